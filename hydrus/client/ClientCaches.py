@@ -394,7 +394,9 @@ class ParsingCache( object ):
         self._next_clean_cache_time = HydrusTime.GetNow()
         
         self._html_to_soups = {}
+        self._html_to_lxml_trees = {}
         self._json_to_jsons = {}
+        self._json_to_streamed_roots = {}
         
         self._lock = threading.Lock()
         
@@ -403,7 +405,7 @@ class ParsingCache( object ):
         
         if HydrusTime.TimeHasPassed( self._next_clean_cache_time ):
             
-            for cache in ( self._html_to_soups, self._json_to_jsons ):
+            for cache in ( self._html_to_soups, self._html_to_lxml_trees, self._json_to_jsons, self._json_to_streamed_roots ):
                 
                 dead_datas = set()
                 
@@ -462,6 +464,35 @@ class ParsingCache( object ):
             
         
     
+    def GetLXMLTree( self, html ):
+        
+        with self._lock:
+            
+            now = HydrusTime.GetNow()
+            
+            if html not in self._html_to_lxml_trees:
+                
+                tree = ClientParsing.GetLXMLTree( html )
+                
+                self._html_to_lxml_trees[ html ] = ( now, tree )
+                
+            
+            ( last_accessed, tree ) = self._html_to_lxml_trees[ html ]
+            
+            if last_accessed != now:
+                
+                self._html_to_lxml_trees[ html ] = ( now, tree )
+                
+            
+            if len( self._html_to_lxml_trees ) > 10:
+                
+                self._CleanCache()
+                
+            
+            return tree
+            
+        
+    
     def GetSoup( self, html ):
         
         with self._lock:
@@ -491,6 +522,45 @@ class ParsingCache( object ):
             
         
     
+    def GetStreamedJSONRoots( self, json_text, formula ):
+        
+        # what a shared streaming pass over this text gave this formula, or None if it was not part of one
+        
+        with self._lock:
+            
+            if json_text not in self._json_to_streamed_roots:
+                
+                return None
+                
+            
+            now = HydrusTime.GetNow()
+            
+            ( last_accessed, formulae_to_roots ) = self._json_to_streamed_roots[ json_text ]
+            
+            if last_accessed != now:
+                
+                self._json_to_streamed_roots[ json_text ] = ( now, formulae_to_roots )
+                
+            
+            return formulae_to_roots.get( formula, None )
+            
+        
+    
+    def SetStreamedJSONRoots( self, json_text, formulae_to_roots ):
+        
+        with self._lock:
+            
+            now = HydrusTime.GetNow()
+            
+            self._json_to_streamed_roots[ json_text ] = ( now, formulae_to_roots )
+            
+            if len( self._json_to_streamed_roots ) > 10:
+                
+                self._CleanCache()
+                
+            
+        
+    
 class ImageRendererCache( object ):
     
     def __init__( self, controller ):
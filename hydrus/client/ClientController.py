@@ -49,6 +49,7 @@ from hydrus.client.gui import QtInit
 from hydrus.client.gui import QtPorting as QP
 from hydrus.client.gui.lists import ClientGUIListManager
 from hydrus.client.importing import ClientImportSubscriptions
+from hydrus.client.metadata import ClientTags
 from hydrus.client.metadata import ClientTagsHandling
 from hydrus.client.networking import ClientNetworking
 from hydrus.client.networking import ClientNetworkingBandwidth
@@ -56,6 +57,7 @@ from hydrus.client.networking import ClientNetworkingDomain
 from hydrus.client.networking import ClientNetworkingLogin
 from hydrus.client.networking import ClientNetworkingSessions
 from hydrus.client.search import ClientSearch
+from hydrus.client.search import ClientSearchAutocomplete
 
 if not HG.twisted_is_broke:
     
@@ -1546,6 +1548,8 @@ class Controller( HydrusController.HydrusController ):
         
         self.subscriptions_manager.Start()
         
+        self.CallLater( 60.0, self.WarmAutocompleteCache )
+        
     
     def ResetIdleTimerFromClientAPI( self ):
         
@@ -2341,6 +2345,59 @@ class Controller( HydrusController.HydrusController ):
             
         
     
+    def WarmAutocompleteCache( self ):
+        
+        # the db remembers autocomplete results, so let's pre-fetch the slow common namespace lookups for the default search page
+        # typing 'character:' on a big PTR client should not be a two second wait the first time in a session
+        
+        tag_service_key = self.new_options.GetKey( 'default_tag_service_search_page' )
+        
+        if not self.services_manager.ServiceExists( tag_service_key ):
+            
+            tag_service_key = CC.COMBINED_TAG_SERVICE_KEY
+            
+        
+        location_context = self.new_options.GetDefaultLocalLocationContext()
+        
+        if location_context.IsAllKnownFiles() and tag_service_key == CC.COMBINED_TAG_SERVICE_KEY:
+            
+            return
+            
+        
+        tag_context = ClientSearch.TagContext( service_key = tag_service_key )
+        
+        file_search_context = ClientSearch.FileSearchContext( location_context = location_context, tag_context = tag_context )
+        
+        tag_autocomplete_options = self.tag_display_manager.GetTagAutocompleteOptions( tag_service_key )
+        
+        search_namespaces_into_full_tags = tag_autocomplete_options.SearchNamespacesIntoFullTags()
+        
+        collapse_search_characters = True
+        
+        for raw_input in ( 'character:', 'creator:', 'series:' ):
+            
+            if HG.view_shutdown:
+                
+                return
+                
+            
+            parsed_autocomplete_text = ClientSearchAutocomplete.ParsedAutocompleteText( raw_input, tag_autocomplete_options, collapse_search_characters )
+            
+            if not parsed_autocomplete_text.IsAcceptableForTagSearches():
+                
+                continue
+                
+            
+            # same calls as the search page dropdown makes
+            
+            strict_search_text = parsed_autocomplete_text.GetSearchText( False )
+            autocomplete_search_text = parsed_autocomplete_text.GetSearchText( True )
+            
+            self.Read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_ACTUAL, file_search_context, search_text = strict_search_text, exact_match = True, inclusive = parsed_autocomplete_text.inclusive )
+            self.Read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_ACTUAL, file_search_context, search_text = autocomplete_search_text, inclusive = parsed_autocomplete_text.inclusive, search_namespaces_into_full_tags = search_namespaces_into_full_tags, limit = ClientSearchAutocomplete.AUTOCOMPLETE_RESULTS_FETCH_LIMIT )
+            
+        
+    
     def Write( self, action, *args, **kwargs ):
         
         if action == 'content_updates':
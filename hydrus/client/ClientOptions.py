@@ -153,6 +153,9 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'booleans' ][ 'replace_tag_underscores_with_spaces' ] = False
         
         self._dictionary[ 'booleans' ][ 'verify_regular_https' ] = True
+        self._dictionary[ 'booleans' ][ 'network_jobs_use_async_runner' ] = False
+        
+        self._dictionary[ 'booleans' ][ 'parse_html_with_lxml' ] = False
         
         self._dictionary[ 'booleans' ][ 'page_drop_chase_normally' ] = True
         self._dictionary[ 'booleans' ][ 'page_drop_chase_with_shift' ] = False
@@ -204,6 +207,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'booleans' ][ 'show_deleted_on_file_seed_short_summary' ] = False
         
         self._dictionary[ 'booleans' ][ 'only_save_last_session_during_idle' ] = False
+        self._dictionary[ 'booleans' ][ 'load_hidden_pages_lazily' ] = True
         
         self._dictionary[ 'booleans' ][ 'do_human_sort_on_hdd_file_import_paths' ] = True
         
@@ -225,6 +229,9 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'booleans' ][ 'watch_clipboard_for_other_recognised_urls' ] = False
         
         self._dictionary[ 'booleans' ][ 'default_search_synchronised' ] = True
+        self._dictionary[ 'booleans' ][ 'show_search_results_progressively' ] = True
+        self._dictionary[ 'booleans' ][ 'lazy_load_tags_for_big_searches' ] = False
+        self._dictionary[ 'booleans' ][ 'use_columnar_files_info_cache' ] = False
         self._dictionary[ 'booleans' ][ 'autocomplete_float_main_gui' ] = True
         
         self._dictionary[ 'booleans' ][ 'global_audio_mute' ] = False
@@ -423,6 +430,13 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'integers' ][ 'max_network_jobs' ] = 15
         self._dictionary[ 'integers' ][ 'max_network_jobs_per_domain' ] = 3
         
+        self._dictionary[ 'integers' ][ 'connection_pool_num_hosts' ] = 32
+        self._dictionary[ 'integers' ][ 'connection_pool_size_per_host' ] = 10
+        self._dictionary[ 'integers' ][ 'connection_max_retries' ] = 0
+        
+        self._dictionary[ 'integers' ][ 'segmented_download_num_segments' ] = 1
+        self._dictionary[ 'integers' ][ 'segmented_download_min_size' ] = 64 * 1048576
+        
         self._dictionary[ 'integers' ][ 'max_connection_attempts_allowed' ] = 5
         self._dictionary[ 'integers' ][ 'max_request_attempts_allowed_get' ] = 5
         
@@ -614,6 +628,11 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         
         #
         
+        # second-level domain : ( pool_size_per_host, max_retries )
+        self._dictionary[ 'domains_to_connection_pool_settings' ] = HydrusSerialisable.SerialisableDictionary()
+        
+        #
+        
         from hydrus.client.media import ClientMedia
         from hydrus.client.metadata import ClientTags
         
@@ -1207,6 +1226,14 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def GetDomainsToConnectionPoolSettings( self ):
+        
+        with self._lock:
+            
+            return { domain : tuple( connection_pool_settings ) for ( domain, connection_pool_settings ) in self._dictionary[ 'domains_to_connection_pool_settings' ].items() }
+            
+        
+    
     def GetDuplicateContentMergeOptions( self, duplicate_type ) -> ClientDuplicates.DuplicateContentMergeOptions:
         
         with self._lock:
@@ -1719,6 +1746,14 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def SetDomainsToConnectionPoolSettings( self, domains_to_connection_pool_settings ):
+        
+        with self._lock:
+            
+            self._dictionary[ 'domains_to_connection_pool_settings' ] = HydrusSerialisable.SerialisableDictionary( domains_to_connection_pool_settings )
+            
+        
+    
     def SetDuplicateContentMergeOptions( self, duplicate_type, duplicate_content_merge_options ):
         
         with self._lock:
@@ -35,6 +35,7 @@ except ImportError:
 try:
     
     import lxml
+    import lxml.etree
     
     LXML_IS_OK = True
     
@@ -43,6 +44,12 @@ except ImportError:
     LXML_IS_OK = False
     
 
+# the attributes bs4 treats as whitespace-separated lists, which affects how they match and what they fetch
+HTML_MULTI_VALUED_ATTRIBUTES = bs4.builder.HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+
+# tag and attribute names we are happy to drop straight into an xpath
+LXML_SAFE_NAME_RE = re.compile( r'^[a-zA-Z_][a-zA-Z0-9_\-\.]*$' )
+
 def ConvertParseResultToPrettyString( result ):
     
     ( ( name, content_type, additional_info ), parsed_text ) = result
@@ -413,6 +420,92 @@ def GetHTMLTagString( tag: bs4.Tag ):
     return ''.join( all_strings )
     
 
+def GetLXMLAttribute( element, attribute ):
+    
+    # mirrors what bs4 gives: multi-value attributes like 'class' are whitespace-split and joined again, and empty ones are missing
+    
+    value = element.get( attribute )
+    
+    if value is None:
+        
+        return None
+        
+    
+    if LXMLAttributeIsMultiValued( element, attribute ):
+        
+        parts = value.split()
+        
+        if len( parts ) == 0:
+            
+            return None
+            
+        
+        value = ' '.join( parts )
+        
+    
+    return value
+    
+
+def GetLXMLTagString( element ):
+    
+    # the same as GetHTMLTagString, but for an lxml tree
+    # bs4 counts comments as strings, so we do too
+    
+    if isinstance( element, lxml.etree._ElementTree ):
+        
+        element = element.getroot()
+        
+    
+    all_strings = []
+    
+    for ( event, sub_element ) in lxml.etree.iterwalk( element, events = ( 'start', 'end', 'comment', 'pi' ) ):
+        
+        if event == 'start':
+            
+            if sub_element is not element and sub_element.tag in ( 'br', 'p' ):
+                
+                all_strings.append( os.linesep )
+                
+            
+            if sub_element.text is not None:
+                
+                all_strings.append( sub_element.text )
+                
+            
+        else:
+            
+            if event != 'end' and sub_element.text is not None:
+                
+                all_strings.append( sub_element.text )
+                
+            
+            if sub_element is not element and sub_element.tail is not None:
+                
+                all_strings.append( sub_element.tail )
+                
+            
+        
+    
+    return ''.join( all_strings )
+    
+
+def GetLXMLTree( html ):
+    
+    if not LXML_IS_OK:
+        
+        raise HydrusExceptions.ParseException( 'This client does not have access to lxml!' )
+        
+    
+    root = lxml.etree.HTML( html )
+    
+    if root is None:
+        
+        raise HydrusExceptions.ParseException( 'Empty document!' )
+        
+    
+    return root.getroottree()
+    
+
 def GetNamespacesFromParsableContent( parsable_content ):
     
     content_type_to_additional_infos = HydrusData.BuildKeyToSetDict( ( ( content_type, additional_infos ) for ( name, content_type, additional_infos ) in parsable_content ) )
@@ -671,6 +764,40 @@ def GetVariableFromParseResults( results ):
     return None
     
 
+def LXMLAttributeIsMultiValued( element, attribute ):
+    
+    return attribute in HTML_MULTI_VALUED_ATTRIBUTES[ '*' ] or attribute in HTML_MULTI_VALUED_ATTRIBUTES.get( element.tag, () )
+    
+
+def LXMLMultiValuedAttributesMatch( element, multi_valued_attribute_checks ):
+    
+    for ( key, value ) in multi_valued_attribute_checks:
+        
+        element_value = element.get( key )
+        
+        if element_value is None:
+            
+            return False
+            
+        
+        if LXMLAttributeIsMultiValued( element, key ):
+            
+            parts = element_value.split()
+            
+            if value not in parts and ' '.join( parts ) != value:
+                
+                return False
+                
+            
+        elif element_value != value:
+            
+            return False
+            
+        
+    
+    return True
+    
+
 def MakeParsedTextPretty( parsed_text ):
     
     if isinstance( parsed_text, bytes ):
@@ -1115,6 +1242,18 @@ class ParseFormulaHTML( ParseFormula ):
         self._attribute_to_fetch = attribute_to_fetch
         
     
+    def _CanParseWithLXML( self ):
+        
+        # we can't produce bs4's exact html serialisation, so that stays with bs4
+        
+        if not LXML_IS_OK or self._content_to_fetch == HTML_CONTENT_HTML:
+            
+            return False
+            
+        
+        return False not in ( tag_rule.CanCompileToLXML() for tag_rule in self._tag_rules )
+        
+    
     def _FindHTMLTags( self, root ):
         
         tags = ( root, )
@@ -1127,6 +1266,18 @@ class ParseFormulaHTML( ParseFormula ):
         return tags
         
     
+    def _FindLXMLNodes( self, tree ):
+        
+        nodes = ( tree, )
+        
+        for tag_rule in self._tag_rules:
+            
+            nodes = tag_rule.GetLXMLNodes( nodes )
+            
+        
+        return nodes
+        
+    
     def _GetParsePrettySeparator( self ):
         
         if self._content_to_fetch == HTML_CONTENT_HTML:
@@ -1211,6 +1362,39 @@ class ParseFormulaHTML( ParseFormula ):
         return raw_texts
         
     
+    def _GetRawTextsFromLXMLNodes( self, nodes ):
+        
+        raw_texts = []
+        
+        for node in nodes:
+            
+            if self._content_to_fetch == HTML_CONTENT_ATTRIBUTE:
+                
+                if isinstance( node, lxml.etree._ElementTree ):
+                    
+                    result = None
+                    
+                else:
+                    
+                    result = GetLXMLAttribute( node, self._attribute_to_fetch )
+                    
+                
+            else:
+                
+                result = GetLXMLTagString( node )
+                
+            
+            if result is None or result == '':
+                
+                continue
+                
+            
+            raw_texts.append( result )
+            
+        
+        return raw_texts
+        
+    
     def _GetSerialisableInfo( self ):
         
         serialisable_tag_rules = self._tag_rules.GetSerialisableTuple()
@@ -1231,6 +1415,27 @@ class ParseFormulaHTML( ParseFormula ):
     
     def _ParseRawTexts( self, parsing_context, parsing_text, collapse_newlines: bool ):
         
+        if HG.client_controller.new_options.GetBoolean( 'parse_html_with_lxml' ) and self._CanParseWithLXML():
+            
+            try:
+                
+                tree = HG.client_controller.parsing_cache.GetLXMLTree( parsing_text )
+                
+            except Exception:
+                
+                # lxml won't take some things bs4 will, like an empty document or an xml declaration in a str, so bs4 gets those
+                
+                tree = None
+                
+            
+            if tree is not None:
+                
+                nodes = self._FindLXMLNodes( tree )
+                
+                return self._GetRawTextsFromLXMLNodes( nodes )
+                
+            
+        
         try:
             
             root = HG.client_controller.parsing_cache.GetSoup( parsing_text )
@@ -1485,6 +1690,100 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
         self._should_test_tag_string = should_test_tag_string
         self._tag_string_string_match = tag_string_string_match
         
+        self._compiled_lxml_rule = None
+        
+    
+    def _CompileLXMLRule( self ):
+        
+        # we let the xpath do the tag name and plain attribute matching in C
+        # multi-value attributes like 'class' match bs4-style, on any single value or the whole normalised string, so we check those ourselves on what comes back
+        
+        if self._tag_name is not None and LXML_SAFE_NAME_RE.match( self._tag_name ) is None:
+            
+            raise HydrusExceptions.ParseException( 'Cannot compile tag name "{}" to xpath!'.format( self._tag_name ) )
+            
+        
+        if self._rule_type == HTML_RULE_TYPE_ASCENDING:
+            
+            return ( None, None, {}, [] )
+            
+        
+        all_multi_valued_attributes = set()
+        
+        for attributes in HTML_MULTI_VALUED_ATTRIBUTES.values():
+            
+            all_multi_valued_attributes.update( attributes )
+            
+        
+        predicates = []
+        variables = {}
+        multi_valued_attribute_checks = []
+        
+        for ( i, ( key, value ) ) in enumerate( sorted( self._tag_attributes.items() ) ):
+            
+            if not isinstance( key, str ) or not isinstance( value, str ) or LXML_SAFE_NAME_RE.match( key ) is None:
+                
+                raise HydrusExceptions.ParseException( 'Cannot compile attribute "{}" to xpath!'.format( key ) )
+                
+            
+            if key in all_multi_valued_attributes:
+                
+                # this doesn't do the whole test, but anything that passes bs4's test contains all these
+                
+                predicates.append( '[@{}]'.format( key ) )
+                
+                for ( j, part ) in enumerate( value.split() ):
+                    
+                    variable_name = 'a{}_{}'.format( i, j )
+                    
+                    predicates.append( '[contains( @{}, ${} )]'.format( key, variable_name ) )
+                    
+                    variables[ variable_name ] = part
+                    
+                
+                multi_valued_attribute_checks.append( ( key, value ) )
+                
+            else:
+                
+                variable_name = 'a{}'.format( i )
+                
+                predicates.append( '[@{} = ${}]'.format( key, variable_name ) )
+                
+                variables[ variable_name ] = value
+                
+            
+        
+        node_test = '*' if self._tag_name is None else self._tag_name
+        
+        if self._rule_type == HTML_RULE_TYPE_DESCENDING:
+            
+            axis = 'descendant'
+            
+        elif self._rule_type == HTML_RULE_TYPE_NEXT_SIBLINGS:
+            
+            axis = 'following-sibling'
+            
+        else:
+            
+            axis = 'preceding-sibling'
+            
+        
+        xpath = lxml.etree.XPath( '{}::{}{}'.format( axis, node_test, ''.join( predicates ) ) )
+        
+        # bs4's find_all on the document itself includes <html>
+        document_xpath = lxml.etree.XPath( 'descendant-or-self::{}{}'.format( node_test, ''.join( predicates ) ) )
+        
+        return ( xpath, document_xpath, variables, multi_valued_attribute_checks )
+        
+    
+    def _GetCompiledLXMLRule( self ):
+        
+        if self._compiled_lxml_rule is None:
+            
+            self._compiled_lxml_rule = self._CompileLXMLRule()
+            
+        
+        return self._compiled_lxml_rule
         
     
     def _GetSerialisableInfo( self ):
@@ -1500,6 +1799,8 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
         
         self._tag_string_string_match = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_tag_string_string_match )
         
+        self._compiled_lxml_rule = None
+        
     
     def _UpdateSerialisableInfo( self, version, old_serialisable_info ):
         
@@ -1524,38 +1825,66 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
             
         
     
-    def GetNodes( self, nodes ):
+    def CanCompileToLXML( self ):
+        
+        if not LXML_IS_OK:
+            
+            return False
+            
+        
+        try:
+            
+            self._GetCompiledLXMLRule()
+            
+            return True
+            
+        except HydrusExceptions.ParseException:
+            
+            return False
+            
+        
+    
+    def GetLXMLNodes( self, nodes ):
+        
+        # the same as GetNodes, but for an lxml tree. the document itself is the lxml ElementTree, everything else is an element
+        
+        ( xpath, document_xpath, variables, multi_valued_attribute_checks ) = self._GetCompiledLXMLRule()
         
         new_nodes = []
         
         for node in nodes:
             
+            node_is_document = isinstance( node, lxml.etree._ElementTree )
+            
             if self._rule_type in [ HTML_RULE_TYPE_DESCENDING, HTML_RULE_TYPE_NEXT_SIBLINGS, HTML_RULE_TYPE_PREV_SIBLINGS ]:
                 
-                # having class : [ 'a', 'b' ] works here, but it does OR not AND
-                # instead do node.find_all( lambda tag: 'class' in tag.attrs and 'a' in tag[ 'class' ] and 'b' in tag[ 'class' ] )
-                # which means we want to just roll all this into one method to support multiple class matching
-                
-                kwargs = { 'attrs' : self._tag_attributes }
-                
-                if self._tag_name is not None:
+                if node_is_document:
                     
-                    kwargs[ 'name' ] = self._tag_name
+                    if self._rule_type == HTML_RULE_TYPE_DESCENDING:
+                        
+                        found_nodes = document_xpath( node.getroot(), **variables )
+                        
+                    else:
+                        
+                        found_nodes = []
+                        
                     
-                
-                if self._rule_type == HTML_RULE_TYPE_DESCENDING:
+                else:
                     
-                    found_nodes = node.find_all( **kwargs )
+                    found_nodes = xpath( node, **variables )
                     
-                elif self._rule_type == HTML_RULE_TYPE_NEXT_SIBLINGS:
+                
+                if len( multi_valued_attribute_checks ) > 0:
                     
-                    found_nodes = node.find_next_siblings( **kwargs )
+                    found_nodes = [ found_node for found_node in found_nodes if LXMLMultiValuedAttributesMatch( found_node, multi_valued_attribute_checks ) ]
                     
-                elif self._rule_type == HTML_RULE_TYPE_PREV_SIBLINGS:
+                
+                if self._rule_type == HTML_RULE_TYPE_PREV_SIBLINGS:
                     
-                    found_nodes = node.find_previous_siblings( **kwargs )
+                    # xpath gives document order, bs4 gives nearest first
+                    found_nodes.reverse()
                     
-
+                
                 if self._tag_index is not None:
                     
                     try:
@@ -1574,25 +1903,25 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
                 
                 found_nodes = []
                 
-                still_in_tree = lambda node: isinstance( node, bs4.element.Tag ) # if we go one above html, we get the BS document itself
+                if node_is_document:
+                    
+                    potential_parent = None
+                    
+                else:
+                    
+                    potential_parent = node.getparent()
+                    
                 
                 num_found = 0
                 
-                potential_parent = node.parent
-                
-                while still_in_tree( potential_parent ):
+                while potential_parent is not None:
                     
-                    if self._tag_name is None:
+                    parent_is_document = isinstance( potential_parent, lxml.etree._ElementTree )
+                    
+                    if self._tag_name is None or ( not parent_is_document and potential_parent.tag == self._tag_name ):
                         
                         num_found += 1
                         
-                    else:
-                        
-                        if potential_parent.name == self._tag_name:
-                            
-                            num_found += 1
-                            
-                        
                     
                     if num_found == self._tag_depth:
                         
@@ -1601,7 +1930,22 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
                         break
                         
                     
-                    potential_parent = potential_parent.parent
+                    if parent_is_document:
+                        
+                        potential_parent = None
+                        
+                    else:
+                        
+                        next_potential_parent = potential_parent.getparent()
+                        
+                        if next_potential_parent is None:
+                            
+                            # bs4 goes one above <html> to the document itself
+                            next_potential_parent = potential_parent.getroottree()
+                            
+                        
+                        potential_parent = next_potential_parent
+                        
                     
                 
             
@@ -1610,11 +1954,103 @@ class ParseRuleHTML( HydrusSerialisable.SerialisableBase ):
         
         if self._should_test_tag_string:
             
-            potential_nodes = new_nodes
-            
-            new_nodes = []
+            new_nodes = [ node for node in new_nodes if self._tag_string_string_match.Matches( GetLXMLTagString( node ) ) ]
             
-            for node in potential_nodes:
+        
+        return new_nodes
+        
+    
+    def GetNodes( self, nodes ):
+        
+        new_nodes = []
+        
+        for node in nodes:
+            
+            if self._rule_type in [ HTML_RULE_TYPE_DESCENDING, HTML_RULE_TYPE_NEXT_SIBLINGS, HTML_RULE_TYPE_PREV_SIBLINGS ]:
+                
+                # having class : [ 'a', 'b' ] works here, but it does OR not AND
+                # instead do node.find_all( lambda tag: 'class' in tag.attrs and 'a' in tag[ 'class' ] and 'b' in tag[ 'class' ] )
+                # which means we want to just roll all this into one method to support multiple class matching
+                
+                kwargs = { 'attrs' : self._tag_attributes }
+                
+                if self._tag_name is not None:
+                    
+                    kwargs[ 'name' ] = self._tag_name
+                    
+                
+                if self._rule_type == HTML_RULE_TYPE_DESCENDING:
+                    
+                    found_nodes = node.find_all( **kwargs )
+                    
+                elif self._rule_type == HTML_RULE_TYPE_NEXT_SIBLINGS:
+                    
+                    found_nodes = node.find_next_siblings( **kwargs )
+                    
+                elif self._rule_type == HTML_RULE_TYPE_PREV_SIBLINGS:
+                    
+                    found_nodes = node.find_previous_siblings( **kwargs )
+                    
+
+                if self._tag_index is not None:
+                    
+                    try:
+                        
+                        indexed_node = found_nodes[ self._tag_index ]
+                        
+                    except IndexError:
+                        
+                        continue
+                        
+                    
+                    found_nodes = [ indexed_node ]
+                    
+                
+            elif self._rule_type == HTML_RULE_TYPE_ASCENDING:
+                
+                found_nodes = []
+                
+                still_in_tree = lambda node: isinstance( node, bs4.element.Tag ) # if we go one above html, we get the BS document itself
+                
+                num_found = 0
+                
+                potential_parent = node.parent
+                
+                while still_in_tree( potential_parent ):
+                    
+                    if self._tag_name is None:
+                        
+                        num_found += 1
+                        
+                    else:
+                        
+                        if potential_parent.name == self._tag_name:
+                            
+                            num_found += 1
+                            
+                        
+                    
+                    if num_found == self._tag_depth:
+                        
+                        found_nodes = [ potential_parent ]
+                        
+                        break
+                        
+                    
+                    potential_parent = potential_parent.parent
+                    
+                
+            
+            new_nodes.extend( found_nodes )
+            
+        
+        if self._should_test_tag_string:
+            
+            potential_nodes = new_nodes
+            
+            new_nodes = []
+            
+            for node in potential_nodes:
                 
                 s = GetHTMLTagString( node )
                 
@@ -1702,6 +2138,328 @@ JSON_PARSE_RULE_TYPE_DICT_KEY = 0
 JSON_PARSE_RULE_TYPE_ALL_ITEMS = 1
 JSON_PARSE_RULE_TYPE_INDEXED_ITEM = 2
 
+# some apis give us tens of MB of json. loading all that into python objects costs several times the text size in memory, for every concurrent parse
+# above this size, we walk the text and only decode the parts the parse rules actually reach
+JSON_STREAMING_MIN_SIZE = 4 * 1048576
+
+JSON_DECODER = json.JSONDecoder()
+JSON_WHITESPACE_RE = re.compile( r'[ \t\n\r]*' )
+
+def GetJSONRoots( j, parse_rules ):
+    
+    roots = ( j, )
+    
+    for ( parse_rule_type, parse_rule ) in parse_rules:
+        
+        next_roots = []
+        
+        for root in roots:
+            
+            if parse_rule_type == JSON_PARSE_RULE_TYPE_ALL_ITEMS:
+                
+                if isinstance( root, list ):
+                    
+                    next_roots.extend( root )
+                    
+                elif isinstance( root, dict ):
+                    
+                    pairs = sorted( root.items() )
+                    
+                    for ( key, value ) in pairs:
+                        
+                        next_roots.append( value )
+                        
+                    
+                else:
+                    
+                    continue
+                    
+                
+            elif parse_rule_type == JSON_PARSE_RULE_TYPE_INDEXED_ITEM:
+                
+                index = parse_rule
+                
+                if isinstance( root, ( list, dict ) ):
+                    
+                    if isinstance( root, list ):
+                        
+                        list_to_index = root
+                        
+                    elif isinstance( root, dict ):
+                        
+                        list_to_index = list( root.keys() )
+                        
+                        HydrusData.HumanTextSort( list_to_index )
+                        
+                    
+                    try:
+                        
+                        indexed_item = list_to_index[ index ]
+                        
+                    except IndexError:
+                        
+                        continue
+                        
+                    
+                    if isinstance( root, list ):
+                        
+                        next_roots.append( indexed_item )
+                        
+                    elif isinstance( root, dict ):
+                        
+                        next_roots.append( root[ indexed_item ] )
+                        
+                    
+                else:
+                    
+                    continue
+                    
+                
+            elif parse_rule_type == JSON_PARSE_RULE_TYPE_DICT_KEY:
+                
+                if not isinstance( root, dict ):
+                    
+                    continue
+                    
+                
+                string_match = parse_rule
+                
+                pairs = sorted( root.items() )
+                
+                for ( key, value ) in pairs:
+                    
+                    if string_match.Matches( key ):
+                        
+                        next_roots.append( value )
+                        
+                    
+                
+            
+        
+        roots = next_roots
+        
+    
+    return roots
+    
+
+def GetJSONRootsStreaming( json_text, parse_rules_list ):
+    
+    # one walk over the text for several lists of parse rules at once, returning what each reaches
+    
+    ( paths_to_roots, idx ) = StreamJSONRoots( json_text, 0, list( enumerate( parse_rules_list ) ), {} )
+    
+    idx = JSON_WHITESPACE_RE.match( json_text, idx ).end()
+    
+    if idx != len( json_text ):
+        
+        raise json.JSONDecodeError( 'Extra data', json_text, idx )
+        
+    
+    return [ paths_to_roots[ i ] for i in range( len( parse_rules_list ) ) ]
+    
+
+def GetJSONStreamingNextPaths( paths, key, routing_cache ):
+    
+    # which paths go into this key or list index, and whether they all stop there
+    # a big json is usually thousands of the same shape of object, so we work this out once per key and remember it
+    
+    cache_key = ( id( paths ), key )
+    
+    if cache_key not in routing_cache:
+        
+        if isinstance( key, str ):
+            
+            next_paths = [ ( path_id, parse_rules[1:] ) for ( path_id, parse_rules ) in paths if parse_rules[0][0] == JSON_PARSE_RULE_TYPE_ALL_ITEMS or ( parse_rules[0][0] == JSON_PARSE_RULE_TYPE_DICT_KEY and parse_rules[0][1].Matches( key ) ) ]
+            
+        else:
+            
+            next_paths = [ ( path_id, parse_rules[1:] ) for ( path_id, parse_rules ) in paths if parse_rules[0][0] == JSON_PARSE_RULE_TYPE_ALL_ITEMS or ( parse_rules[0][0] == JSON_PARSE_RULE_TYPE_INDEXED_ITEM and parse_rules[0][1] == key ) ]
+            
+        
+        all_stop_here = False not in ( len( parse_rules ) == 0 for ( path_id, parse_rules ) in next_paths )
+        
+        # we hold on to the paths, so the id stays good for the whole walk
+        routing_cache[ cache_key ] = ( next_paths, all_stop_here, paths )
+        
+    
+    ( next_paths, all_stop_here, paths ) = routing_cache[ cache_key ]
+    
+    return ( next_paths, all_stop_here )
+    
+
+def StreamJSONRoots( json_text, idx, paths, routing_cache ):
+    
+    # walks the json value starting at idx, returning what each path's parse rules reach under it and the index after it
+    # anything no path goes into is skipped, and only the final roots are decoded into python objects
+    
+    idx = JSON_WHITESPACE_RE.match( json_text, idx ).end()
+    
+    c = json_text[ idx : idx + 1 ]
+    
+    plan_key = ( 'plan', id( paths ), c )
+    
+    if plan_key not in routing_cache:
+        
+        # indexing a dict needs all its keys sorted, and a negative list index needs the length
+        random_access_needed = True in ( parse_rules[0][0] == JSON_PARSE_RULE_TYPE_INDEXED_ITEM and ( c == '{' or parse_rules[0][1] < 0 ) for ( path_id, parse_rules ) in paths if len( parse_rules ) > 0 )
+        someone_stops_here = True in ( len( parse_rules ) == 0 for ( path_id, parse_rules ) in paths )
+        any_indexed = True in ( parse_rules[0][0] == JSON_PARSE_RULE_TYPE_INDEXED_ITEM for ( path_id, parse_rules ) in paths if len( parse_rules ) > 0 )
+        
+        # if everyone just wants all the children, we would decode the whole thing anyway, and it is much faster in one go
+        everyone_wants_all_children = False not in ( len( parse_rules ) == 1 and parse_rules[0][0] == JSON_PARSE_RULE_TYPE_ALL_ITEMS for ( path_id, parse_rules ) in paths )
+        
+        decode_it = c not in ( '{', '[' ) or random_access_needed or someone_stops_here or everyone_wants_all_children
+        
+        routing_cache[ plan_key ] = ( decode_it, any_indexed, paths )
+        
+    
+    ( decode_it, any_indexed, paths ) = routing_cache[ plan_key ]
+    
+    if decode_it:
+        
+        # someone wants this whole node, or we can't walk it, so we decode it once and everyone does the normal walk on that
+        
+        ( j, idx ) = JSON_DECODER.raw_decode( json_text, idx )
+        
+        return ( { path_id : list( GetJSONRoots( j, parse_rules ) ) for ( path_id, parse_rules ) in paths }, idx )
+        
+    
+    paths_to_roots = { path_id : [] for ( path_id, parse_rules ) in paths }
+    
+    if c == '{':
+        
+        keys_to_paths_to_roots = {}
+        
+        idx = JSON_WHITESPACE_RE.match( json_text, idx + 1 ).end()
+        
+        if json_text.startswith( '}', idx ):
+            
+            return ( paths_to_roots, idx + 1 )
+            
+        
+        while True:
+            
+            if not json_text.startswith( '"', idx ):
+                
+                raise json.JSONDecodeError( 'Expecting property name enclosed in double quotes', json_text, idx )
+                
+            
+            ( key, idx ) = json.decoder.scanstring( json_text, idx + 1 )
+            
+            idx = JSON_WHITESPACE_RE.match( json_text, idx ).end()
+            
+            if not json_text.startswith( ':', idx ):
+                
+                raise json.JSONDecodeError( 'Expecting \':\' delimiter', json_text, idx )
+                
+            
+            idx = JSON_WHITESPACE_RE.match( json_text, idx + 1 ).end()
+            
+            ( next_paths, all_stop_here ) = GetJSONStreamingNextPaths( paths, key, routing_cache )
+            
+            # a repeated key overwrites, just like json.loads
+            
+            if len( next_paths ) == 0:
+                
+                ( skipped, idx ) = JSON_DECODER.raw_decode( json_text, idx )
+                
+            elif all_stop_here:
+                
+                ( root, idx ) = JSON_DECODER.raw_decode( json_text, idx )
+                
+                keys_to_paths_to_roots[ key ] = { path_id : [ root ] for ( path_id, parse_rules ) in next_paths }
+                
+            else:
+                
+                ( keys_to_paths_to_roots[ key ], idx ) = StreamJSONRoots( json_text, idx, next_paths, routing_cache )
+                
+            
+            idx = JSON_WHITESPACE_RE.match( json_text, idx ).end()
+            
+            c = json_text[ idx : idx + 1 ]
+            
+            if c == '}':
+                
+                break
+                
+            elif c != ',':
+                
+                raise json.JSONDecodeError( 'Expecting \',\' delimiter', json_text, idx )
+                
+            
+            idx = JSON_WHITESPACE_RE.match( json_text, idx + 1 ).end()
+            
+        
+        # the normal walk goes through dicts in sorted key order, not document order
+        
+        for key in sorted( keys_to_paths_to_roots.keys() ):
+            
+            for ( path_id, roots ) in keys_to_paths_to_roots[ key ].items():
+                
+                paths_to_roots[ path_id ].extend( roots )
+                
+            
+        
+    else:
+        
+        idx = JSON_WHITESPACE_RE.match( json_text, idx + 1 ).end()
+        
+        if json_text.startswith( ']', idx ):
+            
+            return ( paths_to_roots, idx + 1 )
+            
+        
+        i = 0
+        
+        while True:
+            
+            ( next_paths, all_stop_here ) = GetJSONStreamingNextPaths( paths, i if any_indexed else None, routing_cache )
+            
+            if len( next_paths ) == 0:
+                
+                ( skipped, idx ) = JSON_DECODER.raw_decode( json_text, idx )
+                
+            elif all_stop_here:
+                
+                ( root, idx ) = JSON_DECODER.raw_decode( json_text, idx )
+                
+                for ( path_id, parse_rules ) in next_paths:
+                    
+                    paths_to_roots[ path_id ].append( root )
+                    
+                
+            else:
+                
+                ( item_paths_to_roots, idx ) = StreamJSONRoots( json_text, idx, next_paths, routing_cache )
+                
+                for ( path_id, roots ) in item_paths_to_roots.items():
+                    
+                    paths_to_roots[ path_id ].extend( roots )
+                    
+                
+            
+            i += 1
+            
+            idx = JSON_WHITESPACE_RE.match( json_text, idx ).end()
+            
+            c = json_text[ idx : idx + 1 ]
+            
+            if c == ']':
+                
+                break
+                
+            elif c != ',':
+                
+                raise json.JSONDecodeError( 'Expecting \',\' delimiter', json_text, idx )
+                
+            
+            idx = JSON_WHITESPACE_RE.match( json_text, idx + 1 ).end()
+            
+        
+    
+    return ( paths_to_roots, idx + 1 )
+    
+
 class ParseFormulaJSON( ParseFormula ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_PARSE_FORMULA_JSON
@@ -1739,99 +2497,7 @@ class ParseFormulaJSON( ParseFormula ):
             
         
     
-    def _GetRawTextsFromJSON( self, j ):
-        
-        roots = ( j, )
-        
-        for ( parse_rule_type, parse_rule ) in self._parse_rules:
-            
-            next_roots = []
-            
-            for root in roots:
-                
-                if parse_rule_type == JSON_PARSE_RULE_TYPE_ALL_ITEMS:
-                    
-                    if isinstance( root, list ):
-                        
-                        next_roots.extend( root )
-                        
-                    elif isinstance( root, dict ):
-                        
-                        pairs = sorted( root.items() )
-                        
-                        for ( key, value ) in pairs:
-                            
-                            next_roots.append( value )
-                            
-                        
-                    else:
-                        
-                        continue
-                        
-                    
-                elif parse_rule_type == JSON_PARSE_RULE_TYPE_INDEXED_ITEM:
-                    
-                    index = parse_rule
-                    
-                    if isinstance( root, ( list, dict ) ):
-                        
-                        if isinstance( root, list ):
-                            
-                            list_to_index = root
-                            
-                        elif isinstance( root, dict ):
-                            
-                            list_to_index = list( root.keys() )
-                            
-                            HydrusData.HumanTextSort( list_to_index )
-                            
-                        
-                        try:
-                            
-                            indexed_item = list_to_index[ index ]
-                            
-                        except IndexError:
-                            
-                            continue
-                            
-                        
-                        if isinstance( root, list ):
-                            
-                            next_roots.append( indexed_item )
-                            
-                        elif isinstance( root, dict ):
-                            
-                            next_roots.append( root[ indexed_item ] )
-                            
-                        
-                    else:
-                        
-                        continue
-                        
-                    
-                elif parse_rule_type == JSON_PARSE_RULE_TYPE_DICT_KEY:
-                    
-                    if not isinstance( root, dict ):
-                        
-                        continue
-                        
-                    
-                    string_match = parse_rule
-                    
-                    pairs = sorted( root.items() )
-                    
-                    for ( key, value ) in pairs:
-                        
-                        if string_match.Matches( key ):
-                            
-                            next_roots.append( value )
-                            
-                        
-                    
-                
-            
-            roots = next_roots
-            
+    def _GetRawTextsFromRoots( self, roots ):
         
         raw_texts = []
         
@@ -1894,9 +2560,25 @@ class ParseFormulaJSON( ParseFormula ):
     
     def _ParseRawTexts( self, parsing_context, parsing_text, collapse_newlines: bool ):
         
+        # we only stream when the text is big enough that holding it all is the bigger problem
+        # a page parser streams the text once for all its formulae before it asks us, so we usually just pick up our part of that
+        stream_it = len( self._parse_rules ) > 0 and len( parsing_text ) >= JSON_STREAMING_MIN_SIZE
+        
         try:
             
-            j = HG.client_controller.parsing_cache.GetJSON( parsing_text )
+            if stream_it:
+                
+                roots = HG.client_controller.parsing_cache.GetStreamedJSONRoots( parsing_text, self )
+                
+                if roots is None:
+                    
+                    ( roots, ) = GetJSONRootsStreaming( parsing_text, [ self._parse_rules ] )
+                    
+                
+            else:
+                
+                j = HG.client_controller.parsing_cache.GetJSON( parsing_text )
+                
             
         except Exception as e:
             
@@ -1914,7 +2596,12 @@ class ParseFormulaJSON( ParseFormula ):
             raise HydrusExceptions.ParseException( message )
             
         
-        raw_texts = self._GetRawTextsFromJSON( j )
+        if not stream_it:
+            
+            roots = GetJSONRoots( j, self._parse_rules )
+            
+        
+        raw_texts = self._GetRawTextsFromRoots( roots )
         
         return raw_texts
         
@@ -2291,6 +2978,11 @@ class ContentParser( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def GetFormula( self ):
+        
+        return self._formula
+        
+    
     def GetName( self ):
         
         return self._name
@@ -2540,6 +3232,48 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
         self._content_parsers = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_content_parsers )
         
     
+    def _StreamJSONForFormulae( self, parsing_text ):
+        
+        # every json formula we have on this text gets its roots from one shared streaming pass, rather than a pass each
+        
+        formulae = [ content_parser.GetFormula() for content_parser in self._content_parsers ]
+        formulae.extend( ( formula for ( formula, page_parser ) in self._sub_page_parsers ) )
+        
+        json_formulae = []
+        
+        while len( formulae ) > 0:
+            
+            formula = formulae.pop( 0 )
+            
+            if isinstance( formula, ParseFormulaCompound ):
+                
+                formulae.extend( formula.GetFormulae() )
+                
+            elif isinstance( formula, ParseFormulaJSON ) and len( formula.GetParseRules() ) > 0:
+                
+                json_formulae.append( formula )
+                
+            
+        
+        if len( json_formulae ) < 2:
+            
+            return
+            
+        
+        try:
+            
+            roots_list = GetJSONRootsStreaming( parsing_text, [ formula.GetParseRules() for formula in json_formulae ] )
+            
+        except Exception as e:
+            
+            # not good json. the formulae will try again on their own and make a proper error
+            
+            return
+            
+        
+        HG.client_controller.parsing_cache.SetStreamedJSONRoots( parsing_text, dict( zip( json_formulae, roots_list ) ) )
+        
+    
     def _UpdateSerialisableInfo( self, version, old_serialisable_info ):
         
         if version == 1:
@@ -2683,6 +3417,11 @@ class PageParser( HydrusSerialisable.SerialisableBaseNamed ):
                 parsing_context[ 'post_index' ] = '0'
                 
             
+            if len( converted_parsing_text ) >= JSON_STREAMING_MIN_SIZE:
+                
+                self._StreamJSONForFormulae( converted_parsing_text )
+                
+            
             for content_parser in self._content_parsers:
                 
                 whole_page_parse_results.extend( content_parser.Parse( parsing_context, converted_parsing_text ) )
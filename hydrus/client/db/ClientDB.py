@@ -1,4 +1,5 @@
 import collections
+import contextlib
 import hashlib
 import itertools    
 import math
@@ -45,6 +46,7 @@ from hydrus.client.db import ClientDBFilesMetadataBasic
 from hydrus.client.db import ClientDBFilesMetadataRich
 from hydrus.client.db import ClientDBFilesPhysicalStorage
 from hydrus.client.db import ClientDBFilesSearch
+from hydrus.client.db import ClientDBFilesSearchCache
 from hydrus.client.db import ClientDBFilesStorage
 from hydrus.client.db import ClientDBFilesTimestamps
 from hydrus.client.db import ClientDBFilesViewingStats
@@ -66,6 +68,7 @@ from hydrus.client.db import ClientDBSimilarFiles
 from hydrus.client.db import ClientDBTagDisplay
 from hydrus.client.db import ClientDBTagParents
 from hydrus.client.db import ClientDBTagSearch
+from hydrus.client.db import ClientDBTagSearchCache
 from hydrus.client.db import ClientDBTagSiblings
 from hydrus.client.db import ClientDBURLMap
 from hydrus.client.importing import ClientImportFiles
@@ -238,6 +241,9 @@ class DB( HydrusDB.HydrusDB ):
         
         self._weakref_media_result_cache = ClientMediaResultCache.MediaResultCache()
         
+        self._autocomplete_predicates_cache = ClientDBTagSearchCache.AutocompletePredicatesCache()
+        self._file_search_results_cache = ClientDBFilesSearchCache.FileSearchResultsCache()
+        
         self._after_job_content_update_jobs = []
         self._regen_tags_managers_hash_ids = set()
         self._regen_tags_managers_tag_ids = set()
@@ -288,7 +294,7 @@ class DB( HydrusDB.HydrusDB ):
             delta_size = self.modules_files_metadata_basic.GetTotalSize( new_hash_ids )
             num_viewable_files = self.modules_files_metadata_basic.GetNumViewable( new_hash_ids )
             num_files = len( new_hash_ids )
-            num_inbox = len( new_hash_ids.intersection( self.modules_files_inbox.inbox_hash_ids ) )
+            num_inbox = len( self.modules_files_inbox.inbox_hash_ids.intersection( new_hash_ids ) )
             
             service_info_updates = []
             
@@ -574,6 +580,11 @@ class DB( HydrusDB.HydrusDB ):
         return status
         
     
+    def _CacheTagDisplayGetApplicationStatusNumbersServices( self, service_keys ):
+        
+        return { service_key : self._CacheTagDisplayGetApplicationStatusNumbers( service_key ) for service_key in service_keys }
+        
+    
     def _CacheTagDisplaySync( self, service_key: bytes, work_time = 0.5 ):
         
         # ok, this is the big maintenance lad
@@ -887,32 +898,12 @@ class DB( HydrusDB.HydrusDB ):
             
             #
             
-            tag_ids_to_delete_implied_by = collections.defaultdict( set )
-            tag_ids_to_add_implied_by = collections.defaultdict( set )
+            ( tag_ids_to_add_implied_by, tag_ids_to_delete_implied_by ) = ClientTagsHandling.GetImpliedByDiff( possibly_affected_tag_ids, previous_chain_tag_ids_to_implied_by, after_chain_tag_ids_to_implied_by )
             
-            for tag_id in possibly_affected_tag_ids:
-                
-                previous_implied_by = previous_chain_tag_ids_to_implied_by[ tag_id ]
-                after_implied_by = after_chain_tag_ids_to_implied_by[ tag_id ]
-                
-                to_delete = previous_implied_by.difference( after_implied_by )
-                to_add = after_implied_by.difference( previous_implied_by )
+            for tag_ids_to_implied_by in ( tag_ids_to_add_implied_by, tag_ids_to_delete_implied_by ):
                 
-                if len( to_delete ) > 0:
-                    
-                    tag_ids_to_delete_implied_by[ tag_id ] = to_delete
-                    
-                    all_tag_ids_altered.add( tag_id )
-                    all_tag_ids_altered.update( to_delete )
-                    
-                
-                if len( to_add ) > 0:
-                    
-                    tag_ids_to_add_implied_by[ tag_id ] = to_add
-                    
-                    all_tag_ids_altered.add( tag_id )
-                    all_tag_ids_altered.update( to_add )
-                    
+                all_tag_ids_altered.update( tag_ids_to_implied_by.keys() )
+                all_tag_ids_altered.update( itertools.chain.from_iterable( tag_ids_to_implied_by.values() ) )
                 
             
             # now do the implications
@@ -953,6 +944,14 @@ class DB( HydrusDB.HydrusDB ):
             
             self._regen_tags_managers_tag_ids.update( all_tag_ids_altered )
             
+            # autocomplete results carry sibling and parent info, and 'all known tags' results are displayed through the combined service
+            self._autocomplete_predicates_cache.NotifyTagIdsChanged( tag_service_id, all_tag_ids_altered )
+            self._autocomplete_predicates_cache.NotifyTagIdsChanged( self.modules_services.combined_tag_service_id, all_tag_ids_altered )
+            
+            # a new sibling or parent changes what a tag search finds
+            self._file_search_results_cache.NotifyTagIdsChanged( tag_service_id, all_tag_ids_altered )
+            self._file_search_results_cache.NotifyTagIdsChanged( self.modules_services.combined_tag_service_id, all_tag_ids_altered )
+            
             self._CacheTagsSyncTags( tag_service_id, all_tag_ids_altered )
             
             self._cursor_transaction_wrapper.pub_after_job( 'notify_new_tag_display_sync_status', service_key )
@@ -963,6 +962,28 @@ class DB( HydrusDB.HydrusDB ):
         return still_needs_work
         
     
+    def _CacheTagDisplaySyncServices( self, service_keys_to_work_times ):
+        
+        # the maintenance manager hands us several services in one job when it is allowed to work hard, so we don't pay for a job per service
+        
+        service_keys_to_num_rows_to_sync = {}
+        
+        for ( service_key, work_time ) in service_keys_to_work_times.items():
+            
+            self._CacheTagDisplaySync( service_key, work_time = work_time )
+            
+            tag_service_id = self.modules_services.GetServiceId( service_key )
+            
+            ( sibling_rows_to_add, sibling_rows_to_remove, parent_rows_to_add, parent_rows_to_remove, num_actual_rows, num_ideal_rows ) = self.modules_tag_display.GetApplicationStatus( tag_service_id )
+            
+            num_rows_to_sync = len( sibling_rows_to_add ) + len( sibling_rows_to_remove ) + len( parent_rows_to_add ) + len( parent_rows_to_remove )
+            
+            service_keys_to_num_rows_to_sync[ service_key ] = num_rows_to_sync
+            
+        
+        return service_keys_to_num_rows_to_sync
+        
+    
     def _CacheTagsPopulate( self, file_service_id, tag_service_id, status_hook = None ):
         
         siblings_table_name = ClientDBTagSiblings.GenerateTagSiblingsLookupCacheTableName( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id )
@@ -1525,7 +1546,7 @@ class DB( HydrusDB.HydrusDB ):
             delta_size = self.modules_files_metadata_basic.GetTotalSize( existing_hash_ids )
             num_viewable_files = self.modules_files_metadata_basic.GetNumViewable( existing_hash_ids )
             num_existing_files_removed = len( existing_hash_ids )
-            num_inbox = len( existing_hash_ids.intersection( self.modules_files_inbox.inbox_hash_ids ) )
+            num_inbox = len( self.modules_files_inbox.inbox_hash_ids.intersection( existing_hash_ids ) )
             
             service_info_updates.append( ( -delta_size, service_id, HC.SERVICE_INFO_TOTAL_SIZE ) )
             service_info_updates.append( ( -num_viewable_files, service_id, HC.SERVICE_INFO_NUM_VIEWABLE_FILES ) )
@@ -1661,6 +1682,8 @@ class DB( HydrusDB.HydrusDB ):
         self._Execute( 'DELETE FROM recent_tags WHERE service_id = ?;', ( service_id, ) )
         self._Execute( 'DELETE FROM service_info WHERE service_id = ?;', ( service_id, ) )
         
+        self._file_search_results_cache.Clear()
+        
         self._DeleteServiceDropFilesTables( service_id, service_type )
         
         if service_type in HC.REPOSITORIES:
@@ -1786,6 +1809,29 @@ class DB( HydrusDB.HydrusDB ):
         self._cursor_transaction_wrapper.pub_after_job( 'notify_new_pending' )
         
     
+    def _DeleteTagCacheTrigramIndex( self, tag_service_key = None ):
+        
+        if tag_service_key is None:
+            
+            tag_service_ids = self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+            
+        else:
+            
+            tag_service_ids = ( self.modules_services.GetServiceId( tag_service_key ), )
+            
+        
+        file_service_ids = list( self.modules_services.GetServiceIds( HC.FILE_SERVICES_WITH_SPECIFIC_TAG_LOOKUP_CACHES ) )
+        file_service_ids.append( self.modules_services.combined_file_service_id )
+        
+        for ( file_service_id, tag_service_id ) in itertools.product( file_service_ids, tag_service_ids ):
+            
+            if self.modules_tag_search.HasSubtagsTrigramIndex( file_service_id, tag_service_id ):
+                
+                self.modules_tag_search.DropSubtagsTrigramIndex( file_service_id, tag_service_id )
+                
+            
+        
+    
     def _DisplayCatastrophicError( self, text ):
         
         message = 'The db encountered a serious error! This is going to be written to the log as well, but here it is for a screenshot:'
@@ -1812,7 +1858,7 @@ class DB( HydrusDB.HydrusDB ):
             
             if len( hash_ids_to_do ) > 0:
                 
-                hash_ids_to_tags_managers = self._GetForceRefreshTagsManagers( hash_ids_to_do )
+                hash_ids_to_tags_managers = self._GetForceRefreshTagsManagersForMediaResultCache( hash_ids_to_do )
                 
                 self._weakref_media_result_cache.SilentlyTakeNewTagsManagers( hash_ids_to_tags_managers )
                 
@@ -1828,7 +1874,7 @@ class DB( HydrusDB.HydrusDB ):
             
             if len( hash_ids_to_do ) > 0:
                 
-                hash_ids_to_tags_managers = self._GetForceRefreshTagsManagers( hash_ids_to_do )
+                hash_ids_to_tags_managers = self._GetForceRefreshTagsManagersForMediaResultCache( hash_ids_to_do )
             
                 self._weakref_media_result_cache.SilentlyTakeNewTagsManagers( hash_ids_to_tags_managers )
                 
@@ -2387,7 +2433,7 @@ class DB( HydrusDB.HydrusDB ):
             
             if service.GetServiceType() in HC.LOCAL_FILE_SERVICES:
                 
-                hash_ids = set( hash_ids ).intersection( self.modules_files_inbox.inbox_hash_ids )
+                hash_ids = self.modules_files_inbox.inbox_hash_ids.intersection( hash_ids )
                 
             
         
@@ -2900,17 +2946,40 @@ class DB( HydrusDB.HydrusDB ):
         return predicates
         
     
-    def _GetForceRefreshTagsManagers( self, hash_ids, hash_ids_to_current_file_service_ids = None ):
+    def _GetForceRefreshTagsManagers( self, hash_ids, hash_ids_to_current_file_service_ids = None, lazy = False ):
         
         with self._MakeTemporaryIntegerTable( hash_ids, 'hash_id' ) as temp_table_name:
             
             self._AnalyzeTempTable( temp_table_name )
             
-            return self._GetForceRefreshTagsManagersWithTableHashIds( hash_ids, temp_table_name, hash_ids_to_current_file_service_ids = hash_ids_to_current_file_service_ids )
+            return self._GetForceRefreshTagsManagersWithTableHashIds( hash_ids, temp_table_name, hash_ids_to_current_file_service_ids = hash_ids_to_current_file_service_ids, lazy = lazy )
             
         
     
-    def _GetForceRefreshTagsManagersWithTableHashIds( self, hash_ids, hash_ids_table_name, hash_ids_to_current_file_service_ids = None ):
+    def _GetForceRefreshTagsManagersForMediaResultCache( self, hash_ids ):
+        
+        # cached media results that were loaded with lazy tags get lazy replacements
+        
+        lazy_hash_ids = self._weakref_media_result_cache.FilterFilesWithLazyTags( hash_ids )
+        
+        full_hash_ids = set( hash_ids ).difference( lazy_hash_ids )
+        
+        hash_ids_to_tags_managers = {}
+        
+        if len( full_hash_ids ) > 0:
+            
+            hash_ids_to_tags_managers.update( self._GetForceRefreshTagsManagers( full_hash_ids ) )
+            
+        
+        if len( lazy_hash_ids ) > 0:
+            
+            hash_ids_to_tags_managers.update( self._GetForceRefreshTagsManagers( lazy_hash_ids, lazy = True ) )
+            
+        
+        return hash_ids_to_tags_managers
+        
+    
+    def _GetForceRefreshTagsManagersWithTableHashIds( self, hash_ids, hash_ids_table_name, hash_ids_to_current_file_service_ids = None, lazy = False ):
         
         if hash_ids_to_current_file_service_ids is None:
             
@@ -2923,75 +2992,85 @@ class DB( HydrusDB.HydrusDB ):
         
         tag_service_ids = self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
         
-        storage_tag_data = []
-        display_tag_data = []
+        # these are lists of ( tag_service_id, status, [ ( hash_id, tag_id ) ] ), so we never make a python tuple per row
+        storage_tag_groups = []
+        display_tag_groups = []
         
         for ( common_file_service_id, batch_of_hash_ids ) in common_file_service_ids_to_hash_ids.items():
             
             if len( batch_of_hash_ids ) == len( hash_ids ):
                 
-                ( batch_of_storage_tag_data, batch_of_display_tag_data ) = self._GetForceRefreshTagsManagersWithTableHashIdsTagData( common_file_service_id, tag_service_ids, hash_ids_table_name )
+                ( batch_of_storage_tag_groups, batch_of_display_tag_groups ) = self._GetForceRefreshTagsManagersWithTableHashIdsTagData( common_file_service_id, tag_service_ids, hash_ids_table_name, lazy = lazy )
                 
             else:
                 
                 with self._MakeTemporaryIntegerTable( batch_of_hash_ids, 'hash_id' ) as temp_batch_hash_ids_table_name:
                     
-                    ( batch_of_storage_tag_data, batch_of_display_tag_data ) = self._GetForceRefreshTagsManagersWithTableHashIdsTagData( common_file_service_id, tag_service_ids, temp_batch_hash_ids_table_name )
+                    ( batch_of_storage_tag_groups, batch_of_display_tag_groups ) = self._GetForceRefreshTagsManagersWithTableHashIdsTagData( common_file_service_id, tag_service_ids, temp_batch_hash_ids_table_name, lazy = lazy )
                     
                 
             
-            storage_tag_data.extend( batch_of_storage_tag_data )
-            display_tag_data.extend( batch_of_display_tag_data )
+            storage_tag_groups.extend( batch_of_storage_tag_groups )
+            display_tag_groups.extend( batch_of_display_tag_groups )
             
         
-        seen_tag_ids = { tag_id for ( hash_id, ( tag_service_id, status, tag_id ) ) in storage_tag_data }
-        seen_tag_ids.update( ( tag_id for ( hash_id, ( tag_service_id, status, tag_id ) ) in display_tag_data ) )
+        seen_tag_ids = set()
+        
+        for ( tag_service_id, status, rows ) in storage_tag_groups + display_tag_groups:
+            
+            seen_tag_ids.update( [ tag_id for ( hash_id, tag_id ) in rows ] )
+            
         
         tag_ids_to_tags = self.modules_tags_local_cache.GetTagIdsToTags( tag_ids = seen_tag_ids )
         
         service_ids_to_service_keys = self.modules_services.GetServiceIdsToServiceKeys()
         
-        hash_ids_to_raw_storage_tag_data = HydrusData.BuildKeyToListDict( storage_tag_data )
-        hash_ids_to_raw_display_tag_data = HydrusData.BuildKeyToListDict( display_tag_data )
+        hash_ids_to_service_keys_to_statuses_to_storage_tags = { hash_id : collections.defaultdict( HydrusData.default_dict_set ) for hash_id in hash_ids }
+        hash_ids_to_service_keys_to_statuses_to_display_tags = { hash_id : collections.defaultdict( HydrusData.default_dict_set ) for hash_id in hash_ids }
         
-        hash_ids_to_tag_managers = {}
-        
-        for hash_id in hash_ids:
-            
-            # service_id, status, tag_id
-            raw_storage_tag_data = hash_ids_to_raw_storage_tag_data[ hash_id ]
+        for ( tag_groups, hash_ids_to_service_keys_to_statuses_to_tags ) in ( ( storage_tag_groups, hash_ids_to_service_keys_to_statuses_to_storage_tags ), ( display_tag_groups, hash_ids_to_service_keys_to_statuses_to_display_tags ) ):
             
-            # service_id -> ( status, tag )
-            service_ids_to_storage_tag_data = HydrusData.BuildKeyToListDict( ( ( tag_service_id, ( status, tag_ids_to_tags[ tag_id ] ) ) for ( tag_service_id, status, tag_id ) in raw_storage_tag_data ) )
+            for ( tag_service_id, status, rows ) in tag_groups:
+                
+                service_key = service_ids_to_service_keys[ tag_service_id ]
+                
+                for ( hash_id, tag_id ) in rows:
+                    
+                    hash_ids_to_service_keys_to_statuses_to_tags[ hash_id ][ service_key ][ status ].add( tag_ids_to_tags[ tag_id ] )
+                    
+                
             
-            service_keys_to_statuses_to_storage_tags = collections.defaultdict(
-                HydrusData.default_dict_set,
-                { service_ids_to_service_keys[ tag_service_id ] : HydrusData.BuildKeyToSetDict( status_and_tag ) for ( tag_service_id, status_and_tag ) in service_ids_to_storage_tag_data.items() }
-            )
+        
+        if lazy:
             
-            # service_id, status, tag_id
-            raw_display_tag_data = hash_ids_to_raw_display_tag_data[ hash_id ]
+            load_group = ClientMediaManagers.LazyTagsManagerLoadGroup()
             
-            # service_id -> ( status, tag )
-            service_ids_to_display_tag_data = HydrusData.BuildKeyToListDict( ( ( tag_service_id, ( status, tag_ids_to_tags[ tag_id ] ) ) for ( tag_service_id, status, tag_id ) in raw_display_tag_data ) )
+            hash_ids_to_tag_managers = {}
             
-            service_keys_to_statuses_to_display_tags = collections.defaultdict(
-                HydrusData.default_dict_set,
-                { service_ids_to_service_keys[ tag_service_id ] : HydrusData.BuildKeyToSetDict( status_and_tag ) for ( tag_service_id, status_and_tag ) in service_ids_to_display_tag_data.items() }
-            )
+            for hash_id in hash_ids:
+                
+                tags_manager = ClientMediaManagers.LazyTagsManager( hash_ids_to_service_keys_to_statuses_to_storage_tags[ hash_id ], hash_ids_to_service_keys_to_statuses_to_display_tags[ hash_id ], load_group )
+                
+                load_group.AddTagsManager( hash_id, tags_manager )
+                
+                hash_ids_to_tag_managers[ hash_id ] = tags_manager
+                
             
-            tags_manager = ClientMediaManagers.TagsManager( service_keys_to_statuses_to_storage_tags, service_keys_to_statuses_to_display_tags )
+        else:
             
-            hash_ids_to_tag_managers[ hash_id ] = tags_manager
+            hash_ids_to_tag_managers = { hash_id : ClientMediaManagers.TagsManager( hash_ids_to_service_keys_to_statuses_to_storage_tags[ hash_id ], hash_ids_to_service_keys_to_statuses_to_display_tags[ hash_id ] ) for hash_id in hash_ids }
             
         
         return hash_ids_to_tag_managers
         
     
-    def _GetForceRefreshTagsManagersWithTableHashIdsTagData( self, common_file_service_id, tag_service_ids, hash_ids_table_name ):
+    def _GetForceRefreshTagsManagersWithTableHashIdsTagData( self, common_file_service_id, tag_service_ids, hash_ids_table_name, lazy = False ):
         
-        storage_tag_data = []
-        display_tag_data = []
+        storage_tag_groups = []
+        display_tag_groups = []
+        
+        # a lazy tags manager does not get storage current and pending until it asks, but we still need them here to calculate display without a cache
+        lazy_skips_storage_statuses = lazy and common_file_service_id != self.modules_services.combined_file_service_id
         
         for tag_service_id in tag_service_ids:
             
@@ -2999,8 +3078,13 @@ class DB( HydrusDB.HydrusDB ):
             
             for ( status, mappings_table_name ) in statuses_to_table_names.items():
                 
+                if lazy_skips_storage_statuses and status in ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_PENDING ):
+                    
+                    continue
+                    
+                
                 # temp hashes to mappings
-                storage_tag_data.extend( ( hash_id, ( tag_service_id, status, tag_id ) ) for ( hash_id, tag_id ) in self._Execute( 'SELECT hash_id, tag_id FROM {} CROSS JOIN {} USING ( hash_id );'.format( hash_ids_table_name, mappings_table_name ) ) )
+                storage_tag_groups.append( ( tag_service_id, status, self._Execute( 'SELECT hash_id, tag_id FROM {} CROSS JOIN {} USING ( hash_id );'.format( hash_ids_table_name, mappings_table_name ) ).fetchall() ) )
                 
             
             if common_file_service_id != self.modules_services.combined_file_service_id:
@@ -3008,8 +3092,8 @@ class DB( HydrusDB.HydrusDB ):
                 ( cache_current_display_mappings_table_name, cache_pending_display_mappings_table_name ) = ClientDBMappingsStorage.GenerateSpecificDisplayMappingsCacheTableNames( common_file_service_id, tag_service_id )
                 
                 # temp hashes to mappings
-                display_tag_data.extend( ( hash_id, ( tag_service_id, HC.CONTENT_STATUS_CURRENT, tag_id ) ) for ( hash_id, tag_id ) in self._Execute( 'SELECT hash_id, tag_id FROM {} CROSS JOIN {} USING ( hash_id );'.format( hash_ids_table_name, cache_current_display_mappings_table_name ) ) )
-                display_tag_data.extend( ( hash_id, ( tag_service_id, HC.CONTENT_STATUS_PENDING, tag_id ) ) for ( hash_id, tag_id ) in self._Execute( 'SELECT hash_id, tag_id FROM {} CROSS JOIN {} USING ( hash_id );'.format( hash_ids_table_name, cache_pending_display_mappings_table_name ) ) )
+                display_tag_groups.append( ( tag_service_id, HC.CONTENT_STATUS_CURRENT, self._Execute( 'SELECT hash_id, tag_id FROM {} CROSS JOIN {} USING ( hash_id );'.format( hash_ids_table_name, cache_current_display_mappings_table_name ) ).fetchall() ) )
+                display_tag_groups.append( ( tag_service_id, HC.CONTENT_STATUS_PENDING, self._Execute( 'SELECT hash_id, tag_id FROM {} CROSS JOIN {} USING ( hash_id );'.format( hash_ids_table_name, cache_pending_display_mappings_table_name ) ).fetchall() ) )
                 
             
         
@@ -3018,21 +3102,27 @@ class DB( HydrusDB.HydrusDB ):
             # this is likely a 'all known files' query, which means we are in deep water without a cache
             # time to compute manually, which is semi hell mode, but not dreadful
             
-            current_and_pending_storage_tag_data = [ ( hash_id, ( tag_service_id, status, tag_id ) ) for ( hash_id, ( tag_service_id, status, tag_id ) ) in storage_tag_data if status in ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_PENDING ) ]
-            
-            seen_service_ids_to_seen_tag_ids = HydrusData.BuildKeyToSetDict( ( ( tag_service_id, tag_id ) for ( hash_id, ( tag_service_id, status, tag_id ) ) in current_and_pending_storage_tag_data ) )
-            
-            seen_service_ids_to_tag_ids_to_implied_tag_ids = { tag_service_id : self.modules_tag_display.GetTagsToImplies( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id, tag_ids ) for ( tag_service_id, tag_ids ) in seen_service_ids_to_seen_tag_ids.items() }
+            display_tag_groups = []
             
-            display_tag_data = []
+            for ( tag_service_id, status, rows ) in storage_tag_groups:
+                
+                if status not in ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_PENDING ) or len( rows ) == 0:
+                    
+                    continue
+                    
+                
+                tag_ids_to_implied_tag_ids = self.modules_tag_display.GetTagsToImplies( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id, { tag_id for ( hash_id, tag_id ) in rows } )
+                
+                display_tag_groups.append( ( tag_service_id, status, [ ( hash_id, implied_tag_id ) for ( hash_id, tag_id ) in rows for implied_tag_id in tag_ids_to_implied_tag_ids[ tag_id ] ] ) )
+                
             
-            for ( hash_id, ( tag_service_id, status, tag_id ) ) in current_and_pending_storage_tag_data:
+            if lazy:
                 
-                display_tag_data.extend( ( ( hash_id, ( tag_service_id, status, implied_tag_id ) ) for implied_tag_id in seen_service_ids_to_tag_ids_to_implied_tag_ids[ tag_service_id ][ tag_id ] ) )
+                storage_tag_groups = [ ( tag_service_id, status, rows ) for ( tag_service_id, status, rows ) in storage_tag_groups if status not in ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_PENDING ) ]
                 
             
         
-        return ( storage_tag_data, display_tag_data )
+        return ( storage_tag_groups, display_tag_groups )
         
     
     def _GetMaintenanceDue( self, stop_time ):
@@ -3058,22 +3148,147 @@ class DB( HydrusDB.HydrusDB ):
         return jobs_to_do
         
     
-    def _GetMediaResults( self, hash_ids: typing.Collection[ int ], sorted = False ):
+    def _GetMediaCollectGroups( self, hash_ids: typing.Collection[ int ], namespaces: typing.Collection[ str ], tag_service_key: bytes ):
+        
+        # the db version of MediaList collect-by-namespace. the key is the file's display current and pending tags in those namespaces
+        # an unnamespaced 'namespace' never matches in the media version, so we skip it here too
+        
+        namespace_ids = [ self.modules_tags.GetNamespaceId( namespace ) for namespace in namespaces if namespace != '' and self.modules_tags.NamespaceExists( namespace ) ]
+        
+        hash_ids_to_tag_ids = collections.defaultdict( set )
+        
+        if len( namespace_ids ) > 0:
+            
+            if tag_service_key == CC.COMBINED_TAG_SERVICE_KEY:
+                
+                tag_service_ids = self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+                
+            else:
+                
+                tag_service_ids = ( self.modules_services.GetServiceId( tag_service_key ), )
+                
+            
+            with self._MakeTemporaryIntegerTable( hash_ids, 'hash_id' ) as temp_hash_ids_table_name:
+                
+                self._AnalyzeTempTable( temp_hash_ids_table_name )
+                
+                common_file_service_ids_to_hash_ids = self.modules_files_storage.GroupHashIdsByTagCachedFileServiceId( hash_ids, temp_hash_ids_table_name )
+                
+                with self._MakeTemporaryIntegerTable( namespace_ids, 'namespace_id' ) as temp_namespace_ids_table_name:
+                    
+                    for ( common_file_service_id, batch_of_hash_ids ) in common_file_service_ids_to_hash_ids.items():
+                        
+                        with self._MakeTemporaryIntegerTable( batch_of_hash_ids, 'hash_id' ) as temp_batch_hash_ids_table_name:
+                            
+                            for tag_service_id in tag_service_ids:
+                                
+                                if common_file_service_id == self.modules_services.combined_file_service_id:
+                                    
+                                    # no display cache here, so we go storage and then work out what that implies, like the tags managers do
+                                    
+                                    statuses_to_table_names = self.modules_mappings_storage.GetFastestStorageMappingTableNames( common_file_service_id, tag_service_id )
+                                    
+                                    storage_rows = []
+                                    
+                                    for status in ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_PENDING ):
+                                        
+                                        # temp hashes to mappings
+                                        storage_rows.extend( self._Execute( 'SELECT hash_id, tag_id FROM {} CROSS JOIN {} USING ( hash_id );'.format( temp_batch_hash_ids_table_name, statuses_to_table_names[ status ] ) ) )
+                                        
+                                    
+                                    tag_ids_to_implied_tag_ids = self.modules_tag_display.GetTagsToImplies( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id, { tag_id for ( hash_id, tag_id ) in storage_rows } )
+                                    
+                                    implied_tag_ids = set( itertools.chain.from_iterable( tag_ids_to_implied_tag_ids.values() ) )
+                                    
+                                    with self._MakeTemporaryIntegerTable( implied_tag_ids, 'tag_id' ) as temp_tag_ids_table_name:
+                                        
+                                        # temp tags to tags to temp namespaces
+                                        namespaced_implied_tag_ids = self._STS( self._Execute( 'SELECT tag_id FROM {} CROSS JOIN tags USING ( tag_id ) CROSS JOIN {} USING ( namespace_id );'.format( temp_tag_ids_table_name, temp_namespace_ids_table_name ) ) )
+                                        
+                                    
+                                    for ( hash_id, tag_id ) in storage_rows:
+                                        
+                                        hash_ids_to_tag_ids[ hash_id ].update( tag_ids_to_implied_tag_ids[ tag_id ].intersection( namespaced_implied_tag_ids ) )
+                                        
+                                    
+                                else:
+                                    
+                                    ( cache_current_display_mappings_table_name, cache_pending_display_mappings_table_name ) = ClientDBMappingsStorage.GenerateSpecificDisplayMappingsCacheTableNames( common_file_service_id, tag_service_id )
+                                    
+                                    for display_mappings_table_name in ( cache_current_display_mappings_table_name, cache_pending_display_mappings_table_name ):
+                                        
+                                        # temp hashes to display mappings to tags to temp namespaces
+                                        for ( hash_id, tag_id ) in self._Execute( 'SELECT hash_id, tag_id FROM {} CROSS JOIN {} USING ( hash_id ) CROSS JOIN tags USING ( tag_id ) CROSS JOIN {} USING ( namespace_id );'.format( temp_batch_hash_ids_table_name, display_mappings_table_name, temp_namespace_ids_table_name ) ):
+                                            
+                                            hash_ids_to_tag_ids[ hash_id ].add( tag_id )
+                                            
+                                        
+                                    
+                                
+                            
+                        
+                    
+                
+            
+        
+        tag_ids_to_tags = self.modules_tags_local_cache.GetTagIdsToTags( tag_ids = set( itertools.chain.from_iterable( hash_ids_to_tag_ids.values() ) ) )
+        
+        collect_keys_to_hash_ids = collections.defaultdict( list )
+        
+        for hash_id in hash_ids:
+            
+            if hash_id in hash_ids_to_tag_ids:
+                
+                collect_key = frozenset( ( tag_ids_to_tags[ tag_id ] for tag_id in hash_ids_to_tag_ids[ hash_id ] ) )
+                
+            else:
+                
+                collect_key = frozenset()
+                
+            
+            collect_keys_to_hash_ids[ collect_key ].append( hash_id )
+            
+        
+        return dict( collect_keys_to_hash_ids )
+        
+    
+    def _GetMediaResults( self, hash_ids: typing.Collection[ int ], sorted = False, lazy_tags = False ):
         
         ( cached_media_results, missing_hash_ids ) = self._weakref_media_result_cache.GetMediaResultsAndMissing( hash_ids )
         
         if len( missing_hash_ids ) > 0:
             
             # get first detailed results
+            # every column family is one set-based query against the temp table, and then we stitch it all together in one pass
+            
+            # ( column family, time took )
+            family_timings = []
+            
+            family_time_started = HydrusTime.GetNowPrecise()
+            
+            def family_done( family_name ):
+                
+                nonlocal family_time_started
+                
+                now_precise = HydrusTime.GetNowPrecise()
+                
+                family_timings.append( ( family_name, now_precise - family_time_started ) )
+                
+                family_time_started = now_precise
+                
             
             missing_hash_ids_to_hashes = self.modules_hashes_local_cache.GetHashIdsToHashes( hash_ids = missing_hash_ids )
             
+            family_done( 'hashes' )
+            
             with self._MakeTemporaryIntegerTable( missing_hash_ids, 'hash_id' ) as temp_table_name:
                 
                 # everything here is temp hashes to metadata
                 
                 hash_ids_to_info = { hash_id : ClientMediaManagers.FileInfoManager( hash_id, missing_hash_ids_to_hashes[ hash_id ], size, mime, width, height, duration, num_frames, has_audio, num_words ) for ( hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words ) in self._Execute( 'SELECT * FROM {} CROSS JOIN files_info USING ( hash_id );'.format( temp_table_name ) ) }
                 
+                family_done( 'files info' )
+                
                 (
                     hash_ids_to_current_file_service_ids_to_timestamps,
                     hash_ids_to_deleted_file_service_ids_to_timestamps,
@@ -3082,46 +3297,63 @@ class DB( HydrusDB.HydrusDB ):
                     hash_ids_to_petitioned_file_service_ids
                 ) = self.modules_files_storage.GetHashIdsToServiceInfoDicts( temp_table_name )
                 
+                family_done( 'file locations' )
+                
                 hash_ids_to_urls = self.modules_url_map.GetHashIdsToURLs( hash_ids_table_name = temp_table_name )
                 
+                family_done( 'urls' )
+                
                 hash_ids_to_service_ids_and_filenames = self.modules_service_paths.GetHashIdsToServiceIdsAndFilenames( temp_table_name )
                 
-                hash_ids_to_local_star_ratings = HydrusData.BuildKeyToListDict( ( ( hash_id, ( service_id, rating ) ) for ( service_id, hash_id, rating ) in self._Execute( 'SELECT service_id, hash_id, rating FROM {} CROSS JOIN local_ratings USING ( hash_id );'.format( temp_table_name ) ) ) )
-                hash_ids_to_local_incdec_ratings = HydrusData.BuildKeyToListDict( ( ( hash_id, ( service_id, rating ) ) for ( service_id, hash_id, rating ) in self._Execute( 'SELECT service_id, hash_id, rating FROM {} CROSS JOIN local_incdec_ratings USING ( hash_id );'.format( temp_table_name ) ) ) )
+                family_done( 'service filenames' )
                 
                 hash_ids_to_local_ratings = collections.defaultdict( list )
                 
-                for ( hash_id, info_list ) in hash_ids_to_local_star_ratings.items():
+                for ratings_table_name in ( 'local_ratings', 'local_incdec_ratings' ):
                     
-                    hash_ids_to_local_ratings[ hash_id ].extend( info_list )
+                    for ( service_id, hash_id, rating ) in self._Execute( 'SELECT service_id, hash_id, rating FROM {} CROSS JOIN {} USING ( hash_id );'.format( temp_table_name, ratings_table_name ) ):
+                        
+                        hash_ids_to_local_ratings[ hash_id ].append( ( service_id, rating ) )
+                        
                     
                 
-                for ( hash_id, info_list ) in hash_ids_to_local_incdec_ratings.items():
-                    
-                    hash_ids_to_local_ratings[ hash_id ].extend( info_list )
-                    
+                family_done( 'ratings' )
                 
                 hash_ids_to_names_and_notes = self.modules_notes_map.GetHashIdsToNamesAndNotes( temp_table_name )
                 
+                family_done( 'notes' )
+                
                 hash_ids_to_file_viewing_stats = self.modules_files_viewing_stats.GetHashIdsToFileViewingStatsRows( temp_table_name )
                 
+                family_done( 'file viewing stats' )
+                
                 hash_ids_to_half_initialised_timestamp_managers = self.modules_files_timestamps.GetHashIdsToHalfInitialisedTimestampsManagers( hash_ids, temp_table_name )
                 
+                family_done( 'timestamps' )
+                
                 hash_ids_to_local_file_deletion_reasons = self.modules_files_storage.GetHashIdsToFileDeletionReasons( temp_table_name )
                 
+                family_done( 'deletion reasons' )
+                
                 hash_ids_to_current_file_service_ids = { hash_id : list( file_service_ids_to_timestamps.keys() ) for ( hash_id, file_service_ids_to_timestamps ) in hash_ids_to_current_file_service_ids_to_timestamps.items() }
                 
-                hash_ids_to_tags_managers = self._GetForceRefreshTagsManagersWithTableHashIds( missing_hash_ids, temp_table_name, hash_ids_to_current_file_service_ids = hash_ids_to_current_file_service_ids )
+                hash_ids_to_tags_managers = self._GetForceRefreshTagsManagersWithTableHashIds( missing_hash_ids, temp_table_name, hash_ids_to_current_file_service_ids = hash_ids_to_current_file_service_ids, lazy = lazy_tags )
+                
+                family_done( 'tags' )
                 
                 has_exif_hash_ids = self.modules_files_metadata_basic.GetHasEXIFHashIds( temp_table_name )
                 has_human_readable_embedded_metadata_hash_ids = self.modules_files_metadata_basic.GetHasHumanReadableEmbeddedMetadataHashIds( temp_table_name )
                 has_icc_profile_hash_ids = self.modules_files_metadata_basic.GetHasICCProfileHashIds( temp_table_name )
                 
+                family_done( 'embedded metadata' )
+                
             
             # build it
             
             service_ids_to_service_keys = self.modules_services.GetServiceIdsToServiceKeys()
             
+            inbox_hash_ids = self.modules_files_inbox.inbox_hash_ids
+            
             missing_media_results = []
             
             for hash_id in missing_hash_ids:
@@ -3140,13 +3372,11 @@ class DB( HydrusDB.HydrusDB ):
                 
                 petitioned_file_service_keys = { service_ids_to_service_keys[ service_id ] for service_id in hash_ids_to_petitioned_file_service_ids[ hash_id ] }
                 
-                inbox = hash_id in self.modules_files_inbox.inbox_hash_ids
+                inbox = hash_id in inbox_hash_ids
                 
                 urls = hash_ids_to_urls[ hash_id ]
                 
-                service_ids_to_filenames = dict( hash_ids_to_service_ids_and_filenames[ hash_id ] )
-                
-                service_keys_to_filenames = { service_ids_to_service_keys[ service_id ] : filename for ( service_id, filename ) in service_ids_to_filenames.items() }
+                service_keys_to_filenames = { service_ids_to_service_keys[ service_id ] : filename for ( service_id, filename ) in hash_ids_to_service_ids_and_filenames[ hash_id ] }
                 
                 if hash_id in hash_ids_to_half_initialised_timestamp_managers:
                     
@@ -3234,6 +3464,15 @@ class DB( HydrusDB.HydrusDB ):
                 missing_media_results.append( ClientMediaResult.MediaResult( file_info_manager, tags_manager, timestamps_manager, locations_manager, ratings_manager, notes_manager, file_viewing_stats_manager ) )
                 
             
+            family_done( 'assembly' )
+            
+            if HG.db_report_mode:
+                
+                summary = ', '.join( ( '{} {}'.format( family_name, HydrusTime.TimeDeltaToPrettyTimeDelta( time_took ) ) for ( family_name, time_took ) in family_timings ) )
+                
+                HydrusData.Print( 'Loaded {} media results: {}'.format( HydrusData.ToHumanInt( len( missing_hash_ids ) ), summary ) )
+                
+            
             self._weakref_media_result_cache.AddMediaResults( missing_media_results )
             
             cached_media_results.extend( missing_media_results )
@@ -3279,6 +3518,172 @@ class DB( HydrusDB.HydrusDB ):
         return media_results
         
     
+    def _GetMediaTagCounts( self, hash_ids: typing.Collection[ int ], tag_service_key: bytes, tag_display_type: int, max_tags_per_namespace = None ):
+        
+        # the db version of ClientMedia.GetMediaResultsTagCount, for when a selection is too big to walk every tags manager
+        # each status is a GROUP BY over the UNION of every service's ( hash_id, tag_id ) rows, so a file with a tag in two services only counts once
+        # returns None if we cannot do it exactly here, and the caller should count the media themselves
+        
+        if tag_service_key == CC.COMBINED_TAG_SERVICE_KEY:
+            
+            tag_service_ids = self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+            
+        else:
+            
+            tag_service_ids = ( self.modules_services.GetServiceId( tag_service_key ), )
+            
+        
+        statuses = ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_DELETED, HC.CONTENT_STATUS_PENDING, HC.CONTENT_STATUS_PETITIONED )
+        
+        statuses_to_tag_ids_to_counts = { status : collections.Counter() for status in statuses }
+        
+        tag_display_manager = HG.client_controller.tag_display_manager
+        
+        with self._MakeTemporaryIntegerTable( hash_ids, 'hash_id' ) as temp_hash_ids_table_name:
+            
+            self._AnalyzeTempTable( temp_hash_ids_table_name )
+            
+            common_file_service_ids_to_hash_ids = self.modules_files_storage.GroupHashIdsByTagCachedFileServiceId( hash_ids, temp_hash_ids_table_name )
+            
+            if tag_display_type != ClientTags.TAG_DISPLAY_STORAGE and self.modules_services.combined_file_service_id in common_file_service_ids_to_hash_ids:
+                
+                # no display cache here, so the tags managers work out what storage implies in python
+                
+                return None
+                
+            
+            # the batches are disjoint, so we can just add their counts together
+            
+            for ( common_file_service_id, batch_of_hash_ids ) in common_file_service_ids_to_hash_ids.items():
+                
+                with self._MakeTemporaryIntegerTable( batch_of_hash_ids, 'hash_id' ) as temp_batch_hash_ids_table_name:
+                    
+                    tag_service_ids_to_statuses_to_table_names = {}
+                    
+                    for tag_service_id in tag_service_ids:
+                        
+                        statuses_to_table_names = self.modules_mappings_storage.GetFastestStorageMappingTableNames( common_file_service_id, tag_service_id )
+                        
+                        if tag_display_type != ClientTags.TAG_DISPLAY_STORAGE:
+                            
+                            # display current and pending, storage deleted and petitioned, just like the tags managers
+                            
+                            ( cache_current_display_mappings_table_name, cache_pending_display_mappings_table_name ) = ClientDBMappingsStorage.GenerateSpecificDisplayMappingsCacheTableNames( common_file_service_id, tag_service_id )
+                            
+                            statuses_to_table_names[ HC.CONTENT_STATUS_CURRENT ] = cache_current_display_mappings_table_name
+                            statuses_to_table_names[ HC.CONTENT_STATUS_PENDING ] = cache_pending_display_mappings_table_name
+                            
+                        
+                        tag_service_ids_to_statuses_to_table_names[ tag_service_id ] = statuses_to_table_names
+                        
+                    
+                    with contextlib.ExitStack() as temp_table_stack:
+                        
+                        tag_service_ids_to_temp_allowed_tag_ids_table_names = {}
+                        
+                        if tag_display_type in ( ClientTags.TAG_DISPLAY_SELECTION_LIST, ClientTags.TAG_DISPLAY_SINGLE_MEDIA ):
+                            
+                            for tag_service_id in tag_service_ids:
+                                
+                                service_key = self.modules_services.GetServiceKey( tag_service_id )
+                                
+                                if not tag_display_manager.FiltersTags( tag_display_type, service_key ):
+                                    
+                                    continue
+                                    
+                                
+                                tag_ids = set()
+                                
+                                for table_name in tag_service_ids_to_statuses_to_table_names[ tag_service_id ].values():
+                                    
+                                    # temp hashes to mappings
+                                    tag_ids.update( self._STI( self._Execute( 'SELECT DISTINCT tag_id FROM {} CROSS JOIN {} USING ( hash_id );'.format( temp_batch_hash_ids_table_name, table_name ) ) ) )
+                                    
+                                
+                                tag_ids_to_tags = self.modules_tags_local_cache.GetTagIdsToTags( tag_ids = tag_ids )
+                                
+                                allowed_tags = tag_display_manager.FilterTags( tag_display_type, service_key, tag_ids_to_tags.values() )
+                                
+                                allowed_tag_ids = [ tag_id for ( tag_id, tag ) in tag_ids_to_tags.items() if tag in allowed_tags ]
+                                
+                                temp_allowed_tag_ids_table_name = temp_table_stack.enter_context( self._MakeTemporaryIntegerTable( allowed_tag_ids, 'tag_id' ) )
+                                
+                                tag_service_ids_to_temp_allowed_tag_ids_table_names[ tag_service_id ] = temp_allowed_tag_ids_table_name
+                                
+                            
+                        
+                        for status in statuses:
+                            
+                            select_statements = []
+                            
+                            for tag_service_id in tag_service_ids:
+                                
+                                table_name = tag_service_ids_to_statuses_to_table_names[ tag_service_id ][ status ]
+                                
+                                if tag_service_id in tag_service_ids_to_temp_allowed_tag_ids_table_names:
+                                    
+                                    # temp hashes to mappings to temp allowed tags
+                                    select_statements.append( 'SELECT hash_id, tag_id FROM {} CROSS JOIN {} USING ( hash_id ) CROSS JOIN {} USING ( tag_id )'.format( temp_batch_hash_ids_table_name, table_name, tag_service_ids_to_temp_allowed_tag_ids_table_names[ tag_service_id ] ) )
+                                    
+                                else:
+                                    
+                                    # temp hashes to mappings
+                                    select_statements.append( 'SELECT hash_id, tag_id FROM {} CROSS JOIN {} USING ( hash_id )'.format( temp_batch_hash_ids_table_name, table_name ) )
+                                    
+                                
+                            
+                            if len( select_statements ) == 0:
+                                
+                                continue
+                                
+                            
+                            # UNION, not UNION ALL, is our dedupe across services
+                            query = 'SELECT tag_id, COUNT( * ) FROM ( {} ) GROUP BY tag_id;'.format( ' UNION '.join( select_statements ) )
+                            
+                            statuses_to_tag_ids_to_counts[ status ].update( dict( self._Execute( query ) ) )
+                            
+                        
+                    
+                
+            
+        
+        tag_ids_to_tags = self.modules_tags_local_cache.GetTagIdsToTags( tag_ids = set( itertools.chain.from_iterable( ( tag_ids_to_counts.keys() for tag_ids_to_counts in statuses_to_tag_ids_to_counts.values() ) ) ) )
+        
+        result = []
+        
+        for status in statuses:
+            
+            tags_to_counts = collections.Counter( { tag_ids_to_tags[ tag_id ] : count for ( tag_id, count ) in statuses_to_tag_ids_to_counts[ status ].items() } )
+            
+            if max_tags_per_namespace is not None:
+                
+                namespaces_to_tags_and_counts = collections.defaultdict( list )
+                
+                for ( tag, count ) in tags_to_counts.items():
+                    
+                    ( namespace, subtag ) = HydrusTags.SplitTag( tag )
+                    
+                    namespaces_to_tags_and_counts[ namespace ].append( ( tag, count ) )
+                    
+                
+                tags_to_counts = collections.Counter()
+                
+                for tags_and_counts in namespaces_to_tags_and_counts.values():
+                    
+                    tags_and_counts.sort( key = lambda tag_and_count: ( - tag_and_count[1], tag_and_count[0] ) )
+                    
+                    tags_to_counts.update( dict( tags_and_counts[ : max_tags_per_namespace ] ) )
+                    
+                
+            
+            result.append( tags_to_counts )
+            
+        
+        # ( current, deleted, pending, petitioned ), same as the media version
+        
+        return tuple( result )
+        
+    
     def _GetNumsPending( self ):
         
         services = self.modules_services.GetServices( ( HC.TAG_REPOSITORY, HC.FILE_REPOSITORY, HC.IPFS ) )
@@ -4625,7 +5030,7 @@ class DB( HydrusDB.HydrusDB ):
         
         self._modules.append( self.modules_files_physical_storage )
         
-        self.modules_files_metadata_basic = ClientDBFilesMetadataBasic.ClientDBFilesMetadataBasic( self._c )
+        self.modules_files_metadata_basic = ClientDBFilesMetadataBasic.ClientDBFilesMetadataBasic( self._c, self._file_search_results_cache )
         
         self._modules.append( self.modules_files_metadata_basic )
         
@@ -4645,7 +5050,7 @@ class DB( HydrusDB.HydrusDB ):
         
         #
         
-        self.modules_files_storage = ClientDBFilesStorage.ClientDBFilesStorage( self._c, self._cursor_transaction_wrapper, self.modules_services, self.modules_hashes, self.modules_texts )
+        self.modules_files_storage = ClientDBFilesStorage.ClientDBFilesStorage( self._c, self._cursor_transaction_wrapper, self.modules_services, self.modules_hashes, self.modules_texts, self._file_search_results_cache )
         
         self._modules.append( self.modules_files_storage )
         
@@ -4657,13 +5062,13 @@ class DB( HydrusDB.HydrusDB ):
         
         #
         
-        self.modules_files_inbox = ClientDBFilesInbox.ClientDBFilesInbox( self._c, self.modules_files_storage, self.modules_files_timestamps )
+        self.modules_files_inbox = ClientDBFilesInbox.ClientDBFilesInbox( self._c, self.modules_files_storage, self.modules_files_timestamps, self._file_search_results_cache )
         
         self._modules.append( self.modules_files_inbox )
         
         #
         
-        self.modules_mappings_counts = ClientDBMappingsCounts.ClientDBMappingsCounts( self._c, self.modules_services )
+        self.modules_mappings_counts = ClientDBMappingsCounts.ClientDBMappingsCounts( self._c, self.modules_services, self._autocomplete_predicates_cache, self._file_search_results_cache )
         
         self._modules.append( self.modules_mappings_counts )
         
@@ -4712,7 +5117,7 @@ class DB( HydrusDB.HydrusDB ):
         # when you do the mappings caches, storage and display, consider carefully how you want them slotting in here
         # don't rush into it
         
-        self.modules_tag_search = ClientDBTagSearch.ClientDBTagSearch( self._c, self.modules_services, self.modules_tags, self.modules_tag_display, self.modules_tag_siblings, self.modules_mappings_counts )
+        self.modules_tag_search = ClientDBTagSearch.ClientDBTagSearch( self._c, self.modules_services, self.modules_tags, self.modules_tag_display, self.modules_tag_siblings, self.modules_mappings_counts, self._autocomplete_predicates_cache )
         
         self._modules.append( self.modules_tag_search )
         
@@ -4791,7 +5196,8 @@ class DB( HydrusDB.HydrusDB ):
             self.modules_tag_search,
             self.modules_similar_files,
             self.modules_files_duplicates,
-            self.modules_files_search_tags
+            self.modules_files_search_tags,
+            self._file_search_results_cache
         )
         
         self._modules.append( self.modules_files_query )
@@ -4799,6 +5205,11 @@ class DB( HydrusDB.HydrusDB ):
     
     def _ManageDBError( self, job, e ):
         
+        # the transaction is about to be rolled back, so anything we cached during it may be a lie
+        self._autocomplete_predicates_cache.Clear()
+        self._file_search_results_cache.Clear()
+        self.modules_files_metadata_basic.ClearFilesInfoColumnarCache()
+        
         if isinstance( e, MemoryError ):
             
             HydrusData.ShowText( 'The client is running out of memory! Restart it ASAP!' )
@@ -5756,6 +6167,8 @@ class DB( HydrusDB.HydrusDB ):
                     
                 elif service_type in HC.RATINGS_SERVICES:
                     
+                    self._file_search_results_cache.NotifyContentChanged( ClientDBFilesSearchCache.FILE_SEARCH_CACHE_DEPENDENCY_RATINGS )
+                    
                     if action == HC.CONTENT_UPDATE_ADD:
                         
                         ( rating, hashes ) = row
@@ -6290,6 +6703,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'file_maintenance_get_job_counts': result = self.modules_files_maintenance_queue.GetJobCounts( *args, **kwargs )
         elif action == 'file_query_ids': result = self.modules_files_query.GetHashIdsFromQuery( *args, **kwargs )
         elif action == 'file_relationships_for_api': result = self.modules_files_duplicates.GetFileRelationshipsForAPI( *args, **kwargs )
+        elif action == 'file_search_plan': result = self.modules_files_query.GetSearchPlan( *args, **kwargs )
         elif action == 'file_system_predicates': result = self._GetFileSystemPredicates( *args, **kwargs )
         elif action == 'filter_existing_tags': result = self.modules_mappings_counts_update.FilterExistingTags( *args, **kwargs )
         elif action == 'filter_hashes': result = self.modules_files_metadata_rich.FilterHashesByService( *args, **kwargs )
@@ -6306,10 +6720,12 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'local_booru_share': result = self.modules_serialisable.GetYAMLDump( ClientDBSerialisable.YAML_DUMP_ID_LOCAL_BOORU, *args, **kwargs )
         elif action == 'local_booru_shares': result = self.modules_serialisable.GetYAMLDump( ClientDBSerialisable.YAML_DUMP_ID_LOCAL_BOORU )
         elif action == 'maintenance_due': result = self._GetMaintenanceDue( *args, **kwargs )
+        elif action == 'media_collect_groups': result = self._GetMediaCollectGroups( *args, **kwargs )
         elif action == 'media_predicates': result = self.modules_tag_display.GetMediaPredicates( *args, **kwargs )
         elif action == 'media_result': result = self._GetMediaResultFromHash( *args, **kwargs )
         elif action == 'media_results': result = self._GetMediaResultsFromHashes( *args, **kwargs )
         elif action == 'media_results_from_ids': result = self._GetMediaResults( *args, **kwargs )
+        elif action == 'media_tag_counts': result = self._GetMediaTagCounts( *args, **kwargs )
         elif action == 'migration_get_mappings': result = self._MigrationGetMappings( *args, **kwargs )
         elif action == 'migration_get_pairs': result = self._MigrationGetPairs( *args, **kwargs )
         elif action == 'missing_repository_update_hashes': result = self.modules_repositories.GetRepositoryUpdateHashesIDoNotHave( *args, **kwargs )
@@ -6318,6 +6734,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'nums_pending': result = self._GetNumsPending( *args, **kwargs )
         elif action == 'options': result = self._GetOptions( *args, **kwargs )
         elif action == 'pending': result = self._GetPending( *args, **kwargs )
+        elif action == 'pre_import_statuses': result = self.modules_files_metadata_rich.GetPreImportStatuses( *args, **kwargs )
         elif action == 'random_potential_duplicate_hashes': result = self._DuplicatesGetRandomPotentialDuplicateHashes( *args, **kwargs )
         elif action == 'recent_tags': result = self._GetRecentTags( *args, **kwargs )
         elif action == 'repository_progress': result = self.modules_repositories.GetRepositoryProgress( *args, **kwargs )
@@ -6336,6 +6753,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'related_tags': result = self._GetRelatedTags( *args, **kwargs )
         elif action == 'tag_display_application': result = self.modules_tag_display.GetApplication( *args, **kwargs )
         elif action == 'tag_display_maintenance_status': result = self._CacheTagDisplayGetApplicationStatusNumbers( *args, **kwargs )
+        elif action == 'tag_display_maintenance_statuses': result = self._CacheTagDisplayGetApplicationStatusNumbersServices( *args, **kwargs )
         elif action == 'tag_parents': result = self.modules_tag_parents.GetTagParents( *args, **kwargs )
         elif action == 'tag_siblings': result = self.modules_tag_siblings.GetTagSiblings( *args, **kwargs )
         elif action == 'tag_siblings_all_ideals': result = self.modules_tag_siblings.GetTagSiblingsIdeals( *args, **kwargs )
@@ -6651,6 +7069,62 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _RegenerateTagCacheTrigramIndex( self, tag_service_key = None ):
+        
+        if not ClientDBTagSearch.SQLITE_TRIGRAM_OK:
+            
+            HydrusData.ShowText( 'Sorry, your SQLite does not support the fts5 trigram tokenizer (it needs 3.34 or newer), so the infix tag search index cannot be made!' )
+            
+            return
+            
+        
+        job_key = ClientThreading.JobKey( cancellable = True )
+        
+        try:
+            
+            job_key.SetStatusTitle( 'regenerating tag fast search cache infix index' )
+            
+            self._controller.pub( 'modal_message', job_key )
+            
+            if tag_service_key is None:
+                
+                tag_service_ids = self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+                
+            else:
+                
+                tag_service_ids = ( self.modules_services.GetServiceId( tag_service_key ), )
+                
+            
+            file_service_ids = list( self.modules_services.GetServiceIds( HC.FILE_SERVICES_WITH_SPECIFIC_TAG_LOOKUP_CACHES ) )
+            file_service_ids.append( self.modules_services.combined_file_service_id )
+            
+            for ( file_service_id, tag_service_id ) in itertools.product( file_service_ids, tag_service_ids ):
+                
+                if job_key.IsCancelled():
+                    
+                    break
+                    
+                
+                message = 'generating infix index {}_{}'.format( file_service_id, tag_service_id )
+                
+                job_key.SetStatusText( message )
+                self._controller.frame_splash_status.SetSubtext( message )
+                
+                time.sleep( 0.01 )
+                
+                self.modules_tag_search.GenerateSubtagsTrigramIndex( file_service_id, tag_service_id )
+                
+            
+        finally:
+            
+            job_key.SetStatusText( 'done!' )
+            
+            job_key.Finish()
+            
+            job_key.Delete( 5 )
+            
+        
+    
     def _RegenerateTagDisplayMappingsCache( self, tag_service_key = None ):
         
         job_key = ClientThreading.JobKey( cancellable = True )
@@ -6685,6 +7159,10 @@ class DB( HydrusDB.HydrusDB ):
                 self.modules_tag_siblings.ClearActual( tag_service_id )
                 self.modules_tag_parents.ClearActual( tag_service_id )
                 
+                self._autocomplete_predicates_cache.Clear( tag_service_id )
+                self._autocomplete_predicates_cache.Clear( self.modules_services.combined_tag_service_id )
+                self._file_search_results_cache.Clear()
+                
                 if len( tag_ids_in_dispute ) > 0:
                     
                     self._CacheTagsSyncTags( tag_service_id, tag_ids_in_dispute )
@@ -6868,6 +7346,10 @@ class DB( HydrusDB.HydrusDB ):
                 self.modules_tag_siblings.ClearActual( tag_service_id )
                 self.modules_tag_parents.ClearActual( tag_service_id )
                 
+                self._autocomplete_predicates_cache.Clear( tag_service_id )
+                self._autocomplete_predicates_cache.Clear( self.modules_services.combined_tag_service_id )
+                self._file_search_results_cache.Clear()
+                
             
             time.sleep( 0.01 )
             
@@ -9932,6 +10414,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'delete_pending': self._DeletePending( *args, **kwargs )
         elif action == 'delete_serialisable_named': self.modules_serialisable.DeleteJSONDumpNamed( *args, **kwargs )
         elif action == 'delete_service_info': self._DeleteServiceInfo( *args, **kwargs )
+        elif action == 'delete_tag_cache_trigram_index': self._DeleteTagCacheTrigramIndex( *args, **kwargs )
         elif action == 'delete_potential_duplicate_pairs': self.modules_files_duplicates.DeleteAllPotentialDuplicatePairs( *args, **kwargs )
         elif action == 'dirty_services': self._SaveDirtyServices( *args, **kwargs )
         elif action == 'dissolve_alternates_group': self.modules_files_duplicates.DissolveAlternatesGroupIdFromHashes( *args, **kwargs )
@@ -9961,6 +10444,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'regenerate_similar_files': self.modules_similar_files.RegenerateTree( *args, **kwargs )
         elif action == 'regenerate_searchable_subtag_maps': self._RegenerateTagCacheSearchableSubtagMaps( *args, **kwargs )
         elif action == 'regenerate_tag_cache': self._RegenerateTagCache( *args, **kwargs )
+        elif action == 'regenerate_tag_cache_trigram_index': self._RegenerateTagCacheTrigramIndex( *args, **kwargs )
         elif action == 'regenerate_tag_display_mappings_cache': self._RegenerateTagDisplayMappingsCache( *args, **kwargs )
         elif action == 'regenerate_tag_display_pending_mappings_cache': self._RegenerateTagDisplayPendingMappingsCache( *args, **kwargs )
         elif action == 'regenerate_tag_mappings_cache': self._RegenerateTagMappingsCache( *args, **kwargs )
@@ -9991,6 +10475,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'set_repository_update_hashes': self.modules_repositories.SetRepositoryUpdateHashes( *args, **kwargs )
         elif action == 'schedule_repository_update_file_maintenance': self.modules_repositories.ScheduleRepositoryUpdateFileMaintenance( *args, **kwargs )
         elif action == 'sync_tag_display_maintenance': result = self._CacheTagDisplaySync( *args, **kwargs )
+        elif action == 'sync_tag_display_maintenance_services': result = self._CacheTagDisplaySyncServices( *args, **kwargs )
         elif action == 'tag_display_application': self.modules_tag_display.SetApplication( *args, **kwargs )
         elif action == 'update_server_services': self._UpdateServerServices( *args, **kwargs )
         elif action == 'update_services': self._UpdateServices( *args, **kwargs )
@@ -3,10 +3,12 @@ import typing
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusIntegerSets
 from hydrus.core import HydrusTime
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientLocation
+from hydrus.client.db import ClientDBFilesSearchCache
 from hydrus.client.db import ClientDBFilesTimestamps
 from hydrus.client.db import ClientDBFilesStorage
 from hydrus.client.db import ClientDBModule
@@ -17,13 +19,15 @@ class ClientDBFilesInbox( ClientDBModule.ClientDBModule ):
         self,
         cursor: sqlite3.Cursor,
         modules_files_storage: ClientDBFilesStorage.ClientDBFilesStorage,
-        modules_files_metadata_timestamps: ClientDBFilesTimestamps.ClientDBFilesTimestamps
+        modules_files_metadata_timestamps: ClientDBFilesTimestamps.ClientDBFilesTimestamps,
+        file_search_results_cache: ClientDBFilesSearchCache.FileSearchResultsCache
     ):
         
         self.modules_files_storage = modules_files_storage
         self.modules_files_metadata_timestamps = modules_files_metadata_timestamps
+        self.file_search_results_cache = file_search_results_cache
         
-        self.inbox_hash_ids = set()
+        self.inbox_hash_ids = HydrusIntegerSets.SortedIntegerSet()
         
         ClientDBModule.ClientDBModule.__init__( self, 'client files inbox', cursor )
         
@@ -48,18 +52,13 @@ class ClientDBFilesInbox( ClientDBModule.ClientDBModule ):
         
         if self._Execute( 'SELECT 1 FROM sqlite_master WHERE name = ?;', ( 'file_inbox', ) ).fetchone() is not None:
             
-            self.inbox_hash_ids = self._STS( self._Execute( 'SELECT hash_id FROM file_inbox;' ) )
+            self.inbox_hash_ids = HydrusIntegerSets.SortedIntegerSet( self._STI( self._Execute( 'SELECT hash_id FROM file_inbox;' ) ) )
             
         
     
     def ArchiveFiles( self, hash_ids ):
         
-        if not isinstance( hash_ids, set ):
-            
-            hash_ids = set( hash_ids )
-            
-        
-        archiveable_hash_ids = hash_ids.intersection( self.inbox_hash_ids )
+        archiveable_hash_ids = self.inbox_hash_ids.intersection( hash_ids )
         
         if len( archiveable_hash_ids ) > 0:
             
@@ -67,6 +66,8 @@ class ClientDBFilesInbox( ClientDBModule.ClientDBModule ):
             
             self.inbox_hash_ids.difference_update( archiveable_hash_ids )
             
+            self.file_search_results_cache.NotifyContentChanged( ClientDBFilesSearchCache.FILE_SEARCH_CACHE_DEPENDENCY_INBOX )
+            
             now = HydrusTime.GetNow()
             
             self.modules_files_metadata_timestamps.SetSimpleTimestamps( HC.TIMESTAMP_TYPE_ARCHIVED, [ ( hash_id, now ) for hash_id in archiveable_hash_ids ] )
@@ -102,7 +103,7 @@ class ClientDBFilesInbox( ClientDBModule.ClientDBModule ):
         
         hash_ids = self.modules_files_storage.FilterHashIds( location_context, hash_ids )
         
-        inboxable_hash_ids = hash_ids.difference( self.inbox_hash_ids )
+        inboxable_hash_ids = HydrusIntegerSets.SortedIntegerSet( hash_ids ).difference( self.inbox_hash_ids )
         
         if len( inboxable_hash_ids ) > 0:
             
@@ -110,6 +111,8 @@ class ClientDBFilesInbox( ClientDBModule.ClientDBModule ):
             
             self.inbox_hash_ids.update( inboxable_hash_ids )
             
+            self.file_search_results_cache.NotifyContentChanged( ClientDBFilesSearchCache.FILE_SEARCH_CACHE_DEPENDENCY_INBOX )
+            
             self.modules_files_metadata_timestamps.ClearArchivedTimestamps( inboxable_hash_ids )
             
             service_ids_to_counts = self.modules_files_storage.GetServiceIdCounts( inboxable_hash_ids )
@@ -1,14 +1,368 @@
+import operator
 import sqlite3
 import typing
 
+import numpy
+
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusIntegerSets
 
+from hydrus.client.db import ClientDBFilesSearchCache
 from hydrus.client.db import ClientDBModule
 
+FILES_INFO_COLUMNS_TO_DTYPES = {
+    'size' : numpy.int64,
+    'mime' : numpy.int32,
+    'width' : numpy.int32,
+    'height' : numpy.int32,
+    'duration' : numpy.int64,
+    'num_frames' : numpy.int32,
+    'has_audio' : numpy.int8,
+    'num_words' : numpy.int32
+}
+
+FILES_INFO_COLUMN_NAMES = tuple( FILES_INFO_COLUMNS_TO_DTYPES.keys() )
+
+def _MakeColumn( column_values, dtype ):
+    
+    # sqlite NULL becomes a 0 here with a True in the nulls array beside it
+    
+    num_rows = len( column_values )
+    
+    values = numpy.fromiter( ( 0 if value is None else value for value in column_values ), dtype = dtype, count = num_rows )
+    nulls = numpy.fromiter( ( value is None for value in column_values ), dtype = bool, count = num_rows )
+    
+    return ( values, nulls )
+    
+
+def _MakeColumns( rows ):
+    
+    # rows are ( hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words )
+    
+    if len( rows ) == 0:
+        
+        hash_ids = numpy.empty( 0, dtype = HydrusIntegerSets.INTEGER_DTYPE )
+        
+        columns_to_values_and_nulls = { column_name : ( numpy.empty( 0, dtype = dtype ), numpy.empty( 0, dtype = bool ) ) for ( column_name, dtype ) in FILES_INFO_COLUMNS_TO_DTYPES.items() }
+        
+        return ( hash_ids, columns_to_values_and_nulls )
+        
+    
+    ( hash_ids, *all_column_values ) = zip( *rows )
+    
+    hash_ids = numpy.array( hash_ids, dtype = HydrusIntegerSets.INTEGER_DTYPE )
+    
+    columns_to_values_and_nulls = { column_name : _MakeColumn( column_values, dtype ) for ( ( column_name, dtype ), column_values ) in zip( FILES_INFO_COLUMNS_TO_DTYPES.items(), all_column_values ) }
+    
+    return ( hash_ids, columns_to_values_and_nulls )
+    
+
+def GetFilesInfoColumnarMask( simple_preds, columns_to_values_and_nulls, num_rows ) -> numpy.ndarray:
+    
+    # the numpy version of ClientDBFilesSearch.GetFilesInfoPredicates, so keep the two in sync!
+    # a comparison with a NULL is never true in sqlite, so every test here is also 'and not null' unless the sql says 'IS NULL'
+    
+    mask = numpy.ones( num_rows, dtype = bool )
+    
+    def column( column_name ):
+        
+        return columns_to_values_and_nulls[ column_name ]
+        
+    
+    def compare( values_and_nulls, op, value ):
+        
+        ( values, nulls ) = values_and_nulls
+        
+        return ~nulls & op( values, value )
+        
+    
+    def is_null( values_and_nulls ):
+        
+        ( values, nulls ) = values_and_nulls
+        
+        return nulls
+        
+    
+    def do_range( values_and_nulls, key_suffix ):
+        
+        nonlocal mask
+        
+        if 'min_' + key_suffix in simple_preds: mask &= compare( values_and_nulls, operator.gt, simple_preds[ 'min_' + key_suffix ] )
+        if key_suffix in simple_preds: mask &= compare( values_and_nulls, operator.eq, simple_preds[ key_suffix ] )
+        if 'not_' + key_suffix in simple_preds: mask &= compare( values_and_nulls, operator.ne, simple_preds[ 'not_' + key_suffix ] )
+        if 'max_' + key_suffix in simple_preds: mask &= compare( values_and_nulls, operator.lt, simple_preds[ 'max_' + key_suffix ] )
+        
+    
+    def do_nullable_range( values_and_nulls, key_suffix ):
+        
+        # num_words, duration and num_frames treat NULL as zero, more or less
+        
+        nonlocal mask
+        
+        if 'min_' + key_suffix in simple_preds: mask &= compare( values_and_nulls, operator.gt, simple_preds[ 'min_' + key_suffix ] )
+        
+        if key_suffix in simple_preds:
+            
+            value = simple_preds[ key_suffix ]
+            
+            if value == 0: mask &= is_null( values_and_nulls ) | compare( values_and_nulls, operator.eq, 0 )
+            else: mask &= compare( values_and_nulls, operator.eq, value )
+            
+        
+        if 'not_' + key_suffix in simple_preds: mask &= is_null( values_and_nulls ) | compare( values_and_nulls, operator.ne, simple_preds[ 'not_' + key_suffix ] )
+        
+        if 'max_' + key_suffix in simple_preds:
+            
+            value = simple_preds[ 'max_' + key_suffix ]
+            
+            if value == 0: mask &= compare( values_and_nulls, operator.lt, value )
+            else: mask &= is_null( values_and_nulls ) | compare( values_and_nulls, operator.lt, value )
+            
+        
+    
+    do_range( column( 'size' ), 'size' )
+    
+    if 'mimes' in simple_preds:
+        
+        ( values, nulls ) = column( 'mime' )
+        
+        mask &= ~nulls & numpy.isin( values, list( simple_preds[ 'mimes' ] ) )
+        
+    
+    if 'has_audio' in simple_preds:
+        
+        mask &= compare( column( 'has_audio' ), operator.eq, int( simple_preds[ 'has_audio' ] ) )
+        
+    
+    do_range( column( 'width' ), 'width' )
+    do_range( column( 'height' ), 'height' )
+    
+    ( width_values, width_nulls ) = column( 'width' )
+    ( height_values, height_nulls ) = column( 'height' )
+    
+    if True in ( key in simple_preds for key in ( 'min_num_pixels', 'num_pixels', 'not_num_pixels', 'max_num_pixels' ) ):
+        
+        num_pixels = ( width_values.astype( numpy.int64 ) * height_values.astype( numpy.int64 ), width_nulls | height_nulls )
+        
+        do_range( num_pixels, 'num_pixels' )
+        
+    
+    if True in ( key in simple_preds for key in ( 'min_ratio', 'ratio', 'not_ratio', 'max_ratio' ) ):
+        
+        with numpy.errstate( divide = 'ignore', invalid = 'ignore' ):
+            
+            # x / 0 is NULL in sqlite
+            ratios = ( width_values * 1.0 / height_values, width_nulls | height_nulls | ( height_values == 0 ) )
+            
+        
+        for ( key, op ) in ( ( 'min_ratio', operator.gt ), ( 'ratio', operator.eq ), ( 'not_ratio', operator.ne ), ( 'max_ratio', operator.lt ) ):
+            
+            if key in simple_preds:
+                
+                ( ratio_width, ratio_height ) = simple_preds[ key ]
+                
+                mask &= compare( ratios, op, float( ratio_width ) / ratio_height )
+                
+            
+        
+    
+    do_nullable_range( column( 'num_words' ), 'num_words' )
+    do_nullable_range( column( 'duration' ), 'duration' )
+    
+    if True in ( key in simple_preds for key in ( 'min_framerate', 'framerate', 'not_framerate', 'max_framerate' ) ):
+        
+        ( duration_values, duration_nulls ) = column( 'duration' )
+        ( num_frames_values, num_frames_nulls ) = column( 'num_frames' )
+        
+        has_framerate = ~duration_nulls & ( duration_values != 0 ) & ~num_frames_nulls & ( num_frames_values != 0 )
+        
+        with numpy.errstate( divide = 'ignore', invalid = 'ignore' ):
+            
+            framerates = ( num_frames_values * 1.0 ) / ( duration_values / 1000.0 )
+            
+        
+        if 'not_framerate' in simple_preds:
+            
+            min_framerate = simple_preds[ 'not_framerate' ] * 0.95
+            max_framerate = simple_preds[ 'not_framerate' ] * 1.05
+            
+            mask &= duration_nulls | ( ~num_frames_nulls & ( num_frames_values == 0 ) ) | ( has_framerate & ~( ( framerates >= min_framerate ) & ( framerates <= max_framerate ) ) )
+            
+        else:
+            
+            min_framerate = None
+            max_framerate = None
+            
+            if 'min_framerate' in simple_preds:
+                
+                min_framerate = simple_preds[ 'min_framerate' ] * 1.05
+                
+            if 'framerate' in simple_preds:
+                
+                min_framerate = simple_preds[ 'framerate' ] * 0.95
+                max_framerate = simple_preds[ 'framerate' ] * 1.05
+                
+            if 'max_framerate' in simple_preds:
+                
+                max_framerate = simple_preds[ 'max_framerate' ] * 0.95
+                
+            
+            if min_framerate is None:
+                
+                mask &= has_framerate & ( framerates < max_framerate )
+                
+            elif max_framerate is None:
+                
+                mask &= has_framerate & ( framerates > min_framerate )
+                
+            else:
+                
+                mask &= has_framerate & ( framerates >= min_framerate ) & ( framerates <= max_framerate )
+                
+            
+        
+    
+    do_nullable_range( column( 'num_frames' ), 'num_frames' )
+    
+    return mask
+    
+
+class FilesInfoColumnarCache( object ):
+    
+    # files_info laid out as numpy columns sorted by hash_id, so the simple system predicates can test a big candidate set in one vectorised go rather than a join per row
+    # new rows sit in a little dict and get merged in one go on the next filter, so a big import doesn't copy every column for every file
+    
+    def __init__( self, rows ):
+        
+        ( self._hash_ids, self._columns_to_values_and_nulls ) = _MakeColumns( rows )
+        
+        self._hash_ids_to_pending_rows_and_overwrites = {}
+        
+    
+    def _MergePendingRows( self ):
+        
+        if len( self._hash_ids_to_pending_rows_and_overwrites ) == 0:
+            
+            return
+            
+        
+        rows_and_overwrites = sorted( self._hash_ids_to_pending_rows_and_overwrites.values(), key = lambda row_and_overwrite: row_and_overwrite[0][0] )
+        
+        self._hash_ids_to_pending_rows_and_overwrites = {}
+        
+        ( rows, overwrites ) = zip( *rows_and_overwrites )
+        
+        ( new_hash_ids, new_columns_to_values_and_nulls ) = _MakeColumns( rows )
+        
+        overwrites = numpy.array( overwrites, dtype = bool )
+        
+        already_have = numpy.isin( new_hash_ids, self._hash_ids, assume_unique = True )
+        
+        # an 'INSERT OR IGNORE' for a file we already have does nothing
+        
+        replacing = already_have & overwrites
+        keep_new = ~already_have | overwrites
+        
+        if replacing.any():
+            
+            keep_old = ~numpy.isin( self._hash_ids, new_hash_ids[ replacing ], assume_unique = True )
+            
+            self._hash_ids = self._hash_ids[ keep_old ]
+            
+            self._columns_to_values_and_nulls = { column_name : ( values[ keep_old ], nulls[ keep_old ] ) for ( column_name, ( values, nulls ) ) in self._columns_to_values_and_nulls.items() }
+            
+        
+        new_hash_ids = new_hash_ids[ keep_new ]
+        
+        insert_positions = numpy.searchsorted( self._hash_ids, new_hash_ids )
+        
+        self._hash_ids = numpy.insert( self._hash_ids, insert_positions, new_hash_ids )
+        
+        for column_name in FILES_INFO_COLUMN_NAMES:
+            
+            ( values, nulls ) = self._columns_to_values_and_nulls[ column_name ]
+            ( new_values, new_nulls ) = new_columns_to_values_and_nulls[ column_name ]
+            
+            self._columns_to_values_and_nulls[ column_name ] = ( numpy.insert( values, insert_positions, new_values[ keep_new ] ), numpy.insert( nulls, insert_positions, new_nulls[ keep_new ] ) )
+            
+        
+    
+    def AddRows( self, rows, overwrite ):
+        
+        for row in rows:
+            
+            hash_id = row[0]
+            
+            if overwrite or hash_id not in self._hash_ids_to_pending_rows_and_overwrites:
+                
+                self._hash_ids_to_pending_rows_and_overwrites[ hash_id ] = ( row, overwrite )
+                
+            
+        
+    
+    def FilterHashIds( self, simple_preds, hash_ids: typing.Optional[ typing.Collection[ int ] ] = None ) -> HydrusIntegerSets.SortedIntegerSet:
+        
+        # a file with no files_info row is never in the result, just like the sql NATURAL JOIN
+        
+        self._MergePendingRows()
+        
+        if hash_ids is not None and not isinstance( hash_ids, HydrusIntegerSets.SortedIntegerSet ):
+            
+            hash_ids = HydrusIntegerSets.SortedIntegerSet( hash_ids )
+            
+        
+        if hash_ids is None or len( hash_ids ) * 4 > len( self._hash_ids ):
+            
+            # testing everything and then intersecting is cheaper than picking out a big candidate set
+            
+            mask = GetFilesInfoColumnarMask( simple_preds, self._columns_to_values_and_nulls, len( self._hash_ids ) )
+            
+            result = self._hash_ids[ mask ]
+            
+            if hash_ids is not None:
+                
+                result = HydrusIntegerSets.GetSortedIntersection( result, hash_ids.GetArray() )
+                
+            
+        else:
+            
+            candidates = hash_ids.GetArray()
+            
+            positions = numpy.searchsorted( self._hash_ids, candidates )
+            
+            if len( self._hash_ids ) > 0:
+                
+                clipped_positions = numpy.minimum( positions, len( self._hash_ids ) - 1 )
+                
+                present = self._hash_ids[ clipped_positions ] == candidates
+                
+            else:
+                
+                clipped_positions = positions
+                
+                present = numpy.zeros( len( candidates ), dtype = bool )
+                
+            
+            rows = clipped_positions[ present ]
+            
+            columns_to_values_and_nulls = { column_name : ( values[ rows ], nulls[ rows ] ) for ( column_name, ( values, nulls ) ) in self._columns_to_values_and_nulls.items() }
+            
+            mask = GetFilesInfoColumnarMask( simple_preds, columns_to_values_and_nulls, len( rows ) )
+            
+            result = candidates[ present ][ mask ]
+            
+        
+        return HydrusIntegerSets.SortedIntegerSet.STATICCreateFromSortedArray( result )
+        
+    
 class ClientDBFilesMetadataBasic( ClientDBModule.ClientDBModule ):
     
-    def __init__( self, cursor: sqlite3.Cursor ):
+    def __init__( self, cursor: sqlite3.Cursor, file_search_results_cache: ClientDBFilesSearchCache.FileSearchResultsCache ):
+        
+        self.file_search_results_cache = file_search_results_cache
+        
+        self._files_info_columnar_cache = None
         
         ClientDBModule.ClientDBModule.__init__( self, 'client files simple metadata', cursor )
         
@@ -39,6 +393,18 @@ class ClientDBFilesMetadataBasic( ClientDBModule.ClientDBModule ):
         }
         
     
+    def _GetFilesInfoColumnarCache( self ) -> FilesInfoColumnarCache:
+        
+        if self._files_info_columnar_cache is None:
+            
+            rows = self._Execute( 'SELECT hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words FROM files_info ORDER BY hash_id;' ).fetchall()
+            
+            self._files_info_columnar_cache = FilesInfoColumnarCache( rows )
+            
+        
+        return self._files_info_columnar_cache
+        
+    
     def AddFilesInfo( self, rows, overwrite = False ):
         
         if overwrite:
@@ -53,6 +419,31 @@ class ClientDBFilesMetadataBasic( ClientDBModule.ClientDBModule ):
         # hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words
         self._ExecuteMany( insert_phrase + ' files_info ( hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words ) VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ? );', rows )
         
+        if self._GetRowCount() > 0:
+            
+            self.file_search_results_cache.NotifyContentChanged( ClientDBFilesSearchCache.FILE_SEARCH_CACHE_DEPENDENCY_FILES_INFO )
+            
+        
+        if self._files_info_columnar_cache is not None:
+            
+            self._files_info_columnar_cache.AddRows( rows, overwrite )
+            
+        
+    
+    def ClearFilesInfoColumnarCache( self ):
+        
+        self._files_info_columnar_cache = None
+        
+    
+    def FilterHashIdsWithFilesInfoColumnarCache( self, simple_preds, hash_ids: typing.Optional[ typing.Collection[ int ] ] = None ) -> HydrusIntegerSets.SortedIntegerSet:
+        
+        return self._GetFilesInfoColumnarCache().FilterHashIds( simple_preds, hash_ids = hash_ids )
+        
+    
+    def GetHashIdsToMimes( self, hash_ids_table_name: str ) -> typing.Dict[ int, int ]:
+        
+        return dict( self._Execute( 'SELECT hash_id, mime FROM {} CROSS JOIN files_info USING ( hash_id );'.format( hash_ids_table_name ) ) )
+        
     
     def GetMime( self, hash_id: int ) -> int:
         
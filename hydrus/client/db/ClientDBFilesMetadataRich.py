@@ -1,3 +1,4 @@
+import itertools
 import sqlite3
 import typing
 
@@ -237,54 +238,82 @@ class ClientDBFilesMetadataRich( ClientDBModule.ClientDBModule ):
     
     def GetHashIdStatus( self, hash_id, prefix = '' ) -> ClientImportFiles.FileImportStatus:
         
-        if prefix != '':
-            
-            prefix += ': '
-            
-        
-        hash = self.modules_hashes_local_cache.GetHash( hash_id )
+        return self.GetHashIdsToStatuses( ( hash_id, ), prefix = prefix )[ hash_id ]
         
-        ( is_deleted, timestamp, file_deletion_reason ) = self.modules_files_storage.GetDeletionStatus( self.modules_services.combined_local_file_service_id, hash_id )
+    
+    def GetHashIdsToStatuses( self, hash_ids: typing.Collection[ int ], prefix = '' ) -> typing.Dict[ int, ClientImportFiles.FileImportStatus ]:
         
-        if is_deleted:
-            
-            if timestamp is None:
-                
-                note = 'Deleted from the client before delete times were tracked ({}).'.format( file_deletion_reason )
-                
-            else:
-                
-                note = 'Deleted from the client {} ({}), which was {} before this check.'.format( HydrusTime.TimestampToPrettyTime( timestamp ), file_deletion_reason, HydrusTime.BaseTimestampToPrettyTimeDelta( timestamp ) )
-                
+        if prefix != '':
             
-            return ClientImportFiles.FileImportStatus( CC.STATUS_DELETED, hash, note = prefix + note )
+            prefix += ': '
             
         
-        result = self.modules_files_storage.GetImportedTimestamp( self.modules_services.trash_service_id, hash_id )
+        hash_ids_to_hashes = self.modules_hashes_local_cache.GetHashIdsToHashes( hash_ids = hash_ids )
         
-        if result is not None:
-            
-            timestamp = result
+        with self._MakeTemporaryIntegerTable( hash_ids, 'hash_id' ) as temp_hash_ids_table_name:
             
-            note = 'Currently in trash ({}). Sent there at {}, which was {} before this check.'.format( file_deletion_reason, HydrusTime.TimestampToPrettyTime( timestamp ), HydrusTime.BaseTimestampToPrettyTimeDelta( timestamp, just_now_threshold = 0 ) )
-            
-            return ClientImportFiles.FileImportStatus( CC.STATUS_DELETED, hash, note = prefix + note )
+            hash_ids_to_file_deletion_reasons = self.modules_files_storage.GetHashIdsToFileDeletionReasons( temp_hash_ids_table_name )
+            hash_ids_to_deleted_timestamps = self.modules_files_storage.GetHashIdsToTimestamps( self.modules_services.combined_local_file_service_id, HC.CONTENT_STATUS_DELETED, temp_hash_ids_table_name )
+            hash_ids_to_trashed_timestamps = self.modules_files_storage.GetHashIdsToTimestamps( self.modules_services.trash_service_id, HC.CONTENT_STATUS_CURRENT, temp_hash_ids_table_name )
+            hash_ids_to_imported_timestamps = self.modules_files_storage.GetHashIdsToTimestamps( self.modules_services.combined_local_file_service_id, HC.CONTENT_STATUS_CURRENT, temp_hash_ids_table_name )
+            hash_ids_to_mimes = self.modules_files_metadata_basic.GetHashIdsToMimes( temp_hash_ids_table_name )
             
         
-        result = self.modules_files_storage.GetImportedTimestamp( self.modules_services.combined_local_file_service_id, hash_id )
+        hash_ids_to_statuses = {}
         
-        if result is not None:
+        for hash_id in hash_ids:
             
-            timestamp = result
+            hash = hash_ids_to_hashes[ hash_id ]
             
-            mime = self.modules_files_metadata_basic.GetMime( hash_id )
+            file_deletion_reason = hash_ids_to_file_deletion_reasons.get( hash_id, 'Unknown deletion reason.' )
             
-            note = 'Imported at {}, which was {} before this check.'.format( HydrusTime.TimestampToPrettyTime( timestamp ), HydrusTime.BaseTimestampToPrettyTimeDelta( timestamp, just_now_threshold = 0 ) )
+            if hash_id in hash_ids_to_deleted_timestamps:
+                
+                timestamp = hash_ids_to_deleted_timestamps[ hash_id ]
+                
+                if timestamp is None:
+                    
+                    note = 'Deleted from the client before delete times were tracked ({}).'.format( file_deletion_reason )
+                    
+                else:
+                    
+                    note = 'Deleted from the client {} ({}), which was {} before this check.'.format( HydrusTime.TimestampToPrettyTime( timestamp ), file_deletion_reason, HydrusTime.BaseTimestampToPrettyTimeDelta( timestamp ) )
+                    
+                
+                file_import_status = ClientImportFiles.FileImportStatus( CC.STATUS_DELETED, hash, note = prefix + note )
+                
+            elif hash_ids_to_trashed_timestamps.get( hash_id, None ) is not None:
+                
+                timestamp = hash_ids_to_trashed_timestamps[ hash_id ]
+                
+                note = 'Currently in trash ({}). Sent there at {}, which was {} before this check.'.format( file_deletion_reason, HydrusTime.TimestampToPrettyTime( timestamp ), HydrusTime.BaseTimestampToPrettyTimeDelta( timestamp, just_now_threshold = 0 ) )
+                
+                file_import_status = ClientImportFiles.FileImportStatus( CC.STATUS_DELETED, hash, note = prefix + note )
+                
+            elif hash_ids_to_imported_timestamps.get( hash_id, None ) is not None:
+                
+                timestamp = hash_ids_to_imported_timestamps[ hash_id ]
+                
+                if hash_id not in hash_ids_to_mimes:
+                    
+                    raise HydrusExceptions.DataMissing( 'Did not have mime information for that file!' )
+                    
+                
+                mime = hash_ids_to_mimes[ hash_id ]
+                
+                note = 'Imported at {}, which was {} before this check.'.format( HydrusTime.TimestampToPrettyTime( timestamp ), HydrusTime.BaseTimestampToPrettyTimeDelta( timestamp, just_now_threshold = 0 ) )
+                
+                file_import_status = ClientImportFiles.FileImportStatus( CC.STATUS_SUCCESSFUL_BUT_REDUNDANT, hash, mime = mime, note = prefix + note )
+                
+            else:
+                
+                file_import_status = ClientImportFiles.FileImportStatus( CC.STATUS_UNKNOWN, hash )
+                
             
-            return ClientImportFiles.FileImportStatus( CC.STATUS_SUCCESSFUL_BUT_REDUNDANT, hash, mime = mime, note = prefix + note )
+            hash_ids_to_statuses[ hash_id ] = file_import_status
             
         
-        return ClientImportFiles.FileImportStatus( CC.STATUS_UNKNOWN, hash )
+        return hash_ids_to_statuses
         
     
     def GetHashStatus( self, hash_type, hash, prefix = None ) -> ClientImportFiles.FileImportStatus:
@@ -322,6 +351,65 @@ class ClientDBFilesMetadataRich( ClientDBModule.ClientDBModule ):
         return self.GetHashIdStatus( hash_id, prefix = prefix )
         
     
+    def GetHashStatuses( self, hash_types_and_hashes: typing.Collection[ typing.Tuple[ str, bytes ] ], prefix_template = '{} recognised' ) -> typing.Dict[ typing.Tuple[ str, bytes ], ClientImportFiles.FileImportStatus ]:
+        
+        # the batch version of GetHashStatus, for checking a whole import queue in one job
+        
+        hash_types_and_hashes_to_hash_ids = {}
+        
+        for ( hash_type, hash ) in hash_types_and_hashes:
+            
+            if hash_type == 'sha256':
+                
+                if self.modules_hashes.HasHash( hash ):
+                    
+                    hash_types_and_hashes_to_hash_ids[ ( hash_type, hash ) ] = self.modules_hashes_local_cache.GetHashId( hash )
+                    
+                
+            else:
+                
+                try:
+                    
+                    hash_types_and_hashes_to_hash_ids[ ( hash_type, hash ) ] = self.modules_hashes.GetHashIdFromExtraHash( hash_type, hash )
+                    
+                except HydrusExceptions.DataMissing:
+                    
+                    pass
+                    
+                
+            
+        
+        hash_types_to_hash_ids = HydrusData.BuildKeyToSetDict( ( ( hash_type, hash_id ) for ( ( hash_type, hash ), hash_id ) in hash_types_and_hashes_to_hash_ids.items() ) )
+        
+        hash_types_to_hash_ids_to_statuses = { hash_type : self.GetHashIdsToStatuses( hash_ids, prefix = prefix_template.format( hash_type ) ) for ( hash_type, hash_ids ) in hash_types_to_hash_ids.items() }
+        
+        hash_types_and_hashes_to_statuses = {}
+        
+        for ( hash_type, hash ) in hash_types_and_hashes:
+            
+            if ( hash_type, hash ) in hash_types_and_hashes_to_hash_ids:
+                
+                hash_id = hash_types_and_hashes_to_hash_ids[ ( hash_type, hash ) ]
+                
+                hash_types_and_hashes_to_statuses[ ( hash_type, hash ) ] = hash_types_to_hash_ids_to_statuses[ hash_type ][ hash_id ]
+                
+            else:
+                
+                hash_types_and_hashes_to_statuses[ ( hash_type, hash ) ] = ClientImportFiles.FileImportStatus.STATICGetUnknownStatus()
+                
+            
+        
+        return hash_types_and_hashes_to_statuses
+        
+    
+    def GetPreImportStatuses( self, hash_types_and_hashes: typing.Collection[ typing.Tuple[ str, bytes ] ], urls: typing.Collection[ str ] ):
+        
+        hash_types_and_hashes_to_statuses = self.GetHashStatuses( hash_types_and_hashes, prefix_template = '{} hash recognised' )
+        urls_to_statuses = self.GetURLsToStatuses( urls )
+        
+        return ( hash_types_and_hashes_to_statuses, urls_to_statuses )
+        
+    
     def GetTablesAndColumnsThatUseDefinitions( self, content_type: int ) -> typing.List[ typing.Tuple[ str, str ] ]:
         
         return []
@@ -352,3 +440,36 @@ class ClientDBFilesMetadataRich( ClientDBModule.ClientDBModule ):
         return results
         
     
+    def GetURLsToStatuses( self, urls: typing.Collection[ str ] ) -> typing.Dict[ str, typing.List[ ClientImportFiles.FileImportStatus ] ]:
+        
+        # the batch version of GetURLStatuses. all the hash_ids are resolved together, so a queue of urls is one job, not one per url
+        
+        urls_to_hash_ids = {}
+        
+        for url in urls:
+            
+            hash_ids = set()
+            
+            for search_url in ClientNetworkingFunctions.GetSearchURLs( url ):
+                
+                hash_ids.update( self.modules_url_map.GetHashIds( search_url ) )
+                
+            
+            urls_to_hash_ids[ url ] = hash_ids
+            
+        
+        all_hash_ids = set( itertools.chain.from_iterable( urls_to_hash_ids.values() ) )
+        
+        try:
+            
+            hash_ids_to_statuses = self.GetHashIdsToStatuses( all_hash_ids, prefix = 'url recognised' )
+            
+        except:
+            
+            # one bad hash_id, so let's have it spoil only its own urls
+            return { url : self.GetURLStatuses( url ) for url in urls }
+            
+        
+        return { url : [ hash_ids_to_statuses[ hash_id ] for hash_id in hash_ids ] for ( url, hash_ids ) in urls_to_hash_ids.items() }
+        
+    
@@ -7,6 +7,7 @@ from hydrus.core import HydrusData
 from hydrus.core import HydrusDB
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusIntegerSets
 from hydrus.core import HydrusTags
 from hydrus.core import HydrusTime
 
@@ -17,6 +18,7 @@ from hydrus.client.db import ClientDBDefinitionsCache
 from hydrus.client.db import ClientDBFilesDuplicates
 from hydrus.client.db import ClientDBFilesInbox
 from hydrus.client.db import ClientDBFilesMetadataBasic
+from hydrus.client.db import ClientDBFilesSearchCache
 from hydrus.client.db import ClientDBFilesStorage
 from hydrus.client.db import ClientDBFilesTimestamps
 from hydrus.client.db import ClientDBFilesViewingStats
@@ -33,19 +35,58 @@ from hydrus.client.media import ClientMedia
 from hydrus.client.metadata import ClientTags
 from hydrus.client.search import ClientSearch
 
-def intersection_update_qhi( query_hash_ids: typing.Optional[ typing.Set[ int ] ], some_hash_ids: typing.Collection[ int ], force_create_new_set = False ) -> typing.Set[ int ]:
+SEARCH_STEP_SPECIFIC_HASHES = 0
+SEARCH_STEP_TIMESTAMPS = 1
+SEARCH_STEP_SIMPLE_RATINGS = 2
+SEARCH_STEP_FILE_VIEWING_STATS = 3
+SEARCH_STEP_DUPLICATE_COUNTS = 4
+SEARCH_STEP_SIMILAR_TO = 5
+SEARCH_STEP_INBOX = 6
+SEARCH_STEP_TAG = 7
+
+# when we have nothing to estimate a system predicate with, we guess it keeps this much of the file domain
+# this is deliberately small, so only a genuinely rare tag will jump ahead of it
+UNKNOWN_PREDICATE_SELECTIVITY = 0.01
+
+# system:similar to can walk the global vptree or just check the phashes of the files we already have. at or below this many candidates, we check them directly
+SIMILAR_TO_CANDIDATE_SCAN_THRESHOLD = 10000
+
+# these system predicates only read files_info, so the results cache can watch them with one flag
+FILES_INFO_PREDICATE_TYPES = {
+    ClientSearch.PREDICATE_TYPE_SYSTEM_SIZE,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_MIME,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_WIDTH,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_HEIGHT,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_RATIO,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_NUM_PIXELS,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_DIMENSIONS,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_DURATION,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_FRAMERATE,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_NUM_FRAMES,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_HAS_AUDIO,
+    ClientSearch.PREDICATE_TYPE_SYSTEM_NUM_WORDS
+}
+
+def intersection_update_qhi( query_hash_ids: typing.Optional[ typing.Set[ int ] ], some_hash_ids: typing.Collection[ int ], force_create_new_set = False ) -> HydrusIntegerSets.SortedIntegerSet:
+    
+    # the query set can get huge, so we hold it as a sorted array and do the set ops vectorised
     
     if query_hash_ids is None:
         
-        if not isinstance( some_hash_ids, set ) or force_create_new_set:
+        if not isinstance( some_hash_ids, HydrusIntegerSets.SortedIntegerSet ) or force_create_new_set:
             
-            some_hash_ids = set( some_hash_ids )
+            some_hash_ids = HydrusIntegerSets.SortedIntegerSet( some_hash_ids )
             
         
         return some_hash_ids
         
     else:
         
+        if not isinstance( query_hash_ids, HydrusIntegerSets.SortedIntegerSet ):
+            
+            query_hash_ids = HydrusIntegerSets.SortedIntegerSet( query_hash_ids )
+            
+        
         query_hash_ids.intersection_update( some_hash_ids )
         
         return query_hash_ids
@@ -517,7 +558,7 @@ class ClientDBFilesSearchTags( ClientDBModule.ClientDBModule ):
                 
             
         
-        result_hash_ids = set()
+        result_hash_ids = HydrusIntegerSets.SortedIntegerSet()
         
         table_names = self.modules_tag_search.GetMappingTables( tag_display_type, file_service_key, tag_context )
         
@@ -859,6 +900,47 @@ class ClientDBFilesSearchTags( ClientDBModule.ClientDBModule ):
         return tables_and_columns
         
     
+    def GetTagCountEstimate( self, tag_display_type: int, location_context: ClientLocation.LocationContext, tag_context: ClientSearch.TagContext, tag ) -> int:
+        
+        # a cheap guess of how many files GetHashIdsFromTag will give, straight from the autocomplete count cache
+        # 'all known tags' is split into the real tag services, and every real tag service has a count cache on every file domain, 'all known files' included
+        
+        if not self.modules_tags.TagExists( tag ):
+            
+            return 0
+            
+        
+        ( file_service_keys, file_location_is_cross_referenced ) = location_context.GetCoveringCurrentFileServiceKeys()
+        
+        if tag_context.service_key == CC.COMBINED_TAG_SERVICE_KEY:
+            
+            search_tag_service_ids = self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+            
+        else:
+            
+            search_tag_service_ids = ( self.modules_services.GetServiceId( tag_context.service_key ), )
+            
+        
+        tag_id = self.modules_tags.GetTagId( tag )
+        
+        estimate = 0
+        
+        for search_tag_service_id in search_tag_service_ids:
+            
+            ideal_tag_id = self.modules_tag_search.modules_tag_siblings.GetIdealTagId( tag_display_type, search_tag_service_id, tag_id )
+            
+            for file_service_key in file_service_keys:
+                
+                file_service_id = self.modules_services.GetServiceId( file_service_key )
+                
+                ids_to_count = self.modules_mappings_counts.GetCountsEstimate( tag_display_type, search_tag_service_id, file_service_id, ( ideal_tag_id, ), tag_context.include_current_tags, tag_context.include_pending_tags )
+                
+                estimate += ids_to_count[ ideal_tag_id ]
+                
+            
+        
+        return estimate
+        
 
 
 class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
@@ -881,7 +963,8 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
         modules_tag_search: ClientDBTagSearch.ClientDBTagSearch,
         modules_similar_files: ClientDBSimilarFiles.ClientDBSimilarFiles,
         modules_files_duplicates: ClientDBFilesDuplicates.ClientDBFilesDuplicates,
-        modules_files_search_tags: ClientDBFilesSearchTags
+        modules_files_search_tags: ClientDBFilesSearchTags,
+        file_search_results_cache: ClientDBFilesSearchCache.FileSearchResultsCache
     ):
         
         # this is obviously a monster, so the solution is going to be to merge the sub-modules into 'search' modules like the 'tags' one above. this guy doesn't have to do search, it can farm that work out
@@ -902,10 +985,65 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
         self.modules_similar_files = modules_similar_files
         self.modules_files_duplicates = modules_files_duplicates
         self.modules_files_search_tags = modules_files_search_tags
+        self.file_search_results_cache = file_search_results_cache
         
         ClientDBModule.ClientDBModule.__init__( self, 'client file query', cursor )
         
     
+    def _DoDuplicateCountPreds( self, system_predicates: ClientSearch.FileSystemPredicates, db_location_context, query_hash_ids: typing.Optional[ typing.Set[ int ] ], have_cross_referenced_file_locations: bool ) -> typing.Tuple[ typing.Optional[ typing.Set[ int ] ], bool ]:
+        
+        for ( operator, num_relationships, dupe_type ) in system_predicates.GetDuplicateRelationshipCountPredicates():
+            
+            only_do_zero = ( operator in ( '=', CC.UNICODE_ALMOST_EQUAL_TO ) and num_relationships == 0 ) or ( operator == '<' and num_relationships == 1 )
+            include_zero = operator == '<'
+            
+            if only_do_zero:
+                
+                continue
+                
+            elif include_zero:
+                
+                continue
+                
+            else:
+                
+                dupe_hash_ids = self.modules_files_duplicates.GetHashIdsFromDuplicateCountPredicate( db_location_context, operator, num_relationships, dupe_type )
+                
+                query_hash_ids = intersection_update_qhi( query_hash_ids, dupe_hash_ids )
+                
+                have_cross_referenced_file_locations = True
+                
+            
+        
+        return ( query_hash_ids, have_cross_referenced_file_locations )
+        
+    
+    def _DoFileViewingStatsPreds( self, system_predicates: ClientSearch.FileSystemPredicates, query_hash_ids: typing.Optional[ typing.Set[ int ] ] ) -> typing.Optional[ typing.Set[ int ] ]:
+        
+        for ( view_type, viewing_locations, operator, viewing_value ) in system_predicates.GetFileViewingStatsPredicates():
+            
+            only_do_zero = ( operator in ( '=', CC.UNICODE_ALMOST_EQUAL_TO ) and viewing_value == 0 ) or ( operator == '<' and viewing_value == 1 )
+            include_zero = operator == '<'
+            
+            if only_do_zero:
+                
+                continue
+                
+            elif include_zero:
+                
+                continue
+                
+            else:
+                
+                viewing_hash_ids = self.modules_files_viewing_stats.GetHashIdsFromFileViewingStatistics( view_type, viewing_locations, operator, viewing_value )
+                
+                query_hash_ids = intersection_update_qhi( query_hash_ids, viewing_hash_ids )
+                
+            
+        
+        return query_hash_ids
+        
+    
     def _DoNotePreds( self, system_predicates: ClientSearch.FileSystemPredicates, query_hash_ids: typing.Optional[ typing.Set[ int ] ], job_key: typing.Optional[ ClientThreading.JobKey ] = None ) -> typing.Optional[ typing.Set[ int ] ]:
         
         simple_preds = system_predicates.GetSimpleInfo()
@@ -1029,6 +1167,99 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
             
         
     
+    def _DoSimilarToPreds( self, system_predicates: ClientSearch.FileSystemPredicates, query_hash_ids: typing.Optional[ typing.Set[ int ] ] ) -> typing.Optional[ typing.Set[ int ] ]:
+        
+        def get_use_candidate_scan():
+            
+            return query_hash_ids is not None and len( query_hash_ids ) <= SIMILAR_TO_CANDIDATE_SCAN_THRESHOLD
+            
+        
+        if system_predicates.HasSimilarToData():
+            
+            use_candidate_scan = get_use_candidate_scan()
+            
+            ( pixel_hashes, perceptual_hashes, max_hamming ) = system_predicates.GetSimilarToData()
+            
+            all_similar_hash_ids = set()
+            
+            pixel_hash_ids = set()
+            
+            for pixel_hash in pixel_hashes:
+                
+                if self.modules_hashes.HasHash( pixel_hash ):
+                    
+                    pixel_hash_id = self.modules_hashes_local_cache.GetHashId( pixel_hash )
+                    
+                    pixel_hash_ids.add( pixel_hash_id )
+                    
+                
+            
+            if use_candidate_scan:
+                
+                similar_hash_ids_and_distances = self.modules_similar_files.SearchCandidates( pixel_hash_ids, perceptual_hashes, max_hamming, query_hash_ids )
+                
+                similar_hash_ids = [ similar_hash_id for ( similar_hash_id, distance ) in similar_hash_ids_and_distances ]
+                
+                all_similar_hash_ids.update( similar_hash_ids )
+                
+            
+            if len( pixel_hash_ids ) > 0 and not use_candidate_scan:
+                
+                similar_hash_ids_and_distances = self.modules_similar_files.SearchPixelHashes( pixel_hash_ids )
+                
+                similar_hash_ids = [ similar_hash_id for ( similar_hash_id, distance ) in similar_hash_ids_and_distances ]
+                
+                all_similar_hash_ids.update( similar_hash_ids )
+                
+            
+            if len( perceptual_hashes ) > 0 and not use_candidate_scan:
+                
+                similar_hash_ids_and_distances = self.modules_similar_files.SearchPerceptualHashes( perceptual_hashes, max_hamming )
+                
+                similar_hash_ids = [ similar_hash_id for ( similar_hash_id, distance ) in similar_hash_ids_and_distances ]
+                
+                all_similar_hash_ids.update( similar_hash_ids )
+                
+            
+            query_hash_ids = intersection_update_qhi( query_hash_ids, all_similar_hash_ids )
+            
+        
+        if system_predicates.HasSimilarToFiles():
+            
+            ( similar_to_hashes, max_hamming ) = system_predicates.GetSimilarToFiles()
+            
+            all_similar_hash_ids = set()
+            
+            if get_use_candidate_scan():
+                
+                hash_ids = self.modules_hashes_local_cache.GetHashIds( similar_to_hashes )
+                
+                similar_hash_ids_and_distances = self.modules_similar_files.SearchFilesInCandidates( hash_ids, max_hamming, query_hash_ids )
+                
+                similar_hash_ids = [ similar_hash_id for ( similar_hash_id, distance ) in similar_hash_ids_and_distances ]
+                
+                all_similar_hash_ids.update( similar_hash_ids )
+                
+            else:
+                
+                for similar_to_hash in similar_to_hashes:
+                    
+                    hash_id = self.modules_hashes_local_cache.GetHashId( similar_to_hash )
+                    
+                    similar_hash_ids_and_distances = self.modules_similar_files.SearchFile( hash_id, max_hamming )
+                    
+                    similar_hash_ids = [ similar_hash_id for ( similar_hash_id, distance ) in similar_hash_ids_and_distances ]
+                    
+                    all_similar_hash_ids.update( similar_hash_ids )
+                    
+                
+            
+            query_hash_ids = intersection_update_qhi( query_hash_ids, all_similar_hash_ids )
+            
+        
+        return query_hash_ids
+        
+    
     def _DoSimpleRatingPreds( self, file_search_context: ClientSearch.FileSearchContext, query_hash_ids: typing.Optional[ typing.Set[ int ] ], job_key: typing.Optional[ ClientThreading.JobKey ] = None ) -> typing.Optional[ typing.Set[ int ] ]:
         
         cancelled_hook = None
@@ -1138,6 +1369,36 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
                 
             
         
+        return query_hash_ids
+        
+    
+    def _DoSpecificHashPreds( self, system_predicates: ClientSearch.FileSystemPredicates, query_hash_ids: typing.Optional[ typing.Set[ int ] ] ) -> typing.Optional[ typing.Set[ int ] ]:
+        
+        simple_preds = system_predicates.GetSimpleInfo()
+        
+        if 'hash' in simple_preds:
+            
+            ( search_hashes, search_hash_type, inclusive ) = simple_preds[ 'hash' ]
+            
+            if inclusive:
+                
+                if search_hash_type == 'sha256':
+                    
+                    matching_sha256_hashes = [ search_hash for search_hash in search_hashes if self.modules_hashes.HasHash( search_hash ) ]
+                    
+                else:
+                    
+                    source_to_desired = self.modules_hashes.GetFileHashes( search_hashes, search_hash_type, 'sha256' )
+                    
+                    matching_sha256_hashes = list( source_to_desired.values() )
+                    
+                
+                specific_hash_ids = self.modules_hashes_local_cache.GetHashIds( matching_sha256_hashes )
+                
+                query_hash_ids = intersection_update_qhi( query_hash_ids, specific_hash_ids )
+                
+            
+        
         return query_hash_ids
         
     
@@ -1241,58 +1502,257 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
         return ( query_hash_ids, have_cross_referenced_file_locations )
         
     
-    def GetHashIdsFromQuery(
-        self,
-        file_search_context: ClientSearch.FileSearchContext,
-        job_key: typing.Optional[ ClientThreading.JobKey ] = None,
-        query_hash_ids: typing.Optional[ set ] = None,
-        apply_implicit_limit: bool = True,
-        sort_by: typing.Optional[ ClientMedia.MediaSort ] = None,
-        limit_sort_by: typing.Optional[ ClientMedia.MediaSort ] = None
-    ) -> typing.List[ int ]:
+    def _GetFileDomainSizeEstimate( self, location_context: ClientLocation.LocationContext ) -> typing.Optional[ int ]:
         
-        if job_key is None:
+        if location_context.IsAllKnownFiles():
             
-            job_key = ClientThreading.JobKey( cancellable = True )
+            return None
             
         
-        if query_hash_ids is not None:
+        estimate = 0
+        
+        for ( service_keys, info_type ) in ( ( location_context.current_service_keys, HC.SERVICE_INFO_NUM_FILES ), ( location_context.deleted_service_keys, HC.SERVICE_INFO_NUM_DELETED_FILES ) ):
             
-            query_hash_ids = set( query_hash_ids )
+            for service_key in service_keys:
+                
+                service_id = self.modules_services.GetServiceId( service_key )
+                
+                result = self._Execute( 'SELECT info FROM service_info WHERE service_id = ? AND info_type = ?;', ( service_id, info_type ) ).fetchone()
+                
+                if result is not None:
+                    
+                    ( count, ) = result
+                    
+                elif info_type == HC.SERVICE_INFO_NUM_FILES:
+                    
+                    count = self.modules_files_storage.GetCurrentFilesCount( service_id )
+                    
+                else:
+                    
+                    count = self.modules_files_storage.GetDeletedFilesCount( service_id )
+                    
+                
+                estimate += count
+                
             
         
-        have_cross_referenced_file_locations = False
-        
-        HG.client_controller.ResetIdleTimer()
+        return estimate
         
-        system_predicates = file_search_context.GetSystemPredicates()
+    
+    def _GetSimpleRatingPredsCountEstimate( self, system_predicates: ClientSearch.FileSystemPredicates ) -> typing.Optional[ int ]:
         
-        location_context = file_search_context.GetLocationContext()
-        tag_context = file_search_context.GetTagContext()
+        # the number of files rated at all on a service is a cheap upper bound on any rating pred for it
         
-        tag_service_key = tag_context.service_key
+        estimate = None
         
-        if location_context.IsEmpty():
+        for ( operator, value, rating_service_key ) in system_predicates.GetRatingsPredicates():
             
-            return []
+            if value == 'not rated':
+                
+                continue
+                
             
-        
-        current_file_service_ids = set()
-        
-        for current_service_key in location_context.current_service_keys:
+            service_id = self.modules_services.GetServiceId( rating_service_key )
             
-            try:
+            service_type = self.modules_services.GetService( service_id ).GetServiceType()
+            
+            if value == 'rated' or service_type in HC.STAR_RATINGS_SERVICES:
                 
-                current_file_service_id = self.modules_services.GetServiceId( current_service_key )
+                table_name = 'local_ratings'
                 
-            except HydrusExceptions.DataMissing:
+            elif service_type == HC.LOCAL_RATING_INCDEC:
                 
-                HydrusData.ShowText( 'A file search query was run for a file service that does not exist! If you just removed a service, you might want to try checking the search and/or restarting the client.' )
+                if operator == '<' or ( operator == '=' and value == 0 ):
+                    
+                    continue
+                    
                 
-                return []
+                table_name = 'local_incdec_ratings'
+                
+            else:
+                
+                continue
                 
             
-            current_file_service_ids.add( current_file_service_id )
+            ( count, ) = self._Execute( 'SELECT COUNT( * ) FROM {} WHERE service_id = ?;'.format( table_name ), ( service_id, ) ).fetchone()
+            
+            if estimate is None or count < estimate:
+                
+                estimate = count
+                
+            
+        
+        return estimate
+        
+    
+    def _GetFileSearchResultsCacheDependencies( self, file_search_context: ClientSearch.FileSearchContext ):
+        
+        # we only cache searches we know how to invalidate. anything that drifts with the clock, or leans on content we don't watch, like urls or notes, is run fresh every time
+        
+        location_context = file_search_context.GetLocationContext()
+        tag_context = file_search_context.GetTagContext()
+        
+        try:
+            
+            if location_context.IsAllKnownFiles():
+                
+                # tag search here spans every file domain, so any file change may matter
+                file_service_ids = None
+                
+            else:
+                
+                file_service_ids = { self.modules_services.GetServiceId( service_key ) for service_key in location_context.current_service_keys.union( location_context.deleted_service_keys ) }
+                
+                if location_context.IsAllLocalFiles():
+                    
+                    # we hide update files from these results
+                    file_service_ids.add( self.modules_services.local_update_service_id )
+                    
+                
+            
+            tag_service_id = self.modules_services.GetServiceId( tag_context.service_key )
+            
+        except HydrusExceptions.DataMissing:
+            
+            return None
+            
+        
+        if tag_service_id == self.modules_services.combined_tag_service_id:
+            
+            real_tag_service_ids = set( self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES ) )
+            
+        else:
+            
+            real_tag_service_ids = { tag_service_id }
+            
+        
+        predicates = []
+        
+        for predicate in file_search_context.GetPredicates():
+            
+            if predicate.GetType() == ClientSearch.PREDICATE_TYPE_OR_CONTAINER:
+                
+                predicates.extend( predicate.GetValue() )
+                
+            else:
+                
+                predicates.append( predicate )
+                
+            
+        
+        tags = set()
+        any_tag_may_matter = False
+        content_dependencies = set()
+        
+        for predicate in predicates:
+            
+            predicate_type = predicate.GetType()
+            
+            if predicate_type == ClientSearch.PREDICATE_TYPE_TAG:
+                
+                tags.add( predicate.GetValue() )
+                
+            elif predicate_type in ( ClientSearch.PREDICATE_TYPE_NAMESPACE, ClientSearch.PREDICATE_TYPE_WILDCARD, ClientSearch.PREDICATE_TYPE_SYSTEM_NUM_TAGS, ClientSearch.PREDICATE_TYPE_SYSTEM_UNTAGGED ):
+                
+                any_tag_may_matter = True
+                
+            elif predicate_type in ( ClientSearch.PREDICATE_TYPE_SYSTEM_INBOX, ClientSearch.PREDICATE_TYPE_SYSTEM_ARCHIVE ):
+                
+                content_dependencies.add( ClientDBFilesSearchCache.FILE_SEARCH_CACHE_DEPENDENCY_INBOX )
+                
+            elif predicate_type == ClientSearch.PREDICATE_TYPE_SYSTEM_RATING:
+                
+                content_dependencies.add( ClientDBFilesSearchCache.FILE_SEARCH_CACHE_DEPENDENCY_RATINGS )
+                
+            elif predicate_type in FILES_INFO_PREDICATE_TYPES:
+                
+                content_dependencies.add( ClientDBFilesSearchCache.FILE_SEARCH_CACHE_DEPENDENCY_FILES_INFO )
+                
+            elif predicate_type in ( ClientSearch.PREDICATE_TYPE_SYSTEM_LOCAL, ClientSearch.PREDICATE_TYPE_SYSTEM_NOT_LOCAL ):
+                
+                if file_service_ids is not None:
+                    
+                    file_service_ids.add( self.modules_services.combined_local_file_service_id )
+                    
+                
+            elif predicate_type not in ( ClientSearch.PREDICATE_TYPE_SYSTEM_EVERYTHING, ClientSearch.PREDICATE_TYPE_SYSTEM_LIMIT, ClientSearch.PREDICATE_TYPE_SYSTEM_HASH ):
+                
+                return None
+                
+            
+        
+        watched_tag_ids = set()
+        
+        for tag in tags:
+            
+            if not self.modules_tags.TagExists( tag ):
+                
+                # it could turn up later under an id we can't know yet
+                any_tag_may_matter = True
+                
+                break
+                
+            
+            tag_id = self.modules_tags.GetTagId( tag )
+            
+            watched_tag_ids.add( tag_id )
+            
+            # the search actually looks at the sibling ideal
+            for real_tag_service_id in real_tag_service_ids:
+                
+                watched_tag_ids.add( self.modules_tag_search.modules_tag_siblings.GetIdealTagId( ClientTags.TAG_DISPLAY_ACTUAL, real_tag_service_id, tag_id ) )
+                
+            
+        
+        if any_tag_may_matter:
+            
+            watched_tag_ids = None
+            
+        
+        tag_service_ids_to_tag_ids = { watched_tag_service_id : watched_tag_ids for watched_tag_service_id in real_tag_service_ids.union( ( tag_service_id, ) ) }
+        
+        return ( file_service_ids, tag_service_ids_to_tag_ids, content_dependencies )
+        
+    
+    def _GetHashIdsFromQueryUncached( self, file_search_context: ClientSearch.FileSearchContext, job_key: ClientThreading.JobKey, query_hash_ids: typing.Optional[ set ] ):
+        
+        # this gives the full, unsorted, unlimited results, or [] if we broke early
+        
+        if query_hash_ids is not None:
+            
+            query_hash_ids = HydrusIntegerSets.SortedIntegerSet( query_hash_ids )
+            
+        
+        have_cross_referenced_file_locations = False
+        
+        system_predicates = file_search_context.GetSystemPredicates()
+        
+        location_context = file_search_context.GetLocationContext()
+        tag_context = file_search_context.GetTagContext()
+        
+        tag_service_key = tag_context.service_key
+        
+        if location_context.IsEmpty():
+            
+            return []
+            
+        
+        current_file_service_ids = set()
+        
+        for current_service_key in location_context.current_service_keys:
+            
+            try:
+                
+                current_file_service_id = self.modules_services.GetServiceId( current_service_key )
+                
+            except HydrusExceptions.DataMissing:
+                
+                HydrusData.ShowText( 'A file search query was run for a file service that does not exist! If you just removed a service, you might want to try checking the search and/or restarting the client.' )
+                
+                return []
+                
+            
+            current_file_service_ids.add( current_file_service_id )
             
         
         deleted_file_service_ids = set()
@@ -1350,6 +1810,14 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
         
         there_are_simple_files_info_preds_to_search_for = len( files_info_predicates ) > 0
         
+        use_files_info_columnar_cache = HG.client_controller.new_options.GetBoolean( 'use_columnar_files_info_cache' )
+        
+        if not use_files_info_columnar_cache:
+            
+            # in case the user just turned it off, free the memory
+            self.modules_files_metadata_basic.ClearFilesInfoColumnarCache()
+            
+        
         #
         
         done_or_predicates = len( or_predicates ) == 0
@@ -1371,150 +1839,109 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
         
         #
         
-        if 'hash' in simple_preds:
-            
-            ( search_hashes, search_hash_type, inclusive ) = simple_preds[ 'hash' ]
-            
-            if inclusive:
-                
-                if search_hash_type == 'sha256':
-                    
-                    matching_sha256_hashes = [ search_hash for search_hash in search_hashes if self.modules_hashes.HasHash( search_hash ) ]
-                    
-                else:
-                    
-                    source_to_desired = self.modules_hashes.GetFileHashes( search_hashes, search_hash_type, 'sha256' )
-                    
-                    matching_sha256_hashes = list( source_to_desired.values() )
-                    
-                
-                specific_hash_ids = self.modules_hashes_local_cache.GetHashIds( matching_sha256_hashes )
-                
-                query_hash_ids = intersection_update_qhi( query_hash_ids, specific_hash_ids )
-                
-            
+        # now the planned stuff. the most selective goes first, so everything after can work on a small set
         
-        #
-
-        ( query_hash_ids, have_cross_referenced_file_locations ) = self._DoTimestampPreds( file_search_context, query_hash_ids, have_cross_referenced_file_locations, job_key = job_key )
+        is_inbox = system_predicates.MustBeInbox()
         
-        query_hash_ids = self._DoSimpleRatingPreds( file_search_context, query_hash_ids, job_key = job_key )
+        done_inbox = False
         
-        #
+        search_plan = self.GetSearchPlan( file_search_context )
         
-        for ( view_type, viewing_locations, operator, viewing_value ) in system_predicates.GetFileViewingStatsPredicates():
+        plan_lines = []
+        
+        for ( step_type, step_data, estimate, description ) in search_plan:
             
-            only_do_zero = ( operator in ( '=', CC.UNICODE_ALMOST_EQUAL_TO ) and viewing_value == 0 ) or ( operator == '<' and viewing_value == 1 )
-            include_zero = operator == '<'
+            time_started = HydrusTime.GetNowPrecise()
             
-            if only_do_zero:
+            if step_type == SEARCH_STEP_SPECIFIC_HASHES:
                 
-                continue
+                query_hash_ids = self._DoSpecificHashPreds( system_predicates, query_hash_ids )
                 
-            elif include_zero:
+            elif step_type == SEARCH_STEP_TIMESTAMPS:
                 
-                continue
+                ( query_hash_ids, have_cross_referenced_file_locations ) = self._DoTimestampPreds( file_search_context, query_hash_ids, have_cross_referenced_file_locations, job_key = job_key )
                 
-            else:
+            elif step_type == SEARCH_STEP_SIMPLE_RATINGS:
                 
-                viewing_hash_ids = self.modules_files_viewing_stats.GetHashIdsFromFileViewingStatistics( view_type, viewing_locations, operator, viewing_value )
+                query_hash_ids = self._DoSimpleRatingPreds( file_search_context, query_hash_ids, job_key = job_key )
                 
-                query_hash_ids = intersection_update_qhi( query_hash_ids, viewing_hash_ids )
+            elif step_type == SEARCH_STEP_FILE_VIEWING_STATS:
                 
-            
-        
-        for ( operator, num_relationships, dupe_type ) in system_predicates.GetDuplicateRelationshipCountPredicates():
-            
-            only_do_zero = ( operator in ( '=', CC.UNICODE_ALMOST_EQUAL_TO ) and num_relationships == 0 ) or ( operator == '<' and num_relationships == 1 )
-            include_zero = operator == '<'
-            
-            if only_do_zero:
+                query_hash_ids = self._DoFileViewingStatsPreds( system_predicates, query_hash_ids )
                 
-                continue
+            elif step_type == SEARCH_STEP_DUPLICATE_COUNTS:
                 
-            elif include_zero:
+                ( query_hash_ids, have_cross_referenced_file_locations ) = self._DoDuplicateCountPreds( system_predicates, db_location_context, query_hash_ids, have_cross_referenced_file_locations )
                 
-                continue
+            elif step_type == SEARCH_STEP_SIMILAR_TO:
                 
-            else:
+                query_hash_ids = self._DoSimilarToPreds( system_predicates, query_hash_ids )
                 
-                dupe_hash_ids = self.modules_files_duplicates.GetHashIdsFromDuplicateCountPredicate( db_location_context, operator, num_relationships, dupe_type )
+            elif step_type == SEARCH_STEP_INBOX:
                 
-                query_hash_ids = intersection_update_qhi( query_hash_ids, dupe_hash_ids )
+                query_hash_ids = intersection_update_qhi( query_hash_ids, self.modules_files_inbox.inbox_hash_ids, force_create_new_set = True )
                 
-                have_cross_referenced_file_locations = True
+                done_inbox = True
                 
-            
-        
-        if system_predicates.HasSimilarToData():
-            
-            ( pixel_hashes, perceptual_hashes, max_hamming ) = system_predicates.GetSimilarToData()
-            
-            all_similar_hash_ids = set()
-            
-            pixel_hash_ids = set()
-            
-            for pixel_hash in pixel_hashes:
+            elif step_type == SEARCH_STEP_TAG:
                 
-                if self.modules_hashes.HasHash( pixel_hash ):
+                tag = step_data
+                
+                if query_hash_ids is None:
                     
-                    pixel_hash_id = self.modules_hashes_local_cache.GetHashId( pixel_hash )
+                    tag_query_hash_ids = self.modules_files_search_tags.GetHashIdsFromTag( ClientTags.TAG_DISPLAY_ACTUAL, location_context, tag_context, tag, job_key = job_key )
                     
-                    pixel_hash_ids.add( pixel_hash_id )
+                elif done_inbox and len( query_hash_ids ) == len( self.modules_files_inbox.inbox_hash_ids ):
+                    
+                    tag_query_hash_ids = self.modules_files_search_tags.GetHashIdsFromTag( ClientTags.TAG_DISPLAY_ACTUAL, location_context, tag_context, tag, hash_ids = self.modules_files_inbox.inbox_hash_ids, hash_ids_table_name = 'file_inbox', job_key = job_key )
+                    
+                else:
+                    
+                    with self._MakeTemporaryIntegerTable( query_hash_ids, 'hash_id' ) as temp_table_name:
+                        
+                        tag_query_hash_ids = self.modules_files_search_tags.GetHashIdsFromTag( ClientTags.TAG_DISPLAY_ACTUAL, location_context, tag_context, tag, hash_ids = query_hash_ids, hash_ids_table_name = temp_table_name, job_key = job_key )
+                        
                     
                 
-            
-            if len( pixel_hash_ids ) > 0:
-                
-                similar_hash_ids_and_distances = self.modules_similar_files.SearchPixelHashes( pixel_hash_ids )
-                
-                similar_hash_ids = [ similar_hash_id for ( similar_hash_id, distance ) in similar_hash_ids_and_distances ]
+                query_hash_ids = intersection_update_qhi( query_hash_ids, tag_query_hash_ids )
                 
-                all_similar_hash_ids.update( similar_hash_ids )
+                have_cross_referenced_file_locations = True
                 
             
-            if len( perceptual_hashes ) > 0:
-                
-                similar_hash_ids_and_distances = self.modules_similar_files.SearchPerceptualHashes( perceptual_hashes, max_hamming )
+            if HG.query_planner_mode:
                 
-                similar_hash_ids = [ similar_hash_id for ( similar_hash_id, distance ) in similar_hash_ids_and_distances ]
+                pretty_estimate = 'unknown' if estimate is None else HydrusData.ToHumanInt( estimate )
+                pretty_num_results = 'no' if query_hash_ids is None else HydrusData.ToHumanInt( len( query_hash_ids ) )
                 
-                all_similar_hash_ids.update( similar_hash_ids )
+                plan_lines.append( '{}: estimated {} files, {} files left after {}'.format( description, pretty_estimate, pretty_num_results, HydrusTime.TimeDeltaToPrettyTimeDelta( HydrusTime.GetNowPrecise() - time_started ) ) )
                 
             
-            query_hash_ids = intersection_update_qhi( query_hash_ids, all_similar_hash_ids )
-            
-        
-        if system_predicates.HasSimilarToFiles():
-            
-            ( similar_to_hashes, max_hamming ) = system_predicates.GetSimilarToFiles()
-            
-            all_similar_hash_ids = set()
-            
-            for similar_to_hash in similar_to_hashes:
+            if job_key.IsCancelled():
                 
-                hash_id = self.modules_hashes_local_cache.GetHashId( similar_to_hash )
+                return []
                 
-                similar_hash_ids_and_distances = self.modules_similar_files.SearchFile( hash_id, max_hamming )
+            
+            if query_hash_ids is not None and len( query_hash_ids ) == 0:
                 
-                similar_hash_ids = [ similar_hash_id for ( similar_hash_id, distance ) in similar_hash_ids_and_distances ]
+                # nothing can add results back in, so no point running the rest
                 
-                all_similar_hash_ids.update( similar_hash_ids )
+                break
                 
             
-            query_hash_ids = intersection_update_qhi( query_hash_ids, all_similar_hash_ids )
-            
         
-        is_inbox = system_predicates.MustBeInbox()
+        if HG.query_planner_mode and len( plan_lines ) > 0:
+            
+            HG.client_controller.PrintQueryPlan( 'file search plan: {}'.format( ', '.join( sorted( ( predicate.ToString() for predicate in file_search_context.GetPredicates() ) ) ) ), plan_lines )
+            
         
-        if is_inbox:
+        if query_hash_ids is not None and len( query_hash_ids ) == 0:
             
-            query_hash_ids = intersection_update_qhi( query_hash_ids, self.modules_files_inbox.inbox_hash_ids, force_create_new_set = True )
+            return []
             
         
         #
         
-        # last shot before tags and stuff to try to do these. we can only do them if query hash ids has stuff in
+        # last shot before namespaces and stuff to try to do these. we can only do them if query hash ids has stuff in
         done_tricky_incdec_ratings = False
         
         if query_hash_ids is not None:
@@ -1557,47 +1984,10 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
                 
             
         
-        # first tags
+        # now the tag searches that need a file domain to be fast
         
         if there_are_tags_to_search:
             
-            def sort_longest_tag_first_key( s ):
-                
-                return ( 1 if HydrusTags.IsUnnamespaced( s ) else 0, -len( s ) )
-                
-            
-            tags_to_include = list( tags_to_include )
-            
-            tags_to_include.sort( key = sort_longest_tag_first_key )
-            
-            for tag in tags_to_include:
-                
-                if query_hash_ids is None:
-                    
-                    tag_query_hash_ids = self.modules_files_search_tags.GetHashIdsFromTag( ClientTags.TAG_DISPLAY_ACTUAL, location_context, tag_context, tag, job_key = job_key )
-                    
-                elif is_inbox and len( query_hash_ids ) == len( self.modules_files_inbox.inbox_hash_ids ):
-                    
-                    tag_query_hash_ids = self.modules_files_search_tags.GetHashIdsFromTag( ClientTags.TAG_DISPLAY_ACTUAL, location_context, tag_context, tag, hash_ids = self.modules_files_inbox.inbox_hash_ids, hash_ids_table_name = 'file_inbox', job_key = job_key )
-                    
-                else:
-                    
-                    with self._MakeTemporaryIntegerTable( query_hash_ids, 'hash_id' ) as temp_table_name:
-                        
-                        tag_query_hash_ids = self.modules_files_search_tags.GetHashIdsFromTag( ClientTags.TAG_DISPLAY_ACTUAL, location_context, tag_context, tag, hash_ids = query_hash_ids, hash_ids_table_name = temp_table_name, job_key = job_key )
-                        
-                    
-                
-                query_hash_ids = intersection_update_qhi( query_hash_ids, tag_query_hash_ids )
-                
-                have_cross_referenced_file_locations = True
-                
-                if len( query_hash_ids ) == 0:
-                    
-                    return []
-                    
-                
-            
             namespaces_to_include = list( namespaces_to_include )
             
             namespaces_to_include.sort( key = lambda n: -len( n ) )
@@ -1691,6 +2081,15 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
                 
             else:
                 
+                if len( files_info_predicates ) > 0 and query_hash_ids is not None and use_files_info_columnar_cache:
+                    
+                    # do the files_info preds in memory first, so the sql below only has to cross-reference file locations
+                    
+                    query_hash_ids = self.modules_files_metadata_basic.FilterHashIdsWithFilesInfoColumnarCache( simple_preds, hash_ids = query_hash_ids )
+                    
+                    files_info_predicates = []
+                    
+                
                 if len( files_info_predicates ) == 0:
                     
                     files_info_predicates.insert( 0, '1=1' )
@@ -1884,6 +2283,13 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
             query_hash_ids = intersection_update_qhi( query_hash_ids, king_hash_ids )
             
         
+        if there_are_simple_files_info_preds_to_search_for and not done_files_info_predicates and use_files_info_columnar_cache:
+            
+            query_hash_ids = self.modules_files_metadata_basic.FilterHashIdsWithFilesInfoColumnarCache( simple_preds, hash_ids = query_hash_ids )
+            
+            done_files_info_predicates = True
+            
+        
         if there_are_simple_files_info_preds_to_search_for and not done_files_info_predicates:
             
             with self._MakeTemporaryIntegerTable( query_hash_ids, 'hash_id' ) as temp_table_name:
@@ -2107,14 +2513,14 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
             
             if must_not_be_local:
                 
-                query_hash_ids = set()
+                query_hash_ids = HydrusIntegerSets.SortedIntegerSet()
                 
             
         elif file_location_is_all_combined_local_files_deleted:
             
             if must_be_local:
                 
-                query_hash_ids = set()
+                query_hash_ids = HydrusIntegerSets.SortedIntegerSet()
                 
             
         elif must_be_local or must_not_be_local:
@@ -2271,7 +2677,70 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
             return []
             
         
-        #
+        return query_hash_ids
+        
+    
+    def GetHashIdsFromQuery(
+        self,
+        file_search_context: ClientSearch.FileSearchContext,
+        job_key: typing.Optional[ ClientThreading.JobKey ] = None,
+        query_hash_ids: typing.Optional[ set ] = None,
+        apply_implicit_limit: bool = True,
+        sort_by: typing.Optional[ ClientMedia.MediaSort ] = None,
+        limit_sort_by: typing.Optional[ ClientMedia.MediaSort ] = None
+    ) -> typing.List[ int ]:
+        
+        if job_key is None:
+            
+            job_key = ClientThreading.JobKey( cancellable = True )
+            
+        
+        HG.client_controller.ResetIdleTimer()
+        
+        # OR subsearches hand us a candidate set, which we can't key on, so only top-level searches are cached
+        
+        cache_key = None
+        cache_dependencies = None
+        
+        if query_hash_ids is None:
+            
+            cache_dependencies = self._GetFileSearchResultsCacheDependencies( file_search_context )
+            
+            if cache_dependencies is not None:
+                
+                cache_key = self.file_search_results_cache.GetKey( file_search_context )
+                
+            
+        
+        if cache_key is None:
+            
+            query_hash_ids = self._GetHashIdsFromQueryUncached( file_search_context, job_key, query_hash_ids )
+            
+        else:
+            
+            query_hash_ids = self.file_search_results_cache.GetHashIds( cache_key )
+            
+            if query_hash_ids is None:
+                
+                query_hash_ids = self._GetHashIdsFromQueryUncached( file_search_context, job_key, None )
+                
+                if not job_key.IsCancelled():
+                    
+                    ( file_service_ids, tag_service_ids_to_tag_ids, content_dependencies ) = cache_dependencies
+                    
+                    self.file_search_results_cache.SetHashIds( cache_key, query_hash_ids, file_service_ids, tag_service_ids_to_tag_ids, content_dependencies )
+                    
+                
+            
+        
+        if job_key.IsCancelled():
+            
+            return []
+            
+        
+        system_predicates = file_search_context.GetSystemPredicates()
+        
+        location_context = file_search_context.GetLocationContext()
         
         query_hash_ids = list( query_hash_ids )
         
@@ -2310,6 +2779,117 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
         return query_hash_ids
         
     
+    def GetSearchPlan( self, file_search_context: ClientSearch.FileSearchContext ):
+        
+        # these steps can run in any order, so we run the most selective first. everything after them, including later tags, can then join on a small temp table, and if we hit zero we can stop early
+        # estimates are cheap: the tag autocomplete counts, the inbox, and how many files are rated. for stuff like timestamps we have nothing, so we guess a small fraction of the file domain
+        # namespaces, wildcards, files_info and the excludes still come after all this, since they want a populated domain to be fast
+        
+        system_predicates = file_search_context.GetSystemPredicates()
+        location_context = file_search_context.GetLocationContext()
+        tag_context = file_search_context.GetTagContext()
+        
+        domain_size = self._GetFileDomainSizeEstimate( location_context )
+        
+        if domain_size is None:
+            
+            # all known files. we know too little to move the unknown stuff, so it keeps going first
+            unknown_estimate = 0
+            
+        else:
+            
+            unknown_estimate = int( domain_size * UNKNOWN_PREDICATE_SELECTIVITY )
+            
+        
+        search_plan = []
+        
+        simple_preds = system_predicates.GetSimpleInfo()
+        
+        if 'hash' in simple_preds:
+            
+            ( search_hashes, search_hash_type, inclusive ) = simple_preds[ 'hash' ]
+            
+            if inclusive:
+                
+                search_plan.append( ( SEARCH_STEP_SPECIFIC_HASHES, None, len( search_hashes ), 'system:hash' ) )
+                
+            
+        
+        if len( system_predicates.GetTimestampRanges() ) > 0:
+            
+            search_plan.append( ( SEARCH_STEP_TIMESTAMPS, None, unknown_estimate, 'system time predicates' ) )
+            
+        
+        rating_estimate = self._GetSimpleRatingPredsCountEstimate( system_predicates )
+        
+        if rating_estimate is not None:
+            
+            search_plan.append( ( SEARCH_STEP_SIMPLE_RATINGS, None, rating_estimate, 'system:rating predicates' ) )
+            
+        
+        if len( system_predicates.GetFileViewingStatsPredicates() ) > 0:
+            
+            search_plan.append( ( SEARCH_STEP_FILE_VIEWING_STATS, None, unknown_estimate, 'system file viewing predicates' ) )
+            
+        
+        if len( system_predicates.GetDuplicateRelationshipCountPredicates() ) > 0:
+            
+            search_plan.append( ( SEARCH_STEP_DUPLICATE_COUNTS, None, unknown_estimate, 'system duplicate count predicates' ) )
+            
+        
+        if system_predicates.MustBeInbox():
+            
+            search_plan.append( ( SEARCH_STEP_INBOX, None, len( self.modules_files_inbox.inbox_hash_ids ), 'system:inbox' ) )
+            
+        
+        def sort_longest_tag_first_key( s ):
+            
+            return ( 1 if HydrusTags.IsUnnamespaced( s ) else 0, -len( s ) )
+            
+        
+        tags_to_include = sorted( file_search_context.GetTagsToInclude(), key = sort_longest_tag_first_key )
+        
+        for tag in tags_to_include:
+            
+            estimate = self.modules_files_search_tags.GetTagCountEstimate( ClientTags.TAG_DISPLAY_ACTUAL, location_context, tag_context, tag )
+            
+            search_plan.append( ( SEARCH_STEP_TAG, tag, estimate, tag ) )
+            
+        
+        if system_predicates.HasSimilarToData() or system_predicates.HasSimilarToFiles():
+            
+            # these only ever give a handful of results, so the global vptree search usually goes first
+            # but if another step will get us down to a small candidate set, walking the tree costs more than checking those candidates' phashes directly, so we go straight after it
+            
+            known_estimates = [ estimate for ( step_type, step_data, estimate, description ) in search_plan if estimate is not None ]
+            
+            smallest_estimate = min( known_estimates ) if len( known_estimates ) > 0 else None
+            
+            if smallest_estimate is not None and smallest_estimate <= SIMILAR_TO_CANDIDATE_SCAN_THRESHOLD:
+                
+                # ties keep their order, so this lands just after that step
+                search_plan.append( ( SEARCH_STEP_SIMILAR_TO, None, smallest_estimate, 'system:similar to (candidate scan)' ) )
+                
+            else:
+                
+                search_plan.append( ( SEARCH_STEP_SIMILAR_TO, None, 0, 'system:similar to' ) )
+                
+            
+        
+        # tags we cannot estimate go last, in the old longest-first order. ties keep the order above
+        
+        def plan_sort_key( i_and_step ):
+            
+            ( i, ( step_type, step_data, estimate, description ) ) = i_and_step
+            
+            return ( estimate is None, 0 if estimate is None else estimate, i )
+            
+        
+        search_plan = [ step for ( i, step ) in sorted( enumerate( search_plan ), key = plan_sort_key ) ]
+        
+        return search_plan
+        
+    
     def GetTablesAndColumnsThatUseDefinitions( self, content_type: int ) -> typing.List[ typing.Tuple[ str, str ] ]:
         
         tables_and_columns = []
@@ -0,0 +1,224 @@
+import collections
+import json
+import typing
+
+from hydrus.core import HydrusIntegerSets
+
+from hydrus.client.search import ClientSearch
+
+FILE_SEARCH_CACHE_DEPENDENCY_INBOX = 0
+FILE_SEARCH_CACHE_DEPENDENCY_RATINGS = 1
+FILE_SEARCH_CACHE_DEPENDENCY_FILES_INFO = 2
+
+class FileSearchResultsCache( object ):
+    
+    # the hash_ids a file search found before sort and limit, keyed on the serialised search, so a page refresh or session load can skip the search
+    # each entry lists the file services, tag_ids and other content (inbox, ratings, files_info) it read. only a change to one of those drops it
+    
+    def __init__( self, max_weight = 128 * 1048576 ):
+        
+        # weight is roughly bytes
+        self._max_weight = max_weight
+        
+        self._keys_to_entries = collections.OrderedDict()
+        
+        self._file_service_ids_to_keys = collections.defaultdict( set )
+        self._keys_that_need_all_file_services = set()
+        self._tag_service_ids_to_keys = collections.defaultdict( set )
+        self._content_dependencies_to_keys = collections.defaultdict( set )
+        
+        self._total_weight = 0
+        
+        self._num_hits = 0
+        self._num_misses = 0
+        
+    
+    def _Delete( self, key ):
+        
+        if key not in self._keys_to_entries:
+            
+            return
+            
+        
+        ( hash_ids, file_service_ids, tag_service_ids_to_tag_ids, content_dependencies, weight ) = self._keys_to_entries[ key ]
+        
+        del self._keys_to_entries[ key ]
+        
+        if file_service_ids is None:
+            
+            self._keys_that_need_all_file_services.discard( key )
+            
+        else:
+            
+            self._DiscardFromIndex( self._file_service_ids_to_keys, file_service_ids, key )
+            
+        
+        self._DiscardFromIndex( self._tag_service_ids_to_keys, tag_service_ids_to_tag_ids.keys(), key )
+        self._DiscardFromIndex( self._content_dependencies_to_keys, content_dependencies, key )
+        
+        self._total_weight -= weight
+        
+    
+    def _DeleteKeys( self, keys ):
+        
+        for key in list( keys ):
+            
+            self._Delete( key )
+            
+        
+    
+    def _DiscardFromIndex( self, index, index_keys, key ):
+        
+        for index_key in index_keys:
+            
+            if index_key in index:
+                
+                index[ index_key ].discard( key )
+                
+                if len( index[ index_key ] ) == 0:
+                    
+                    del index[ index_key ]
+                    
+                
+            
+        
+    
+    def Clear( self ):
+        
+        self._keys_to_entries = collections.OrderedDict()
+        
+        self._file_service_ids_to_keys = collections.defaultdict( set )
+        self._keys_that_need_all_file_services = set()
+        self._tag_service_ids_to_keys = collections.defaultdict( set )
+        self._content_dependencies_to_keys = collections.defaultdict( set )
+        
+        self._total_weight = 0
+        
+    
+    def GetHashIds( self, key ) -> typing.Optional[ HydrusIntegerSets.SortedIntegerSet ]:
+        
+        if key not in self._keys_to_entries:
+            
+            self._num_misses += 1
+            
+            return None
+            
+        
+        self._num_hits += 1
+        
+        self._keys_to_entries.move_to_end( key )
+        
+        ( hash_ids, file_service_ids, tag_service_ids_to_tag_ids, content_dependencies, weight ) = self._keys_to_entries[ key ]
+        
+        # cheap, the array is shared, and the caller is free to edit it
+        return hash_ids.copy()
+        
+    
+    def GetKey( self, file_search_context: ClientSearch.FileSearchContext ):
+        
+        # the serialised context, minus the 'search complete' flag. sort and limit are applied to the cached ids afterwards, so they aren't in here
+        
+        ( serialisable_location_context, serialisable_tag_context, search_type, serialisable_predicates, search_complete ) = file_search_context.GetSerialisableTuple()[2]
+        
+        return json.dumps( ( serialisable_location_context, serialisable_tag_context, search_type, serialisable_predicates ) )
+        
+    
+    def GetStats( self ):
+        
+        return ( len( self._keys_to_entries ), self._total_weight, self._num_hits, self._num_misses )
+        
+    
+    def NotifyContentChanged( self, content_dependency: int ):
+        
+        self._DeleteKeys( self._content_dependencies_to_keys.get( content_dependency, set() ) )
+        
+    
+    def NotifyFilesChanged( self, file_service_id: int ):
+        
+        self._DeleteKeys( self._file_service_ids_to_keys.get( file_service_id, set() ) )
+        self._DeleteKeys( self._keys_that_need_all_file_services )
+        
+    
+    def NotifyTagIdsChanged( self, tag_service_id: int, tag_ids: typing.Collection[ int ] ):
+        
+        if tag_service_id not in self._tag_service_ids_to_keys:
+            
+            return
+            
+        
+        if not isinstance( tag_ids, ( set, frozenset ) ):
+            
+            tag_ids = set( tag_ids )
+            
+        
+        keys_to_delete = []
+        
+        for key in self._tag_service_ids_to_keys[ tag_service_id ]:
+            
+            ( hash_ids, file_service_ids, tag_service_ids_to_tag_ids, content_dependencies, weight ) = self._keys_to_entries[ key ]
+            
+            search_tag_ids = tag_service_ids_to_tag_ids[ tag_service_id ]
+            
+            if search_tag_ids is None or not search_tag_ids.isdisjoint( tag_ids ):
+                
+                keys_to_delete.append( key )
+                
+            
+        
+        self._DeleteKeys( keys_to_delete )
+        
+    
+    def SetHashIds( self, key, hash_ids, file_service_ids: typing.Optional[ typing.Collection[ int ] ], tag_service_ids_to_tag_ids: typing.Dict[ int, typing.Optional[ typing.Collection[ int ] ] ], content_dependencies: typing.Collection[ int ] ):
+        
+        # file_service_ids None means any file change, and a tag service's tag_ids None means any tag change on it
+        
+        self._Delete( key )
+        
+        hash_ids = HydrusIntegerSets.SortedIntegerSet( hash_ids )
+        
+        weight = hash_ids.GetArray().nbytes + len( key ) + 1024
+        
+        if weight > self._max_weight:
+            
+            return
+            
+        
+        tag_service_ids_to_tag_ids = { tag_service_id : None if tag_ids is None else frozenset( tag_ids ) for ( tag_service_id, tag_ids ) in tag_service_ids_to_tag_ids.items() }
+        content_dependencies = frozenset( content_dependencies )
+        
+        if file_service_ids is None:
+            
+            self._keys_that_need_all_file_services.add( key )
+            
+        else:
+            
+            file_service_ids = frozenset( file_service_ids )
+            
+            for file_service_id in file_service_ids:
+                
+                self._file_service_ids_to_keys[ file_service_id ].add( key )
+                
+            
+        
+        for tag_service_id in tag_service_ids_to_tag_ids.keys():
+            
+            self._tag_service_ids_to_keys[ tag_service_id ].add( key )
+            
+        
+        for content_dependency in content_dependencies:
+            
+            self._content_dependencies_to_keys[ content_dependency ].add( key )
+            
+        
+        self._keys_to_entries[ key ] = ( hash_ids, file_service_ids, tag_service_ids_to_tag_ids, content_dependencies, weight )
+        
+        self._total_weight += weight
+        
+        while self._total_weight > self._max_weight and len( self._keys_to_entries ) > 0:
+            
+            ( oldest_key, entry ) = next( iter( self._keys_to_entries.items() ) )
+            
+            self._Delete( oldest_key )
+            
+        
+    
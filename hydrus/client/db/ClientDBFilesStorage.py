@@ -12,6 +12,7 @@ from hydrus.core import HydrusTime
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientLocation
 from hydrus.client import ClientTime
+from hydrus.client.db import ClientDBFilesSearchCache
 from hydrus.client.db import ClientDBMaster
 from hydrus.client.db import ClientDBModule
 from hydrus.client.db import ClientDBServices
@@ -232,12 +233,13 @@ class DBLocationContextBranch( DBLocationContext, ClientDBModule.ClientDBModule
     
 class ClientDBFilesStorage( ClientDBModule.ClientDBModule ):
     
-    def __init__( self, cursor: sqlite3.Cursor, cursor_transaction_wrapper: HydrusDBBase.DBCursorTransactionWrapper, modules_services: ClientDBServices.ClientDBMasterServices, modules_hashes: ClientDBMaster.ClientDBMasterHashes, modules_texts: ClientDBMaster.ClientDBMasterTexts ):
+    def __init__( self, cursor: sqlite3.Cursor, cursor_transaction_wrapper: HydrusDBBase.DBCursorTransactionWrapper, modules_services: ClientDBServices.ClientDBMasterServices, modules_hashes: ClientDBMaster.ClientDBMasterHashes, modules_texts: ClientDBMaster.ClientDBMasterTexts, file_search_results_cache: ClientDBFilesSearchCache.FileSearchResultsCache ):
         
         self._cursor_transaction_wrapper = cursor_transaction_wrapper
         self.modules_services = modules_services
         self.modules_hashes = modules_hashes
         self.modules_texts = modules_texts
+        self.file_search_results_cache = file_search_results_cache
         
         ClientDBModule.ClientDBModule.__init__( self, 'client file locations', cursor )
         
@@ -345,6 +347,8 @@ class ClientDBFilesStorage( ClientDBModule.ClientDBModule ):
         
         pending_changed = self._GetRowCount() > 0
         
+        self.file_search_results_cache.NotifyFilesChanged( service_id )
+        
         return pending_changed
         
     
@@ -377,6 +381,8 @@ class ClientDBFilesStorage( ClientDBModule.ClientDBModule ):
         
         num_deleted = self._GetRowCount()
         
+        self.file_search_results_cache.NotifyFilesChanged( service_id )
+        
         return num_deleted
         
     
@@ -399,6 +405,8 @@ class ClientDBFilesStorage( ClientDBModule.ClientDBModule ):
         
         self._Execute( 'DELETE FROM {};'.format( petitioned_files_table_name ) )
         
+        self.file_search_results_cache.NotifyFilesChanged( service_id )
+        
     
     def ClearLocalDeleteRecord( self, hash_ids = None ):
         
@@ -448,6 +456,11 @@ class ClientDBFilesStorage( ClientDBModule.ClientDBModule ):
                 
             
         
+        for service_id in service_ids_to_nums_cleared.keys():
+            
+            self.file_search_results_cache.NotifyFilesChanged( service_id )
+            
+        
         return service_ids_to_nums_cleared
         
     
@@ -510,6 +523,8 @@ class ClientDBFilesStorage( ClientDBModule.ClientDBModule ):
         self._Execute( 'DROP TABLE IF EXISTS {};'.format( pending_files_table_name ) )
         self._Execute( 'DROP TABLE IF EXISTS {};'.format( petitioned_files_table_name ) )
         
+        self.file_search_results_cache.Clear()
+        
     
     def FilterAllCurrentHashIds( self, hash_ids, just_these_service_ids = None ):
         
@@ -739,6 +754,9 @@ class ClientDBFilesStorage( ClientDBModule.ClientDBModule ):
             self._CreateIndex( table_name, columns, unique = unique )
             
         
+        # a new service shifts the umbrella domains around
+        self.file_search_results_cache.Clear()
+        
     
     def GetAPendingHashId( self, service_id ):
         
@@ -1030,6 +1048,13 @@ class ClientDBFilesStorage( ClientDBModule.ClientDBModule ):
         )
         
     
+    def GetHashIdsToTimestamps( self, service_id: int, status: int, hash_ids_table_name: str ) -> typing.Dict[ int, typing.Optional[ int ] ]:
+        
+        files_table_name = GenerateFilesTableName( service_id, status )
+        
+        return dict( self._Execute( 'SELECT hash_id, timestamp FROM {} CROSS JOIN {} USING ( hash_id );'.format( hash_ids_table_name, files_table_name ) ) )
+        
+    
     def GetImportedTimestamp( self, service_id: int, hash_id: int ):
         
         return self._GetTimestamp( service_id, HC.TIMESTAMP_TYPE_IMPORTED, hash_id )
@@ -1262,6 +1287,8 @@ class ClientDBFilesStorage( ClientDBModule.ClientDBModule ):
         
         num_new_deleted_files = self._GetRowCount()
         
+        self.file_search_results_cache.NotifyFilesChanged( service_id )
+        
         return num_new_deleted_files
         
     
@@ -1296,6 +1323,8 @@ class ClientDBFilesStorage( ClientDBModule.ClientDBModule ):
         
         pending_changed = self._GetRowCount() > 0
         
+        self.file_search_results_cache.NotifyFilesChanged( service_id )
+        
         return pending_changed
         
     
@@ -6,8 +6,10 @@ from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusDBBase
 
 from hydrus.client import ClientData
+from hydrus.client.db import ClientDBFilesSearchCache
 from hydrus.client.db import ClientDBModule
 from hydrus.client.db import ClientDBServices
+from hydrus.client.db import ClientDBTagSearchCache
 from hydrus.client.metadata import ClientTags
 
 def GenerateCombinedFilesMappingsCountsCacheTableName( tag_display_type, tag_service_id ):
@@ -48,9 +50,11 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
     
     CAN_REPOPULATE_ALL_MISSING_DATA = True
     
-    def __init__( self, cursor: sqlite3.Cursor, modules_services: ClientDBServices.ClientDBMasterServices ):
+    def __init__( self, cursor: sqlite3.Cursor, modules_services: ClientDBServices.ClientDBMasterServices, autocomplete_predicates_cache: ClientDBTagSearchCache.AutocompletePredicatesCache, file_search_results_cache: ClientDBFilesSearchCache.FileSearchResultsCache ):
         
         self.modules_services = modules_services
+        self.autocomplete_predicates_cache = autocomplete_predicates_cache
+        self.file_search_results_cache = file_search_results_cache
         
         ClientDBModule.ClientDBModule.__init__( self, 'client mappings counts', cursor )
         
@@ -158,6 +162,9 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
             self._ExecuteMany( 'UPDATE {} SET current_count = current_count + ?, pending_count = pending_count + ? WHERE tag_id = ?;'.format( counts_cache_table_name ), ( ( num_current, num_pending, tag_id ) for ( tag_id, num_current, num_pending ) in ac_cache_changes if tag_id not in new_tag_ids ) )
             
         
+        self.autocomplete_predicates_cache.NotifyTagIdsChanged( tag_service_id, [ tag_id for ( tag_id, current_delta, pending_delta ) in ac_cache_changes ], new_tags_added = len( new_tag_ids ) > 0 )
+        self.file_search_results_cache.NotifyTagIdsChanged( tag_service_id, [ tag_id for ( tag_id, current_delta, pending_delta ) in ac_cache_changes ] )
+        
         return ( new_tag_ids, new_local_tag_ids )
         
     
@@ -182,6 +189,9 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
             self._Execute( 'DELETE FROM {};'.format( table_name ) )
             
         
+        self.autocomplete_predicates_cache.Clear( tag_service_id )
+        self.file_search_results_cache.Clear()
+        
     
     def CreateTables( self, tag_display_type, file_service_id, tag_service_id, populate_from_storage = False ):
         
@@ -202,6 +212,10 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
             self._Execute( 'INSERT OR IGNORE INTO {} ( tag_id, current_count, pending_count ) SELECT tag_id, current_count, pending_count FROM {};'.format( display_table_name, storage_table_name ) )
             
         
+        # a new service will contribute to 'all known tags' results it was never registered with, so this wipes everything
+        self.autocomplete_predicates_cache.Clear()
+        self.file_search_results_cache.Clear()
+        
     
     def DropTables( self, tag_display_type, file_service_id, tag_service_id ):
         
@@ -209,6 +223,9 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
         
         self._Execute( 'DROP TABLE IF EXISTS {};'.format( table_name ) )
         
+        self.autocomplete_predicates_cache.Clear()
+        self.file_search_results_cache.Clear()
+        
     
     def FilterExistingTagIds( self, tag_display_type, file_service_id, tag_service_id, tag_ids_table_name ):
         
@@ -525,6 +542,33 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
         return tables_and_columns
         
     
+    def GetTopCountsForTags( self, tag_display_type, file_service_id, tag_service_id, temp_tag_id_table_name, include_current, include_pending, limit ):
+        
+        counts_cache_table_name = self.GetCountsCacheTableName( tag_display_type, file_service_id, tag_service_id )
+        
+        count_columns = []
+        
+        if include_current:
+            
+            count_columns.append( 'current_count' )
+            
+        
+        if include_pending:
+            
+            count_columns.append( 'pending_count' )
+            
+        
+        if len( count_columns ) == 0:
+            
+            return []
+            
+        
+        count_phrase = ' + '.join( count_columns )
+        
+        # temp tags to counts, biggest first. sqlite keeps a little bounded sorter for ORDER BY with LIMIT, so this is fast even for huge temp tables
+        return self._Execute( 'SELECT tag_id, current_count, pending_count FROM {} CROSS JOIN {} USING ( tag_id ) WHERE {} > 0 ORDER BY {} DESC LIMIT ?;'.format( temp_tag_id_table_name, counts_cache_table_name, count_phrase, count_phrase ), ( limit, ) ).fetchall()
+        
+    
     def GetTotalCurrentCount( self, tag_display_type, file_service_id, tag_service_id ):
         
         counts_cache_table_name = self.GetCountsCacheTableName( tag_display_type, file_service_id, tag_service_id )
@@ -572,5 +616,8 @@ class ClientDBMappingsCounts( ClientDBModule.ClientDBModule ):
             self._ExecuteMany( 'UPDATE {} SET current_count = current_count - ?, pending_count = pending_count - ? WHERE tag_id = ?;'.format( counts_cache_table_name ), ( ( current_delta, pending_delta, tag_id ) for ( tag_id, current_delta, pending_delta ) in ac_cache_changes if tag_id not in deleted_tag_ids ) )
             
         
+        self.autocomplete_predicates_cache.NotifyTagIdsChanged( tag_service_id, [ tag_id for ( tag_id, current_delta, pending_delta ) in ac_cache_changes ] )
+        self.file_search_results_cache.NotifyTagIdsChanged( tag_service_id, [ tag_id for ( tag_id, current_delta, pending_delta ) in ac_cache_changes ] )
+        
         return ( deleted_tag_ids, deleted_local_tag_ids )
         
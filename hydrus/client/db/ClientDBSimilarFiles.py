@@ -3,6 +3,8 @@ import random
 import sqlite3
 import typing
 
+import numpy
+
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusDBBase
@@ -14,6 +16,9 @@ from hydrus.client.db import ClientDBFilesStorage
 from hydrus.client.db import ClientDBModule
 from hydrus.client.db import ClientDBServices
 
+# bits set in each byte value, so we can popcount a whole xored phash array with one lookup
+BYTE_POPCOUNTS = numpy.array( [ bin( i ).count( '1' ) for i in range( 256 ) ], dtype = numpy.uint8 )
+
 class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
     
     def __init__( self, cursor: sqlite3.Cursor, modules_services: ClientDBServices.ClientDBMasterServices, modules_files_storage: ClientDBFilesStorage.ClientDBFilesStorage ):
@@ -784,6 +789,76 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         self._ExecuteMany( 'UPDATE shape_search_cache SET searched_distance = NULL WHERE hash_id = ?;', ( ( hash_id, ) for hash_id in hash_ids ) )
         
     
+    def SearchCandidates( self, search_pixel_hash_ids: typing.Collection[ int ], search_perceptual_hashes: typing.Collection[ bytes ], max_hamming_distance: int, candidate_hash_ids: typing.Collection[ int ] ) -> typing.List:
+        
+        # the other end of the vptree. when the rest of the search has already got us down to a few thousand files, it is faster to load all their phashes and check them directly
+        
+        similar_hash_ids_to_distances = {}
+        
+        if len( candidate_hash_ids ) == 0:
+            
+            return []
+            
+        
+        with self._MakeTemporaryIntegerTable( candidate_hash_ids, 'hash_id' ) as temp_table_name:
+            
+            if len( search_pixel_hash_ids ) > 0:
+                
+                search_pixel_hash_ids = set( search_pixel_hash_ids )
+                
+                for ( hash_id, pixel_hash_id ) in self._Execute( f'SELECT hash_id, pixel_hash_id FROM {temp_table_name} CROSS JOIN pixel_hash_map USING ( hash_id );' ).fetchall():
+                    
+                    if pixel_hash_id in search_pixel_hash_ids:
+                        
+                        similar_hash_ids_to_distances[ hash_id ] = 0
+                        
+                    
+                
+            
+            if len( search_perceptual_hashes ) > 0:
+                
+                # a file can have several phashes, so hash_ids may repeat here
+                hash_ids_and_perceptual_hashes = [ ( hash_id, perceptual_hash ) for ( hash_id, perceptual_hash ) in self._Execute( f'SELECT hash_id, phash FROM {temp_table_name} CROSS JOIN shape_perceptual_hash_map USING ( hash_id ) CROSS JOIN shape_perceptual_hashes USING ( phash_id );' ) if len( perceptual_hash ) == 8 ]
+                
+            else:
+                
+                hash_ids_and_perceptual_hashes = []
+                
+            
+        
+        search_perceptual_hashes = [ search_perceptual_hash for search_perceptual_hash in search_perceptual_hashes if len( search_perceptual_hash ) == 8 ]
+        
+        if len( hash_ids_and_perceptual_hashes ) > 0 and len( search_perceptual_hashes ) > 0:
+            
+            hash_ids = numpy.fromiter( ( hash_id for ( hash_id, perceptual_hash ) in hash_ids_and_perceptual_hashes ), dtype = numpy.int64, count = len( hash_ids_and_perceptual_hashes ) )
+            
+            perceptual_hash_bytes = numpy.frombuffer( b''.join( ( perceptual_hash for ( hash_id, perceptual_hash ) in hash_ids_and_perceptual_hashes ) ), dtype = numpy.uint8 ).reshape( ( -1, 8 ) )
+            
+            distances = None
+            
+            for search_perceptual_hash in search_perceptual_hashes:
+                
+                search_bytes = numpy.frombuffer( search_perceptual_hash, dtype = numpy.uint8 )
+                
+                search_distances = BYTE_POPCOUNTS[ numpy.bitwise_xor( perceptual_hash_bytes, search_bytes ) ].sum( axis = 1, dtype = numpy.uint8 )
+                
+                distances = search_distances if distances is None else numpy.minimum( distances, search_distances )
+                
+            
+            mask = distances <= max_hamming_distance
+            
+            for ( hash_id, distance ) in zip( hash_ids[ mask ].tolist(), distances[ mask ].tolist() ):
+                
+                if hash_id not in similar_hash_ids_to_distances or distance < similar_hash_ids_to_distances[ hash_id ]:
+                    
+                    similar_hash_ids_to_distances[ hash_id ] = distance
+                    
+                
+            
+        
+        return list( similar_hash_ids_to_distances.items() )
+        
+    
     def SearchFile( self, hash_id: int, max_hamming_distance: int ) -> typing.List:
         
         similar_hash_ids_and_distances = [ ( hash_id, 0 ) ]
@@ -815,6 +890,34 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         return similar_hash_ids_and_distances
         
     
+    def SearchFilesInCandidates( self, hash_ids: typing.Collection[ int ], max_hamming_distance: int, candidate_hash_ids: typing.Collection[ int ] ) -> typing.List:
+        
+        # SearchFile, but over a candidate scan
+        
+        similar_hash_ids_and_distances = [ ( hash_id, 0 ) for hash_id in hash_ids ]
+        
+        search_pixel_hash_ids = set()
+        search_perceptual_hashes = set()
+        
+        for hash_id in hash_ids:
+            
+            pixel_hash_id = self._GetPixelHashId( hash_id )
+            
+            if pixel_hash_id is not None:
+                
+                search_pixel_hash_ids.add( pixel_hash_id )
+                
+            
+            search_perceptual_hashes.update( self._GetPerceptualHashes( self._GetPerceptualHashIdsFromHashId( hash_id ) ) )
+            
+        
+        similar_hash_ids_and_distances.extend( self.SearchCandidates( search_pixel_hash_ids, search_perceptual_hashes, max_hamming_distance, candidate_hash_ids ) )
+        
+        similar_hash_ids_and_distances = HydrusData.DedupeList( similar_hash_ids_and_distances )
+        
+        return similar_hash_ids_and_distances
+        
+    
     def SearchPixelHashes( self, search_pixel_hash_ids: typing.Collection[ int ] ):
         
         similar_hash_ids_and_distances = []
@@ -115,6 +115,73 @@ class ClientDBTagParents( ClientDBModule.ClientDBModule ):
         return self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
         
     
+    def _GetLookupRows( self, display_type, tag_service_id, tag_ids ) -> typing.Set[ typing.Tuple[ int, int ] ]:
+        
+        cache_tag_parents_lookup_table_name = GenerateTagParentsLookupCacheTableName( display_type, tag_service_id )
+        
+        with self._MakeTemporaryIntegerTable( tag_ids, 'tag_id' ) as temp_table_name:
+            
+            # keep these separate--older sqlite can't do cross join to an OR ON
+            
+            rows = set( self._Execute( 'SELECT child_tag_id, ancestor_tag_id FROM {} CROSS JOIN {} ON ( child_tag_id = tag_id );'.format( temp_table_name, cache_tag_parents_lookup_table_name ) ) )
+            rows.update( self._Execute( 'SELECT child_tag_id, ancestor_tag_id FROM {} CROSS JOIN {} ON ( ancestor_tag_id = tag_id );'.format( temp_table_name, cache_tag_parents_lookup_table_name ) ) )
+            
+        
+        return rows
+        
+    
+    def _NotifyIdealRowsChanged( self, tag_service_id, ideal_rows_added, ideal_rows_removed ):
+        
+        # keep the cached application status in step with the ideal table, so we don't have to reload both whole tables on the next status check
+        
+        if tag_service_id not in self._service_ids_to_display_application_status:
+            
+            return
+            
+        
+        ( parent_rows_to_add, parent_rows_to_remove, num_actual_rows, num_ideal_rows ) = self._service_ids_to_display_application_status[ tag_service_id ]
+        
+        cache_actual_tag_parents_lookup_table_name = GenerateTagParentsLookupCacheTableName( ClientTags.TAG_DISPLAY_ACTUAL, tag_service_id )
+        
+        ideal_rows_added = set( ideal_rows_added )
+        ideal_rows_removed = set( ideal_rows_removed )
+        
+        child_tag_ids = { row[0] for row in itertools.chain( ideal_rows_added, ideal_rows_removed ) }
+        
+        with self._MakeTemporaryIntegerTable( child_tag_ids, 'child_tag_id' ) as temp_table_name:
+            
+            actual_rows = set( self._Execute( 'SELECT child_tag_id, ancestor_tag_id FROM {} CROSS JOIN {} USING ( child_tag_id );'.format( temp_table_name, cache_actual_tag_parents_lookup_table_name ) ) )
+            
+        
+        for row in ideal_rows_removed:
+            
+            if row in actual_rows:
+                
+                parent_rows_to_remove.add( row )
+                
+            else:
+                
+                parent_rows_to_add.discard( row )
+                
+            
+        
+        for row in ideal_rows_added:
+            
+            if row in actual_rows:
+                
+                parent_rows_to_remove.discard( row )
+                
+            else:
+                
+                parent_rows_to_add.add( row )
+                
+            
+        
+        num_ideal_rows += len( ideal_rows_added ) - len( ideal_rows_removed )
+        
+        self._service_ids_to_display_application_status[ tag_service_id ] = ( parent_rows_to_add, parent_rows_to_remove, num_actual_rows, num_ideal_rows )
+        
+    
     def _RepairRepopulateTables( self, repopulate_table_names, cursor_transaction_wrapper: HydrusDBBase.DBCursorTransactionWrapper ):
         
         for service_id in self._GetServiceIdsWeGenerateDynamicTablesFor():
@@ -774,10 +841,6 @@ class ClientDBTagParents( ClientDBModule.ClientDBModule ):
             
             # this should now contain all possible tag_ids that could be in tag parents right now related to what we were given
             
-            self._ExecuteMany( 'DELETE FROM {} WHERE child_tag_id = ? OR ancestor_tag_id = ?;'.format( cache_tag_parents_lookup_table_name ), ( ( tag_id, tag_id ) for tag_id in tag_ids_to_clear_and_regen ) )
-            
-            # we wipe them
-            
             applicable_tag_service_ids = self.GetApplicableServiceIds( tag_service_id )
             
             tps = ClientTagsHandling.TagParentsStructure()
@@ -810,12 +873,23 @@ class ClientDBTagParents( ClientDBModule.ClientDBModule ):
                     
                 
             
-            self._ExecuteMany( 'INSERT OR IGNORE INTO {} ( child_tag_id, ancestor_tag_id ) VALUES ( ?, ? );'.format( cache_tag_parents_lookup_table_name ), tps.IterateDescendantAncestorPairs() )
+            # the chains are still worked out from scratch, but rather than wiping their rows and writing them all again, we only touch the rows that changed
+            # removal covers the same rows the old wipe did--everything touching what we were asked to regen. siblings use the same scope
+            # sibling collapse can join parent chains we did not fetch, so this must not widen to the tags in after_rows
             
-            if tag_service_id in self._service_ids_to_display_application_status:
-                
-                del self._service_ids_to_display_application_status[ tag_service_id ]
-                
+            after_rows = set( tps.IterateDescendantAncestorPairs() )
+            
+            tag_ids_in_scope = set( tag_ids_to_clear_and_regen )
+            tag_ids_in_scope.update( itertools.chain.from_iterable( after_rows ) )
+            
+            previous_rows = self._GetLookupRows( ClientTags.TAG_DISPLAY_IDEAL, tag_service_id, tag_ids_in_scope )
+            
+            ( rows_to_add, rows_to_remove ) = ClientTagsHandling.GetLookupRowsDiff( previous_rows, after_rows, tag_ids_to_clear_and_regen )
+            
+            self._ExecuteMany( 'DELETE FROM {} WHERE child_tag_id = ? AND ancestor_tag_id = ?;'.format( cache_tag_parents_lookup_table_name ), rows_to_remove )
+            self._ExecuteMany( 'INSERT OR IGNORE INTO {} ( child_tag_id, ancestor_tag_id ) VALUES ( ?, ? );'.format( cache_tag_parents_lookup_table_name ), rows_to_add )
+            
+            self._NotifyIdealRowsChanged( tag_service_id, rows_to_add, rows_to_remove )
             
         
     
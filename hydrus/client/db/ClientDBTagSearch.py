@@ -1,4 +1,5 @@
 import collections
+import heapq
 import sqlite3
 import time
 import typing
@@ -13,12 +14,14 @@ from hydrus.core import HydrusTags
 from hydrus.core import HydrusTime
 
 from hydrus.client import ClientConstants as CC
+from hydrus.client import ClientData
 from hydrus.client.db import ClientDBMappingsCounts
 from hydrus.client.db import ClientDBMappingsStorage
 from hydrus.client.db import ClientDBMaster
 from hydrus.client.db import ClientDBModule
 from hydrus.client.db import ClientDBServices
 from hydrus.client.db import ClientDBTagDisplay
+from hydrus.client.db import ClientDBTagSearchCache
 from hydrus.client.db import ClientDBTagSiblings
 from hydrus.client.metadata import ClientTags
 from hydrus.client.search import ClientSearch
@@ -27,6 +30,22 @@ from hydrus.client.search import ClientSearch
 MIN_CACHED_INTEGER = - ( 2 ** 63 )
 MAX_CACHED_INTEGER = ( 2 ** 63 ) - 1
 
+# the trigram tokenizer arrived in SQLite 3.34, and some builds don't have fts5 at all
+try:
+    
+    db = sqlite3.connect( ':memory:' )
+    
+    db.execute( 'CREATE VIRTUAL TABLE trigram_test USING fts5( subtag, tokenize = \'trigram\' );' )
+    
+    db.close()
+    
+    SQLITE_TRIGRAM_OK = True
+    
+except:
+    
+    SQLITE_TRIGRAM_OK = False
+    
+
 def CanCacheInteger( num ):
     
     return MIN_CACHED_INTEGER <= num <= MAX_CACHED_INTEGER
@@ -54,6 +73,14 @@ def GenerateCombinedFilesSubtagsFTS4TableName( tag_service_id ):
     
     return subtags_fts4_table_name
     
+def GenerateCombinedFilesSubtagsTrigramTableName( tag_service_id ):
+    
+    name = 'combined_files_subtags_trigram_cache'
+    
+    subtags_trigram_table_name = 'external_caches.{}_{}'.format( name, tag_service_id )
+    
+    return subtags_trigram_table_name
+    
 def GenerateCombinedFilesSubtagsSearchableMapTableName( tag_service_id ):
     
     name = 'combined_files_subtags_searchable_map_cache'
@@ -108,6 +135,16 @@ def GenerateSpecificSubtagsSearchableMapTableName( file_service_id, tag_service_
     
     return subtags_searchable_map_table_name
     
+def GenerateSpecificSubtagsTrigramTableName( file_service_id, tag_service_id ):
+    
+    name = 'specific_subtags_trigram_cache'
+    
+    suffix = '{}_{}'.format( file_service_id, tag_service_id )
+    
+    subtags_trigram_table_name = 'external_caches.{}_{}'.format( name, suffix )
+    
+    return subtags_trigram_table_name
+    
 def GenerateSpecificTagsTableName( file_service_id, tag_service_id ):
     
     name = 'specific_tags_cache'
@@ -130,24 +167,184 @@ def WildcardHasFTS4SearchableCharacters( wildcard: str ):
             
         
     
+    return False
+    
+def WildcardHasTrigramSearchableCharacters( wildcard: str ):
+    
+    # the trigram index can only help a LIKE if there are at least three literal characters in a row. '_' is a LIKE wildcard, so it breaks a run
+    
+    run = 0
+    
+    for c in wildcard:
+        
+        if c in ( '*', '_', '%' ):
+            
+            run = 0
+            
+        else:
+            
+            run += 1
+            
+            if run >= 3:
+                
+                return True
+                
+            
+        
+    
     return False
     
 class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
     
     CAN_REPOPULATE_ALL_MISSING_DATA = True
     
-    def __init__( self, cursor: sqlite3.Cursor, modules_services: ClientDBServices.ClientDBMasterServices, modules_tags: ClientDBMaster.ClientDBMasterTags, modules_tag_display: ClientDBTagDisplay.ClientDBTagDisplay, modules_tag_siblings: ClientDBTagSiblings.ClientDBTagSiblings, modules_mappings_counts: ClientDBMappingsCounts.ClientDBMappingsCounts ):
+    def __init__( self, cursor: sqlite3.Cursor, modules_services: ClientDBServices.ClientDBMasterServices, modules_tags: ClientDBMaster.ClientDBMasterTags, modules_tag_display: ClientDBTagDisplay.ClientDBTagDisplay, modules_tag_siblings: ClientDBTagSiblings.ClientDBTagSiblings, modules_mappings_counts: ClientDBMappingsCounts.ClientDBMappingsCounts, autocomplete_predicates_cache: ClientDBTagSearchCache.AutocompletePredicatesCache ):
         
         self.modules_services = modules_services
         self.modules_tags = modules_tags
         self.modules_tag_display = modules_tag_display
         self.modules_tag_siblings = modules_tag_siblings
         self.modules_mappings_counts = modules_mappings_counts
+        self.autocomplete_predicates_cache = autocomplete_predicates_cache
         
         ClientDBModule.ClientDBModule.__init__( self, 'client tag search', cursor )
         
         self._missing_tag_search_service_pairs = set()
         
+        # the trigram index is optional, so its tables are not in the generation dicts. we remember which exist, and which were dropped for a regen
+        self._subtags_trigram_table_names_to_exists = {}
+        self._subtags_trigram_table_names_to_regenerate = set()
+        
+    
+    def _GetAutocompletePredicatesTopK( self, tag_display_type, display_tag_service_id, leaves_and_tag_ids, include_current, include_pending, inclusive, zero_count_ok, limit, job_key = None ):
+        
+        # rather than fetching counts and building predicates for every matching tag, we ask each leaf for its biggest counts and merge those
+        # the merged count is the best current plus the best pending across leaves, so a tag that is in no leaf's top n can be no bigger than the sum of the two biggest leaf cutoffs
+        # once our kth merged count reaches that, nothing we have not seen can beat it and we can stop. if not, we ask for more
+        
+        def get_count( ids_to_count_item ):
+            
+            ( tag_id, ( current_min, current_max, pending_min, pending_max ) ) = ids_to_count_item
+            
+            return current_min + pending_min
+            
+        
+        fetch_limit = limit
+        
+        while True:
+            
+            candidate_tag_ids = set()
+            leaf_cutoffs = []
+            
+            for ( leaf, tag_ids ) in leaves_and_tag_ids:
+                
+                if len( tag_ids ) == 0:
+                    
+                    continue
+                    
+                
+                with self._MakeTemporaryIntegerTable( tag_ids, 'tag_id' ) as temp_tag_id_table_name:
+                    
+                    rows = self.modules_mappings_counts.GetTopCountsForTags( tag_display_type, leaf.file_service_id, leaf.tag_service_id, temp_tag_id_table_name, include_current, include_pending, fetch_limit )
+                    
+                
+                candidate_tag_ids.update( ( tag_id for ( tag_id, current_count, pending_count ) in rows ) )
+                
+                if len( rows ) == fetch_limit:
+                    
+                    ( tag_id, current_count, pending_count ) = rows[-1]
+                    
+                    leaf_cutoffs.append( ( current_count if include_current else 0 ) + ( pending_count if include_pending else 0 ) )
+                    
+                
+                if job_key is not None and job_key.IsCancelled():
+                    
+                    return []
+                    
+                
+            
+            # now get the proper merged counts for everything any leaf put forward
+            
+            ids_to_count = {}
+            
+            for ( leaf, tag_ids ) in leaves_and_tag_ids:
+                
+                leaf_candidate_tag_ids = candidate_tag_ids.intersection( tag_ids )
+                
+                leaf_ids_to_count = self.modules_mappings_counts.GetCounts( tag_display_type, leaf.tag_service_id, leaf.file_service_id, leaf_candidate_tag_ids, include_current, include_pending, job_key = job_key )
+                
+                for ( tag_id, ( current_min, current_max, pending_min, pending_max ) ) in leaf_ids_to_count.items():
+                    
+                    if tag_id in ids_to_count:
+                        
+                        ( existing_current_min, existing_current_max, existing_pending_min, existing_pending_max ) = ids_to_count[ tag_id ]
+                        
+                        ( current_min, current_max ) = ClientData.MergeCounts( existing_current_min, existing_current_max, current_min, current_max )
+                        ( pending_min, pending_max ) = ClientData.MergeCounts( existing_pending_min, existing_pending_max, pending_min, pending_max )
+                        
+                    
+                    ids_to_count[ tag_id ] = ( current_min, current_max, pending_min, pending_max )
+                    
+                
+            
+            top_ids_to_count_items = heapq.nlargest( limit, ids_to_count.items(), key = get_count )
+            
+            if len( leaf_cutoffs ) == 0:
+                
+                # every leaf gave us everything it had
+                
+                break
+                
+            
+            leaf_cutoffs.sort( reverse = True )
+            
+            if include_current and include_pending:
+                
+                unseen_count_bound = sum( leaf_cutoffs[ : 2 ] )
+                
+            else:
+                
+                unseen_count_bound = leaf_cutoffs[0]
+                
+            
+            if len( top_ids_to_count_items ) == limit and get_count( top_ids_to_count_items[-1] ) >= unseen_count_bound:
+                
+                break
+                
+            
+            fetch_limit *= 4
+            
+        
+        top_ids_to_count = dict( top_ids_to_count_items )
+        
+        if zero_count_ok and len( top_ids_to_count ) < limit:
+            
+            for ( leaf, tag_ids ) in leaves_and_tag_ids:
+                
+                for tag_id in tag_ids:
+                    
+                    if len( top_ids_to_count ) >= limit:
+                        
+                        break
+                        
+                    
+                    if tag_id not in top_ids_to_count:
+                        
+                        top_ids_to_count[ tag_id ] = ( 0, 0, 0, 0 )
+                        
+                    
+                
+            
+        
+        if len( top_ids_to_count ) == 0:
+            
+            return []
+            
+        
+        predicates = self.modules_tag_display.GeneratePredicatesFromTagIdsAndCounts( tag_display_type, display_tag_service_id, top_ids_to_count, inclusive, job_key = job_key )
+        
+        return predicates
+        
     
     def _GetServiceIndexGenerationDictSingle( self, file_service_id, tag_service_id ) -> dict:
         
@@ -293,6 +490,9 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                 subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, tag_service_id )
                 subtags_searchable_map_table_name = self.GetSubtagsSearchableMapTableName( file_service_id, tag_service_id )
                 integer_subtags_table_name = self.GetIntegerSubtagsTableName( file_service_id, tag_service_id )
+                subtags_trigram_table_name = self.GetSubtagsTrigramTableName( file_service_id, tag_service_id )
+                
+                has_subtags_trigram_index = self.HasSubtagsTrigramIndex( file_service_id, tag_service_id )
                 
                 for ( subtag_id, subtag ) in subtag_ids_and_subtags:
                     
@@ -309,6 +509,11 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                     
                     self._Execute( 'INSERT OR IGNORE INTO {} ( docid, subtag ) VALUES ( ?, ? );'.format( subtags_fts4_table_name ), ( subtag_id, searchable_subtag ) )
                     
+                    if has_subtags_trigram_index:
+                        
+                        self._Execute( 'INSERT OR REPLACE INTO {} ( rowid, subtag ) VALUES ( ?, ? );'.format( subtags_trigram_table_name ), ( subtag_id, searchable_subtag ) )
+                        
+                    
                     if subtag.isdecimal():
                         
                         try:
@@ -389,6 +594,13 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                 self._ExecuteMany( 'DELETE FROM {} WHERE subtag_id = ?;'.format( subtags_searchable_map_table_name ), ( ( subtag_id, ) for subtag_id in deletee_subtag_ids ) )
                 self._ExecuteMany( 'DELETE FROM {} WHERE subtag_id = ?;'.format( integer_subtags_table_name ), ( ( subtag_id, ) for subtag_id in deletee_subtag_ids ) )
                 
+                if self.HasSubtagsTrigramIndex( file_service_id, tag_service_id ):
+                    
+                    subtags_trigram_table_name = self.GetSubtagsTrigramTableName( file_service_id, tag_service_id )
+                    
+                    self._ExecuteMany( 'DELETE FROM {} WHERE rowid = ?;'.format( subtags_trigram_table_name ), ( ( subtag_id, ) for subtag_id in deletee_subtag_ids ) )
+                    
+                
             
         
     
@@ -410,6 +622,25 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         
         self._Execute( 'DROP TABLE IF EXISTS {};'.format( integer_subtags_table_name ) )
         
+        if self.HasSubtagsTrigramIndex( file_service_id, tag_service_id ):
+            
+            # if this is a regen, the Generate call that follows will make it again
+            self._subtags_trigram_table_names_to_regenerate.add( self.GetSubtagsTrigramTableName( file_service_id, tag_service_id ) )
+            
+            self.DropSubtagsTrigramIndex( file_service_id, tag_service_id )
+            
+        
+        self.autocomplete_predicates_cache.Clear()
+        
+    
+    def DropSubtagsTrigramIndex( self, file_service_id, tag_service_id ):
+        
+        subtags_trigram_table_name = self.GetSubtagsTrigramTableName( file_service_id, tag_service_id )
+        
+        self._Execute( 'DROP TABLE IF EXISTS {};'.format( subtags_trigram_table_name ) )
+        
+        self._subtags_trigram_table_names_to_exists[ subtags_trigram_table_name ] = False
+        
     
     def FilterExistingTagIds( self, file_service_id, tag_service_id, tag_ids_table_name ):
         
@@ -434,6 +665,38 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
             self._CreateIndex( table_name, columns, unique = unique )
             
         
+        subtags_trigram_table_name = self.GetSubtagsTrigramTableName( file_service_id, tag_service_id )
+        
+        if subtags_trigram_table_name in self._subtags_trigram_table_names_to_regenerate:
+            
+            self._subtags_trigram_table_names_to_regenerate.discard( subtags_trigram_table_name )
+            
+            # this will be filled as the tags are added back in
+            self.GenerateSubtagsTrigramIndex( file_service_id, tag_service_id )
+            
+        
+        self.autocomplete_predicates_cache.Clear()
+        
+    
+    def GenerateSubtagsTrigramIndex( self, file_service_id, tag_service_id ):
+        
+        if not SQLITE_TRIGRAM_OK:
+            
+            raise Exception( 'Sorry, your SQLite does not support the fts5 trigram tokenizer, so it cannot make this index!' )
+            
+        
+        self.DropSubtagsTrigramIndex( file_service_id, tag_service_id )
+        
+        subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, tag_service_id )
+        subtags_trigram_table_name = self.GetSubtagsTrigramTableName( file_service_id, tag_service_id )
+        
+        self._Execute( 'CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5( subtag, tokenize = \'trigram\' );'.format( subtags_trigram_table_name ) )
+        
+        # the fts4 table already holds the searchable subtags, so we can copy them straight across
+        self._Execute( 'INSERT OR REPLACE INTO {} ( rowid, subtag ) SELECT docid, subtag FROM {};'.format( subtags_trigram_table_name, subtags_fts4_table_name ) )
+        
+        self._subtags_trigram_table_names_to_exists[ subtags_trigram_table_name ] = True
+        
     
     def GetAllTagIds( self, leaf: ClientDBServices.FileSearchContextLeaf, job_key = None ):
         
@@ -460,7 +723,8 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         inclusive = True,
         search_namespaces_into_full_tags = False,
         zero_count_ok = False,
-        job_key = None
+        job_key = None,
+        limit = None
     ):
         
         # TODO: So I think I should interleave this, perhaps with the SearchLeaf object, or just as GetHashIdsFromTag now does, for each tag service. don't throw 'all known tags' down to lower methods
@@ -496,7 +760,20 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         include_current = tag_context.include_current_tags
         include_pending = tag_context.include_pending_tags
         
-        all_predicates = []
+        cache_key = self.autocomplete_predicates_cache.GetKey( tag_display_type, file_search_context, search_text, exact_match, inclusive, search_namespaces_into_full_tags, zero_count_ok, limit )
+        
+        predicates = self.autocomplete_predicates_cache.GetPredicates( cache_key )
+        
+        if predicates is not None:
+            
+            return predicates
+            
+        
+        # we remember what we looked at so the cache can be invalidated by any count or display change to these tags
+        cache_tag_service_ids = { display_tag_service_id }
+        cache_candidate_tag_ids = set()
+        
+        leaves_and_tag_ids = []
         
         file_search_context_branch = self.modules_services.GetFileSearchContextBranch( file_search_context )
         
@@ -518,36 +795,58 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                 return []
                 
             
-            domain_is_cross_referenced = leaf.file_service_id != self.modules_services.combined_deleted_file_service_id
+            cache_tag_service_ids.add( leaf.tag_service_id )
+            cache_candidate_tag_ids.update( tag_ids )
+            
+            leaves_and_tag_ids.append( ( leaf, tag_ids ) )
+            
+        
+        # the deleted files domain is not cross-referenced, so its min counts are all zero and we can't rank on them. just do everything
+        all_domains_cross_referenced = True not in ( leaf.file_service_id == self.modules_services.combined_deleted_file_service_id for ( leaf, tag_ids ) in leaves_and_tag_ids )
+        
+        if limit is not None and all_domains_cross_referenced:
             
-            for group_of_tag_ids in HydrusData.SplitIteratorIntoChunks( tag_ids, 1000 ):
+            predicates = self._GetAutocompletePredicatesTopK( tag_display_type, display_tag_service_id, leaves_and_tag_ids, include_current, include_pending, inclusive, zero_count_ok, limit, job_key = job_key )
+            
+        else:
+            
+            all_predicates = []
+            
+            for ( leaf, tag_ids ) in leaves_and_tag_ids:
                 
-                if job_key is not None and job_key.IsCancelled():
+                domain_is_cross_referenced = leaf.file_service_id != self.modules_services.combined_deleted_file_service_id
+                
+                for group_of_tag_ids in HydrusData.SplitIteratorIntoChunks( tag_ids, 1000 ):
                     
-                    return []
+                    if job_key is not None and job_key.IsCancelled():
+                        
+                        return []
+                        
                     
-                
-                ids_to_count = self.modules_mappings_counts.GetCounts( tag_display_type, leaf.tag_service_id, leaf.file_service_id, group_of_tag_ids, include_current, include_pending, domain_is_cross_referenced = domain_is_cross_referenced, zero_count_ok = zero_count_ok, job_key = job_key )
-                
-                if len( ids_to_count ) == 0:
+                    ids_to_count = self.modules_mappings_counts.GetCounts( tag_display_type, leaf.tag_service_id, leaf.file_service_id, group_of_tag_ids, include_current, include_pending, domain_is_cross_referenced = domain_is_cross_referenced, zero_count_ok = zero_count_ok, job_key = job_key )
                     
-                    continue
+                    if len( ids_to_count ) == 0:
+                        
+                        continue
+                        
+                    
+                    #
+                    
+                    predicates = self.modules_tag_display.GeneratePredicatesFromTagIdsAndCounts( tag_display_type, display_tag_service_id, ids_to_count, inclusive, job_key = job_key )
+                    
+                    all_predicates.extend( predicates )
                     
-                
-                #
-                
-                predicates = self.modules_tag_display.GeneratePredicatesFromTagIdsAndCounts( tag_display_type, display_tag_service_id, ids_to_count, inclusive, job_key = job_key )
-                
-                all_predicates.extend( predicates )
                 
             
-            if job_key is not None and job_key.IsCancelled():
-                
-                return []
-                
+            predicates = ClientSearch.MergePredicates( all_predicates )
             
         
-        predicates = ClientSearch.MergePredicates( all_predicates )
+        if job_key is not None and job_key.IsCancelled():
+            
+            return []
+            
+        
+        self.autocomplete_predicates_cache.SetPredicates( cache_key, predicates, cache_tag_service_ids, cache_candidate_tag_ids )
         
         return predicates
         
@@ -841,8 +1140,19 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                         # a potential optimisation here, in future, is to store fts4 of subtags reversed, then for '*amus', we can just search that reverse cache for 'suma*'
                         # and this would only double the size of the fts4 cache, the largest cache in the whole db! a steal!
                         # it also would not fix '*amu*', but with some cleverness could speed up '*amus ar*'
+                        # if the user has made the optional trigram index, it can do '*amu*' and '*_dress' for any run of three or more characters
+                        
+                        if WildcardHasTrigramSearchableCharacters( subtag_wildcard ) and self.HasSubtagsTrigramIndex( file_service_id, search_tag_service_id ):
+                            
+                            subtags_trigram_table_name = self.GetSubtagsTrigramTableName( file_service_id, search_tag_service_id )
+                            
+                            query = 'SELECT rowid FROM {} WHERE subtag LIKE ?;'.format( subtags_trigram_table_name )
+                            
+                        else:
+                            
+                            query = 'SELECT docid FROM {} WHERE subtag LIKE ?;'.format( subtags_fts4_table_name )
+                            
                         
-                        query = 'SELECT docid FROM {} WHERE subtag LIKE ?;'.format( subtags_fts4_table_name )
                         query_args = ( like_param, )
                         
                     else:
@@ -956,8 +1266,19 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
                         # a potential optimisation here, in future, is to store fts4 of subtags reversed, then for '*amus', we can just search that reverse cache for 'suma*'
                         # and this would only double the size of the fts4 cache, the largest cache in the whole db! a steal!
                         # it also would not fix '*amu*', but with some cleverness could speed up '*amus ar*'
+                        # if the user has made the optional trigram index, it can do '*amu*' and '*_dress' for any run of three or more characters
+                        
+                        if WildcardHasTrigramSearchableCharacters( subtag_wildcard ) and self.HasSubtagsTrigramIndex( file_service_id, search_tag_service_id ):
+                            
+                            subtags_trigram_table_name = self.GetSubtagsTrigramTableName( file_service_id, search_tag_service_id )
+                            
+                            query = 'SELECT rowid FROM {} WHERE subtag LIKE ?;'.format( subtags_trigram_table_name )
+                            
+                        else:
+                            
+                            query = 'SELECT docid FROM {} WHERE subtag LIKE ?;'.format( subtags_fts4_table_name )
+                            
                         
-                        query = 'SELECT docid FROM {} WHERE subtag LIKE ?;'.format( subtags_fts4_table_name )
                         query_args = ( like_param, )
                         
                     else:
@@ -1061,6 +1382,25 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         return subtags_searchable_map_table_name
         
     
+    def GetSubtagsTrigramTableName( self, file_service_id, tag_service_id ):
+        
+        if file_service_id == self.modules_services.combined_file_service_id:
+            
+            subtags_trigram_table_name = GenerateCombinedFilesSubtagsTrigramTableName( tag_service_id )
+            
+        else:
+            
+            if self.modules_services.FileServiceIsCoveredByAllLocalFiles( file_service_id ):
+                
+                file_service_id = self.modules_services.combined_local_file_service_id
+                
+            
+            subtags_trigram_table_name = GenerateSpecificSubtagsTrigramTableName( file_service_id, tag_service_id )
+            
+        
+        return subtags_trigram_table_name
+        
+    
     def GetTablesAndColumnsThatUseDefinitions( self, content_type: int ) -> typing.List[ typing.Tuple[ str, str ] ]:
         
         tables_and_columns = []
@@ -1290,6 +1630,19 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         return tags_table_name
         
     
+    def HasSubtagsTrigramIndex( self, file_service_id, tag_service_id ):
+        
+        subtags_trigram_table_name = self.GetSubtagsTrigramTableName( file_service_id, tag_service_id )
+        
+        if subtags_trigram_table_name not in self._subtags_trigram_table_names_to_exists:
+            
+            # if the user moved to a SQLite without the trigram tokenizer, we can't touch the table, so we pretend it isn't there
+            self._subtags_trigram_table_names_to_exists[ subtags_trigram_table_name ] = SQLITE_TRIGRAM_OK and self._TableExists( subtags_trigram_table_name )
+            
+        
+        return self._subtags_trigram_table_names_to_exists[ subtags_trigram_table_name ]
+        
+    
     def HasTag( self, file_service_id, tag_service_id, tag_id ):
         
         tags_table_name = self.GetTagsTableName( file_service_id, tag_service_id )
@@ -1350,6 +1703,11 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
         subtags_fts4_table_name = self.GetSubtagsFTS4TableName( file_service_id, tag_service_id )
         subtags_searchable_map_table_name = self.GetSubtagsSearchableMapTableName( file_service_id, tag_service_id )
         integer_subtags_table_name = self.GetIntegerSubtagsTableName( file_service_id, tag_service_id )
+        subtags_trigram_table_name = self.GetSubtagsTrigramTableName( file_service_id, tag_service_id )
+        
+        has_subtags_trigram_index = self.HasSubtagsTrigramIndex( file_service_id, tag_service_id )
+        
+        self.autocomplete_predicates_cache.Clear( tag_service_id )
         
         missing_subtag_ids = self._STS( self._Execute( 'SELECT subtag_id FROM {} EXCEPT SELECT docid FROM {};'.format( tags_table_name, subtags_fts4_table_name ) ) )
         
@@ -1377,6 +1735,11 @@ class ClientDBTagSearch( ClientDBModule.ClientDBModule ):
             
             self._Execute( 'INSERT OR IGNORE INTO {} ( docid, subtag ) VALUES ( ?, ? );'.format( subtags_fts4_table_name ), ( subtag_id, searchable_subtag ) )
             
+            if has_subtags_trigram_index:
+                
+                self._Execute( 'INSERT OR REPLACE INTO {} ( rowid, subtag ) VALUES ( ?, ? );'.format( subtags_trigram_table_name ), ( subtag_id, searchable_subtag ) )
+                
+            
             if subtag.isdecimal():
                 
                 try:
@@ -0,0 +1,211 @@
+import collections
+import copy
+import typing
+
+from hydrus.client.search import ClientSearch
+
+class AutocompletePredicatesCache( object ):
+    
+    # finished autocomplete results, keyed on everything the fetch was given, limit included, so the dropdowns and the api share them
+    # each entry keeps the candidate tag_ids it counted, so a count or display change on some other tag leaves it alone. fetch-alls are too big to track and go on any change to their service
+    
+    MAX_CANDIDATE_TAG_IDS_TO_TRACK = 10000
+    
+    def __init__( self, max_weight = 1000000 ):
+        
+        self._max_weight = max_weight
+        
+        self._keys_to_entries = collections.OrderedDict()
+        self._tag_service_ids_to_keys = collections.defaultdict( set )
+        
+        self._total_weight = 0
+        
+        self._num_hits = 0
+        self._num_misses = 0
+        
+    
+    def _Delete( self, key ):
+        
+        if key not in self._keys_to_entries:
+            
+            return
+            
+        
+        ( predicates, tag_service_ids, candidate_tag_ids, weight ) = self._keys_to_entries[ key ]
+        
+        del self._keys_to_entries[ key ]
+        
+        for tag_service_id in tag_service_ids:
+            
+            if tag_service_id in self._tag_service_ids_to_keys:
+                
+                self._tag_service_ids_to_keys[ tag_service_id ].discard( key )
+                
+                if len( self._tag_service_ids_to_keys[ tag_service_id ] ) == 0:
+                    
+                    del self._tag_service_ids_to_keys[ tag_service_id ]
+                    
+                
+            
+        
+        self._total_weight -= weight
+        
+    
+    def Clear( self, tag_service_id = None ):
+        
+        if tag_service_id is None:
+            
+            self._keys_to_entries = collections.OrderedDict()
+            self._tag_service_ids_to_keys = collections.defaultdict( set )
+            
+            self._total_weight = 0
+            
+        else:
+            
+            keys = list( self._tag_service_ids_to_keys.get( tag_service_id, set() ) )
+            
+            for key in keys:
+                
+                self._Delete( key )
+                
+            
+        
+    
+    def GetKey( self, tag_display_type: int, file_search_context: ClientSearch.FileSearchContext, search_text: str, exact_match: bool, inclusive: bool, search_namespaces_into_full_tags: bool, zero_count_ok: bool, limit: typing.Optional[ int ] ):
+        
+        location_context = file_search_context.GetLocationContext()
+        tag_context = file_search_context.GetTagContext()
+        
+        location_key = ( frozenset( location_context.current_service_keys ), frozenset( location_context.deleted_service_keys ) )
+        tag_key = ( tag_context.service_key, tag_context.include_current_tags, tag_context.include_pending_tags, tag_context.display_service_key )
+        
+        search_text = ClientSearch.CollapseWildcardCharacters( search_text.strip() )
+        
+        return ( tag_display_type, location_key, tag_key, search_text, exact_match, inclusive, search_namespaces_into_full_tags, zero_count_ok, limit )
+        
+    
+    def GetPredicates( self, key ) -> typing.Optional[ typing.List[ ClientSearch.Predicate ] ]:
+        
+        if key not in self._keys_to_entries:
+            
+            self._num_misses += 1
+            
+            return None
+            
+        
+        self._num_hits += 1
+        
+        self._keys_to_entries.move_to_end( key )
+        
+        ( predicates, tag_service_ids, candidate_tag_ids, weight ) = self._keys_to_entries[ key ]
+        
+        # the caller is free to merge and otherwise edit these, so we hand out copies. GetCopy would lose the sibling/parent info
+        
+        copied_predicates = []
+        
+        for predicate in predicates:
+            
+            copied_predicate = copy.copy( predicate )
+            
+            copied_predicate.SetCount( predicate.GetCount().Duplicate() )
+            
+            copied_predicates.append( copied_predicate )
+            
+        
+        return copied_predicates
+        
+    
+    def GetStats( self ):
+        
+        return ( len( self._keys_to_entries ), self._total_weight, self._num_hits, self._num_misses )
+        
+    
+    def NotifyTagIdsChanged( self, tag_service_id: int, tag_ids: typing.Collection[ int ], new_tags_added = False ):
+        
+        if tag_service_id not in self._tag_service_ids_to_keys:
+            
+            return
+            
+        
+        if new_tags_added:
+            
+            # a brand new tag may match any old search, so we can't be clever
+            
+            self.Clear( tag_service_id )
+            
+            return
+            
+        
+        if not isinstance( tag_ids, ( set, frozenset ) ):
+            
+            tag_ids = set( tag_ids )
+            
+        
+        keys_to_delete = []
+        
+        for key in self._tag_service_ids_to_keys[ tag_service_id ]:
+            
+            ( predicates, tag_service_ids, candidate_tag_ids, weight ) = self._keys_to_entries[ key ]
+            
+            if candidate_tag_ids is None or not candidate_tag_ids.isdisjoint( tag_ids ):
+                
+                keys_to_delete.append( key )
+                
+            
+        
+        for key in keys_to_delete:
+            
+            self._Delete( key )
+            
+        
+    
+    def SetPredicates( self, key, predicates: typing.Collection[ ClientSearch.Predicate ], tag_service_ids: typing.Collection[ int ], candidate_tag_ids: typing.Collection[ int ] ):
+        
+        self._Delete( key )
+        
+        if len( candidate_tag_ids ) > self.MAX_CANDIDATE_TAG_IDS_TO_TRACK:
+            
+            # big fetch-all stuff. we'll just drop it on any change to its services
+            
+            candidate_tag_ids = None
+            
+            weight = len( predicates ) + 1
+            
+        else:
+            
+            candidate_tag_ids = frozenset( candidate_tag_ids )
+            
+            weight = len( predicates ) + len( candidate_tag_ids ) + 1
+            
+        
+        if weight > self._max_weight:
+            
+            return
+            
+        
+        predicates = [ copy.copy( predicate ) for predicate in predicates ]
+        
+        for predicate in predicates:
+            
+            predicate.SetCount( predicate.GetCount().Duplicate() )
+            
+        
+        tag_service_ids = frozenset( tag_service_ids )
+        
+        self._keys_to_entries[ key ] = ( predicates, tag_service_ids, candidate_tag_ids, weight )
+        
+        for tag_service_id in tag_service_ids:
+            
+            self._tag_service_ids_to_keys[ tag_service_id ].add( key )
+            
+        
+        self._total_weight += weight
+        
+        while self._total_weight > self._max_weight and len( self._keys_to_entries ) > 0:
+            
+            ( oldest_key, entry ) = next( iter( self._keys_to_entries.items() ) )
+            
+            self._Delete( oldest_key )
+            
+        
+    
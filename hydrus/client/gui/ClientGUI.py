@@ -3097,6 +3097,7 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
         ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache', 'Delete and regenerate the cache hydrus uses for fast tag search.', self._RegenerateTagCache )
         ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache (subtags repopulation)', 'Repopulate the subtags for the cache hydrus uses for fast tag search.', self._RepopulateTagCacheMissingSubtags )
         ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache (searchable subtag maps)', 'Regenerate the searchable subtag maps.', self._RegenerateTagCacheSearchableSubtagsMaps )
+        ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache (optional infix index)', 'Create, regenerate, or delete the optional index that speeds up \'*hair*\' style tag searches.', self._RegenerateTagCacheTrigramIndex )
         
         ClientGUIMenus.AppendSeparator( regen_submenu )
         
@@ -5296,6 +5297,40 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
             
         
     
+    def _RegenerateTagCacheTrigramIndex( self ):
+        
+        message = 'This will create or regenerate an optional extra index for the fast tag search cache, for one or all tag services.'
+        message += os.linesep * 2
+        message += 'Normal tag search is very fast for \'sam*\' style searches, but a search that starts with a wildcard, like \'*hair*\' or \'*_dress\', has to scan every tag in the service. This index lets those searches skip straight to the answer whenever they have at least three characters in a row.'
+        message += os.linesep * 2
+        message += 'The index takes roughly twice the space of the fast tag search cache. If you have a lot of tags (e.g. you sync with the PTR), it can take a long time to make, during which the gui may hang. Once made, it is kept up to date automatically. It needs SQLite 3.34 or newer.'
+        
+        yes_tuples = []
+        
+        yes_tuples.append( ( 'create/regenerate it', 'regenerate' ) )
+        yes_tuples.append( ( 'delete it', 'delete' ) )
+        
+        try:
+            
+            result = ClientGUIDialogsQuick.GetYesYesNo( self, message, yes_tuples = yes_tuples, no_label = 'forget it' )
+            
+            tag_service_key = GetTagServiceKeyForMaintenance( self )
+            
+        except HydrusExceptions.CancelledException:
+            
+            return
+            
+        
+        if result == 'regenerate':
+            
+            self._controller.Write( 'regenerate_tag_cache_trigram_index', tag_service_key = tag_service_key )
+            
+        else:
+            
+            self._controller.Write( 'delete_tag_cache_trigram_index', tag_service_key = tag_service_key )
+            
+        
+    
     def _RegenerateTagParentsLookupCache( self ):
         
         message = 'This will delete and then recreate the tag parents lookup cache, which is used for all basic tag parents operations. This is useful if it has become damaged or otherwise desynchronised.'
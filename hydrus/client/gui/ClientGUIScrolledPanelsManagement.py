@@ -38,6 +38,7 @@ from hydrus.client.gui.importing import ClientGUIImportOptions
 from hydrus.client.gui.lists import ClientGUIListBoxes
 from hydrus.client.gui.lists import ClientGUIListConstants as CGLC
 from hydrus.client.gui.lists import ClientGUIListCtrl
+from hydrus.client.gui.networking import ClientGUINetwork
 from hydrus.client.gui.pages import ClientGUIResultsSortCollect
 from hydrus.client.gui.search import ClientGUIACDropdown
 from hydrus.client.gui.search import ClientGUILocation
@@ -284,6 +285,9 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._verify_regular_https = QW.QCheckBox( general )
             
+            self._network_jobs_use_async_runner = QW.QCheckBox( general )
+            self._network_jobs_use_async_runner.setToolTip( 'Normally, every running network job has its own thread, even while it is waiting on bandwidth or a connection error retry. This runs them all on one event loop instead, only borrowing a thread from a small pool while actually talking to the server. Good if you have hundreds of downloaders going at once. Takes effect for newly started jobs.' )
+            
             if self._new_options.GetBoolean( 'advanced_mode' ):
                 
                 network_timeout_min = 1
@@ -329,6 +333,35 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._max_network_jobs = ClientGUICommon.BetterSpinBox( general, min = 1, max = max_network_jobs_max )
             self._max_network_jobs_per_domain = ClientGUICommon.BetterSpinBox( general, min = 1, max = max_network_jobs_per_domain_max )
             
+            self._connection_pool_num_hosts = ClientGUICommon.BetterSpinBox( general, min = 1, max = 256 )
+            self._connection_pool_num_hosts.setToolTip( 'Each domain session keeps a pool of open connections for this many different hosts (e.g. cdn subdomains). Hosts beyond this get their connections thrown away and remade.' )
+            
+            self._connection_pool_size_per_host = ClientGUICommon.BetterSpinBox( general, min = 1, max = 256 )
+            self._connection_pool_size_per_host.setToolTip( 'How many kept-alive connections to hold open per host. If this is lower than the max number of jobs per domain, extra connections will be closed after use rather than reused.' )
+            
+            self._connection_max_retries = ClientGUICommon.BetterSpinBox( general, min = 0, max = 10 )
+            self._connection_max_retries.setToolTip( 'How many times to quickly retry a failed connection, with a short backoff, before handing the error up to the normal connection error wait above. Requests that already got to the server are never quick-retried.' )
+            
+            self._segmented_download_num_segments = ClientGUICommon.BetterSpinBox( general, min = 1, max = 16 )
+            self._segmented_download_num_segments.setToolTip( 'If a server supports ranged requests, big file downloads can be split into this many parts and fetched at the same time, which helps when a server throttles each connection. If anything about the parts looks wrong, the job falls back to a normal single download. 1 turns this off.' )
+            
+            self._segmented_download_min_size = ClientGUIControls.BytesControl( general )
+            self._segmented_download_min_size.setToolTip( 'Files smaller than this are always downloaded in one go.' )
+            
+            #
+            
+            connection_pool_panel = ClientGUICommon.StaticBox( self, 'per-domain connection pools' )
+            
+            connection_pool_list_panel = ClientGUIListCtrl.BetterListCtrlPanel( connection_pool_panel )
+            
+            self._domains_to_connection_pool_settings = ClientGUIListCtrl.BetterListCtrl( connection_pool_list_panel, CGLC.COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS.ID, 6, self._ConvertDomainConnectionPoolSettingsToListCtrlTuples, activation_callback = self._EditDomainConnectionPoolSettings, use_simple_delete = True )
+            
+            connection_pool_list_panel.SetListCtrl( self._domains_to_connection_pool_settings )
+            
+            connection_pool_list_panel.AddButton( 'add', self._AddDomainConnectionPoolSettings )
+            connection_pool_list_panel.AddButton( 'edit', self._EditDomainConnectionPoolSettings, enabled_only_on_single_selection = True )
+            connection_pool_list_panel.AddDeleteButton()
+            
             #
             
             proxy_panel = ClientGUICommon.StaticBox( self, 'proxy settings' )
@@ -340,6 +373,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             #
             
             self._verify_regular_https.setChecked( self._new_options.GetBoolean( 'verify_regular_https' ) )
+            self._network_jobs_use_async_runner.setChecked( self._new_options.GetBoolean( 'network_jobs_use_async_runner' ) )
             
             self._http_proxy.SetValue( self._new_options.GetNoneableString( 'http_proxy' ) )
             self._https_proxy.SetValue( self._new_options.GetNoneableString( 'https_proxy' ) )
@@ -359,6 +393,16 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._max_network_jobs.setValue( self._new_options.GetInteger( 'max_network_jobs' ) )
             self._max_network_jobs_per_domain.setValue( self._new_options.GetInteger( 'max_network_jobs_per_domain' ) )
             
+            self._connection_pool_num_hosts.setValue( self._new_options.GetInteger( 'connection_pool_num_hosts' ) )
+            self._connection_pool_size_per_host.setValue( self._new_options.GetInteger( 'connection_pool_size_per_host' ) )
+            self._connection_max_retries.setValue( self._new_options.GetInteger( 'connection_max_retries' ) )
+            self._segmented_download_num_segments.setValue( self._new_options.GetInteger( 'segmented_download_num_segments' ) )
+            self._segmented_download_min_size.SetValue( self._new_options.GetInteger( 'segmented_download_min_size' ) )
+            
+            self._domains_to_connection_pool_settings.SetData( [ ( domain, pool_size_per_host, max_retries ) for ( domain, ( pool_size_per_host, max_retries ) ) in self._new_options.GetDomainsToConnectionPoolSettings().items() ] )
+            
+            self._domains_to_connection_pool_settings.Sort()
+            
             #
             
             if self._new_options.GetBoolean( 'advanced_mode' ):
@@ -383,6 +427,12 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Halt new jobs as long as this many network infrastructure errors on their domain (0 for never wait): ', self._domain_network_infrastructure_error_velocity ) )
             rows.append( ( 'max number of simultaneous active network jobs: ', self._max_network_jobs ) )
             rows.append( ( 'max number of simultaneous active network jobs per domain: ', self._max_network_jobs_per_domain ) )
+            rows.append( ( 'kept-alive connection pool: max hosts per domain: ', self._connection_pool_num_hosts ) )
+            rows.append( ( 'kept-alive connection pool: max connections per host: ', self._connection_pool_size_per_host ) )
+            rows.append( ( 'quick connection retries: ', self._connection_max_retries ) )
+            rows.append( ( 'split big file downloads into this many parts: ', self._segmented_download_num_segments ) )
+            rows.append( ( 'only split file downloads bigger than: ', self._segmented_download_min_size ) )
+            rows.append( ( 'EXPERIMENTAL: run network jobs on an event loop:', self._network_jobs_use_async_runner ) )
             rows.append( ( 'BUGFIX: verify regular https traffic:', self._verify_regular_https ) )
             
             gridbox = ClientGUICommon.WrapInGrid( general, rows )
@@ -423,18 +473,102 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             #
             
+            st = ClientGUICommon.BetterStaticText( connection_pool_panel, 'Domains here use these instead of the kept-alive connections per host and quick connection retries above.' )
+            
+            st.setWordWrap( True )
+            
+            connection_pool_panel.Add( st, CC.FLAGS_EXPAND_PERPENDICULAR )
+            connection_pool_panel.Add( connection_pool_list_panel, CC.FLAGS_EXPAND_BOTH_WAYS )
+            
+            #
+            
             vbox = QP.VBoxLayout()
             
             QP.AddToLayout( vbox, general, CC.FLAGS_EXPAND_PERPENDICULAR )
+            QP.AddToLayout( vbox, connection_pool_panel, CC.FLAGS_EXPAND_PERPENDICULAR )
             QP.AddToLayout( vbox, proxy_panel, CC.FLAGS_EXPAND_PERPENDICULAR )
             vbox.addStretch( 1 )
             
             self.setLayout( vbox )
             
         
+        def _AddDomainConnectionPoolSettings( self ):
+            
+            pool_size_per_host = self._new_options.GetInteger( 'connection_pool_size_per_host' )
+            max_retries = self._new_options.GetInteger( 'connection_max_retries' )
+            
+            with ClientGUITopLevelWindowsPanels.DialogEdit( self, 'add domain connection pool' ) as dlg:
+                
+                panel = ClientGUINetwork.EditConnectionPoolSettingsPanel( dlg, '', pool_size_per_host, max_retries )
+                
+                dlg.SetPanel( panel )
+                
+                if dlg.exec() == QW.QDialog.Accepted:
+                    
+                    new_data = panel.GetValue()
+                    
+                    self._SetDomainConnectionPoolSettings( new_data )
+                    
+                
+            
+        
+        def _ConvertDomainConnectionPoolSettingsToListCtrlTuples( self, data ):
+            
+            ( domain, pool_size_per_host, max_retries ) = data
+            
+            display_tuple = ( domain, HydrusData.ToHumanInt( pool_size_per_host ), HydrusData.ToHumanInt( max_retries ) )
+            sort_tuple = ( domain, pool_size_per_host, max_retries )
+            
+            return ( display_tuple, sort_tuple )
+            
+        
+        def _EditDomainConnectionPoolSettings( self ):
+            
+            selected_data = self._domains_to_connection_pool_settings.GetData( only_selected = True )
+            
+            if len( selected_data ) > 0:
+                
+                original_data = selected_data[0]
+                
+                ( domain, pool_size_per_host, max_retries ) = original_data
+                
+                with ClientGUITopLevelWindowsPanels.DialogEdit( self, 'edit domain connection pool' ) as dlg:
+                    
+                    panel = ClientGUINetwork.EditConnectionPoolSettingsPanel( dlg, domain, pool_size_per_host, max_retries )
+                    
+                    dlg.SetPanel( panel )
+                    
+                    if dlg.exec() == QW.QDialog.Accepted:
+                        
+                        edited_data = panel.GetValue()
+                        
+                        self._domains_to_connection_pool_settings.DeleteDatas( [ original_data ] )
+                        
+                        self._SetDomainConnectionPoolSettings( edited_data )
+                        
+                    
+                
+            
+        
+        def _SetDomainConnectionPoolSettings( self, new_data ):
+            
+            # one row per domain, so a new row for a domain we have replaces the old one
+            
+            domain = new_data[0]
+            
+            existing_data = [ data for data in self._domains_to_connection_pool_settings.GetData() if data[0] == domain ]
+            
+            self._domains_to_connection_pool_settings.DeleteDatas( existing_data )
+            
+            self._domains_to_connection_pool_settings.AddDatas( [ new_data ] )
+            
+            self._domains_to_connection_pool_settings.Sort()
+            
+        
         def UpdateOptions( self ):
             
             self._new_options.SetBoolean( 'verify_regular_https', self._verify_regular_https.isChecked() )
+            self._new_options.SetBoolean( 'network_jobs_use_async_runner', self._network_jobs_use_async_runner.isChecked() )
             
             self._new_options.SetNoneableString( 'http_proxy', self._http_proxy.GetValue() )
             self._new_options.SetNoneableString( 'https_proxy', self._https_proxy.GetValue() )
@@ -446,6 +580,13 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetInteger( 'serverside_bandwidth_wait_time', self._serverside_bandwidth_wait_time.value() )
             self._new_options.SetInteger( 'max_network_jobs', self._max_network_jobs.value() )
             self._new_options.SetInteger( 'max_network_jobs_per_domain', self._max_network_jobs_per_domain.value() )
+            self._new_options.SetInteger( 'connection_pool_num_hosts', self._connection_pool_num_hosts.value() )
+            self._new_options.SetInteger( 'connection_pool_size_per_host', self._connection_pool_size_per_host.value() )
+            self._new_options.SetInteger( 'connection_max_retries', self._connection_max_retries.value() )
+            self._new_options.SetInteger( 'segmented_download_num_segments', self._segmented_download_num_segments.value() )
+            self._new_options.SetInteger( 'segmented_download_min_size', self._segmented_download_min_size.GetValue() )
+            
+            self._new_options.SetDomainsToConnectionPoolSettings( { domain : ( pool_size_per_host, max_retries ) for ( domain, pool_size_per_host, max_retries ) in self._domains_to_connection_pool_settings.GetData() } )
             
             ( number, time_delta ) = self._domain_network_infrastructure_error_velocity.GetValue()
             
@@ -512,6 +653,9 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._show_new_on_file_seed_short_summary = QW.QCheckBox( misc )
             self._show_deleted_on_file_seed_short_summary = QW.QCheckBox( misc )
             
+            self._parse_html_with_lxml = QW.QCheckBox( misc )
+            self._parse_html_with_lxml.setToolTip( 'Normally, html parsing formulas walk a BeautifulSoup tree in python. This compiles their rules to lxml xpath and runs them on a fast C parse instead, which is much quicker on big pages. Formulas that fetch html, or use unusual tag or attribute names, still go through BeautifulSoup. lxml can build a slightly different tree for very broken html, so if a parser stops working, turn this off.' )
+            
             if self._new_options.GetBoolean( 'advanced_mode' ):
                 
                 delay_min = 1
@@ -557,6 +701,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._stop_character.setText( self._new_options.GetString( 'stop_character' ) )
             self._show_new_on_file_seed_short_summary.setChecked( self._new_options.GetBoolean( 'show_new_on_file_seed_short_summary' ) )
             self._show_deleted_on_file_seed_short_summary.setChecked( self._new_options.GetBoolean( 'show_deleted_on_file_seed_short_summary' ) )
+            self._parse_html_with_lxml.setChecked( self._new_options.GetBoolean( 'parse_html_with_lxml' ) )
             
             self._watcher_page_wait_period.setValue( self._new_options.GetInteger( 'watcher_page_wait_period' ) )
             self._watcher_page_wait_period.setToolTip( gallery_page_tt )
@@ -616,6 +761,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Delay time on a gallery/watcher network error:', self._downloader_network_error_delay ) )
             rows.append( ( 'Delay time on a subscription network error:', self._subscription_network_error_delay ) )
             rows.append( ( 'Delay time on a subscription other error:', self._subscription_other_error_delay ) )
+            rows.append( ( 'EXPERIMENTAL: Parse html with lxml:', self._parse_html_with_lxml ) )
             
             gridbox = ClientGUICommon.WrapInGrid( misc, rows )
             
@@ -657,6 +803,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetString( 'stop_character', self._stop_character.text() )
             self._new_options.SetBoolean( 'show_new_on_file_seed_short_summary', self._show_new_on_file_seed_short_summary.isChecked() )
             self._new_options.SetBoolean( 'show_deleted_on_file_seed_short_summary', self._show_deleted_on_file_seed_short_summary.isChecked() )
+            self._new_options.SetBoolean( 'parse_html_with_lxml', self._parse_html_with_lxml.isChecked() )
             
             self._new_options.SetInteger( 'subscription_network_error_delay', self._subscription_network_error_delay.GetValue() )
             self._new_options.SetInteger( 'subscription_other_error_delay', self._subscription_other_error_delay.GetValue() )
@@ -1494,6 +1641,10 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._only_save_last_session_during_idle.setToolTip( 'This is useful if you usually have a very large session (200,000+ files/import items open) and a client that is always on.' )
             
+            self._load_hidden_pages_lazily = QW.QCheckBox( self._sessions_panel )
+            
+            self._load_hidden_pages_lazily.setToolTip( 'If checked, a page that is loaded in the background, like most of a session, will not fetch its files until you first look at it. This makes big sessions load much faster and use less memory until you look around.' )
+            
             self._number_of_gui_session_backups = ClientGUICommon.BetterSpinBox( self._sessions_panel, min = 1, max = 32 )
             
             self._number_of_gui_session_backups.setToolTip( 'The client keeps multiple rolling backups of your gui sessions. If you have very large sessions, you might like to reduce this number.' )
@@ -1596,6 +1747,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._only_save_last_session_during_idle.setChecked( self._new_options.GetBoolean( 'only_save_last_session_during_idle' ) )
             
+            self._load_hidden_pages_lazily.setChecked( self._new_options.GetBoolean( 'load_hidden_pages_lazily' ) )
+            
             self._number_of_gui_session_backups.setValue( self._new_options.GetInteger( 'number_of_gui_session_backups' ) )
             
             self._show_session_size_warnings.setChecked( self._new_options.GetBoolean( 'show_session_size_warnings' ) )
@@ -1634,6 +1787,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Default session on startup: ', self._default_gui_session ) )
             rows.append( ( 'If \'last session\' above, autosave it how often (minutes)?', self._last_session_save_period_minutes ) )
             rows.append( ( 'If \'last session\' above, only autosave during idle time?', self._only_save_last_session_during_idle ) )
+            rows.append( ( 'Only load a background page\'s files when it is first shown: ', self._load_hidden_pages_lazily ) )
             rows.append( ( 'Number of session backups to keep: ', self._number_of_gui_session_backups ) )
             rows.append( ( 'Show warning popup if session size exceeds 10,000,000: ', self._show_session_size_warnings ) )
             
@@ -1717,6 +1871,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._new_options.SetBoolean( 'only_save_last_session_during_idle', self._only_save_last_session_during_idle.isChecked() )
             
+            self._new_options.SetBoolean( 'load_hidden_pages_lazily', self._load_hidden_pages_lazily.isChecked() )
+            
             self._new_options.SetInteger( 'default_new_page_goes', self._default_new_page_goes.GetValue() )
             
             self._new_options.SetInteger( 'max_page_name_chars', self._max_page_name_chars.value() )
@@ -2645,6 +2801,18 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             tt = 'This refers to the button on the autocomplete dropdown that enables new searches to start. If this is on, then new search pages will search as soon as you enter the first search predicate. If off, no search will happen until you switch it back on.'
             self._default_search_synchronised.setToolTip( tt )
             
+            self._show_search_results_progressively = QW.QCheckBox( self._read_autocomplete_panel )
+            tt = 'If a search has a lot of results, thumbnails can appear in batches as they load, rather than all at once at the end. If you have a collect-by set, the collecting happens once everything is in.'
+            self._show_search_results_progressively.setToolTip( tt )
+            
+            self._lazy_load_tags_for_big_searches = QW.QCheckBox( self._read_autocomplete_panel )
+            tt = 'For searches with more than 10,000 results, thumbnails only load the tags they need to display. The full tags of a file are fetched, in batches, the first time something needs them, like the manage tags dialog. This saves a lot of memory on big pages if you sync with a large tag repository.'
+            self._lazy_load_tags_for_big_searches.setToolTip( tt )
+            
+            self._use_columnar_files_info_cache = QW.QCheckBox( self._read_autocomplete_panel )
+            tt = 'Keep a copy of every file\'s size, filetype, resolution, duration and so on in memory, laid out so system predicates like system:width or system:duration can check a big set of files in one go. This makes those predicates much faster on big searches, but it costs roughly 50 bytes per file in your database, and the first search after boot will take a few seconds to load it.'
+            self._use_columnar_files_info_cache.setToolTip( tt )
+            
             self._autocomplete_float_main_gui = QW.QCheckBox( self._read_autocomplete_panel )
             tt = 'The autocomplete dropdown can either \'float\' on top of the main window, or if that does not work well for you, it can embed into the parent page panel.'
             self._autocomplete_float_main_gui.setToolTip( tt )
@@ -2697,6 +2865,12 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._default_search_synchronised.setChecked( self._new_options.GetBoolean( 'default_search_synchronised' ) )
             
+            self._show_search_results_progressively.setChecked( self._new_options.GetBoolean( 'show_search_results_progressively' ) )
+            
+            self._lazy_load_tags_for_big_searches.setChecked( self._new_options.GetBoolean( 'lazy_load_tags_for_big_searches' ) )
+            
+            self._use_columnar_files_info_cache.setChecked( self._new_options.GetBoolean( 'use_columnar_files_info_cache' ) )
+            
             self._autocomplete_float_main_gui.setChecked( self._new_options.GetBoolean( 'autocomplete_float_main_gui' ) )
             
             self._ac_read_list_height_num_chars.setValue( self._new_options.GetInteger( 'ac_read_list_height_num_chars' ) )
@@ -2723,6 +2897,9 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Autocomplete dropdown floats over file search pages: ', self._autocomplete_float_main_gui ) )
             rows.append( ( 'Autocomplete list height: ', self._ac_read_list_height_num_chars ) )
             rows.append( ( 'Start new search pages in \'searching immediately\': ', self._default_search_synchronised ) )
+            rows.append( ( 'Show search results as they load: ', self._show_search_results_progressively ) )
+            rows.append( ( 'Load only display tags for big searches: ', self._lazy_load_tags_for_big_searches ) )
+            rows.append( ( 'Keep file metadata in memory for fast system predicates: ', self._use_columnar_files_info_cache ) )
             rows.append( ( 'show system:everything even if total files is over 10,000: ', self._always_show_system_everything ) )
             rows.append( ( 'hide inbox and archive system predicates if either has no files: ', self._filter_inbox_and_archive_predicates ) )
             
@@ -2788,6 +2965,12 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._new_options.SetBoolean( 'default_search_synchronised', self._default_search_synchronised.isChecked() )
             
+            self._new_options.SetBoolean( 'show_search_results_progressively', self._show_search_results_progressively.isChecked() )
+            
+            self._new_options.SetBoolean( 'lazy_load_tags_for_big_searches', self._lazy_load_tags_for_big_searches.isChecked() )
+            
+            self._new_options.SetBoolean( 'use_columnar_files_info_cache', self._use_columnar_files_info_cache.isChecked() )
+            
             self._new_options.SetBoolean( 'autocomplete_float_main_gui', self._autocomplete_float_main_gui.isChecked() )
             
             self._new_options.SetInteger( 'ac_read_list_height_num_chars', self._ac_read_list_height_num_chars.value() )
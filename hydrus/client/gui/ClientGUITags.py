@@ -5551,9 +5551,23 @@ class ReviewTagDisplayMaintenancePanel( ClientGUIScrolledPanels.ReviewPanel ):
         
         self.widget().setLayout( vbox )
         
+        self._tag_services_notebook.currentChanged.connect( self._ServiceChanged )
+        
+        self._ServiceChanged()
+        
         HG.client_controller.sub( self, '_UpdateStatusText', 'notify_new_menu_option' )
         
     
+    def _ServiceChanged( self ):
+        
+        page = self._tag_services_notebook.currentWidget()
+        
+        if page is not None:
+            
+            HG.client_controller.tag_display_maintenance_manager.SetFocusedServiceKey( page.GetServiceKey() )
+            
+        
+    
     def _UpdateStatusText( self ):
         
         if HG.client_controller.new_options.GetBoolean( 'tag_display_maintenance_during_active' ):
@@ -5579,6 +5593,13 @@ class ReviewTagDisplayMaintenancePanel( ClientGUIScrolledPanels.ReviewPanel ):
         self._sync_status.style().polish( self._sync_status )
         
     
+    def CleanBeforeDestroy( self ):
+        
+        ClientGUIScrolledPanels.ReviewPanel.CleanBeforeDestroy( self )
+        
+        HG.client_controller.tag_display_maintenance_manager.SetFocusedServiceKey( None )
+        
+    
     class _Panel( QW.QWidget ):
         
         def __init__( self, parent, service_key ):
@@ -5680,6 +5701,16 @@ class ReviewTagDisplayMaintenancePanel( ClientGUIScrolledPanels.ReviewPanel ):
                     
                     sync_halted = True
                     
+                elif num_items_to_regen > 0:
+                    
+                    eta = HG.client_controller.tag_display_maintenance_manager.GetSyncETA( self._service_key, num_items_to_regen )
+                    
+                    if eta is not None:
+                        
+                        message += os.linesep * 2
+                        message += 'At the current rate, about {} to go.'.format( HydrusTime.TimeDeltaToPrettyTimeDelta( eta ) )
+                        
+                    
                 
                 self._siblings_and_parents_st.setText( message )
                 
@@ -5766,6 +5797,11 @@ class ReviewTagDisplayMaintenancePanel( ClientGUIScrolledPanels.ReviewPanel ):
             self._StartRefresh()
             
         
+        def GetServiceKey( self ):
+            
+            return self._service_key
+            
+        
         def NotifyRefresh( self, service_key ):
             
             if service_key == self._service_key:
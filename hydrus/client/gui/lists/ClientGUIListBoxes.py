@@ -3848,6 +3848,8 @@ class ListBoxTagsMedia( ListBoxTagsDisplayCapable ):
         
         self._include_counts = include_counts
         
+        self._count_big_selections_in_db = False
+        
         self._current_tags_to_count = collections.Counter()
         self._deleted_tags_to_count = collections.Counter()
         self._pending_tags_to_count = collections.Counter()
@@ -4018,7 +4020,7 @@ class ListBoxTagsMedia( ListBoxTagsDisplayCapable ):
         
         media_results = media_results.difference( self._last_media_results )
         
-        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( media_results, self._service_key, self._tag_display_type )
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( media_results, self._service_key, self._tag_display_type, count_in_db_if_big = self._count_big_selections_in_db )
         
         tags_changed = set()
         
@@ -4058,7 +4060,7 @@ class ListBoxTagsMedia( ListBoxTagsDisplayCapable ):
             media_results = set( media_results )
             
         
-        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( media_results, self._service_key, self._tag_display_type )
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( media_results, self._service_key, self._tag_display_type, count_in_db_if_big = self._count_big_selections_in_db )
         
         self._current_tags_to_count = current_tags_to_count
         self._deleted_tags_to_count = deleted_tags_to_count
@@ -4110,14 +4112,14 @@ class ListBoxTagsMedia( ListBoxTagsDisplayCapable ):
         
         adds = media_results.difference( self._last_media_results )
         
-        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( removees, self._service_key, self._tag_display_type )
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( removees, self._service_key, self._tag_display_type, count_in_db_if_big = self._count_big_selections_in_db )
         
         self._current_tags_to_count.subtract( current_tags_to_count )
         self._deleted_tags_to_count.subtract( deleted_tags_to_count )
         self._pending_tags_to_count.subtract( pending_tags_to_count )
         self._petitioned_tags_to_count.subtract( petitioned_tags_to_count )
         
-        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( adds, self._service_key, self._tag_display_type )
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( adds, self._service_key, self._tag_display_type, count_in_db_if_big = self._count_big_selections_in_db )
         
         self._current_tags_to_count.update( current_tags_to_count )
         self._deleted_tags_to_count.update( deleted_tags_to_count )
@@ -1161,6 +1161,7 @@ class COLUMN_LIST_REVIEW_NETWORK_SESSIONS( COLUMN_LIST_DEFINITION ):
     NETWORK_CONTEXT = 0
     COOKIES = 1
     EXPIRES = 2
+    CONNECTIONS = 3
     
 
 column_list_type_name_lookup[ COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID ] = 'network sessions'
@@ -1168,6 +1169,7 @@ column_list_type_name_lookup[ COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID ] = 'networ
 register_column_type( COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID, COLUMN_LIST_REVIEW_NETWORK_SESSIONS.NETWORK_CONTEXT, 'network context', False, 34, True )
 register_column_type( COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID, COLUMN_LIST_REVIEW_NETWORK_SESSIONS.COOKIES, 'cookies', False, 9, True )
 register_column_type( COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID, COLUMN_LIST_REVIEW_NETWORK_SESSIONS.EXPIRES, 'expires', False, 28, True )
+register_column_type( COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID, COLUMN_LIST_REVIEW_NETWORK_SESSIONS.CONNECTIONS, 'connections opened/reused', True, 24, True )
 
 default_column_list_sort_lookup[ COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID ] = ( COLUMN_LIST_REVIEW_NETWORK_SESSIONS.NETWORK_CONTEXT, True )
 
@@ -1528,3 +1530,20 @@ register_column_type( COLUMN_LIST_DOMAIN_MODIFIED_TIMESTAMPS.ID, COLUMN_LIST_DOM
 register_column_type( COLUMN_LIST_DOMAIN_MODIFIED_TIMESTAMPS.ID, COLUMN_LIST_DOMAIN_MODIFIED_TIMESTAMPS.TIMESTAMP, 'time', False, 23, True )
 
 default_column_list_sort_lookup[ COLUMN_LIST_DOMAIN_MODIFIED_TIMESTAMPS.ID ] = ( COLUMN_LIST_DOMAIN_MODIFIED_TIMESTAMPS.DOMAIN, True )
+
+class COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS( COLUMN_LIST_DEFINITION ):
+    
+    ID = 71
+    
+    DOMAIN = 0
+    POOL_SIZE_PER_HOST = 1
+    MAX_RETRIES = 2
+    
+
+column_list_type_name_lookup[ COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS.ID ] = 'domain connection pool settings'
+
+register_column_type( COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS.ID, COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS.DOMAIN, 'domain', False, 20, True )
+register_column_type( COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS.ID, COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS.POOL_SIZE_PER_HOST, 'connections per host', False, 20, True )
+register_column_type( COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS.ID, COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS.MAX_RETRIES, 'quick retries', False, 14, True )
+
+default_column_list_sort_lookup[ COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS.ID ] = ( COLUMN_LIST_DOMAIN_CONNECTION_POOL_SETTINGS.DOMAIN, True )
@@ -30,6 +30,7 @@ from hydrus.client.gui.widgets import ClientGUIControls
 from hydrus.client.networking import ClientNetworking
 from hydrus.client.networking import ClientNetworkingDomain
 from hydrus.client.networking import ClientNetworkingContexts
+from hydrus.client.networking import ClientNetworkingFunctions
 
 class EditBandwidthRulesPanel( ClientGUIScrolledPanels.EditPanel ):
     
@@ -62,6 +63,73 @@ class EditBandwidthRulesPanel( ClientGUIScrolledPanels.EditPanel ):
         return self._bandwidth_rules_ctrl.GetValue()
         
     
+class EditConnectionPoolSettingsPanel( ClientGUIScrolledPanels.EditPanel ):
+    
+    def __init__( self, parent: QW.QWidget, domain: str, pool_size_per_host: int, max_retries: int ):
+        
+        ClientGUIScrolledPanels.EditPanel.__init__( self, parent )
+        
+        self._domain = QW.QLineEdit( self )
+        
+        self._pool_size_per_host = ClientGUICommon.BetterSpinBox( self, min = 1, max = 256 )
+        self._pool_size_per_host.setToolTip( 'How many kept-alive connections to hold open per host for this domain.' )
+        
+        self._max_retries = ClientGUICommon.BetterSpinBox( self, min = 0, max = 10 )
+        self._max_retries.setToolTip( 'How many times to quickly retry a failed connection to this domain before handing the error up to the normal connection error wait.' )
+        
+        #
+        
+        self._domain.setText( domain )
+        self._pool_size_per_host.setValue( pool_size_per_host )
+        self._max_retries.setValue( max_retries )
+        
+        #
+        
+        vbox = QP.VBoxLayout()
+        
+        st = ClientGUICommon.BetterStaticText( self, 'Connections are pooled per domain session, so a subdomain like "img.example.com" will be saved as "example.com".' )
+        st.setWordWrap( True )
+        
+        rows = []
+        
+        rows.append( ( 'domain: ', self._domain ) )
+        rows.append( ( 'kept-alive connections per host: ', self._pool_size_per_host ) )
+        rows.append( ( 'quick connection retries: ', self._max_retries ) )
+        
+        gridbox = ClientGUICommon.WrapInGrid( self, rows )
+        
+        QP.AddToLayout( vbox, st, CC.FLAGS_EXPAND_PERPENDICULAR )
+        QP.AddToLayout( vbox, gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
+        
+        self.widget().setLayout( vbox )
+        
+    
+    def _GetDomain( self ):
+        
+        domain = self._domain.text().strip()
+        
+        if domain == '':
+            
+            raise HydrusExceptions.VetoException( 'Please enter a domain!' )
+            
+        
+        return ClientNetworkingFunctions.ConvertDomainIntoSecondLevelDomain( domain )
+        
+    
+    def CheckValid( self ):
+        
+        self._GetDomain()
+        
+    
+    def GetValue( self ):
+        
+        domain = self._GetDomain()
+        pool_size_per_host = self._pool_size_per_host.value()
+        max_retries = self._max_retries.value()
+        
+        return ( domain, pool_size_per_host, max_retries )
+        
+    
 class EditCookiePanel( ClientGUIScrolledPanels.EditPanel ):
     
     def __init__( self, parent: QW.QWidget, name: str, value: str, domain: str, path: str, expires: HC.noneable_int ):
@@ -1281,8 +1349,12 @@ class ReviewNetworkSessionsPanel( ClientGUIScrolledPanels.ReviewPanel ):
                 
             
         
-        display_tuple = ( pretty_network_context, pretty_number_of_cookies, pretty_expiry )
-        sort_tuple = ( pretty_network_context, number_of_cookies, expiry )
+        ( num_connections_opened, num_connections_reused ) = self._session_manager.GetConnectionCounts( network_context )
+        
+        pretty_connections = '{}/{}'.format( HydrusData.ToHumanInt( num_connections_opened ), HydrusData.ToHumanInt( num_connections_reused ) )
+        
+        display_tuple = ( pretty_network_context, pretty_number_of_cookies, pretty_expiry, pretty_connections )
+        sort_tuple = ( pretty_network_context, number_of_cookies, expiry, ( num_connections_opened, num_connections_reused ) )
         
         return ( display_tuple, sort_tuple )
         
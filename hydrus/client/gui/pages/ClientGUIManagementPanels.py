@@ -123,6 +123,9 @@ class ListBoxTagsMediaManagementPanel( ClientGUIListBoxes.ListBoxTagsMedia ):
         
         ClientGUIListBoxes.ListBoxTagsMedia.__init__( self, parent, tag_display_type, include_counts = True )
         
+        # our media results are the page's live ones, so the db agrees with them
+        self._count_big_selections_in_db = True
+        
         self._management_controller = management_controller
         self._minimum_height_num_chars = 15
         
@@ -5235,23 +5238,55 @@ class ManagementPanelQuery( ManagementPanel ):
             
         
     
-    def ShowFinishedQuery( self, query_job_key, media_results ):
+    def ShowFinishedQuery( self, query_job_key, media_results, unshown_media_results ):
         
         if query_job_key == self._query_job_key:
             
-            location_context = self._management_controller.GetLocationContext()
-            
-            panel = ClientGUIResults.MediaPanelThumbnails( self._page, self._page_key, self._management_controller, media_results )
+            media_panel = self._page.GetMediaPanel()
             
-            panel.SetEmptyPageStatusOverride( 'no files found for this search' )
+            if isinstance( media_panel, ClientGUIResults.MediaPanelLoading ):
+                
+                panel = ClientGUIResults.MediaPanelThumbnails( self._page, self._page_key, self._management_controller, media_results )
+                
+                panel.SetEmptyPageStatusOverride( 'no files found for this search' )
+                
+                panel.Collect( self._media_collect_widget.GetValue() )
+                
+                panel.Sort( self._media_sort_widget.GetSort() )
+                
+                self._page.SwapMediaPanel( panel )
+                
+            else:
+                
+                # we have been showing results as they came in, so just top it up and collect and sort what we have
+                
+                media_panel.AddMediaResults( self._page_key, unshown_media_results, from_search = True )
+                
+                media_panel.Collect( self._media_collect_widget.GetValue() )
+                
+                media_panel.Sort( self._media_sort_widget.GetSort() )
+                
             
-            panel.Collect( self._media_collect_widget.GetValue() )
+            self._page_state = CC.PAGE_STATE_NORMAL
             
-            panel.Sort( self._media_sort_widget.GetSort() )
+        
+    
+    def ShowPartialQuery( self, query_job_key, media_results ):
+        
+        if query_job_key == self._query_job_key:
             
-            self._page.SwapMediaPanel( panel )
+            media_panel = self._page.GetMediaPanel()
             
-            self._page_state = CC.PAGE_STATE_NORMAL
+            if isinstance( media_panel, ClientGUIResults.MediaPanelLoading ):
+                
+                panel = ClientGUIResults.MediaPanelThumbnails( self._page, self._page_key, self._management_controller, media_results )
+                
+                self._page.SwapMediaPanel( panel )
+                
+            else:
+                
+                media_panel.AddMediaResults( self._page_key, media_results, from_search = True )
+                
             
         
     
@@ -5280,21 +5315,52 @@ class ManagementPanelQuery( ManagementPanel ):
                 return
                 
             
-            self.ShowFinishedQuery( query_job_key, media_results )
+            self.ShowFinishedQuery( query_job_key, media_results, unshown_media_results )
+            
+        
+        def qt_code_partial( partial_media_results ):
+            
+            if not self or not QP.isValid( self ):
+                
+                return
+                
+            
+            self.ShowPartialQuery( query_job_key, partial_media_results )
             
         
         QUERY_CHUNK_SIZE = 256
         
+        # a search that takes longer than this to load starts putting thumbs up as they come in
+        PARTIAL_RESULTS_PERIOD = 0.5
+        
+        # a search bigger than this can load its media results with lazy tags managers
+        LAZY_TAGS_NUM_RESULTS_THRESHOLD = 10000
+        
         HG.client_controller.file_viewing_stats_manager.Flush()
         
-        query_hash_ids = controller.Read( 'file_query_ids', file_search_context, job_key = query_job_key, limit_sort_by = sort_by )
+        show_progressively = controller.new_options.GetBoolean( 'show_search_results_progressively' )
+        
+        if show_progressively:
+            
+            # we want them in order from the start. if the db can't do this sort, the final sort on the finished panel catches it
+            query_hash_ids = controller.Read( 'file_query_ids', file_search_context, job_key = query_job_key, sort_by = sort_by )
+            
+        else:
+            
+            query_hash_ids = controller.Read( 'file_query_ids', file_search_context, job_key = query_job_key, limit_sort_by = sort_by )
+            
         
         if query_job_key.IsCancelled():
             
             return
             
         
+        lazy_tags = controller.new_options.GetBoolean( 'lazy_load_tags_for_big_searches' ) and len( query_hash_ids ) > LAZY_TAGS_NUM_RESULTS_THRESHOLD
+        
         media_results = []
+        unshown_media_results = []
+        
+        time_to_show_partial_results = HydrusTime.GetNowFloat() + PARTIAL_RESULTS_PERIOD
         
         for sub_query_hash_ids in HydrusLists.SplitListIntoChunks( query_hash_ids, QUERY_CHUNK_SIZE ):
             
@@ -5303,12 +5369,22 @@ class ManagementPanelQuery( ManagementPanel ):
                 return
                 
             
-            more_media_results = controller.Read( 'media_results_from_ids', sub_query_hash_ids )
+            more_media_results = controller.Read( 'media_results_from_ids', sub_query_hash_ids, lazy_tags = lazy_tags )
             
             media_results.extend( more_media_results )
+            unshown_media_results.extend( more_media_results )
             
             controller.pub( 'set_num_query_results', page_key, len( media_results ), len( query_hash_ids ) )
             
+            if show_progressively and len( media_results ) < len( query_hash_ids ) and HydrusTime.TimeHasPassedFloat( time_to_show_partial_results ):
+                
+                QP.CallAfter( qt_code_partial, unshown_media_results )
+                
+                unshown_media_results = []
+                
+                time_to_show_partial_results = HydrusTime.GetNowFloat() + PARTIAL_RESULTS_PERIOD
+                
+            
             controller.WaitUntilViewFree()
             
         
@@ -449,6 +449,7 @@ class Page( QW.QWidget ):
             
         
         self._initialised = len( initial_hashes ) == 0
+        self._initial_media_results_load_deferred = False
         self._pre_initialisation_media_results = []
         
         self._pretty_status = ''
@@ -668,6 +669,9 @@ class Page( QW.QWidget ):
     
     def GetAPIInfoDict( self, simple ):
         
+        # the api wants to see our files, so it is time to load them
+        self._StartDeferredInitialMediaResultsLoad()
+        
         d = {}
         
         d[ 'name' ] = self._management_controller.GetPageName()
@@ -790,6 +794,11 @@ class Page( QW.QWidget ):
             
             return self._management_panel.GetPageState()
             
+        elif self._initial_media_results_load_deferred:
+            
+            # nothing is loading. we'll load as soon as anyone looks at us
+            return CC.PAGE_STATE_NORMAL
+            
         else:
             
             return CC.PAGE_STATE_INITIALISING
@@ -945,6 +954,11 @@ class Page( QW.QWidget ):
         return self._initialised
         
     
+    def IsInitialMediaResultsLoadDeferred( self ):
+        
+        return self._initial_media_results_load_deferred
+        
+    
     def IsMultipleWatcherPage( self ):
         
         return self._management_controller.GetType() == ClientGUIManagementController.MANAGEMENT_TYPE_IMPORT_MULTIPLE_WATCHER
@@ -971,6 +985,8 @@ class Page( QW.QWidget ):
             self._done_split_setups = True
             
         
+        self._StartDeferredInitialMediaResultsLoad()
+        
         self._management_panel.PageShown()
         self._media_panel.PageShown()
         self._preview_canvas.PageShown()
@@ -982,6 +998,10 @@ class Page( QW.QWidget ):
             
             self._management_panel.RefreshQuery()
             
+        else:
+            
+            self._StartDeferredInitialMediaResultsLoad()
+            
         
     
     def SetMediaFocus( self ):
@@ -1055,6 +1075,36 @@ class Page( QW.QWidget ):
             
         
     
+    def _IsCurrentAllTheWayUp( self ):
+        
+        # being the current tab of our notebook is not enough, since that notebook may itself be a background tab
+        widget = self
+        notebook = self._parent_notebook
+        
+        while isinstance( notebook, PagesNotebook ):
+            
+            if notebook.currentWidget() != widget:
+                
+                return False
+                
+            
+            widget = notebook
+            notebook = notebook.GetParentNotebook()
+            
+        
+        return True
+        
+    
+    def _StartDeferredInitialMediaResultsLoad( self ):
+        
+        if self._initial_media_results_load_deferred:
+            
+            self._initial_media_results_load_deferred = False
+            
+            self._StartInitialMediaResultsLoad()
+            
+        
+    
     def _StartInitialMediaResultsLoad( self ):
         
         def qt_code_status( status ):
@@ -1128,7 +1178,15 @@ class Page( QW.QWidget ):
         
         if self._initial_hashes is not None and len( self._initial_hashes ) > 0:
             
-            self._StartInitialMediaResultsLoad()
+            # a big session is mostly pages nobody is looking at, so they just hold their hashes until they are first shown
+            if not self._IsCurrentAllTheWayUp() and not self.IsImporter() and self._controller.new_options.GetBoolean( 'load_hidden_pages_lazily' ):
+                
+                self._initial_media_results_load_deferred = True
+                
+            else:
+                
+                self._StartInitialMediaResultsLoad()
+                
             
         else:
             
@@ -1612,7 +1670,7 @@ class PagesNotebook( QP.TabWidgetWithDnD ):
         
         page = self.widget( index )
         
-        if isinstance( page, Page ) and not page.IsInitialised():
+        if isinstance( page, Page ) and not page.IsInitialised() and not page.IsInitialMediaResultsLoadDeferred():
             
             full_page_name = 'initialising'
             
@@ -1975,7 +1975,7 @@ class MediaPanel( CAC.ApplicationCommandProcessorMixin, ClientMedia.ListeningMed
             
         
     
-    def AddMediaResults( self, page_key, media_results ):
+    def AddMediaResults( self, page_key, media_results, from_search = False ):
         
         if page_key == self._page_key:
             
@@ -1983,7 +1983,11 @@ class MediaPanel( CAC.ApplicationCommandProcessorMixin, ClientMedia.ListeningMed
             
             result = ClientMedia.ListeningMediaList.AddMediaResults( self, media_results )
             
-            self.newMediaAdded.emit()
+            # a search filling its own page in as results arrive should not pause itself
+            if not from_search:
+                
+                self.newMediaAdded.emit()
+                
             
             HG.client_controller.pub( 'notify_new_pages_count' )
             
@@ -3210,11 +3214,11 @@ class MediaPanelThumbnails( MediaPanel ):
         self.setWidgetResizable( True )
         
     
-    def AddMediaResults( self, page_key, media_results ):
+    def AddMediaResults( self, page_key, media_results, from_search = False ):
         
         if page_key == self._page_key:
             
-            thumbnails = MediaPanel.AddMediaResults( self, page_key, media_results )
+            thumbnails = MediaPanel.AddMediaResults( self, page_key, media_results, from_search = from_search )
             
             if len( thumbnails ) > 0:
                 
@@ -1,3 +1,4 @@
+import base64
 import itertools
 
 from hydrus.core import HydrusExceptions
@@ -7,6 +8,26 @@ from hydrus.client import ClientConstants as CC
 
 RESERVED_SESSION_NAMES = { '', 'just a blank page', CC.LAST_SESSION_SESSION_NAME, CC.EXIT_SESSION_SESSION_NAME }
 
+# a page's file list is stored as its sha256 hashes stuck together and base64ed, which is ~43 json characters per file rather than ~68 as a list of hex strings
+# sha256s are random, so there is nothing to gain from compressing them
+
+def PackHashes( hashes ) -> str:
+    
+    return str( base64.b64encode( b''.join( hashes ) ), 'ascii' )
+    
+
+def UnpackHashes( packed_hashes: str ) -> list:
+    
+    hashes_bytes = base64.b64decode( packed_hashes )
+    
+    if len( hashes_bytes ) % 32 != 0:
+        
+        raise HydrusExceptions.SerialisationException( 'Packed page hashes were not a multiple of 32 bytes long!' )
+        
+    
+    return [ hashes_bytes[ i : i + 32 ] for i in range( 0, len( hashes_bytes ), 32 ) ]
+    
+
 class GUISessionContainer( HydrusSerialisable.SerialisableBaseNamed ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_GUI_SESSION_CONTAINER
@@ -211,7 +232,7 @@ class GUISessionPageData( HydrusSerialisable.SerialisableBase ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_GUI_SESSION_PAGE_DATA
     SERIALISABLE_NAME = 'GUI Session Page Data'
-    SERIALISABLE_VERSION = 1
+    SERIALISABLE_VERSION = 2
     
     def __init__( self, management_controller = None, hashes = None ):
         
@@ -232,7 +253,7 @@ class GUISessionPageData( HydrusSerialisable.SerialisableBase ):
     def _GetSerialisableInfo( self ):
         
         serialisable_management_controller = self._management_controller.GetSerialisableTuple()
-        serialisable_hashes = [ hash.hex() for hash in self._hashes ]
+        serialisable_hashes = PackHashes( self._hashes )
         
         return ( serialisable_management_controller, serialisable_hashes )
         
@@ -242,7 +263,23 @@ class GUISessionPageData( HydrusSerialisable.SerialisableBase ):
         ( serialisable_management_controller, serialisable_hashes ) = serialisable_info
         
         self._management_controller = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_management_controller )
-        self._hashes = [ bytes.fromhex( hash_hex ) for hash_hex in serialisable_hashes ]
+        self._hashes = UnpackHashes( serialisable_hashes )
+        
+    
+    def _UpdateSerialisableInfo( self, version, old_serialisable_info ):
+        
+        if version == 1:
+            
+            ( serialisable_management_controller, serialisable_hashes ) = old_serialisable_info
+            
+            hashes = [ bytes.fromhex( hash_hex ) for hash_hex in serialisable_hashes ]
+            
+            serialisable_hashes = PackHashes( hashes )
+            
+            new_serialisable_info = ( serialisable_management_controller, serialisable_hashes )
+            
+            return ( 2, new_serialisable_info )
+            
         
     
     def GetHashes( self ):
@@ -42,6 +42,12 @@ def AppendLoadingPredicate( predicates, label ):
     
     predicates.append( ClientSearch.Predicate( predicate_type = ClientSearch.PREDICATE_TYPE_LABEL, value = label + '\u2026' ) )
     
+def AppendTruncatedResultsPredicate( predicates, limit ):
+    
+    label = 'only showing the top {} results, force a fetch (default ctrl+space) to see everything'.format( HydrusData.ToHumanInt( limit ) )
+    
+    predicates.append( ClientSearch.Predicate( predicate_type = ClientSearch.PREDICATE_TYPE_LABEL, value = label ) )
+    
 
 def InsertOtherPredicatesForRead( predicates: list, parsed_autocomplete_text: ClientSearchAutocomplete.ParsedAutocompleteText, include_unusual_predicate_types: bool, under_construction_or_predicate: typing.Optional[ ClientSearch.Predicate ] ):
     
@@ -137,13 +143,27 @@ def ReadFetch(
     include_unusual_predicate_types,
     results_cache: ClientSearchAutocomplete.PredicateResultsCache,
     under_construction_or_predicate,
-    force_system_everything
+    force_system_everything,
+    fetch_all_results
 ):
     
     tag_context = file_search_context.GetTagContext()
     
     tag_service_key = tag_context.service_key
     
+    results_are_truncated = False
+    
+    if fetch_all_results:
+        
+        limit = None
+        fetch_limit = None
+        
+    else:
+        
+        limit = ClientSearchAutocomplete.AUTOCOMPLETE_RESULTS_LIMIT
+        fetch_limit = ClientSearchAutocomplete.AUTOCOMPLETE_RESULTS_FETCH_LIMIT
+        
+    
     if not parsed_autocomplete_text.IsAcceptableForTagSearches():
         
         if parsed_autocomplete_text.IsEmpty():
@@ -265,20 +285,27 @@ def ReadFetch(
                     
                     search_namespaces_into_full_tags = parsed_autocomplete_text.GetTagAutocompleteOptions().SearchNamespacesIntoFullTags()
                     
-                    predicates = HG.client_controller.Read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_ACTUAL, file_search_context, search_text = autocomplete_search_text, inclusive = parsed_autocomplete_text.inclusive, job_key = job_key, search_namespaces_into_full_tags = search_namespaces_into_full_tags )
+                    predicates = HG.client_controller.Read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_ACTUAL, file_search_context, search_text = autocomplete_search_text, inclusive = parsed_autocomplete_text.inclusive, job_key = job_key, search_namespaces_into_full_tags = search_namespaces_into_full_tags, limit = fetch_limit )
                     
                     if job_key.IsCancelled():
                         
                         return
                         
                     
+                    results_are_truncated = limit is not None and len( predicates ) > limit
+                    
+                    if results_are_truncated:
+                        
+                        predicates = ClientSearch.SortPredicates( predicates )[ : limit ]
+                        
+                    
                     if is_explicit_wildcard:
                         
                         matches = ClientSearch.FilterPredicatesBySearchText( tag_service_key, autocomplete_search_text, predicates )
                         
                     else:
                         
-                        results_cache = ClientSearchAutocomplete.PredicateResultsCacheTag( predicates, strict_search_text, False )
+                        results_cache = ClientSearchAutocomplete.PredicateResultsCacheTag( predicates, strict_search_text, False, is_complete = not results_are_truncated )
                         
                         matches = results_cache.FilterPredicates( tag_service_key, autocomplete_search_text )
                         
@@ -418,6 +445,11 @@ def ReadFetch(
     
     InsertOtherPredicatesForRead( matches, parsed_autocomplete_text, include_unusual_predicate_types, under_construction_or_predicate )
     
+    if results_are_truncated:
+        
+        AppendTruncatedResultsPredicate( matches, limit )
+        
+    
     if job_key.IsCancelled():
         
         return
@@ -490,13 +522,27 @@ def WriteFetch(
     results_callable,
     parsed_autocomplete_text: ClientSearchAutocomplete.ParsedAutocompleteText,
     file_search_context: ClientSearch.FileSearchContext,
-    results_cache: ClientSearchAutocomplete.PredicateResultsCache
+    results_cache: ClientSearchAutocomplete.PredicateResultsCache,
+    fetch_all_results: bool
 ):
     
     tag_context = file_search_context.GetTagContext()
     
     display_tag_service_key = tag_context.display_service_key
     
+    results_are_truncated = False
+    
+    if fetch_all_results:
+        
+        limit = None
+        fetch_limit = None
+        
+    else:
+        
+        limit = ClientSearchAutocomplete.AUTOCOMPLETE_RESULTS_LIMIT
+        fetch_limit = ClientSearchAutocomplete.AUTOCOMPLETE_RESULTS_FETCH_LIMIT
+        
+    
     if not parsed_autocomplete_text.IsAcceptableForTagSearches():
         
         matches = []
@@ -561,7 +607,14 @@ def WriteFetch(
                 
                 search_namespaces_into_full_tags = parsed_autocomplete_text.GetTagAutocompleteOptions().SearchNamespacesIntoFullTags()
                 
-                predicates = HG.client_controller.Read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = autocomplete_search_text, job_key = job_key, zero_count_ok = True, search_namespaces_into_full_tags = search_namespaces_into_full_tags )
+                predicates = HG.client_controller.Read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = autocomplete_search_text, job_key = job_key, zero_count_ok = True, search_namespaces_into_full_tags = search_namespaces_into_full_tags, limit = fetch_limit )
+                
+                results_are_truncated = limit is not None and len( predicates ) > limit
+                
+                if results_are_truncated:
+                    
+                    predicates = ClientSearch.SortPredicates( predicates )[ : limit ]
+                    
                 
                 if is_explicit_wildcard:
                     
@@ -569,7 +622,7 @@ def WriteFetch(
                     
                 else:
                     
-                    results_cache = ClientSearchAutocomplete.PredicateResultsCacheTag( predicates, strict_search_text, False )
+                    results_cache = ClientSearchAutocomplete.PredicateResultsCacheTag( predicates, strict_search_text, False, is_complete = not results_are_truncated )
                     
                     matches = results_cache.FilterPredicates( display_tag_service_key, autocomplete_search_text )
                     
@@ -588,6 +641,11 @@ def WriteFetch(
     
     InsertTagPredicates( matches, display_tag_service_key, parsed_autocomplete_text, allow_auto_wildcard_conversion )
     
+    if results_are_truncated:
+        
+        AppendTruncatedResultsPredicate( matches, limit )
+        
+    
     HG.client_controller.CallAfterQtSafe( win, 'write a/c full results', results_callable, job_key, parsed_autocomplete_text, results_cache, matches )
     
 
@@ -810,6 +868,9 @@ class AutoCompleteDropdown( CAC.ApplicationCommandProcessorMixin, QW.QWidget ):
         self._float_mode = use_float_mode
         self._temporary_focus_widget = None
         
+        # set by a force fetch, cleared when the text changes
+        self._fetch_all_results = False
+        
         self._text_input_panel = QW.QWidget( self )
         
         self._text_ctrl = QW.QLineEdit( self._text_input_panel )
@@ -1368,6 +1429,8 @@ class AutoCompleteDropdown( CAC.ApplicationCommandProcessorMixin, QW.QWidget ):
     
     def EventText( self, new_text ):
         
+        self._fetch_all_results = False
+        
         num_chars = len( self._text_ctrl.text() )
         
         if num_chars == 0:
@@ -1449,6 +1512,9 @@ class AutoCompleteDropdown( CAC.ApplicationCommandProcessorMixin, QW.QWidget ):
                 
                 if action == CAC.SIMPLE_AUTOCOMPLETE_FORCE_FETCH:
                     
+                    # a normal fetch only gets the top results, so this is the user asking for everything
+                    self._fetch_all_results = True
+                    
                     self._ScheduleResultsRefresh( 0.0 )
                     
                 elif input_is_empty and action in ( CAC.SIMPLE_AUTOCOMPLETE_IF_EMPTY_TAB_LEFT, CAC.SIMPLE_AUTOCOMPLETE_IF_EMPTY_TAB_RIGHT ):
@@ -2346,7 +2412,7 @@ class AutoCompleteDropdownTagsRead( AutoCompleteDropdownTags ):
             under_construction_or_predicate = self._under_construction_or_predicate.Duplicate()
             
         
-        HG.client_controller.CallToThread( ReadFetch, self, job_key, self.SetPrefetchResults, self.SetFetchedResults, parsed_autocomplete_text, self._media_callable, fsc, self._search_pause_play.IsOn(), self._include_unusual_predicate_types, self._results_cache, under_construction_or_predicate, self._force_system_everything )
+        HG.client_controller.CallToThread( ReadFetch, self, job_key, self.SetPrefetchResults, self.SetFetchedResults, parsed_autocomplete_text, self._media_callable, fsc, self._search_pause_play.IsOn(), self._include_unusual_predicate_types, self._results_cache, under_construction_or_predicate, self._force_system_everything, self._fetch_all_results )
         
     
     def _ShouldTakeResponsibilityForEnter( self ):
@@ -2964,7 +3030,7 @@ class AutoCompleteDropdownTagsWrite( AutoCompleteDropdownTags ):
         
         file_search_context = ClientSearch.FileSearchContext( location_context = self._location_context_button.GetValue(), tag_context = tag_context )
         
-        HG.client_controller.CallToThread( WriteFetch, self, job_key, self.SetPrefetchResults, self.SetFetchedResults, parsed_autocomplete_text, file_search_context, self._results_cache )
+        HG.client_controller.CallToThread( WriteFetch, self, job_key, self.SetPrefetchResults, self.SetFetchedResults, parsed_autocomplete_text, file_search_context, self._results_cache, self._fetch_all_results )
         
     
     def _TakeResponsibilityForEnter( self, shift_down ):
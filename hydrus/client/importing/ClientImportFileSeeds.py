@@ -37,6 +37,52 @@ from hydrus.client.networking import ClientNetworkingFunctions
 FILE_SEED_TYPE_HDD = 0
 FILE_SEED_TYPE_URL = 1
 
+# how long a batch pre-import status lookup is trusted before a file seed goes back to asking the db itself
+PRE_IMPORT_STATUS_PREDICTION_PERIOD = 600
+
+# when a file seed finishes, its hashes and urls go here for a while. any batch lookup for them that is older than that is stale, whatever page it came from
+PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES_LOCK = threading.Lock()
+PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES = collections.OrderedDict()
+
+def NotifyPreImportLookupsFinished( lookups ):
+    
+    now = HydrusTime.GetNowFloat()
+    
+    with PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES_LOCK:
+        
+        for lookup in lookups:
+            
+            PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES[ lookup ] = now
+            
+            PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES.move_to_end( lookup )
+            
+        
+        # predictions older than the period are not trusted anyway
+        
+        while len( PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES ) > 0:
+            
+            ( lookup, finished_time ) = next( iter( PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES.items() ) )
+            
+            if finished_time + PRE_IMPORT_STATUS_PREDICTION_PERIOD < now:
+                
+                del PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES[ lookup ]
+                
+            else:
+                
+                break
+                
+            
+        
+    
+
+def PreImportLookupFinishedSince( lookup, timestamp ):
+    
+    with PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES_LOCK:
+        
+        return lookup in PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES and PRE_IMPORT_LOOKUPS_TO_FINISHED_TIMES[ lookup ] >= timestamp
+        
+    
+
 def FileURLMappingHasUntrustworthyNeighbours( hash: bytes, url: str ):
     
     # let's see if the file that has this url has any other interesting urls
@@ -152,6 +198,10 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         self._names_and_notes_dict = dict()
         self._hashes = {}
         
+        self._pre_import_status_predictions_time = None
+        self._pre_import_hash_statuses = {}
+        self._pre_import_url_statuses = {}
+        
     
     def __eq__( self, other ):
         
@@ -326,6 +376,88 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         return lookup_url
         
     
+    def _GetPreImportStatusLookupHashes( self ) -> typing.List[ typing.Tuple[ str, bytes ] ]:
+        
+        hash_types_and_hashes = []
+        
+        if 'sha256' in self._hashes:
+            
+            hash_types_and_hashes.append( ( 'sha256', self._hashes[ 'sha256' ] ) )
+            
+        
+        for ( hash_type, found_hash ) in self._hashes.items():
+            
+            if hash_type == 'sha256':
+                
+                continue
+                
+            
+            hash_types_and_hashes.append( ( hash_type, found_hash ) )
+            
+        
+        return hash_types_and_hashes
+        
+    
+    def _GetPreImportStatusLookupURLs( self, file_url = None ) -> typing.List[ str ]:
+        
+        urls = []
+        
+        if self.file_seed_type == FILE_SEED_TYPE_URL:
+            
+            urls.append( self.file_seed_data )
+            
+        
+        if file_url is not None:
+            
+            urls.append( file_url )
+            
+        
+        urls.extend( self._primary_urls )
+        
+        # now that we store primary and source urls separately, we'll trust any primary but be careful about source
+        # trusting classless source urls was too much of a hassle with too many boorus providing bad source urls like user account pages
+        
+        urls.extend( ( url for url in self._source_urls if HG.client_controller.network_engine.domain_manager.URLDefinitelyRefersToOneFile( url ) ) )
+        
+        # now discard gallery pages or post urls that can hold multiple files
+        urls = [ url for url in urls if not HG.client_controller.network_engine.domain_manager.URLCanReferToMultipleFiles( url ) ]
+        
+        lookup_urls = HG.client_controller.network_engine.domain_manager.NormaliseURLs( urls )
+        
+        return lookup_urls
+        
+    
+    def _GetPreImportHashStatus( self, hash_type: str, hash: bytes ) -> ClientImportFiles.FileImportStatus:
+        
+        if self._PreImportStatusPredictionIsFresh( self._pre_import_hash_statuses, ( hash_type, hash ) ):
+            
+            return self._pre_import_hash_statuses[ ( hash_type, hash ) ].Duplicate()
+            
+        
+        return HG.client_controller.Read( 'hash_status', hash_type, hash, prefix = '{} hash recognised'.format( hash_type ) )
+        
+    
+    def _GetPreImportURLStatuses( self, lookup_url: str ) -> typing.List[ ClientImportFiles.FileImportStatus ]:
+        
+        if self._PreImportStatusPredictionIsFresh( self._pre_import_url_statuses, lookup_url ):
+            
+            return [ file_import_status.Duplicate() for file_import_status in self._pre_import_url_statuses[ lookup_url ] ]
+            
+        
+        return HG.client_controller.Read( 'url_statuses', lookup_url )
+        
+    
+    def _PreImportStatusPredictionIsFresh( self, lookups_to_statuses, lookup ):
+        
+        if not self.HasPreImportStatusPredictions() or lookup not in lookups_to_statuses:
+            
+            return False
+            
+        
+        # another file seed may have imported this file since we asked, perhaps one just ahead of us in the same queue
+        return not PreImportLookupFinishedSince( lookup, self._pre_import_status_predictions_time )
+        
+    
     def _SetupNoteImportOptions( self, given_note_import_options: NoteImportOptions.NoteImportOptions ) -> NoteImportOptions.NoteImportOptions:
         
         if given_note_import_options.IsDefault():
@@ -787,6 +919,11 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         return dict( self._hashes )
         
     
+    def GetPreImportStatusLookups( self ) -> typing.Tuple[ typing.List[ typing.Tuple[ str, bytes ] ], typing.List[ str ] ]:
+        
+        return ( self._GetPreImportStatusLookupHashes(), self._GetPreImportStatusLookupURLs() )
+        
+    
     def GetPreImportStatusPredictionHash( self, file_import_options: FileImportOptions.FileImportOptions ) -> typing.Tuple[ bool, bool, ClientImportFiles.FileImportStatus ]:
         
         # TODO: a user raised the spectre of multiple hash parses on some site that actually provides somehow the pre- and post- optimised versions of a file
@@ -804,26 +941,11 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         
         # hashes
         
-        jobs = []
-        
-        if 'sha256' in self._hashes:
-            
-            jobs.append( ( 'sha256', self._hashes[ 'sha256' ] ) )
-            
-        
-        for ( hash_type, found_hash ) in self._hashes.items():
-            
-            if hash_type == 'sha256':
-                
-                continue
-                
-            
-            jobs.append( ( hash_type, found_hash ) )
-            
+        jobs = self._GetPreImportStatusLookupHashes()
         
         for ( hash_type, found_hash ) in jobs:
             
-            file_import_status = HG.client_controller.Read( 'hash_status', hash_type, found_hash, prefix = '{} hash recognised'.format( hash_type ) )
+            file_import_status = self._GetPreImportHashStatus( hash_type, found_hash )
             
             # there's some subtle gubbins going on here
             # an sha256 'haven't seen this before' result will not set the hash here and so will not count as a match
@@ -861,29 +983,7 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         
         # urls
         
-        urls = []
-        
-        if self.file_seed_type == FILE_SEED_TYPE_URL:
-            
-            urls.append( self.file_seed_data )
-            
-        
-        if file_url is not None:
-            
-            urls.append( file_url )
-            
-        
-        urls.extend( self._primary_urls )
-        
-        # now that we store primary and source urls separately, we'll trust any primary but be careful about source
-        # trusting classless source urls was too much of a hassle with too many boorus providing bad source urls like user account pages
-        
-        urls.extend( ( url for url in self._source_urls if HG.client_controller.network_engine.domain_manager.URLDefinitelyRefersToOneFile( url ) ) )
-        
-        # now discard gallery pages or post urls that can hold multiple files
-        urls = [ url for url in urls if not HG.client_controller.network_engine.domain_manager.URLCanReferToMultipleFiles( url ) ]
-        
-        lookup_urls = HG.client_controller.network_engine.domain_manager.NormaliseURLs( urls )
+        lookup_urls = self._GetPreImportStatusLookupURLs( file_url = file_url )
         
         untrustworthy_domains = set()
         
@@ -894,7 +994,7 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
                 continue
                 
             
-            results = HG.client_controller.Read( 'url_statuses', lookup_url )
+            results = self._GetPreImportURLStatuses( lookup_url )
             
             if len( results ) == 0: # if no match found, this is a new URL, no useful data discovered
                 
@@ -978,6 +1078,11 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         return self.GetHash() is not None
         
     
+    def HasPreImportStatusPredictions( self ):
+        
+        return self._pre_import_status_predictions_time is not None and not HydrusTime.TimeHasPassed( self._pre_import_status_predictions_time + PRE_IMPORT_STATUS_PREDICTION_PERIOD )
+        
+    
     def Import( self, temp_path: str, file_import_options: FileImportOptions.FileImportOptions, status_hook = None ):
         
         if file_import_options.IsDefault():
@@ -1234,6 +1339,13 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def SetPreImportStatusPredictions( self, hash_types_and_hashes_to_statuses, urls_to_statuses ):
+        
+        self._pre_import_status_predictions_time = HydrusTime.GetNowFloat()
+        self._pre_import_hash_statuses = dict( hash_types_and_hashes_to_statuses )
+        self._pre_import_url_statuses = dict( urls_to_statuses )
+        
+    
     def SetReferralURL( self, referral_url: str ):
         
         self._referral_url = referral_url
@@ -1261,6 +1373,16 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         self.status = status
         self.note = note
         
+        # we are done with this round of work, so any batch lookups are spent
+        self._pre_import_status_predictions_time = None
+        self._pre_import_hash_statuses = {}
+        self._pre_import_url_statuses = {}
+        
+        if status in CC.SUCCESSFUL_IMPORT_STATES or status == CC.STATUS_DELETED:
+            
+            NotifyPreImportLookupsFinished( self._GetPreImportStatusLookupHashes() + self._GetPreImportStatusLookupURLs() )
+            
+        
         if status == CC.STATUS_UNKNOWN:
             
             # if user is 'try again'ing for a complicated 'the destination file changed' situation,
@@ -1340,6 +1462,13 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
             
             status_hook( 'checking url status' )
             
+            we_check_something = file_import_options.GetPreImportHashCheckType() != FileImportOptions.DO_NOT_CHECK or file_import_options.GetPreImportURLCheckType() != FileImportOptions.DO_NOT_CHECK
+            
+            if we_check_something and not self.HasPreImportStatusPredictions():
+                
+                file_seed_cache.PredictPreImportStatuses( self )
+                
+            
             ( should_download_metadata, should_download_file ) = self.PredictPreImportStatus( file_import_options, tag_import_options, note_import_options )
             
             if self.IsAPostURL():
@@ -2086,6 +2215,7 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
     SERIALISABLE_VERSION = 8
     
     COMPACT_NUMBER = 250
+    PRE_IMPORT_STATUS_PREDICTION_BATCH_SIZE = 256
     
     def __init__( self ):
         
@@ -2107,6 +2237,8 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         
         self._status_cache = FileSeedCacheStatus()
         
+        self._latest_added_time = None
+        
         self._status_dirty = True
         self._statuses_to_file_seeds_dirty = True
         self._file_seeds_to_indices_dirty = True
@@ -2245,31 +2377,33 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
     
     def _GetLatestAddedTime( self ):
         
-        if len( self._file_seeds ) == 0:
+        if self._latest_added_time is None:
             
-            latest_timestamp = 0
-            
-        else:
-            
-            latest_timestamp = max( ( file_seed.created for file_seed in self._file_seeds ) )
+            if len( self._file_seeds ) == 0:
+                
+                self._latest_added_time = 0
+                
+            else:
+                
+                self._latest_added_time = max( ( file_seed.created for file_seed in self._file_seeds ) )
+                
             
         
-        return latest_timestamp
+        return self._latest_added_time
         
     
     def _GetMyFileSeed( self, file_seed: FileSeed ) -> typing.Optional[ FileSeed ]:
         
-        search_file_seeds = file_seed.GetSearchFileSeeds()
+        file_seeds_to_indices = self._GetFileSeedsToIndices()
         
-        for f_s in self._file_seeds:
+        indices = [ file_seeds_to_indices[ search_file_seed ] for search_file_seed in file_seed.GetSearchFileSeeds() if search_file_seed in file_seeds_to_indices ]
+        
+        if len( indices ) == 0:
             
-            if f_s in search_file_seeds:
-                
-                return f_s
-                
+            return None
             
         
-        return None
+        return self._file_seeds[ min( indices ) ]
         
     
     def _GetNextFileSeed( self, status: int ) -> typing.Optional[ FileSeed ]:
@@ -2696,6 +2830,11 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                 
                 file_seeds_to_indices[ file_seed ] = index
                 
+                if self._latest_added_time is not None:
+                    
+                    self._latest_added_time = max( self._latest_added_time, file_seed.created )
+                    
+                
             
             self._FixStatusesToFileSeeds( updated_or_new_file_seeds )
             
@@ -2723,7 +2862,7 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                     
                     swapped_file_seed = self._file_seeds[ index - 1 ]
                     
-                    self._file_seeds.remove( file_seed )
+                    del self._file_seeds[ index ]
                     
                     self._file_seeds.insert( index - 1, file_seed )
                     
@@ -2808,7 +2947,7 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                     
                     swapped_file_seed = self._file_seeds[ index + 1 ]
                     
-                    self._file_seeds.remove( file_seed )
+                    del self._file_seeds[ index ]
                     
                     self._file_seeds.insert( index + 1, file_seed )
                     
@@ -3085,6 +3224,11 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                 
                 index += 1
                 
+                if self._latest_added_time is not None:
+                    
+                    self._latest_added_time = max( self._latest_added_time, file_seed.created )
+                    
+                
             
             self._SetFileSeedsToIndicesDirty()
             
@@ -3117,6 +3261,55 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         self._NotifyFileSeedsUpdated( file_seeds )
         
     
+    def PredictPreImportStatuses( self, file_seed: FileSeed ):
+        
+        # rather than every file seed asking the db about its urls and hashes one at a time, we ask about the next batch of outstanding work all at once
+        
+        with self._lock:
+            
+            file_seeds_to_predict = [ file_seed ]
+            
+            file_seeds_to_indices = self._GetFileSeedsToIndices()
+            
+            if file_seed in file_seeds_to_indices:
+                
+                for f_s in itertools.islice( self._file_seeds, file_seeds_to_indices[ file_seed ] + 1, None ):
+                    
+                    if len( file_seeds_to_predict ) >= self.PRE_IMPORT_STATUS_PREDICTION_BATCH_SIZE:
+                        
+                        break
+                        
+                    
+                    if f_s.status == CC.STATUS_UNKNOWN and f_s.IsURLFileImport() and not f_s.HasPreImportStatusPredictions():
+                        
+                        file_seeds_to_predict.append( f_s )
+                        
+                    
+                
+            
+        
+        file_seeds_to_lookups = { f_s : f_s.GetPreImportStatusLookups() for f_s in file_seeds_to_predict }
+        
+        all_hash_types_and_hashes = set()
+        all_urls = set()
+        
+        for ( hash_types_and_hashes, urls ) in file_seeds_to_lookups.values():
+            
+            all_hash_types_and_hashes.update( hash_types_and_hashes )
+            all_urls.update( urls )
+            
+        
+        ( hash_types_and_hashes_to_statuses, urls_to_statuses ) = HG.client_controller.Read( 'pre_import_statuses', all_hash_types_and_hashes, all_urls )
+        
+        for ( f_s, ( hash_types_and_hashes, urls ) ) in file_seeds_to_lookups.items():
+            
+            f_s.SetPreImportStatusPredictions(
+                { hash_type_and_hash : hash_types_and_hashes_to_statuses[ hash_type_and_hash ] for hash_type_and_hash in hash_types_and_hashes },
+                { url : urls_to_statuses[ url ] for url in urls }
+            )
+            
+        
+    
     def RemoveFileSeeds( self, file_seeds_to_delete: typing.Iterable[ FileSeed ] ):
         
         with self._lock:
@@ -3134,6 +3327,8 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
             
             self._file_seeds = HydrusSerialisable.SerialisableList( [ file_seed for file_seed in self._file_seeds if file_seed not in file_seeds_to_delete ] )
             
+            self._latest_added_time = None
+            
             self._SetFileSeedsToIndicesDirty()
             
             self._SetStatusDirty()
@@ -17,6 +17,12 @@ from hydrus.client.media import ClientMediaResult
 from hydrus.client.metadata import ClientTags
 from hydrus.client.search import ClientSearch
 
+# collecting a page bigger than this by namespace asks the db for the groups rather than walking every tags manager
+DB_COLLECT_NUM_MEDIA_THRESHOLD = 5000
+
+# counting the tags of a selection bigger than this asks the db rather than walking every tags manager
+DB_TAG_COUNT_NUM_MEDIA_THRESHOLD = 10000
+
 def FilterServiceKeysToContentUpdates( full_service_keys_to_content_updates, hashes ):
     
     filtered_service_keys_to_content_updates = {}
@@ -89,7 +95,21 @@ def GetMediasTags( pool, tag_service_key, tag_display_type, content_statuses ):
     return tags
     
 
-def GetMediaResultsTagCount( media_results, tag_service_key, tag_display_type ):
+def GetMediaResultsTagCount( media_results, tag_service_key, tag_display_type, count_in_db_if_big = False ):
+    
+    # only say count_in_db_if_big if these media results are the live ones, not copies with uncommitted edits, like in the manage tags dialog
+    
+    if count_in_db_if_big and len( media_results ) >= DB_TAG_COUNT_NUM_MEDIA_THRESHOLD:
+        
+        hash_ids = [ media_result.GetHashId() for media_result in media_results ]
+        
+        result = HG.client_controller.Read( 'media_tag_counts', hash_ids, tag_service_key, tag_display_type )
+        
+        if result is not None:
+            
+            return result
+            
+        
     
     tags_managers = [ media_result.GetTagsManager() for media_result in media_results ]
     
@@ -449,9 +469,24 @@ class MediaList( object ):
         ratings_to_collect_by = list( media_collect.rating_service_keys )
         tag_context = media_collect.tag_context
         
+        medias_to_namespace_keys = None
+        
+        if len( namespaces_to_collect_by ) > 0 and len( medias ) > DB_COLLECT_NUM_MEDIA_THRESHOLD:
+            
+            hash_ids_to_medias = { media.GetHashId() : media for media in medias }
+            
+            namespace_keys_to_hash_ids = HG.client_controller.Read( 'media_collect_groups', list( hash_ids_to_medias.keys() ), namespaces_to_collect_by, tag_context.service_key )
+            
+            medias_to_namespace_keys = { hash_ids_to_medias[ hash_id ] : namespace_key for ( namespace_key, hash_ids ) in namespace_keys_to_hash_ids.items() for hash_id in hash_ids }
+            
+        
         for media in medias:
             
-            if len( namespaces_to_collect_by ) > 0:
+            if medias_to_namespace_keys is not None:
+                
+                namespace_key = medias_to_namespace_keys[ media ]
+                
+            elif len( namespaces_to_collect_by ) > 0:
                 
                 namespace_key = media.GetTagsManager().GetNamespaceSlice( tag_context.service_key, namespaces_to_collect_by, ClientTags.TAG_DISPLAY_ACTUAL )
                 
@@ -743,7 +778,20 @@ class MediaList( object ):
                     
                 
             
-            self._collected_media = { self._GenerateMediaCollection( [ media.GetMediaResult() for media in medias ] ) for ( key, medias ) in keys_to_medias.items() }# if len( medias ) > 1 }
+            self._collected_media = set()
+            
+            for ( ( namespace_key, rating_key ), medias ) in keys_to_medias.items():
+                
+                media_collection = self._GenerateMediaCollection( [ media.GetMediaResult() for media in medias ] )
+                
+                if len( media_collect.namespaces ) > 0:
+                    
+                    media_collection.SetCollectNamespaceSlice( media_collect.tag_context.service_key, media_collect.namespaces, namespace_key )
+                    
+                
+                self._collected_media.add( media_collection )
+                
+            
             
         else:
             
@@ -1207,6 +1255,9 @@ class MediaCollection( MediaList, Media ):
         self._locations_manager = None
         self._file_viewing_stats_manager = None
         
+        # ( service_key, namespaces, namespace_key ) of the collect that made us, if still valid
+        self._collect_namespace_slice = None
+        
         self._internals_dirty = False
         
         self._RecalcInternals()
@@ -1425,6 +1476,8 @@ class MediaCollection( MediaList, Media ):
         
         self._tags_manager = ClientMediaManagers.TagsManager.MergeTagsManagers( tags_managers )
         
+        self._collect_namespace_slice = None
+        
     
     def AddMedia( self, new_media ):
         
@@ -1440,6 +1493,25 @@ class MediaCollection( MediaList, Media ):
         self._RecalcInternals()
         
     
+    def GetCollectComparableNamespaceSlice( self, service_key: bytes, namespaces: typing.Collection[ str ], tag_display_type: int ):
+        
+        # if we were collected by these namespaces, every file in here has the same slice, so we can sort without going through the merged tags manager
+        
+        if self._collect_namespace_slice is None or tag_display_type != ClientTags.TAG_DISPLAY_ACTUAL:
+            
+            return None
+            
+        
+        ( collect_service_key, collect_namespaces, namespace_key ) = self._collect_namespace_slice
+        
+        if service_key != collect_service_key or not set( namespaces ).issubset( collect_namespaces ):
+            
+            return None
+            
+        
+        return ClientMediaManagers.GetComparableNamespaceSlice( namespace_key, namespaces )
+        
+    
     def GetDisplayMedia( self ):
         
         first = self._GetFirst()
@@ -1623,6 +1695,11 @@ class MediaCollection( MediaList, Media ):
         self._RecalcInternals()
         
     
+    def SetCollectNamespaceSlice( self, service_key: bytes, namespaces: typing.Collection[ str ], namespace_key: typing.FrozenSet[ str ] ):
+        
+        self._collect_namespace_slice = ( service_key, frozenset( namespaces ), namespace_key )
+        
+    
     def UpdateFileInfo( self, hashes_to_media_results ):
         
         for media in self._sorted_media:
@@ -2538,6 +2615,16 @@ class MediaSort( HydrusSerialisable.SerialisableBase ):
             
             def sort_key( x ):
                 
+                if x.IsCollection():
+                    
+                    collect_slice = x.GetCollectComparableNamespaceSlice( self.tag_context.service_key, namespaces, tag_display_type )
+                    
+                    if collect_slice is not None:
+                        
+                        return [ ( namespace_slice, ) for namespace_slice in collect_slice ]
+                        
+                    
+                
                 x_tags_manager = x.GetTagsManager()
                 
                 return [ x_tags_manager.GetComparableNamespaceSlice( self.tag_context.service_key, ( namespace, ), tag_display_type ) for namespace in namespaces ]
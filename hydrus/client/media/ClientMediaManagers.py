@@ -2,6 +2,7 @@ import collections
 import itertools
 import threading
 import typing
+import weakref
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusTags
@@ -16,6 +17,22 @@ from hydrus.client import ClientTime
 from hydrus.client.metadata import ClientTags
 from hydrus.client.search import ClientSearch
 
+def GetComparableNamespaceSlice( tags: typing.Collection[ str ], namespaces: typing.Collection[ str ] ):
+    
+    pairs = [ HydrusTags.SplitTag( tag ) for tag in tags ]
+    
+    slice_tags = []
+    
+    for desired_namespace in namespaces:
+        
+        subtags = sorted( ( HydrusTags.ConvertTagToSortable( subtag ) for ( namespace, subtag ) in pairs if namespace == desired_namespace ) )
+        
+        slice_tags.append( tuple( subtags ) )
+        
+    
+    return tuple( slice_tags )
+    
+
 class FileDuplicatesManager( object ):
     
     def __init__( self, media_group_king_hash, alternates_group_id, dupe_statuses_to_counts ):
@@ -1400,6 +1417,105 @@ class TagsManager( object ):
         return self._tag_display_types_to_service_keys_to_statuses_to_tags[ tag_display_type ]
         
     
+    def _ProcessContentUpdate( self, service_key, content_update: HydrusData.ContentUpdate ):
+        
+        service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
+        
+        statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
+        
+        ( data_type, action, row ) = content_update.ToTuple()
+        
+        ( tag, hashes ) = row
+        
+        if action == HC.CONTENT_UPDATE_ADD:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].add( tag )
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
+            statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
+            
+        elif action == HC.CONTENT_UPDATE_DELETE:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].add( tag )
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].discard( tag )
+            statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].discard( tag )
+            
+        elif action == HC.CONTENT_UPDATE_PEND:
+            
+            if tag not in statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]:
+                
+                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].add( tag )
+                
+            
+        elif action == HC.CONTENT_UPDATE_RESCIND_PEND:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
+            
+        elif action == HC.CONTENT_UPDATE_PETITION:
+            
+            if tag in statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]:
+                
+                statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].add( tag )
+                
+            
+        elif action == HC.CONTENT_UPDATE_RESCIND_PETITION:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].discard( tag )
+            
+        elif action == HC.CONTENT_UPDATE_CLEAR_DELETE_RECORD:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
+            
+        
+        #
+        
+        # this does not need to do clever sibling collapse or parent gubbins, because in that case, the db forces tagsmanager refresh
+        # so this is just handling things if the content update has no sibling/parent tags
+        
+        service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_ACTUAL )
+        
+        statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
+        
+        ( data_type, action, row ) = content_update.ToTuple()
+        
+        ( tag, hashes ) = row
+        
+        if action == HC.CONTENT_UPDATE_ADD:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].add( tag )
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
+            statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
+            
+        elif action == HC.CONTENT_UPDATE_DELETE:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].add( tag )
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].discard( tag )
+            statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].discard( tag )
+            
+        elif action == HC.CONTENT_UPDATE_PEND:
+            
+            if tag not in statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]:
+                
+                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].add( tag )
+                
+            
+        elif action == HC.CONTENT_UPDATE_RESCIND_PEND:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
+            
+        elif action == HC.CONTENT_UPDATE_CLEAR_DELETE_RECORD:
+            
+            statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
+            
+        
+        #
+        
+        self._SetDirty()
+        
+    
     def _RecalcStorageCache( self ):
         
         service_keys_to_statuses_to_tags = self._tag_display_types_to_service_keys_to_statuses_to_tags[ ClientTags.TAG_DISPLAY_STORAGE ]
@@ -1671,18 +1787,7 @@ class TagsManager( object ):
             
             combined_tags = statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].union( statuses_to_tags[ HC.CONTENT_STATUS_PENDING ] )
             
-            pairs = [ HydrusTags.SplitTag( tag ) for tag in combined_tags ]
-            
-            slice_tags = []
-            
-            for desired_namespace in namespaces:
-                
-                subtags = sorted( ( HydrusTags.ConvertTagToSortable( subtag ) for ( namespace, subtag ) in pairs if namespace == desired_namespace ) )
-                
-                slice_tags.append( tuple( subtags ) )
-                
-            
-            return tuple( slice_tags )
+            return GetComparableNamespaceSlice( combined_tags, namespaces )
             
         
     
@@ -1832,6 +1937,11 @@ class TagsManager( object ):
             
         
     
+    def IsFullyLoaded( self ):
+        
+        return True
+        
+    
     def NewTagDisplayRules( self ):
         
         with self._lock:
@@ -1844,116 +1954,270 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
-            
-            statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
+            self._ProcessContentUpdate( service_key, content_update )
             
-            ( data_type, action, row ) = content_update.ToTuple()
+        
+    
+    def ResetService( self, service_key ):
+        
+        with self._lock:
             
-            ( tag, hashes ) = row
+            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
             
-            if action == HC.CONTENT_UPDATE_ADD:
-                
-                statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].add( tag )
-                
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
-                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
-                
-            elif action == HC.CONTENT_UPDATE_DELETE:
-                
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].add( tag )
-                
-                statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].discard( tag )
-                statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].discard( tag )
-                
-            elif action == HC.CONTENT_UPDATE_PEND:
+            if service_key in service_keys_to_statuses_to_tags:
                 
-                if tag not in statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]:
-                    
-                    statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].add( tag )
-                    
+                del service_keys_to_statuses_to_tags[ service_key ]
                 
-            elif action == HC.CONTENT_UPDATE_RESCIND_PEND:
+                self._SetDirty()
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
+            
+        
+    
+
+class LazyTagsManagerLoadGroup( object ):
+    
+    # all the lazy tags managers from one db read share one of these, so when one of them needs its full tags, the whole batch comes in together
+    
+    def __init__( self ):
+        
+        self._lock = threading.Lock()
+        
+        self._hash_ids_to_tags_managers = weakref.WeakValueDictionary()
+        
+        self._load_started = False
+        self._load_done = threading.Event()
+        
+    
+    def AddTagsManager( self, hash_id: int, tags_manager: "LazyTagsManager" ):
+        
+        with self._lock:
+            
+            self._hash_ids_to_tags_managers[ hash_id ] = tags_manager
+            
+        
+    
+    def LoadFullTags( self ):
+        
+        # the whole group loads once. we don't hold our lock over the db read, anyone else who wants it in the meantime just waits for it to finish
+        
+        with self._lock:
+            
+            if self._load_started:
                 
-            elif action == HC.CONTENT_UPDATE_PETITION:
+                do_it = False
                 
-                if tag in statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]:
-                    
-                    statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].add( tag )
-                    
+            else:
                 
-            elif action == HC.CONTENT_UPDATE_RESCIND_PETITION:
+                do_it = True
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].discard( tag )
+                self._load_started = True
                 
-            elif action == HC.CONTENT_UPDATE_CLEAR_DELETE_RECORD:
+                hash_ids_to_lazy_tags_managers = { hash_id : tags_manager for ( hash_id, tags_manager ) in list( self._hash_ids_to_tags_managers.items() ) if not tags_manager.IsFullyLoaded() }
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
+                self._hash_ids_to_tags_managers = weakref.WeakValueDictionary()
                 
             
-            #
-            
-            # this does not need to do clever sibling collapse or parent gubbins, because in that case, the db forces tagsmanager refresh
-            # so this is just handling things if the content update has no sibling/parent tags
-            
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_ACTUAL )
+        
+        if not do_it:
             
-            statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
+            self._load_done.wait()
             
-            ( data_type, action, row ) = content_update.ToTuple()
+            return
             
-            ( tag, hashes ) = row
+        
+        try:
             
-            if action == HC.CONTENT_UPDATE_ADD:
+            if len( hash_ids_to_lazy_tags_managers ) > 0:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].add( tag )
+                hash_ids_to_tags_managers = HG.client_controller.Read( 'force_refresh_tags_managers', list( hash_ids_to_lazy_tags_managers.keys() ) )
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
-                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
-                
-            elif action == HC.CONTENT_UPDATE_DELETE:
-                
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].add( tag )
-                
-                statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].discard( tag )
-                statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].discard( tag )
-                
-            elif action == HC.CONTENT_UPDATE_PEND:
-                
-                if tag not in statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]:
+                for ( hash_id, lazy_tags_manager ) in hash_ids_to_lazy_tags_managers.items():
                     
-                    statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].add( tag )
+                    if hash_id in hash_ids_to_tags_managers:
+                        
+                        lazy_tags_manager.SetFullTags( hash_ids_to_tags_managers[ hash_id ] )
+                        
                     
                 
-            elif action == HC.CONTENT_UPDATE_RESCIND_PEND:
+            
+        finally:
+            
+            self._load_done.set()
+            
+        
+    
+
+class LazyTagsManager( TagsManager ):
+    
+    # a thumbnail grid only needs display current and pending tags, so that's all this starts with, plus the deleted and petitioned storage records so the display lists are right
+    # the storage current and pending is the bulk of it, and we only fetch that, for the whole load group, if anything actually asks for storage tags
+    # edits (content updates, service resets) are applied to what we have without a fetch, since the db has them by the time we would fetch
+    # the exception is petitions, which check the storage current tags we don't have yet. we never fetch for those (we may be on the db thread), we hold them until the full tags come in
+    
+    def __init__(
+        self,
+        service_keys_to_statuses_to_storage_tags: typing.Dict[ bytes, typing.Dict[ int, typing.Set[ str ] ] ],
+        service_keys_to_statuses_to_display_tags: typing.Dict[ bytes, typing.Dict[ int, typing.Set[ str ] ] ],
+        load_group: LazyTagsManagerLoadGroup
+        ):
+            
+        TagsManager.__init__( self, service_keys_to_statuses_to_storage_tags, service_keys_to_statuses_to_display_tags )
+        
+        self._load_group = load_group
+        self._fully_loaded = False
+        
+        self._petition_updates_waiting_for_full_tags = []
+        
+    
+    def _LoadFullTagsIfNeeded( self, tag_display_type = ClientTags.TAG_DISPLAY_STORAGE ):
+        
+        # do not call this while holding our lock--the load group will want it
+        
+        if tag_display_type == ClientTags.TAG_DISPLAY_STORAGE and not self._fully_loaded:
+            
+            load_group = self._load_group
+            
+            if load_group is not None:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
+                load_group.LoadFullTags()
                 
-            elif action == HC.CONTENT_UPDATE_CLEAR_DELETE_RECORD:
+            
+        
+    
+    def Duplicate( self ):
+        
+        self._LoadFullTagsIfNeeded()
+        
+        return TagsManager.Duplicate( self )
+        
+    
+    def GetComparableNamespaceSlice( self, service_key: bytes, namespaces: typing.Collection[ str ], tag_display_type: int ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.GetComparableNamespaceSlice( self, service_key, namespaces, tag_display_type )
+        
+    
+    def GetCurrent( self, service_key, tag_display_type ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.GetCurrent( self, service_key, tag_display_type )
+        
+    
+    def GetCurrentAndPending( self, service_key, tag_display_type ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.GetCurrentAndPending( self, service_key, tag_display_type )
+        
+    
+    def GetDeleted( self, service_key, tag_display_type ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.GetDeleted( self, service_key, tag_display_type )
+        
+    
+    def GetNamespaceSlice( self, service_key: bytes, namespaces: typing.Collection[ str ], tag_display_type: int ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.GetNamespaceSlice( self, service_key, namespaces, tag_display_type )
+        
+    
+    def GetNumTags( self, tag_context: ClientSearch.TagContext, tag_display_type ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.GetNumTags( self, tag_context, tag_display_type )
+        
+    
+    def GetPending( self, service_key, tag_display_type ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.GetPending( self, service_key, tag_display_type )
+        
+    
+    def GetPetitioned( self, service_key, tag_display_type ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.GetPetitioned( self, service_key, tag_display_type )
+        
+    
+    def GetServiceKeysToStatusesToTags( self, tag_display_type ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.GetServiceKeysToStatusesToTags( self, tag_display_type )
+        
+    
+    def GetStatusesToTags( self, service_key, tag_display_type ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.GetStatusesToTags( self, service_key, tag_display_type )
+        
+    
+    def HasTag( self, tag, tag_display_type ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.HasTag( self, tag, tag_display_type )
+        
+    
+    def HasAnyOfTheseTags( self, tags, tag_display_type ):
+        
+        self._LoadFullTagsIfNeeded( tag_display_type )
+        
+        return TagsManager.HasAnyOfTheseTags( self, tags, tag_display_type )
+        
+    
+    def IsFullyLoaded( self ):
+        
+        return self._fully_loaded
+        
+    
+    def ProcessContentUpdate( self, service_key, content_update: HydrusData.ContentUpdate ):
+        
+        with self._lock:
+            
+            if not self._fully_loaded and content_update.GetAction() in ( HC.CONTENT_UPDATE_PETITION, HC.CONTENT_UPDATE_RESCIND_PETITION ):
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
+                # rescinds go in too, so they stay in order with the petitions
+                self._petition_updates_waiting_for_full_tags.append( ( service_key, content_update ) )
                 
             
-            #
-            
-            self._SetDirty()
+            self._ProcessContentUpdate( service_key, content_update )
             
         
     
-    def ResetService( self, service_key ):
+    def SetFullTags( self, tags_manager: TagsManager ):
+        
+        service_keys_to_statuses_to_storage_tags = tags_manager.GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
+        service_keys_to_statuses_to_display_tags = tags_manager.GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_ACTUAL )
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
+            self._tag_display_types_to_service_keys_to_statuses_to_tags = {
+                ClientTags.TAG_DISPLAY_STORAGE : service_keys_to_statuses_to_storage_tags,
+                ClientTags.TAG_DISPLAY_ACTUAL : service_keys_to_statuses_to_display_tags
+            }
             
-            if service_key in service_keys_to_statuses_to_tags:
+            # the db may have read these before a petition we were told about went in. if it read them after, replaying changes nothing
+            for ( service_key, content_update ) in self._petition_updates_waiting_for_full_tags:
                 
-                del service_keys_to_statuses_to_tags[ service_key ]
-                
-                self._SetDirty()
+                self._ProcessContentUpdate( service_key, content_update )
                 
             
+            self._petition_updates_waiting_for_full_tags = []
+            
+            self._SetDirty()
+            
+            self._load_group = None
+            self._fully_loaded = True
+            
         
     
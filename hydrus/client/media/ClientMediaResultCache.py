@@ -70,11 +70,53 @@ class MediaResultCache( object ):
             
         
     
+    def FilterFilesWithLazyTags( self, hash_ids: typing.Collection[ int ] ):
+        
+        with self._lock:
+            
+            hash_ids_with_lazy_tags = set()
+            
+            for hash_id in hash_ids:
+                
+                media_result = self._hash_ids_to_media_results.get( hash_id, None )
+                
+                if media_result is not None and not media_result.GetTagsManager().IsFullyLoaded():
+                    
+                    hash_ids_with_lazy_tags.add( hash_id )
+                    
+                
+            
+            return hash_ids_with_lazy_tags
+            
+        
+    
     def FilterFilesWithTags( self, tags: typing.Collection[ str ] ):
         
         with self._lock:
             
-            return { hash_id for ( hash_id, media_result ) in self._hash_ids_to_media_results.items() if media_result.GetTagsManager().HasAnyOfTheseTags( tags, ClientTags.TAG_DISPLAY_STORAGE ) }
+            hash_ids = set()
+            
+            for ( hash_id, media_result ) in self._hash_ids_to_media_results.items():
+                
+                tags_manager = media_result.GetTagsManager()
+                
+                # we are probably in the db thread, so a lazy tags manager must not go off to fetch its storage tags. its display tags are a fine proxy
+                if tags_manager.IsFullyLoaded():
+                    
+                    tag_display_type = ClientTags.TAG_DISPLAY_STORAGE
+                    
+                else:
+                    
+                    tag_display_type = ClientTags.TAG_DISPLAY_ACTUAL
+                    
+                
+                if tags_manager.HasAnyOfTheseTags( tags, tag_display_type ):
+                    
+                    hash_ids.add( hash_id )
+                    
+                
+            
+            return hash_ids
             
         
     
@@ -115,16 +157,21 @@ class MediaResultCache( object ):
         
         # repo sync or tag migration occurred, so we need complete refresh
         
-        def do_it( hash_ids ):
+        def do_it( hash_ids, lazy_hash_ids ):
+            
+            # lazy tags managers that have not loaded their full tags yet get a fresh lazy one, so we aren't loading a giant page's worth of tags here
             
-            for group_of_hash_ids in HydrusLists.SplitListIntoChunks( hash_ids, 256 ):
+            groups_of_hash_ids_and_laziness = [ ( group_of_hash_ids, False ) for group_of_hash_ids in HydrusLists.SplitListIntoChunks( hash_ids, 256 ) ]
+            groups_of_hash_ids_and_laziness.extend( ( ( group_of_hash_ids, True ) for group_of_hash_ids in HydrusLists.SplitListIntoChunks( lazy_hash_ids, 256 ) ) )
+            
+            for ( group_of_hash_ids, lazy ) in groups_of_hash_ids_and_laziness:
                 
                 if HydrusThreading.IsThreadShuttingDown():
                     
                     return
                     
                 
-                hash_ids_to_tags_managers = HG.client_controller.Read( 'force_refresh_tags_managers', group_of_hash_ids )
+                hash_ids_to_tags_managers = HG.client_controller.Read( 'force_refresh_tags_managers', group_of_hash_ids, lazy = lazy )
                 
                 with self._lock:
                     
@@ -145,10 +192,23 @@ class MediaResultCache( object ):
         
         with self._lock:
             
-            hash_ids = list( self._hash_ids_to_media_results.keys() )
+            hash_ids = []
+            lazy_hash_ids = []
+            
+            for ( hash_id, media_result ) in self._hash_ids_to_media_results.items():
+                
+                if media_result.GetTagsManager().IsFullyLoaded():
+                    
+                    hash_ids.append( hash_id )
+                    
+                else:
+                    
+                    lazy_hash_ids.append( hash_id )
+                    
+                
             
         
-        HG.client_controller.CallToThread( do_it, hash_ids )
+        HG.client_controller.CallToThread( do_it, hash_ids, lazy_hash_ids )
         
     
     def NewTagDisplayRules( self ):
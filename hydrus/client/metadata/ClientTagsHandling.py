@@ -1,5 +1,4 @@
 import collections
-import random
 import threading
 import time
 import typing
@@ -15,6 +14,51 @@ from hydrus.core import HydrusTime
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientLocation
 
+def GetImpliedByDiff( tags: typing.Collection[ object ], previous_tags_to_implied_by, after_tags_to_implied_by ):
+    
+    # given what implied these (display) tags before and after a change, what implication rows do we need to add and delete?
+    # the 'after' here still comes from regenerating the whole chains, so this saves on writes, not on working the chains out
+    
+    tags_to_add_implied_by = collections.defaultdict( set )
+    tags_to_delete_implied_by = collections.defaultdict( set )
+    
+    for tag in tags:
+        
+        previous_implied_by = previous_tags_to_implied_by.get( tag, set() )
+        after_implied_by = after_tags_to_implied_by.get( tag, set() )
+        
+        to_delete = previous_implied_by.difference( after_implied_by )
+        to_add = after_implied_by.difference( previous_implied_by )
+        
+        if len( to_delete ) > 0:
+            
+            tags_to_delete_implied_by[ tag ] = to_delete
+            
+        
+        if len( to_add ) > 0:
+            
+            tags_to_add_implied_by[ tag ] = to_add
+            
+        
+    
+    return ( tags_to_add_implied_by, tags_to_delete_implied_by )
+    
+def GetLookupRowsDiff( previous_rows: typing.Collection[ typing.Tuple[ object, object ] ], after_rows: typing.Collection[ typing.Tuple[ object, object ] ], removal_scope_tags: typing.Collection[ object ] ):
+    
+    # previous_rows are what the lookup table currently has for the chains we regenerated, after_rows are what a full regen of those chains produced
+    # this is a diff of the two for writing, so a big chain that barely changed is a handful of row writes, not a wipe and rewrite. the regen itself is unchanged
+    # we only remove rows that touch the removal scope, so an incomplete fetch of a neighbouring chain never wipes good data
+    
+    if not isinstance( after_rows, set ):
+        
+        after_rows = set( after_rows )
+        
+    
+    rows_to_add = after_rows.difference( previous_rows )
+    rows_to_remove = { row for row in previous_rows if row not in after_rows and ( row[0] in removal_scope_tags or row[1] in removal_scope_tags ) }
+    
+    return ( rows_to_add, rows_to_remove )
+    
 class TagAutocompleteOptions( HydrusSerialisable.SerialisableBase ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_TAG_AUTOCOMPLETE_OPTIONS
@@ -353,10 +397,14 @@ class TagDisplayMaintenanceManager( object ):
         self._controller = controller
         
         self._service_keys_to_needs_work = {}
+        self._service_keys_to_num_rows_to_sync = {}
+        self._service_keys_to_last_work_time = {}
+        self._service_keys_to_last_loop_work_time = {}
+        self._service_keys_to_rows_per_second = {}
         
         self._go_faster = set()
         
-        self._last_loop_work_time = 0.5
+        self._focused_service_key = None
         
         self._shutdown = False
         self._mainloop_finished = False
@@ -373,17 +421,27 @@ class TagDisplayMaintenanceManager( object ):
         self._controller.sub( self, 'NotifyNewDisplayData', 'notify_new_tag_display_application' )
         
     
-    def _GetAfterWorkWaitTime( self, service_key, expected_work_time, actual_work_time ):
+    def _GetAfterWorkWaitTime( self, service_keys, expected_work_time, actual_work_time ):
         
         with self._lock:
             
-            if service_key in self._go_faster:
+            going_faster = False
+            
+            for service_key in service_keys:
                 
-                if service_key in self._service_keys_to_needs_work and not self._service_keys_to_needs_work[ service_key ]:
+                if service_key in self._go_faster:
+                    
+                    going_faster = True
                     
-                    self._go_faster.discard( service_key )
+                    if service_key in self._service_keys_to_needs_work and not self._service_keys_to_needs_work[ service_key ]:
+                        
+                        self._go_faster.discard( service_key )
+                        
                     
                 
+            
+            if going_faster:
+                
                 return 0.1
                 
             
@@ -408,25 +466,53 @@ class TagDisplayMaintenanceManager( object ):
             
         
     
-    def _GetServiceKeyToWorkOn( self ):
+    def _GetServiceKeysToWorkOn( self ):
         
-        if len( self._go_faster ) > 0:
+        with self._lock:
             
-            service_keys_that_need_work = list( self._go_faster )
+            if len( self._go_faster ) > 0:
+                
+                service_keys_that_need_work = list( self._go_faster )
+                
+            else:
+                
+                service_keys_that_need_work = [ service_key for ( service_key, needs_work ) in self._service_keys_to_needs_work.items() if needs_work ]
+                
+                if len( service_keys_that_need_work ) == 0:
+                    
+                    raise HydrusExceptions.NotFoundException( 'No service keys need work!' )
+                    
+                
             
-        else:
+            # round robin, so a big PTR job doesn't starve the little local services. whatever the user is looking at jumps the queue
             
-            service_keys_that_need_work = [ service_key for ( service_key, needs_work ) in self._service_keys_to_needs_work.items() if needs_work ]
+            service_keys_that_need_work.sort( key = lambda s_k: ( s_k != self._focused_service_key, self._service_keys_to_last_work_time.get( s_k, 0 ) ) )
             
-            if len( service_keys_that_need_work ) == 0:
-                
-                raise HydrusExceptions.NotFoundException( 'No service keys need work!' )
-                
+            return service_keys_that_need_work
+        
+    
+    def _GetServiceKeysToWorkTimes( self ):
+        
+        service_keys = self._GetServiceKeysToWorkOn()
+        
+        with self._lock:
+            
+            going_faster = len( self._go_faster ) > 0
             
         
-        ( service_key, ) = random.sample( service_keys_that_need_work, 1 )
+        if going_faster or self._controller.CurrentlyIdle():
+            
+            # the user asked for speed or is away, so let's do everything in one big job rather than a bunch of small ones
+            # everyone gets their own full budget, just as they would if we did them one at a time
+            
+            return { service_key : self._GetWorkTime( service_key ) for service_key in service_keys }
+            
         
-        return service_key
+        # when the user is active, we do one small piece at a time
+        
+        service_key = service_keys[0]
+        
+        return { service_key : self._GetWorkTime( service_key ) }
         
     
     def _GetWorkTime( self, service_key ):
@@ -437,7 +523,7 @@ class TagDisplayMaintenanceManager( object ):
                 
                 ideally = 30
                 
-                base = max( 0.5, self._last_loop_work_time )
+                base = max( 0.5, self._service_keys_to_last_loop_work_time.get( service_key, 0.5 ) )
                 
                 accelerating_time = min( base * 1.2, ideally )
                 
@@ -455,6 +541,39 @@ class TagDisplayMaintenanceManager( object ):
             
         
     
+    def _NotifyWorkDone( self, service_key, num_rows_to_sync, work_time ):
+        
+        now = HydrusTime.GetNowPrecise()
+        
+        with self._lock:
+            
+            # we measure progress against wall time, rests included, so the ETA is what the user will actually see
+            
+            if service_key in self._service_keys_to_num_rows_to_sync and service_key in self._service_keys_to_last_work_time:
+                
+                num_rows_done = self._service_keys_to_num_rows_to_sync[ service_key ] - num_rows_to_sync
+                time_passed = now - self._service_keys_to_last_work_time[ service_key ]
+                
+                if num_rows_done > 0 and time_passed > 0:
+                    
+                    rows_per_second = num_rows_done / time_passed
+                    
+                    if service_key in self._service_keys_to_rows_per_second:
+                        
+                        rows_per_second = ( self._service_keys_to_rows_per_second[ service_key ] * 4 + rows_per_second ) / 5
+                        
+                    
+                    self._service_keys_to_rows_per_second[ service_key ] = rows_per_second
+                    
+                
+            
+            self._service_keys_to_needs_work[ service_key ] = num_rows_to_sync > 0
+            self._service_keys_to_num_rows_to_sync[ service_key ] = num_rows_to_sync
+            self._service_keys_to_last_work_time[ service_key ] = now
+            self._service_keys_to_last_loop_work_time[ service_key ] = work_time
+            
+        
+    
     def _WorkPermitted( self ):
         
         if len( self._go_faster ) > 0:
@@ -498,10 +617,16 @@ class TagDisplayMaintenanceManager( object ):
                 
                 status = self._controller.Read( 'tag_display_maintenance_status', service_key )
                 
-                work_to_do = status[ 'num_siblings_to_sync' ] + status[ 'num_parents_to_sync' ] > 0
+                num_rows_to_sync = status[ 'num_siblings_to_sync' ] + status[ 'num_parents_to_sync' ]
+                
+                work_to_do = num_rows_to_sync > 0
                 sync_halted = len( status[ 'waiting_on_tag_repos' ] ) > 0
                 
-                self._service_keys_to_needs_work[ service_key ] = work_to_do and not sync_halted
+                with self._lock:
+                    
+                    self._service_keys_to_needs_work[ service_key ] = work_to_do and not sync_halted
+                    self._service_keys_to_num_rows_to_sync[ service_key ] = num_rows_to_sync
+                    
                 
             
             if self._service_keys_to_needs_work[ service_key ]:
@@ -545,6 +670,28 @@ class TagDisplayMaintenanceManager( object ):
         return 'tag display sync'
         
     
+    def GetSyncETA( self, service_key, num_rows_to_sync ) -> typing.Optional[ float ]:
+        
+        # how many seconds until we are done, going at the speed we have recently seen. None if we have no idea
+        
+        if num_rows_to_sync == 0:
+            
+            return 0
+            
+        
+        with self._lock:
+            
+            if service_key not in self._service_keys_to_rows_per_second:
+                
+                return None
+                
+            
+            rows_per_second = self._service_keys_to_rows_per_second[ service_key ]
+            
+        
+        return num_rows_to_sync / rows_per_second
+        
+    
     def IsShutdown( self ):
         
         return self._mainloop_finished
@@ -566,7 +713,7 @@ class TagDisplayMaintenanceManager( object ):
                     
                     try:
                         
-                        service_key = self._GetServiceKeyToWorkOn()
+                        service_keys_to_work_times = self._GetServiceKeysToWorkTimes()
                         
                     except HydrusExceptions.NotFoundException:
                         
@@ -577,21 +724,23 @@ class TagDisplayMaintenanceManager( object ):
                         continue
                         
                     
-                    work_time = self._GetWorkTime( service_key )
+                    work_time = sum( service_keys_to_work_times.values() )
                     
                     start_time = HydrusTime.GetNowPrecise()
                     
-                    still_needs_work = self._controller.WriteSynchronous( 'sync_tag_display_maintenance', service_key, work_time )
+                    service_keys_to_num_rows_to_sync = self._controller.WriteSynchronous( 'sync_tag_display_maintenance_services', service_keys_to_work_times )
                     
                     finish_time = HydrusTime.GetNowPrecise()
                     
                     total_time_took = finish_time - start_time
                     
-                    self._service_keys_to_needs_work[ service_key ] = still_needs_work
-                    
-                    wait_time = self._GetAfterWorkWaitTime( service_key, work_time, total_time_took )
+                    for ( service_key, num_rows_to_sync ) in service_keys_to_num_rows_to_sync.items():
+                        
+                        self._NotifyWorkDone( service_key, num_rows_to_sync, service_keys_to_work_times[ service_key ] )
+                        
                     
-                    self._last_loop_work_time = work_time
+                    # we pace on the whole job's time, since that is how long the db was busy
+                    wait_time = self._GetAfterWorkWaitTime( list( service_keys_to_work_times.keys() ), work_time, total_time_took )
                     
                 else:
                     
@@ -609,7 +758,10 @@ class TagDisplayMaintenanceManager( object ):
                     self._last_last_new_data_event_time = self._last_new_data_event_time
                     self._last_new_data_event_time = HydrusTime.GetNow()
                     
-                    self._service_keys_to_needs_work = {}
+                    with self._lock:
+                        
+                        self._service_keys_to_needs_work = {}
+                        
                     
                     self._new_data_event.clear()
                     
@@ -628,6 +780,16 @@ class TagDisplayMaintenanceManager( object ):
         self.Wake()
         
     
+    def SetFocusedServiceKey( self, service_key: typing.Optional[ bytes ] ):
+        
+        # the service the user is looking at in the sync review panel. it gets first go
+        
+        with self._lock:
+            
+            self._focused_service_key = service_key
+            
+        
+    
     def Shutdown( self ):
         
         self._shutdown = True
@@ -106,6 +106,7 @@ class HydrusServiceClientAPI( HydrusClientService ):
         manage_database.putChild( b'mr_bones', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseMrBones( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'lock_on', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseLockOn( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'lock_off', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseLockOff( self._service, self._client_requests_domain ) )
+        manage_database.putChild( b'get_tag_display_sync_status', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseGetTagDisplaySyncStatus( self._service, self._client_requests_domain ) )
         
         manage_file_relationships = NoResource()
         
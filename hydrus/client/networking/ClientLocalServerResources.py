@@ -3512,6 +3512,54 @@ class HydrusResourceClientAPIRestrictedManageDatabaseMrBones( HydrusResourceClie
         
     
 
+class HydrusResourceClientAPIRestrictedManageDatabaseGetTagDisplaySyncStatus( HydrusResourceClientAPIRestrictedManageDatabase ):
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        tag_display_maintenance_manager = HG.client_controller.tag_display_maintenance_manager
+        
+        service_keys = HG.client_controller.services_manager.GetServiceKeys( HC.REAL_TAG_SERVICES )
+        
+        service_keys_to_statuses = HG.client_controller.Read( 'tag_display_maintenance_statuses', service_keys )
+        
+        tag_display_sync_status = {}
+        
+        for ( service_key, status ) in service_keys_to_statuses.items():
+            
+            num_rows_to_sync = status[ 'num_siblings_to_sync' ] + status[ 'num_parents_to_sync' ]
+            
+            eta = tag_display_maintenance_manager.GetSyncETA( service_key, num_rows_to_sync )
+            
+            if eta is not None:
+                
+                eta = int( eta )
+                
+            
+            tag_display_sync_status[ service_key.hex() ] = {
+                'num_siblings_to_sync' : status[ 'num_siblings_to_sync' ],
+                'num_parents_to_sync' : status[ 'num_parents_to_sync' ],
+                'num_actual_rows' : status[ 'num_actual_rows' ],
+                'num_ideal_rows' : status[ 'num_ideal_rows' ],
+                'waiting_on_tag_repos' : list( status[ 'waiting_on_tag_repos' ] ),
+                'going_faster' : tag_display_maintenance_manager.CurrentlyGoingFaster( service_key ),
+                'eta' : eta
+            }
+            
+        
+        body_dict = {
+            'tag_display_sync_status' : tag_display_sync_status,
+            'services' : GetServicesDict()
+        }
+        
+        mime = request.preferred_mime
+        body = Dumps( body_dict, mime )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, body = body )
+        
+        return response_context
+        
+    
+
 class HydrusResourceClientAPIRestrictedManageFileRelationships( HydrusResourceClientAPIRestricted ):
     
     def _CheckAPIPermissions( self, request: HydrusServerRequest.HydrusRequest ):
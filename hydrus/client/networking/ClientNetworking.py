@@ -1,6 +1,8 @@
 import collections
+import heapq
+import itertools
+import math
 import threading
-import time
 import typing
 
 from hydrus.core import HydrusData
@@ -8,6 +10,7 @@ from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusTime
 
+from hydrus.client.networking import ClientNetworkingAsync
 from hydrus.client.networking import ClientNetworkingBandwidth
 from hydrus.client.networking import ClientNetworkingSessions
 from hydrus.client.networking import ClientNetworkingDomain
@@ -28,6 +31,9 @@ job_status_str_lookup = {
     JOB_STATUS_RUNNING : 'running'
 }
 
+# jobs wake the engine when something changes, but we'll have a look around this often anyway, just in case something slipped through
+MAX_SECONDS_BETWEEN_CHECKS = 5.0
+
 class NetworkEngine( object ):
     
     def __init__(
@@ -50,24 +56,49 @@ class NetworkEngine( object ):
         
         self._lock = threading.Lock()
         
+        self._new_work_to_do = threading.Event()
+        
         self.MAX_JOBS = 1
         self.MAX_JOBS_PER_DOMAIN = 1
         
-        self.RefreshOptions()
+        self._use_async_runner = False
         
-        self._new_work_to_do = threading.Event()
+        # only spins up its loop when first used
+        self._async_runner = ClientNetworkingAsync.NetworkJobAsyncRunner()
+        
+        self.RefreshOptions()
         
         self._domains_to_login = []
         
         self._active_domains_counter = collections.Counter()
         
-        self._jobs_awaiting_validity = []
+        # every job we have and the stage it is at. a job is in exactly one of: its stage's ready queue, the sleeping heap, the blocked jobs, or running
+        self._jobs_to_statuses = {}
+        
+        self._statuses_to_ready_jobs = {
+            JOB_STATUS_AWAITING_VALIDITY : collections.deque(),
+            JOB_STATUS_AWAITING_BANDWIDTH : collections.deque(),
+            JOB_STATUS_AWAITING_LOGIN : collections.deque()
+        }
+        
+        # the ready queue for the last stage is split by domain, so a busy domain's jobs can wait without us looking at them
+        self._domains_to_jobs_awaiting_slot = collections.OrderedDict()
+        
+        self._jobs_running = []
+        
+        # ( wake_time, job_number, job ). when a job is woken early, its old entry stays in the heap and is skipped when it comes up
+        self._sleeping_jobs_heap = []
+        self._sleeping_jobs_to_heap_entries = {}
+        self._job_numbers = itertools.count()
+        
+        # jobs waiting on the current validation or login process, which go back in their queue when it is done
+        self._blocked_jobs = {}
+        
         self._current_validation_process = None
-        self._jobs_awaiting_bandwidth = []
-        self._jobs_awaiting_login = []
         self._current_login_process = None
-        self._jobs_awaiting_slot = []
-        self._jobs_running = []
+        
+        # jobs can ask to be looked at from any thread, often while holding their own lock, so this is a deque and not behind our lock
+        self._jobs_to_wake = collections.deque()
         
         self._pause_all_new_network_traffic = self.controller.new_options.GetBoolean( 'pause_all_new_network_traffic' )
         
@@ -78,6 +109,137 @@ class NetworkEngine( object ):
         self.controller.sub( self, 'RefreshOptions', 'notify_new_options' )
         
     
+    def _AddJobToStage( self, job: ClientNetworkingJobs.NetworkJob, status: int ):
+        
+        self._jobs_to_statuses[ job ] = status
+        
+        if status == JOB_STATUS_AWAITING_SLOT:
+            
+            # we won't look at this job again until it might be able to start, so tell the user why it is waiting now
+            
+            if len( self._jobs_running ) >= self.MAX_JOBS:
+                
+                job.SetStatus( 'waiting for other jobs to finish\u2026' )
+                
+            elif self._active_domains_counter[ job.GetSecondLevelDomain() ] >= self.MAX_JOBS_PER_DOMAIN:
+                
+                job.SetStatus( 'waiting for other jobs on this domain to finish' )
+                
+            
+        
+        self._QueueJob( job )
+        
+    
+    def _ParkJob( self, job: ClientNetworkingJobs.NetworkJob ):
+        
+        status = self._jobs_to_statuses[ job ]
+        
+        now = HydrusTime.GetNowFloat()
+        
+        wake_time = job.GetWakeTime()
+        
+        if wake_time <= now:
+            
+            if status in ( JOB_STATUS_AWAITING_VALIDITY, JOB_STATUS_AWAITING_LOGIN ):
+                
+                self._blocked_jobs[ job ] = status
+                
+                return
+                
+            
+            # nothing to wait on but time, which for bandwidth means the rollover of the second
+            wake_time = math.floor( now ) + 1.0
+            
+        
+        heap_entry = ( wake_time, next( self._job_numbers ), job )
+        
+        heapq.heappush( self._sleeping_jobs_heap, heap_entry )
+        
+        self._sleeping_jobs_to_heap_entries[ job ] = heap_entry
+        
+    
+    def _QueueBlockedJobs( self, status: int ):
+        
+        jobs = [ job for ( job, job_status ) in self._blocked_jobs.items() if job_status == status ]
+        
+        for job in jobs:
+            
+            del self._blocked_jobs[ job ]
+            
+            self._QueueJob( job )
+            
+        
+    
+    def _QueueJob( self, job: ClientNetworkingJobs.NetworkJob ):
+        
+        status = self._jobs_to_statuses[ job ]
+        
+        if status == JOB_STATUS_AWAITING_SLOT:
+            
+            second_level_domain = job.GetSecondLevelDomain()
+            
+            if second_level_domain not in self._domains_to_jobs_awaiting_slot:
+                
+                self._domains_to_jobs_awaiting_slot[ second_level_domain ] = collections.deque()
+                
+            
+            self._domains_to_jobs_awaiting_slot[ second_level_domain ].append( job )
+            
+        else:
+            
+            self._statuses_to_ready_jobs[ status ].append( job )
+            
+        
+    
+    def _StartProcessAndWake( self, process ):
+        
+        try:
+            
+            process.Start()
+            
+        finally:
+            
+            self._new_work_to_do.set()
+            
+        
+    
+    def _WakeJobs( self ):
+        
+        while len( self._jobs_to_wake ) > 0:
+            
+            job = self._jobs_to_wake.popleft()
+            
+            if job in self._sleeping_jobs_to_heap_entries:
+                
+                del self._sleeping_jobs_to_heap_entries[ job ]
+                
+                self._QueueJob( job )
+                
+            elif job in self._blocked_jobs:
+                
+                del self._blocked_jobs[ job ]
+                
+                self._QueueJob( job )
+                
+            
+        
+        now = HydrusTime.GetNowFloat()
+        
+        while len( self._sleeping_jobs_heap ) > 0 and self._sleeping_jobs_heap[0][0] <= now:
+            
+            heap_entry = heapq.heappop( self._sleeping_jobs_heap )
+            
+            job = heap_entry[2]
+            
+            if self._sleeping_jobs_to_heap_entries.get( job ) is heap_entry:
+                
+                del self._sleeping_jobs_to_heap_entries[ job ]
+                
+                self._QueueJob( job )
+                
+            
+        
+    
     def AddJob( self, job: ClientNetworkingJobs.NetworkJob ):
         
         if HG.network_report_mode:
@@ -89,7 +251,7 @@ class NetworkEngine( object ):
             
             job.engine = self
             
-            self._jobs_awaiting_validity.append( job )
+            self._AddJobToStage( job, JOB_STATUS_AWAITING_VALIDITY )
             
         
         self._new_work_to_do.set()
@@ -104,18 +266,17 @@ class NetworkEngine( object ):
             self._domains_to_login = HydrusData.DedupeList( self._domains_to_login )
             
         
+        self._new_work_to_do.set()
+        
     
     def GetJobsSnapshot( self ):
         
         with self._lock:
             
-            jobs = []
+            # a cancelled job hangs about until the main loop next looks at it, but it is no longer work
+            jobs = [ ( status, job ) for ( job, status ) in self._jobs_to_statuses.items() if not job.IsCancelled() ]
             
-            jobs.extend( ( ( JOB_STATUS_AWAITING_VALIDITY, j ) for j in self._jobs_awaiting_validity ) )
-            jobs.extend( ( ( JOB_STATUS_AWAITING_BANDWIDTH, j ) for j in self._jobs_awaiting_bandwidth ) )
-            jobs.extend( ( ( JOB_STATUS_AWAITING_LOGIN, j ) for j in self._jobs_awaiting_login ) )
-            jobs.extend( ( ( JOB_STATUS_AWAITING_SLOT, j ) for j in self._jobs_awaiting_slot ) )
-            jobs.extend( ( ( JOB_STATUS_RUNNING, j ) for j in self._jobs_running ) )
+            jobs.sort( key = lambda status_and_job: status_and_job[0] )
             
             return jobs
             
@@ -125,7 +286,7 @@ class NetworkEngine( object ):
         
         with self._lock:
             
-            return len( self._jobs_awaiting_validity ) + len( self._jobs_awaiting_bandwidth ) + len( self._jobs_awaiting_login ) + len( self._jobs_awaiting_slot ) + len( self._jobs_running ) > 50
+            return len( self._jobs_to_statuses ) > 50
             
         
     
@@ -165,7 +326,7 @@ class NetworkEngine( object ):
                         
                         validation_process = job.GenerateValidationPopupProcess()
                         
-                        self.controller.CallToThread( validation_process.Start )
+                        self.controller.CallToThread( self._StartProcessAndWake, validation_process )
                         
                         self._current_validation_process = validation_process
                         
@@ -191,7 +352,7 @@ class NetworkEngine( object ):
                 
             else:
                 
-                self._jobs_awaiting_bandwidth.append( job )
+                self._AddJobToStage( job, JOB_STATUS_AWAITING_BANDWIDTH )
                 
                 return False
                 
@@ -205,6 +366,8 @@ class NetworkEngine( object ):
                     
                     self._current_validation_process = None
                     
+                    self._QueueBlockedJobs( JOB_STATUS_AWAITING_VALIDITY )
+                    
                 
             
         
@@ -233,7 +396,7 @@ class NetworkEngine( object ):
                 
             else:
                 
-                self._jobs_awaiting_login.append( job )
+                self._AddJobToStage( job, JOB_STATUS_AWAITING_LOGIN )
                 
                 return False
                 
@@ -256,7 +419,7 @@ class NetworkEngine( object ):
                     return
                     
                 
-                self.controller.CallToThread( login_process.Start )
+                self.controller.CallToThread( self._StartProcessAndWake, login_process )
                 
                 self._current_login_process = login_process
                 
@@ -322,7 +485,7 @@ class NetworkEngine( object ):
                         return True
                         
                     
-                    self.controller.CallToThread( login_process.Start )
+                    self.controller.CallToThread( self._StartProcessAndWake, login_process )
                     
                     self._current_login_process = login_process
                     
@@ -337,7 +500,7 @@ class NetworkEngine( object ):
                 
             else:
                 
-                self._jobs_awaiting_slot.append( job )
+                self._AddJobToStage( job, JOB_STATUS_AWAITING_SLOT )
                 
                 return False
                 
@@ -351,6 +514,8 @@ class NetworkEngine( object ):
                     
                     self._current_login_process = None
                     
+                    self._QueueBlockedJobs( JOB_STATUS_AWAITING_LOGIN )
+                    
                 
             
         
@@ -382,14 +547,6 @@ class NetworkEngine( object ):
                     
                     return True
                     
-                elif self._active_domains_counter[ job.GetSecondLevelDomain() ] >= self.MAX_JOBS_PER_DOMAIN:
-                    
-                    job.SetStatus( 'waiting for other jobs on this domain to finish' )
-                    
-                    job.Sleep( 2 )
-                    
-                    return True
-                    
                 elif not job.TokensOK():
                     
                     return True
@@ -407,7 +564,16 @@ class NetworkEngine( object ):
                     
                     self._active_domains_counter[ job.GetSecondLevelDomain() ] += 1
                     
-                    self.controller.CallToThread( job.Start )
+                    if self._use_async_runner:
+                        
+                        self._async_runner.StartJob( job )
+                        
+                    else:
+                        
+                        self.controller.CallToThread( job.Start )
+                        
+                    
+                    self._jobs_to_statuses[ job ] = JOB_STATUS_RUNNING
                     
                     self._jobs_running.append( job )
                     
@@ -440,6 +606,8 @@ class NetworkEngine( object ):
                     del self._active_domains_counter[ second_level_domain ]
                     
                 
+                del self._jobs_to_statuses[ job ]
+                
                 return False
                 
             else:
@@ -448,41 +616,103 @@ class NetworkEngine( object ):
                 
             
         
+        def ProcessStage( status, process_job_callable ):
+            
+            ready_jobs = self._statuses_to_ready_jobs[ status ]
+            
+            while len( ready_jobs ) > 0:
+                
+                job = ready_jobs.popleft()
+                
+                if process_job_callable( job ):
+                    
+                    self._ParkJob( job )
+                    
+                elif self._jobs_to_statuses[ job ] == status:
+                    
+                    # it did not move on, so it is done
+                    del self._jobs_to_statuses[ job ]
+                    
+                
+            
+        
+        def ProcessReadyJobs():
+            
+            # we only look at domains with a free slot, so a thousand jobs waiting on one busy domain cost nothing
+            
+            for ( second_level_domain, ready_jobs ) in list( self._domains_to_jobs_awaiting_slot.items() ):
+                
+                while len( ready_jobs ) > 0 and len( self._jobs_running ) < self.MAX_JOBS and self._active_domains_counter[ second_level_domain ] < self.MAX_JOBS_PER_DOMAIN:
+                    
+                    job = ready_jobs.popleft()
+                    
+                    if ProcessReadyJob( job ):
+                        
+                        self._ParkJob( job )
+                        
+                    elif self._jobs_to_statuses[ job ] == JOB_STATUS_AWAITING_SLOT:
+                        
+                        del self._jobs_to_statuses[ job ]
+                        
+                    else:
+                        
+                        # it started, so the other domains get first go next time
+                        self._domains_to_jobs_awaiting_slot.move_to_end( second_level_domain )
+                        
+                    
+                
+                if len( ready_jobs ) == 0:
+                    
+                    del self._domains_to_jobs_awaiting_slot[ second_level_domain ]
+                    
+                
+            
+        
         self._is_running = True
         
         while not ( self._local_shutdown or HG.model_shutdown ):
             
+            self._new_work_to_do.clear()
+            
             with self._lock:
                 
-                self._jobs_awaiting_validity = list( filter( ProcessValidationJob, self._jobs_awaiting_validity ) )
+                self._jobs_running = list( filter( ProcessRunningJob, self._jobs_running ) )
+                
+                self._WakeJobs()
                 
                 ProcessCurrentValidationJob()
                 
-                self._jobs_awaiting_bandwidth = list( filter( ProcessBandwidthJob, self._jobs_awaiting_bandwidth ) )
+                ProcessStage( JOB_STATUS_AWAITING_VALIDITY, ProcessValidationJob )
+                
+                ProcessStage( JOB_STATUS_AWAITING_BANDWIDTH, ProcessBandwidthJob )
+                
+                ProcessCurrentLoginJob()
                 
                 ProcessForceLogins()
                 
-                self._jobs_awaiting_login = list( filter( ProcessLoginJob, self._jobs_awaiting_login ) )
+                ProcessStage( JOB_STATUS_AWAITING_LOGIN, ProcessLoginJob )
                 
-                ProcessCurrentLoginJob()
+                ProcessReadyJobs()
                 
-                self._jobs_awaiting_slot = list( filter( ProcessReadyJob, self._jobs_awaiting_slot ) )
+                # now sleep until the next job wakes up or someone gives us new work
                 
-                self._jobs_running = list( filter( ProcessRunningJob, self._jobs_running ) )
+                if len( self._sleeping_jobs_heap ) > 0:
+                    
+                    time_until_next_wake = max( 0.0, self._sleeping_jobs_heap[0][0] - HydrusTime.GetNowFloat() )
+                    
+                    timeout = min( time_until_next_wake, MAX_SECONDS_BETWEEN_CHECKS )
+                    
+                else:
+                    
+                    timeout = MAX_SECONDS_BETWEEN_CHECKS
+                    
                 
             
-            # we want to catch the rollover of the second for bandwidth jobs
-            
-            now_with_subsecond = time.time()
-            subsecond_part = now_with_subsecond % 1
-            
-            time_until_next_second = 1.0 - subsecond_part
-            
-            self._new_work_to_do.wait( time_until_next_second )
-            
-            self._new_work_to_do.clear()
+            self._new_work_to_do.wait( timeout )
             
         
+        self._async_runner.Shutdown()
+        
         self._is_running = False
         
         self._is_shutdown = True
@@ -499,6 +729,8 @@ class NetworkEngine( object ):
             self.controller.pub( 'notify_network_traffic_unpaused' )
             
         
+        self._new_work_to_do.set()
+        
     
     def RefreshOptions( self ):
         
@@ -507,6 +739,10 @@ class NetworkEngine( object ):
             self.MAX_JOBS = self.controller.new_options.GetInteger( 'max_network_jobs' )
             self.MAX_JOBS_PER_DOMAIN = self.controller.new_options.GetInteger( 'max_network_jobs_per_domain' )
             
+            self._use_async_runner = self.controller.new_options.GetBoolean( 'network_jobs_use_async_runner' )
+            
+        
+        self._new_work_to_do.set()
         
     
     def Shutdown( self ):
@@ -516,3 +752,12 @@ class NetworkEngine( object ):
         self._new_work_to_do.set()
         
     
+    def WakeJob( self, job: ClientNetworkingJobs.NetworkJob ):
+        
+        # a job calls this when something changed that we should look at now, like it finishing or being told to stop waiting
+        
+        self._jobs_to_wake.append( job )
+        
+        self._new_work_to_do.set()
+        
+    
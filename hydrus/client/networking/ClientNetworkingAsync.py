@@ -0,0 +1,194 @@
+import asyncio
+import concurrent.futures
+import threading
+
+from hydrus.core import HydrusData
+
+from hydrus.client.networking import ClientNetworkingJobs
+
+# a running job spends most of its life waiting--on ongoing bandwidth, connection error and serverside bandwidth retry timers, paused network traffic--and the threaded runner holds an OS thread for all of it
+# this drives the same job work steps as tasks on one event loop thread, so a wait is just a timer
+# the actual blocking socket calls (sending the request, reading the next chunk) still go through requests, so sessions, cookies, proxies and logins all work as normal. they borrow a thread from a small pool for their duration
+
+NUM_BLOCKING_THREADS = 32
+
+class NetworkJobAsyncRunner( object ):
+    
+    def __init__( self, num_blocking_threads = NUM_BLOCKING_THREADS ):
+        
+        self._num_blocking_threads = num_blocking_threads
+        
+        self._lock = threading.Lock()
+        
+        self._loop = None
+        self._loop_thread = None
+        self._executor = None
+        
+        self._jobs_running = set()
+        
+    
+    def _InitialiseLoop( self ):
+        
+        self._executor = concurrent.futures.ThreadPoolExecutor( max_workers = self._num_blocking_threads, thread_name_prefix = 'network job blocking call' )
+        
+        self._loop = asyncio.new_event_loop()
+        
+        self._loop_thread = threading.Thread( target = self._loop.run_forever, name = 'network job event loop', daemon = True )
+        
+        self._loop_thread.start()
+        
+    
+    async def _RunJob( self, job ):
+        
+        try:
+            
+            await self._RunJobSteps( job.GetWorkSteps() )
+            
+        except asyncio.CancelledError:
+            
+            pass
+            
+        except Exception as e:
+            
+            HydrusData.ShowException( e )
+            
+        finally:
+            
+            with self._lock:
+                
+                self._jobs_running.discard( job )
+                
+            
+        
+    
+    async def _RunJobSteps( self, steps ):
+        
+        loop = asyncio.get_running_loop()
+        
+        result = None
+        exception = None
+        
+        try:
+            
+            while True:
+                
+                try:
+                    
+                    if exception is None:
+                        
+                        ( step_type, step_value ) = steps.send( result )
+                        
+                    else:
+                        
+                        ( step_type, step_value ) = steps.throw( exception )
+                        
+                    
+                except StopIteration:
+                    
+                    return
+                    
+                
+                result = None
+                exception = None
+                
+                if step_type == ClientNetworkingJobs.JOB_STEP_SLEEP:
+                    
+                    await asyncio.sleep( step_value )
+                    
+                else:
+                    
+                    try:
+                        
+                        result = await loop.run_in_executor( self._executor, step_value )
+                        
+                    except Exception as e:
+                        
+                        exception = e
+                        
+                    
+                
+            
+        finally:
+            
+            # if we were cancelled mid-wait, this runs the job's finally blocks, closing any response and setting it done
+            
+            steps.close()
+            
+        
+    
+    async def _StopLoop( self ):
+        
+        tasks = [ task for task in asyncio.all_tasks() if task is not asyncio.current_task() ]
+        
+        for task in tasks:
+            
+            task.cancel()
+            
+        
+        await asyncio.gather( *tasks, return_exceptions = True )
+        
+        asyncio.get_running_loop().stop()
+        
+    
+    def GetNumJobsRunning( self ):
+        
+        with self._lock:
+            
+            return len( self._jobs_running )
+            
+        
+    
+    def IsRunning( self ):
+        
+        with self._lock:
+            
+            return self._loop is not None
+            
+        
+    
+    def Shutdown( self ):
+        
+        with self._lock:
+            
+            if self._loop is None:
+                
+                return
+                
+            
+            loop = self._loop
+            loop_thread = self._loop_thread
+            executor = self._executor
+            jobs = list( self._jobs_running )
+            
+            self._loop = None
+            self._loop_thread = None
+            self._executor = None
+            
+        
+        for job in jobs:
+            
+            job.Cancel( 'network engine shut down' )
+            
+        
+        asyncio.run_coroutine_threadsafe( self._StopLoop(), loop )
+        
+        loop_thread.join( 5 )
+        
+        executor.shutdown( wait = False, cancel_futures = True )
+        
+    
+    def StartJob( self, job ):
+        
+        with self._lock:
+            
+            if self._loop is None:
+                
+                self._InitialiseLoop()
+                
+            
+            self._jobs_running.add( job )
+            
+            asyncio.run_coroutine_threadsafe( self._RunJob( job ), self._loop )
+            
+        
+    
@@ -31,6 +31,9 @@ valid_str_lookup = {
 
 valid_enum_lookup = { value : key for ( key, value ) in valid_str_lookup.items() }
 
+# how many recent url -> url class and url -> normalised url results we remember
+URL_CLASS_CACHE_SIZE = 10000
+
 class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_NETWORK_DOMAIN_MANAGER
@@ -54,6 +57,10 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
         self._url_class_keys_to_parser_keys = HydrusSerialisable.SerialisableBytesDictionary()
         
         self._second_level_domains_to_url_classes = collections.defaultdict( list )
+        self._second_level_domains_to_url_class_matchers = {}
+        
+        self._urls_to_url_classes = collections.OrderedDict()
+        self._urls_to_normalised_urls = collections.OrderedDict()
         
         self._second_level_domains_to_network_infrastructure_errors = collections.defaultdict( list )
         
@@ -299,28 +306,32 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
     
     def _GetURLClass( self, url ):
         
+        if url in self._urls_to_url_classes:
+            
+            self._urls_to_url_classes.move_to_end( url )
+            
+            return self._urls_to_url_classes[ url ]
+            
+        
         domain = ClientNetworkingFunctions.ConvertURLIntoSecondLevelDomain( url )
         
-        if domain in self._second_level_domains_to_url_classes:
+        if domain in self._second_level_domains_to_url_class_matchers:
             
-            url_classes = self._second_level_domains_to_url_classes[ domain ]
+            url_class = self._second_level_domains_to_url_class_matchers[ domain ].GetMatchingURLClass( url )
             
-            for url_class in url_classes:
-                
-                try:
-                    
-                    url_class.Test( url )
-                    
-                    return url_class
-                    
-                except HydrusExceptions.URLClassException:
-                    
-                    continue
-                    
-                
+        else:
+            
+            url_class = None
             
         
-        return None
+        self._urls_to_url_classes[ url ] = url_class
+        
+        if len( self._urls_to_url_classes ) > URL_CLASS_CACHE_SIZE:
+            
+            self._urls_to_url_classes.popitem( last = False )
+            
+        
+        return url_class
         
     
     def _GetURLToFetch( self, url: str ):
@@ -426,6 +437,11 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
             ClientNetworkingURLClass.SortURLClassesListDescendingComplexity( url_classes )
             
         
+        self._second_level_domains_to_url_class_matchers = { domain : ClientNetworkingURLClass.URLClassMatcher( url_classes ) for ( domain, url_classes ) in self._second_level_domains_to_url_classes.items() }
+        
+        self._urls_to_url_classes = collections.OrderedDict()
+        self._urls_to_normalised_urls = collections.OrderedDict()
+        
         self._gug_keys_to_gugs = { gug.GetGUGKey() : gug for gug in self._gugs }
         self._gug_names_to_gugs = { gug.GetName() : gug for gug in self._gugs }
         
@@ -1511,6 +1527,13 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
+            if url in self._urls_to_normalised_urls:
+                
+                self._urls_to_normalised_urls.move_to_end( url )
+                
+                return self._urls_to_normalised_urls[ url ]
+                
+            
             url_class = self._GetURLClass( url )
             
             if url_class is None:
@@ -1537,6 +1560,13 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
                 normalised_url = url_class.Normalise( url )
                 
             
+            self._urls_to_normalised_urls[ url ] = normalised_url
+            
+            if len( self._urls_to_normalised_urls ) > URL_CLASS_CACHE_SIZE:
+                
+                self._urls_to_normalised_urls.popitem( last = False )
+                
+            
             return normalised_url
             
         
@@ -1,4 +1,5 @@
 import calendar
+import concurrent.futures
 import datetime
 import io
 import os
@@ -48,6 +49,13 @@ except:
     PYPARSING_OK = False
     
 
+# a job's work steps are ( JOB_STEP_SLEEP, seconds ) or ( JOB_STEP_CALL, callable ), and the callable's result or exception is sent back in
+JOB_STEP_SLEEP = 0
+JOB_STEP_CALL = 1
+
+# we won't split a file into parts smaller than this
+SEGMENTED_DOWNLOAD_MIN_SEGMENT_SIZE = 1048576
+
 def ConvertStatusCodeAndDataIntoExceptionInfo( status_code, data, is_hydrus_service = False ):
     
     ( error_text, encoding ) = HydrusText.NonFailingUnicodeDecode( data, 'utf-8' )
@@ -147,6 +155,85 @@ def ConvertStatusCodeAndDataIntoExceptionInfo( status_code, data, is_hydrus_serv
     
     return ( e, error_text )
     
+def ParseContentRange( content_range: str ):
+    
+    # Content-Range: <unit> <range-start>-<range-end>/<size>
+    # range and size can be *, which we give as None
+    
+    byte_start = None
+    byte_end = None
+    total_size = None
+    
+    if content_range.startswith( 'bytes ' ) and '/' in content_range:
+        
+        ( byte_range, size ) = content_range[6:].split( '/', 1 )
+        
+        ( byte_range, size ) = ( byte_range.strip(), size.strip() )
+        
+        if '-' in byte_range:
+            
+            ( start_text, end_text ) = byte_range.split( '-', 1 )
+            
+            if start_text.isdigit() and end_text.isdigit():
+                
+                byte_start = int( start_text )
+                byte_end = int( end_text )
+                
+            
+        
+        if size.isdigit():
+            
+            total_size = int( size )
+            
+        
+    
+    return ( byte_start, byte_end, total_size )
+    
+
+def RunJobStepsInThisThread( steps ):
+    
+    result = None
+    exception = None
+    
+    while True:
+        
+        try:
+            
+            if exception is None:
+                
+                ( step_type, step_value ) = steps.send( result )
+                
+            else:
+                
+                ( step_type, step_value ) = steps.throw( exception )
+                
+            
+        except StopIteration:
+            
+            return
+            
+        
+        result = None
+        exception = None
+        
+        if step_type == JOB_STEP_SLEEP:
+            
+            time.sleep( step_value )
+            
+        else:
+            
+            try:
+                
+                result = step_value()
+                
+            except Exception as e:
+                
+                exception = e
+                
+            
+        
+    
+
 class NetworkJob( object ):
     
     WILLING_TO_WAIT_ON_INVALID_LOGIN = True
@@ -242,6 +329,8 @@ class NetworkJob( object ):
         self._num_bytes_expected_in_this_range_chunk = None
         self._number_of_concurrent_empty_chunks = 0
         
+        self._segmented_download_failed = False
+        
         self._file_import_options = None
         
         self._network_contexts = self._GenerateNetworkContexts()
@@ -280,6 +369,146 @@ class NetworkJob( object ):
         return self._current_request_attempt_number <= max_attempts_allowed
         
     
+    def _DownloadSegment( self, byte_start, byte_end, total_size, abort_event: threading.Event ):
+        
+        response = self._SendRequestAndGetResponse( byte_range = ( byte_start, byte_end ) )
+        
+        try:
+            
+            if response.status_code != 206:
+                
+                raise HydrusExceptions.SegmentedDownloadException( 'We asked for range {}-{}, but the server responded {}!'.format( byte_start, byte_end, response.status_code ) )
+                
+            
+            if response.headers.get( 'Content-Encoding', 'identity' ) != 'identity':
+                
+                raise HydrusExceptions.SegmentedDownloadException( 'The server encoded a range response!' )
+                
+            
+            content_range = response.headers.get( 'Content-Range', '' )
+            
+            if ParseContentRange( content_range ) != ( byte_start, byte_end, total_size ):
+                
+                raise HydrusExceptions.SegmentedDownloadException( 'We asked for range {}-{}/{}, but got Content-Range "{}"!'.format( byte_start, byte_end, total_size, content_range ) )
+                
+            
+            num_bytes_expected = ( byte_end - byte_start ) + 1
+            num_bytes_written = 0
+            
+            with open( self._temp_path, 'r+b' ) as f:
+                
+                f.seek( byte_start )
+                
+                # no content-encoding, so the chunk lengths are the raw bytes over the wire
+                
+                for chunk in response.iter_content( chunk_size = 65536 ):
+                    
+                    if abort_event.is_set():
+                        
+                        return
+                        
+                    
+                    if self._IsCancelled():
+                        
+                        raise HydrusExceptions.CancelledException()
+                        
+                    
+                    num_bytes_written += len( chunk )
+                    
+                    if num_bytes_written > num_bytes_expected:
+                        
+                        raise HydrusExceptions.SegmentedDownloadException( 'Too much data: Was expecting {} in range {}-{}, but the server continued responding!'.format( HydrusData.ToHumanBytes( num_bytes_expected ), byte_start, byte_end ) )
+                        
+                    
+                    f.write( chunk )
+                    
+                    self._ReportDataUsed( len( chunk ) )
+                    
+                    with self._lock:
+                        
+                        self._num_bytes_read += len( chunk )
+                        
+                    
+                    while not self._OngoingBandwidthOK() and not self._IsCancelled() and not abort_event.is_set():
+                        
+                        time.sleep( 0.1 )
+                        
+                    
+                    if HG.started_shutdown:
+                        
+                        raise HydrusExceptions.ShutdownException()
+                        
+                    
+                
+            
+            if num_bytes_written != num_bytes_expected:
+                
+                raise HydrusExceptions.SegmentedDownloadException( 'Not enough data: Was expecting {} in range {}-{}, but the server only delivered {}!'.format( HydrusData.ToHumanBytes( num_bytes_expected ), byte_start, byte_end, HydrusData.ToHumanBytes( num_bytes_written ) ) )
+                
+            
+        finally:
+            
+            response.close()
+            
+        
+    
+    def _DownloadSegments( self, segments ):
+        
+        total_size = segments[-1][1] + 1
+        
+        with self._lock:
+            
+            self._status_text = 'downloading in {} parts\u2026'.format( len( segments ) )
+            
+            self._num_bytes_read = 0
+            self._num_bytes_to_read = total_size
+            
+        
+        # sparse on any decent filesystem, and every segment then writes straight to its place
+        
+        with open( self._temp_path, 'wb' ) as f:
+            
+            f.truncate( total_size )
+            
+        
+        abort_event = threading.Event()
+        
+        with concurrent.futures.ThreadPoolExecutor( max_workers = len( segments ), thread_name_prefix = 'segmented download' ) as executor:
+            
+            futures = [ executor.submit( self._DownloadSegment, byte_start, byte_end, total_size, abort_event ) for ( byte_start, byte_end ) in segments ]
+            
+            concurrent.futures.wait( futures, return_when = concurrent.futures.FIRST_EXCEPTION )
+            
+            # if one part broke, the others stop at their next chunk
+            
+            abort_event.set()
+            
+        
+        for future in futures:
+            
+            future.result()
+            
+        
+        with self._lock:
+            
+            num_bytes_read = self._num_bytes_read
+            
+        
+        file_size = os.path.getsize( self._temp_path )
+        
+        if num_bytes_read != total_size or file_size != total_size:
+            
+            raise HydrusExceptions.SegmentedDownloadException( 'Was expecting {} in total, but got {} and the file is {}!'.format( HydrusData.ToHumanBytes( total_size ), HydrusData.ToHumanBytes( num_bytes_read ), HydrusData.ToHumanBytes( file_size ) ) )
+            
+        
+        if self._file_import_options is not None:
+            
+            is_complete_file_size = True
+            
+            self._file_import_options.CheckNetworkDownload( self._response_mime, num_bytes_read, is_complete_file_size )
+            
+        
+    
     def _GenerateModifiedDate( self, response: requests.Response ):
     
         if 'Last-Modified' in response.headers:
@@ -342,6 +571,45 @@ class NetworkJob( object ):
         return ( connect_timeout, read_timeout )
         
     
+    def _GetSegmentedDownloadRanges( self, response: requests.Response ):
+        
+        # we only split up big files going to disk, from servers that gave our 'bytes=0-' a proper range response
+        
+        num_segments = HG.client_controller.new_options.GetInteger( 'segmented_download_num_segments' )
+        min_size = HG.client_controller.new_options.GetInteger( 'segmented_download_min_size' )
+        
+        with self._lock:
+            
+            if num_segments < 2 or self._segmented_download_failed or self._method != 'GET' or self._temp_path is None or self.IS_HYDRUS_SERVICE or self.IS_IPFS_SERVICE:
+                
+                return []
+                
+            
+        
+        if response.status_code != 206 or response.headers.get( 'Content-Encoding', 'identity' ) != 'identity':
+            
+            return []
+            
+        
+        ( byte_start, byte_end, total_size ) = ParseContentRange( response.headers.get( 'Content-Range', '' ) )
+        
+        if byte_start != 0 or total_size is None or byte_end != total_size - 1 or total_size < min_size:
+            
+            return []
+            
+        
+        num_segments = min( num_segments, total_size // SEGMENTED_DOWNLOAD_MIN_SEGMENT_SIZE )
+        
+        if num_segments < 2:
+            
+            return []
+            
+        
+        segment_size = - ( - total_size // num_segments )
+        
+        return [ ( segment_start, min( segment_start + segment_size, total_size ) - 1 ) for segment_start in range( 0, total_size, segment_size ) ]
+        
+    
     def _IsCancelled( self ):
         
         if self._is_cancelled:
@@ -544,7 +812,16 @@ class NetworkJob( object ):
         
         num_bytes_read_before_this_response = self._num_bytes_read
         
-        for chunk in response.iter_content( chunk_size = 65536 ):
+        chunk_iterator = response.iter_content( chunk_size = 65536 )
+        
+        while True:
+            
+            chunk = yield ( JOB_STEP_CALL, lambda: next( chunk_iterator, None ) )
+            
+            if chunk is None:
+                
+                break
+                
             
             if self._IsCancelled():
                 
@@ -617,7 +894,8 @@ class NetworkJob( object ):
                 
             
             self._ReportDataUsed( chunk_num_bytes )
-            self._WaitOnOngoingBandwidth()
+            
+            yield from self._WaitOnOngoingBandwidth()
             
             if HG.started_shutdown:
                 
@@ -712,7 +990,7 @@ class NetworkJob( object ):
         self._current_request_attempt_number = 1
         
     
-    def _SendRequestAndGetResponse( self ) -> requests.Response:
+    def _SendRequestAndGetResponse( self, byte_range = None ) -> requests.Response:
         
         with self._lock:
             
@@ -742,7 +1020,11 @@ class NetworkJob( object ):
                 headers.update( url_class.GetHeaderOverrides() )
                 
             
-            if url_class is None or url_class.GetURLType() in ( HC.URL_TYPE_FILE, HC.URL_TYPE_UNKNOWN ):
+            if byte_range is not None:
+                
+                headers[ 'Range' ] = 'bytes={}-{}'.format( *byte_range )
+                
+            elif url_class is None or url_class.GetURLType() in ( HC.URL_TYPE_FILE, HC.URL_TYPE_UNKNOWN ):
                 
                 headers[ 'Range' ] = 'bytes={}-'.format( self._num_bytes_read )
                 
@@ -777,7 +1059,7 @@ class NetworkJob( object ):
                 headers[ key ] = value
                 
             
-            if self._num_bytes_read == 0:
+            if self._num_bytes_read == 0 and byte_range is None:
                 
                 self._status_text = 'sending request\u2026'
                 
@@ -836,6 +1118,16 @@ class NetworkJob( object ):
         self._wake_time_float = HydrusTime.GetNowFloat() + seconds_float
         
     
+    def _WakeEngine( self ):
+        
+        # the engine does not poll us, so if we finish or stop waiting early, we need to tell it. do not call this holding our lock
+        
+        if self.engine is not None:
+            
+            self.engine.WakeJob( self )
+            
+        
+    
     def _SolveCloudFlare( self, response ):
         
         if CLOUDSCRAPER_OK:
@@ -1025,10 +1317,10 @@ class NetworkJob( object ):
                 self._status_text = '{} - retrying in {}'.format( status_text, ClientTime.TimestampToPrettyTimeDelta( self._connection_error_wake_time ) )
                 
             
-            time.sleep( 1 )
+            yield ( JOB_STEP_SLEEP, 1 )
             
         
-        self._WaitOnNetworkTrafficPaused( status_text )
+        yield from self._WaitOnNetworkTrafficPaused( status_text )
         
     
     def _WaitOnNetworkTrafficPaused( self, status_text: str ):
@@ -1040,7 +1332,7 @@ class NetworkJob( object ):
                 self._status_text = '{} - now waiting because all network traffic is paused'.format( status_text )
                 
             
-            time.sleep( 1 )
+            yield ( JOB_STEP_SLEEP, 1 )
             
         
     
@@ -1048,7 +1340,7 @@ class NetworkJob( object ):
         
         while not self._OngoingBandwidthOK() and not self._IsCancelled():
             
-            time.sleep( 0.1 )
+            yield ( JOB_STEP_SLEEP, 0.1 )
             
         
     
@@ -1070,10 +1362,10 @@ class NetworkJob( object ):
                 self._status_text = '{} - retrying in {}'.format( status_text, ClientTime.TimestampToPrettyTimeDelta( self._serverside_bandwidth_wake_time ) )
                 
             
-            time.sleep( 1 )
+            yield ( JOB_STEP_SLEEP, 1 )
             
         
-        self._WaitOnNetworkTrafficPaused( status_text )
+        yield from self._WaitOnNetworkTrafficPaused( status_text )
         
     
     def AddAdditionalHeader( self, key, value ):
@@ -1113,6 +1405,8 @@ class NetworkJob( object ):
             self._SetCancelled()
             
         
+        self._WakeEngine()
+        
     
     def CanValidateInPopup( self ):
         
@@ -1333,226 +1627,32 @@ class NetworkJob( object ):
             
         
     
-    def HasError( self ):
-        
-        with self._lock:
-            
-            return self._error_exception is not None
-            
-        
-    
-    def IsAsleep( self ):
-        
-        with self._lock:
-            
-            return not HydrusTime.TimeHasPassedFloat( self._wake_time_float )
-            
-        
-    
-    def IsCancelled( self ):
-        
-        with self._lock:
-            
-            return self._IsCancelled()
-            
-        
-    
-    def IsCloudFlareCache( self ):
-        
-        with self._lock:
-            
-            return self._response_server_header is not None and self._response_server_header == 'cloudflare'
-            
-    
-    def IsDone( self ):
-        
-        with self._lock:
-            
-            return self._IsDone()
-            
-        
-    
-    def IsHydrusJob( self ):
-        
-        with self._lock:
-            
-            return False
-            
+    def GetWorkSteps( self ):
         
-    
-    def IsValid( self ):
+        # the whole job as a generator of steps. blocking network calls and sleeps are yielded out rather than done here, so whoever drives us can do them in this thread or elsewhere
         
-        with self._lock:
+        try:
             
-            return self.engine.domain_manager.IsValid( self._network_contexts )
+            with self._lock:
+                
+                self._is_started = True
+                self._status_text = 'job started'
+                
             
-        
-    
-    def NeedsLogin( self ):
-        
-        with self._lock:
+            request_completed = False
             
-            if self._for_login:
-                
-                return False
+            while not request_completed:
                 
-            else:
+                if self._IsCancelled():
+                    
+                    return
+                    
                 
-                return self.engine.login_manager.NeedsLogin( self._login_network_context )
-                
-            
-        
-    
-    def NoEngineYet( self ):
-        
-        return self.engine is None
-        
-    
-    def ObeysBandwidth( self ):
-        
-        return self._ObeysBandwidth()
-        
-    
-    def OnlyTryConnectionOnce( self ):
-        
-        self._this_is_a_one_shot_request = True
-        
-    
-    def OverrideBandwidth( self, delay = None ):
-        
-        with self._lock:
-            
-            if delay is None:
-                
-                self._bandwidth_manual_override = True
-                
-                self._wake_time_float = 0.0
-                
-            else:
-                
-                self._bandwidth_manual_override_delayed_timestamp = HydrusTime.GetNow() + delay
-                
-                self._wake_time_float = min( self._wake_time_float, self._bandwidth_manual_override_delayed_timestamp + 1.0 )
-                
-            
-        
-    
-    def OverrideConnectionErrorWait( self ):
-        
-        with self._lock:
-            
-            self._connection_error_wake_time = 0
-            
-        
-    
-    def OverrideServersideBandwidthWait( self ):
-        
-        with self._lock:
-            
-            self._serverside_bandwidth_wake_time = 0
-            
-        
-    
-    def OverrideToken( self ):
-        
-        with self._lock:
-            
-            self._gallery_token_consumed = True
-            
-            self._wake_time_float = 0.0
-            
-        
-    
-    def ScrubDomainErrors( self ):
-        
-        with self._lock:
-            
-            self.engine.domain_manager.ScrubDomainErrors( self._url )
-            
-            self._wake_time_float = 0.0
-            
-        
-    
-    def SetError( self, e: Exception, error: str ):
-        
-        with self._lock:
-            
-            self._SetError( e, error )
-            
-        
-    
-    def SetFiles( self, files ):
-        
-        with self._lock:
-            
-            self._files = files
-            
-        
-    
-    def SetFileImportOptions( self, file_import_options ):
-        
-        with self._lock:
-            
-            self._file_import_options = file_import_options
-            
-        
-    
-    def SetForLogin( self, for_login: bool ):
-        
-        with self._lock:
-            
-            self._for_login = for_login
-            
-        
-    
-    def SetGalleryToken( self, token_name: str ):
-        
-        with self._lock:
-            
-            self._gallery_token_name = token_name
-            
-        
-    
-    def SetStatus( self, text: str ):
-        
-        with self._lock:
-            
-            self._status_text = text
-            
-        
-    
-    def Sleep( self, seconds ):
-        
-        with self._lock:
-            
-            self._Sleep( seconds )
-            
-        
-    
-    def Start( self ):
-        
-        try:
-            
-            with self._lock:
-                
-                self._is_started = True
-                self._status_text = 'job started'
-                
-            
-            request_completed = False
-            
-            while not request_completed:
-                
-                if self._IsCancelled():
-                    
-                    return
-                    
-                
-                response = None
+                response = None
                 
                 try:
                     
-                    response = self._SendRequestAndGetResponse()
+                    response = yield ( JOB_STEP_CALL, self._SendRequestAndGetResponse )
                     
                     # I think tbh I would rather tell requests not to do 3XX, which is possible with allow_redirects = False on request, and then just raise various 3XX exceptions with url info, so I can requeue easier and keep a record
                     # figuring out correct new url seems a laugh, requests has slight helpers, but lots of exceptions
@@ -1574,45 +1674,80 @@ class NetworkJob( object ):
                             self._status_text = 'downloading\u2026'
                             
                         
-                        if self._temp_path is None:
+                        segments = self._GetSegmentedDownloadRanges( response )
+                        
+                        more_to_download = True
+                        
+                        if len( segments ) > 1:
                             
-                            stream_dest = self._stream_io
+                            response.close()
                             
-                        else:
-                            
-                            stream_dest = open( self._temp_path, 'wb' )
+                            try:
+                                
+                                yield ( JOB_STEP_CALL, lambda: self._DownloadSegments( segments ) )
+                                
+                                more_to_download = False
+                                
+                            except HydrusExceptions.SegmentedDownloadException as e:
+                                
+                                HydrusData.Print( 'Segmented download of {} failed, so trying again as a single stream: {}'.format( self._url, e ) )
+                                
+                                with self._lock:
+                                    
+                                    self._segmented_download_failed = True
+                                    self._num_bytes_read = 0
+                                    self._status_text = 'downloading\u2026'
+                                    
+                                
+                                response = yield ( JOB_STEP_CALL, self._SendRequestAndGetResponse )
+                                
+                                if not response.ok:
+                                    
+                                    raise HydrusExceptions.NetworkException( 'Single stream response failed {}'.format( response.status_code ) )
+                                    
+                                
                             
                         
-                        try:
+                        if more_to_download:
                             
-                            more_to_download = True
-                            
-                            while more_to_download:
+                            if self._temp_path is None:
+                                
+                                stream_dest = self._stream_io
+                                
+                            else:
                                 
-                                more_to_download = self._ReadResponse( response, stream_dest )
+                                stream_dest = open( self._temp_path, 'wb' )
                                 
-                                if more_to_download:
+                            
+                            try:
+                                
+                                while more_to_download:
                                     
-                                    with self._lock:
+                                    more_to_download = yield from self._ReadResponse( response, stream_dest )
+                                    
+                                    if more_to_download:
                                         
-                                        self._status_text = 'downloading next part\u2026'
+                                        with self._lock:
+                                            
+                                            self._status_text = 'downloading next part\u2026'
+                                            
                                         
-                                    
-                                    # this will magically have new Range header
-                                    response = self._SendRequestAndGetResponse()
-                                    
-                                    if not response.ok:
+                                        # this will magically have new Range header
+                                        response = yield ( JOB_STEP_CALL, self._SendRequestAndGetResponse )
                                         
-                                        raise HydrusExceptions.NetworkException( 'Ranged response failed {}'.format( response.status_code ) )
+                                        if not response.ok:
+                                            
+                                            raise HydrusExceptions.NetworkException( 'Ranged response failed {}'.format( response.status_code ) )
+                                            
                                         
                                     
                                 
-                            
-                        finally:
-                            
-                            if self._temp_path is not None:
+                            finally:
                                 
-                                stream_dest.close()
+                                if self._temp_path is not None:
+                                    
+                                    stream_dest.close()
+                                    
                                 
                             
                         
@@ -1642,11 +1777,11 @@ class NetworkJob( object ):
                             
                             self._we_tried_cloudflare_once = True
                             
-                            self._SolveCloudFlare( response )
+                            yield ( JOB_STEP_CALL, lambda: self._SolveCloudFlare( response ) )
                             
                         
                         # don't care about 'more_to_download' here. lmao if some server ever tried to pull it off anyway
-                        self._ReadResponse( response, self._stream_io )
+                        yield from self._ReadResponse( response, self._stream_io )
                         
                         data = self.GetContentBytes()
                         
@@ -1687,7 +1822,7 @@ class NetworkJob( object ):
                         raise HydrusExceptions.BandwidthException( 'Server reported very limited bandwidth: ' + str( e ) )
                         
                     
-                    self._WaitOnServersideBandwidth( 'server reported limited bandwidth' )
+                    yield from self._WaitOnServersideBandwidth( 'server reported limited bandwidth' )
                     
                 except HydrusExceptions.ShouldReattemptNetworkException as e:
                     
@@ -1698,7 +1833,7 @@ class NetworkJob( object ):
                         raise HydrusExceptions.NetworkInfrastructureException( 'Ran out of reattempts on this error: ' + str( e ) )
                         
                     
-                    self._WaitOnConnectionError( str( e ) )
+                    yield from self._WaitOnConnectionError( str( e ) )
                     
                 except requests.exceptions.ChunkedEncodingError:
                     
@@ -1709,7 +1844,7 @@ class NetworkJob( object ):
                         raise HydrusExceptions.StreamTimeoutException( 'Unable to complete request--it broke mid-way!' )
                         
                     
-                    self._WaitOnConnectionError( 'connection broke mid-request' )
+                    yield from self._WaitOnConnectionError( 'connection broke mid-request' )
                     
                 except ( requests.exceptions.SSLError, requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout ) as e:
                     
@@ -1737,7 +1872,7 @@ class NetworkJob( object ):
                         raise HydrusExceptions.ConnectionException( fail_text )
                         
                     
-                    self._WaitOnConnectionError( delay_text )
+                    yield from self._WaitOnConnectionError( delay_text )
                     
                 except requests.exceptions.ReadTimeout:
                     
@@ -1748,7 +1883,7 @@ class NetworkJob( object ):
                         raise HydrusExceptions.StreamTimeoutException( 'Connection successful, but reading response timed out!' )
                         
                     
-                    self._WaitOnConnectionError( 'read timed out' )
+                    yield from self._WaitOnConnectionError( 'read timed out' )
                     
                 except Exception as e:
                     
@@ -1768,7 +1903,7 @@ class NetworkJob( object ):
                             raise HydrusExceptions.ConnectionException( 'Could not connect!' )
                             
                         
-                        self._WaitOnConnectionError( 'connection failed, and could not recover neatly' )
+                        yield from self._WaitOnConnectionError( 'connection failed, and could not recover neatly' )
                         
                     else:
                         
@@ -1821,6 +1956,223 @@ class NetworkJob( object ):
                 self._SetDone()
                 
             
+            self._WakeEngine()
+            
+        
+    
+    def GetWakeTime( self ) -> float:
+        
+        with self._lock:
+            
+            return self._wake_time_float
+            
+        
+    
+    def HasError( self ):
+        
+        with self._lock:
+            
+            return self._error_exception is not None
+            
+        
+    
+    def IsAsleep( self ):
+        
+        with self._lock:
+            
+            return not HydrusTime.TimeHasPassedFloat( self._wake_time_float )
+            
+        
+    
+    def IsCancelled( self ):
+        
+        with self._lock:
+            
+            return self._IsCancelled()
+            
+        
+    
+    def IsCloudFlareCache( self ):
+        
+        with self._lock:
+            
+            return self._response_server_header is not None and self._response_server_header == 'cloudflare'
+            
+    
+    def IsDone( self ):
+        
+        with self._lock:
+            
+            return self._IsDone()
+            
+        
+    
+    def IsHydrusJob( self ):
+        
+        with self._lock:
+            
+            return False
+            
+        
+    
+    def IsValid( self ):
+        
+        with self._lock:
+            
+            return self.engine.domain_manager.IsValid( self._network_contexts )
+            
+        
+    
+    def NeedsLogin( self ):
+        
+        with self._lock:
+            
+            if self._for_login:
+                
+                return False
+                
+            else:
+                
+                return self.engine.login_manager.NeedsLogin( self._login_network_context )
+                
+            
+        
+    
+    def NoEngineYet( self ):
+        
+        return self.engine is None
+        
+    
+    def ObeysBandwidth( self ):
+        
+        return self._ObeysBandwidth()
+        
+    
+    def OnlyTryConnectionOnce( self ):
+        
+        self._this_is_a_one_shot_request = True
+        
+    
+    def OverrideBandwidth( self, delay = None ):
+        
+        with self._lock:
+            
+            if delay is None:
+                
+                self._bandwidth_manual_override = True
+                
+                self._wake_time_float = 0.0
+                
+            else:
+                
+                self._bandwidth_manual_override_delayed_timestamp = HydrusTime.GetNow() + delay
+                
+                self._wake_time_float = min( self._wake_time_float, self._bandwidth_manual_override_delayed_timestamp + 1.0 )
+                
+            
+        
+        self._WakeEngine()
+        
+    
+    def OverrideConnectionErrorWait( self ):
+        
+        with self._lock:
+            
+            self._connection_error_wake_time = 0
+            
+        
+    
+    def OverrideServersideBandwidthWait( self ):
+        
+        with self._lock:
+            
+            self._serverside_bandwidth_wake_time = 0
+            
+        
+    
+    def OverrideToken( self ):
+        
+        with self._lock:
+            
+            self._gallery_token_consumed = True
+            
+            self._wake_time_float = 0.0
+            
+        
+        self._WakeEngine()
+        
+    
+    def ScrubDomainErrors( self ):
+        
+        with self._lock:
+            
+            self.engine.domain_manager.ScrubDomainErrors( self._url )
+            
+            self._wake_time_float = 0.0
+            
+        
+    
+    def SetError( self, e: Exception, error: str ):
+        
+        with self._lock:
+            
+            self._SetError( e, error )
+            
+        
+        self._WakeEngine()
+        
+    
+    def SetFiles( self, files ):
+        
+        with self._lock:
+            
+            self._files = files
+            
+        
+    
+    def SetFileImportOptions( self, file_import_options ):
+        
+        with self._lock:
+            
+            self._file_import_options = file_import_options
+            
+        
+    
+    def SetForLogin( self, for_login: bool ):
+        
+        with self._lock:
+            
+            self._for_login = for_login
+            
+        
+    
+    def SetGalleryToken( self, token_name: str ):
+        
+        with self._lock:
+            
+            self._gallery_token_name = token_name
+            
+        
+    
+    def SetStatus( self, text: str ):
+        
+        with self._lock:
+            
+            self._status_text = text
+            
+        
+    
+    def Sleep( self, seconds ):
+        
+        with self._lock:
+            
+            self._Sleep( seconds )
+            
+        
+    
+    def Start( self ):
+        
+        RunJobStepsInThisThread( self.GetWorkSteps() )
         
     
     def TokensOK( self ) -> bool:
@@ -2132,7 +2484,7 @@ class NetworkJobHydrus( NetworkJob ):
         NetworkJob._ReportDataUsed( self, num_bytes )
         
     
-    def _SendRequestAndGetResponse( self ) -> requests.Response:
+    def _SendRequestAndGetResponse( self, byte_range = None ) -> requests.Response:
         
         service = self.engine.controller.services_manager.GetService( self._service_key )
         
@@ -2145,7 +2497,7 @@ class NetworkJobHydrus( NetworkJob ):
             account.ReportRequestUsed()
             
         
-        response = NetworkJob._SendRequestAndGetResponse( self )
+        response = NetworkJob._SendRequestAndGetResponse( self, byte_range = byte_range )
         
         if response.ok and service_type in HC.RESTRICTED_SERVICES:
             
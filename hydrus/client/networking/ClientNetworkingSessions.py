@@ -1,7 +1,9 @@
+import collections
 import pickle
 import requests
 import threading
 import typing
+import urllib3
 
 from hydrus.core import HydrusData
 from hydrus.core import HydrusSerialisable
@@ -23,6 +25,70 @@ except:
     
     SOCKS_PROXY_OK = False
     
+def _MakeConnectionCountingPoolClass( pool_class, report_connection_opened, report_request ):
+    
+    # urllib3 calls connect on a connection object whenever it needs a fresh socket, and urlopen for every request attempt
+    # so, requests minus connects is how many times we got to reuse a kept-alive connection
+    
+    base_connection_class = pool_class.ConnectionCls
+    
+    class ConnectionCountingConnection( base_connection_class ):
+        
+        def connect( self ):
+            
+            report_connection_opened()
+            
+            return base_connection_class.connect( self )
+            
+        
+    
+    class ConnectionCountingConnectionPool( pool_class ):
+        
+        ConnectionCls = ConnectionCountingConnection
+        
+        def urlopen( self, *args, **kwargs ):
+            
+            report_request()
+            
+            return pool_class.urlopen( self, *args, **kwargs )
+            
+        
+    
+    return ConnectionCountingConnectionPool
+    
+
+class ConnectionCountingHTTPAdapter( requests.adapters.HTTPAdapter ):
+    
+    def __init__( self, connection_pool_settings, report_connection_opened, report_request ):
+        
+        ( num_hosts, pool_size_per_host, max_retries ) = connection_pool_settings
+        
+        self._connection_pool_settings = connection_pool_settings
+        
+        self._pool_classes_by_scheme = {
+            'http' : _MakeConnectionCountingPoolClass( urllib3.HTTPConnectionPool, report_connection_opened, report_request ),
+            'https' : _MakeConnectionCountingPoolClass( urllib3.HTTPSConnectionPool, report_connection_opened, report_request )
+        }
+        
+        # no read retries, since we cannot know if the server did the thing. connect errors are safe to try again
+        retry = urllib3.util.Retry( total = max_retries, read = False, backoff_factor = 0.5 )
+        
+        requests.adapters.HTTPAdapter.__init__( self, pool_connections = num_hosts, pool_maxsize = pool_size_per_host, max_retries = retry )
+        
+    
+    def GetConnectionPoolSettings( self ):
+        
+        return self._connection_pool_settings
+        
+    
+    def init_poolmanager( self, *args, **kwargs ):
+        
+        requests.adapters.HTTPAdapter.init_poolmanager( self, *args, **kwargs )
+        
+        self.poolmanager.pool_classes_by_scheme = dict( self._pool_classes_by_scheme )
+        
+    
+
 class NetworkSessionManagerSessionContainer( HydrusSerialisable.SerialisableBaseNamed ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_NETWORK_SESSION_MANAGER_SESSION_CONTAINER
@@ -137,9 +203,17 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
         
         self._proxies_dict = {}
         
+        self._default_connection_pool_settings = ( 10, 10, 0 )
+        self._domains_to_connection_pool_settings = {}
+        
+        self._network_contexts_to_num_connections_opened = collections.Counter()
+        self._network_contexts_to_num_requests = collections.Counter()
+        
         self._ReinitialiseProxies()
+        self._ReinitialiseConnectionPoolSettings()
         
         HG.client_controller.sub( self, 'ReinitialiseProxies', 'notify_new_options' )
+        HG.client_controller.sub( self, 'ReinitialiseConnectionPoolSettings', 'notify_new_options' )
         
     
     def _CleanSessionCookies( self, network_context, session ):
@@ -159,6 +233,18 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
         session.cookies.clear_expired_cookies()
         
     
+    def _GetConnectionPoolSettings( self, network_context ):
+        
+        ( num_hosts, pool_size_per_host, max_retries ) = self._default_connection_pool_settings
+        
+        if network_context.context_type == CC.NETWORK_CONTEXT_DOMAIN and network_context.context_data in self._domains_to_connection_pool_settings:
+            
+            ( pool_size_per_host, max_retries ) = self._domains_to_connection_pool_settings[ network_context.context_data ]
+            
+        
+        return ( num_hosts, pool_size_per_host, max_retries )
+        
+    
     def _GetSerialisableInfo( self ):
         
         return sorted( self._session_container_names )
@@ -204,6 +290,61 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
         self._SetDirty()
         
     
+    def _MountConnectionAdapter( self, network_context, session ):
+        
+        connection_pool_settings = self._GetConnectionPoolSettings( network_context )
+        
+        current_adapter = session.adapters.get( 'https://', None )
+        
+        if isinstance( current_adapter, ConnectionCountingHTTPAdapter ) and current_adapter.GetConnectionPoolSettings() == connection_pool_settings:
+            
+            return
+            
+        
+        # these get called from the network job threads, never while we hold the lock
+        
+        def report_connection_opened():
+            
+            with self._lock:
+                
+                self._network_contexts_to_num_connections_opened[ network_context ] += 1
+                
+            
+        
+        def report_request():
+            
+            with self._lock:
+                
+                self._network_contexts_to_num_requests[ network_context ] += 1
+                
+            
+        
+        old_adapters = { session.adapters[ prefix ] for prefix in ( 'https://', 'http://' ) if prefix in session.adapters }
+        
+        adapter = ConnectionCountingHTTPAdapter( connection_pool_settings, report_connection_opened, report_request )
+        
+        session.mount( 'https://', adapter )
+        session.mount( 'http://', adapter )
+        
+        # any connection still checked out of an old pool is just closed when it comes back
+        
+        for old_adapter in old_adapters:
+            
+            old_adapter.close()
+            
+        
+    
+    def _ReinitialiseConnectionPoolSettings( self ):
+        
+        num_hosts = HG.client_controller.new_options.GetInteger( 'connection_pool_num_hosts' )
+        pool_size_per_host = HG.client_controller.new_options.GetInteger( 'connection_pool_size_per_host' )
+        max_retries = HG.client_controller.new_options.GetInteger( 'connection_max_retries' )
+        
+        self._default_connection_pool_settings = ( num_hosts, pool_size_per_host, max_retries )
+        
+        self._domains_to_connection_pool_settings = HG.client_controller.new_options.GetDomainsToConnectionPoolSettings()
+        
+    
     def _ReinitialiseProxies( self ):
         
         self._proxies_dict = {}
@@ -266,6 +407,19 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def GetConnectionCounts( self, network_context ):
+        
+        with self._lock:
+            
+            network_context = self._GetSessionNetworkContext( network_context )
+            
+            num_opened = self._network_contexts_to_num_connections_opened[ network_context ]
+            num_reused = max( 0, self._network_contexts_to_num_requests[ network_context ] - num_opened )
+            
+            return ( num_opened, num_reused )
+            
+        
+    
     def GetDeleteeSessionNames( self ):
         
         with self._lock:
@@ -308,6 +462,8 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
                 session.proxies = dict( self._proxies_dict )
                 
             
+            self._MountConnectionAdapter( network_context, session )
+            
             #
             
             self._CleanSessionCookies( network_context, session )
@@ -354,6 +510,14 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def ReinitialiseConnectionPoolSettings( self ):
+        
+        with self._lock:
+            
+            self._ReinitialiseConnectionPoolSettings()
+            
+        
+    
     def ReinitialiseProxies( self ):
         
         with self._lock:
@@ -62,6 +62,25 @@ def ConvertURLClassesIntoAPIPairs( url_classes ):
     
     return pairs
     
+def ParseURLForTesting( url ):
+    
+    # everything a url class test looks at, so we only have to do it once per url no matter how many classes we test
+    
+    p = ClientNetworkingFunctions.ParseURL( url )
+    
+    url_path = p.path
+    
+    while url_path.startswith( '/' ):
+        
+        url_path = url_path[ 1 : ]
+        
+    
+    url_path_components = url_path.split( '/' )
+    
+    ( url_parameters, single_value_parameters, param_order ) = ClientNetworkingFunctions.ConvertQueryTextToDict( p.query )
+    
+    return ( p.netloc, url_path, url_path_components, p.query, url_parameters, single_value_parameters )
+    
 def SortURLClassesListDescendingComplexity( url_classes: typing.List[ "URLClass" ] ):
     
     # sort reverse = true so most complex come first
@@ -959,32 +978,28 @@ class URLClass( HydrusSerialisable.SerialisableBaseNamed ):
     
     def Test( self, url ):
         
-        p = ClientNetworkingFunctions.ParseURL( url )
+        self.TestParsed( ParseURLForTesting( url ) )
+        
+    
+    def TestParsed( self, parsed_url ):
+        
+        ( netloc, url_path, url_path_components, query, url_parameters, single_value_parameters ) = parsed_url
         
         if self._match_subdomains:
             
-            if p.netloc != self._netloc and not p.netloc.endswith( '.' + self._netloc ):
+            if netloc != self._netloc and not netloc.endswith( '.' + self._netloc ):
                 
-                raise HydrusExceptions.URLClassException( p.netloc + ' (potentially excluding subdomains) did not match ' + self._netloc )
+                raise HydrusExceptions.URLClassException( netloc + ' (potentially excluding subdomains) did not match ' + self._netloc )
                 
             
         else:
             
-            if not ClientNetworkingFunctions.DomainEqualsAnotherForgivingWWW( p.netloc, self._netloc ):
+            if not ClientNetworkingFunctions.DomainEqualsAnotherForgivingWWW( netloc, self._netloc ):
                 
-                raise HydrusExceptions.URLClassException( p.netloc + ' did not match ' + self._netloc )
+                raise HydrusExceptions.URLClassException( netloc + ' did not match ' + self._netloc )
                 
             
         
-        url_path = p.path
-        
-        while url_path.startswith( '/' ):
-            
-            url_path = url_path[ 1 : ]
-            
-        
-        url_path_components = url_path.split( '/' )
-        
         if len( url_path_components ) > len( self._path_components ) and self._no_more_path_components_than_this:
             
             raise HydrusExceptions.URLClassException( '"{}" has {} path components, but I will not allow more than my defined {}!'.format( url_path, len( url_path_components ), len( self._path_components ) ) )
@@ -1020,8 +1035,6 @@ class URLClass( HydrusSerialisable.SerialisableBaseNamed ):
                 
             
         
-        ( url_parameters, single_value_parameters, param_order ) = ClientNetworkingFunctions.ConvertQueryTextToDict( p.query )
-        
         if len( url_parameters ) > len( self._parameters ) and self._no_more_parameters_than_this:
             
             raise HydrusExceptions.URLClassException( '"{}" has {} parameters, but I will not allow more than my defined {}!'.format( url_path, len( url_parameters ), len( self._parameters ) ) )
@@ -1033,7 +1046,7 @@ class URLClass( HydrusSerialisable.SerialisableBaseNamed ):
                 
                 if default is None:
                     
-                    raise HydrusExceptions.URLClassException( key + ' not found in ' + p.query )
+                    raise HydrusExceptions.URLClassException( key + ' not found in ' + query )
                     
                 else:
                     
@@ -1090,3 +1103,143 @@ class URLClass( HydrusSerialisable.SerialisableBaseNamed ):
         
     
 HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_URL_CLASS ] = URLClass
+
+class URLClassPathTrieNode( object ):
+    
+    def __init__( self ):
+        
+        self.fixed_children = {}
+        self.wildcard_child = None
+        
+        # classes whose path components end here
+        self.url_class_indices = []
+        
+        # everything here and below
+        self.all_url_class_indices = []
+        
+    
+class URLClassMatcher( object ):
+    
+    # testing a url against a domain's url classes one by one means parsing it and running every string match of every class
+    # this parses once and uses a trie of the classes' fixed path components, and their required parameter keys, to throw out classes that cannot match
+    # whatever is left is tested properly, in the same most-complex-first order as before, so we always get the same answer as the simple loop
+    
+    def __init__( self, url_classes: typing.List[ URLClass ] ):
+        
+        self._url_classes = list( url_classes )
+        
+        self._required_parameter_keys = []
+        
+        self._root = URLClassPathTrieNode()
+        
+        for ( index, url_class ) in enumerate( self._url_classes ):
+            
+            ( url_type, preferred_scheme, netloc, path_components, parameters, api_lookup_converter, send_referral_url, referral_url_converter, example_url ) = url_class.ToTuple()
+            
+            node = self._root
+            
+            node.all_url_class_indices.append( index )
+            
+            for ( string_match, default ) in path_components:
+                
+                # a default only kicks in when the url is too short, so a fixed component still has to be exactly this when present
+                
+                if isinstance( string_match, ClientStrings.StringMatch ) and string_match.ToTuple()[0] == ClientStrings.STRING_MATCH_FIXED:
+                    
+                    fixed_value = string_match.ToTuple()[1]
+                    
+                    if fixed_value not in node.fixed_children:
+                        
+                        node.fixed_children[ fixed_value ] = URLClassPathTrieNode()
+                        
+                    
+                    node = node.fixed_children[ fixed_value ]
+                    
+                else:
+                    
+                    if node.wildcard_child is None:
+                        
+                        node.wildcard_child = URLClassPathTrieNode()
+                        
+                    
+                    node = node.wildcard_child
+                    
+                
+                node.all_url_class_indices.append( index )
+                
+            
+            node.url_class_indices.append( index )
+            
+            self._required_parameter_keys.append( frozenset( ( key for ( key, ( string_match, default ) ) in parameters.items() if default is None ) ) )
+            
+        
+    
+    def _GetCandidateIndices( self, url_path_components, url_parameters ):
+        
+        candidate_indices = set()
+        
+        nodes_and_depths = [ ( self._root, 0 ) ]
+        
+        while len( nodes_and_depths ) > 0:
+            
+            ( node, depth ) = nodes_and_depths.pop()
+            
+            if depth == len( url_path_components ):
+                
+                # the url ran out, so any class down here might still match with defaults
+                
+                candidate_indices.update( node.all_url_class_indices )
+                
+                continue
+                
+            
+            candidate_indices.update( node.url_class_indices )
+            
+            url_path_component = url_path_components[ depth ]
+            
+            if url_path_component in node.fixed_children:
+                
+                nodes_and_depths.append( ( node.fixed_children[ url_path_component ], depth + 1 ) )
+                
+            
+            if node.wildcard_child is not None:
+                
+                nodes_and_depths.append( ( node.wildcard_child, depth + 1 ) )
+                
+            
+        
+        return sorted( ( index for index in candidate_indices if self._required_parameter_keys[ index ].issubset( url_parameters ) ) )
+        
+    
+    def GetMatchingURLClass( self, url ) -> typing.Optional[ URLClass ]:
+        
+        try:
+            
+            parsed_url = ParseURLForTesting( url )
+            
+        except HydrusExceptions.URLClassException:
+            
+            return None
+            
+        
+        ( netloc, url_path, url_path_components, query, url_parameters, single_value_parameters ) = parsed_url
+        
+        for index in self._GetCandidateIndices( url_path_components, url_parameters ):
+            
+            url_class = self._url_classes[ index ]
+            
+            try:
+                
+                url_class.TestParsed( parsed_url )
+                
+                return url_class
+                
+            except HydrusExceptions.URLClassException:
+                
+                continue
+                
+            
+        
+        return None
+        
+    
@@ -7,6 +7,11 @@ from hydrus.client.metadata import ClientTagsHandling
 from hydrus.client.search import ClientSearch
 from hydrus.client.search import ClientSearchParseSystemPredicates
 
+# a normal a/c fetch gets this many of the biggest results. a forced fetch gets everything
+AUTOCOMPLETE_RESULTS_LIMIT = 1000
+# we ask the db for one more, so we know if anything was actually cut off
+AUTOCOMPLETE_RESULTS_FETCH_LIMIT = AUTOCOMPLETE_RESULTS_LIMIT + 1
+
 def SearchTextIsFetchAll( search_text: str ):
     
     ( namespace, subtag ) = HydrusTags.SplitTag( search_text )
@@ -394,7 +399,7 @@ class PredicateResultsCacheMedia( PredicateResultsCache ):
     
 class PredicateResultsCacheTag( PredicateResultsCache ):
     
-    def __init__( self, predicates: typing.Iterable[ ClientSearch.Predicate ], strict_search_text: str, exact_match: bool ):
+    def __init__( self, predicates: typing.Iterable[ ClientSearch.Predicate ], strict_search_text: str, exact_match: bool, is_complete: bool = True ):
         
         PredicateResultsCache.__init__( self, predicates )
         
@@ -403,10 +408,18 @@ class PredicateResultsCacheTag( PredicateResultsCache ):
         ( self._strict_search_text_namespace, self._strict_search_text_subtag ) = HydrusTags.SplitTag( self._strict_search_text )
         
         self._exact_match = exact_match
+        self._is_complete = is_complete
         
     
     def CanServeTagResults( self, parsed_autocomplete_text: ParsedAutocompleteText, exact_match: bool, allow_auto_wildcard_conversion = True ):
         
+        if not self._is_complete:
+            
+            # we only have the top n results, so a refined search may want something we cut off
+            
+            return False
+            
+        
         strict_search_text = parsed_autocomplete_text.GetSearchText( False, allow_auto_wildcard_conversion = allow_auto_wildcard_conversion )
         
         if self._exact_match:
@@ -101,7 +101,7 @@ options = {}
 
 NETWORK_VERSION = 20
 SOFTWARE_VERSION = 532
-CLIENT_API_VERSION = 47
+CLIENT_API_VERSION = 48
 
 SERVER_THUMBNAIL_DIMENSIONS = ( 200, 200 )
 
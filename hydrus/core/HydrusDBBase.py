@@ -1,10 +1,12 @@
 import collections
+import json
 import typing
 
 import psutil
 import sqlite3
 
 from hydrus.core import HydrusData
+from hydrus.core import HydrusIntegerSets
 from hydrus.core import HydrusPaths
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusTemp
@@ -173,11 +175,38 @@ class TemporaryIntegerTableNameCache( object ):
         self._column_names_to_table_names[ column_name ].append( table_name )
         
     
+# past this, we send the ints over as one json array rather than a million executemany rows. it is about three times faster
+TEMPORARY_INTEGER_TABLE_BULK_INSERT_THRESHOLD = 1024
+
+JSON_EACH_IS_AVAILABLE = None
+
+def CanDoJSONEach( cursor: sqlite3.Cursor ) -> bool:
+    
+    global JSON_EACH_IS_AVAILABLE
+    
+    if JSON_EACH_IS_AVAILABLE is None:
+        
+        try:
+            
+            cursor.execute( 'SELECT value FROM json_each( ? );', ( '[1]', ) ).fetchall()
+            
+            JSON_EACH_IS_AVAILABLE = True
+            
+        except sqlite3.OperationalError:
+            
+            # old sqlite without json1 compiled in
+            
+            JSON_EACH_IS_AVAILABLE = False
+            
+        
+    
+    return JSON_EACH_IS_AVAILABLE
+    
 class TemporaryIntegerTable( object ):
     
     def __init__( self, cursor: sqlite3.Cursor, integer_iterable, column_name ):
         
-        if not isinstance( integer_iterable, set ):
+        if not isinstance( integer_iterable, ( set, HydrusIntegerSets.SortedIntegerSet ) ):
             
             integer_iterable = set( integer_iterable )
             
@@ -196,7 +225,25 @@ class TemporaryIntegerTable( object ):
             self._cursor.execute( 'CREATE TABLE IF NOT EXISTS {} ( {} INTEGER PRIMARY KEY );'.format( self._table_name, self._column_name ) )
             
         
-        self._cursor.executemany( 'INSERT INTO {} ( {} ) VALUES ( ? );'.format( self._table_name, self._column_name ), ( ( i, ) for i in self._integer_iterable ) )
+        if len( self._integer_iterable ) > TEMPORARY_INTEGER_TABLE_BULK_INSERT_THRESHOLD and CanDoJSONEach( self._cursor ):
+            
+            # sorted input means the primary key btree only ever appends
+            if isinstance( self._integer_iterable, HydrusIntegerSets.SortedIntegerSet ):
+                
+                integers = self._integer_iterable.ToList()
+                
+            else:
+                
+                integers = sorted( self._integer_iterable )
+                
+            
+            self._cursor.execute( 'INSERT INTO {} ( {} ) SELECT value FROM json_each( ? );'.format( self._table_name, self._column_name ), ( json.dumps( integers ), ) )
+            
+        else:
+            
+            self._cursor.executemany( 'INSERT INTO {} ( {} ) VALUES ( ? );'.format( self._table_name, self._column_name ), ( ( i, ) for i in self._integer_iterable ) )
+            
+        
         
         return self._table_name
         
@@ -0,0 +1,364 @@
+import collections.abc
+import typing
+
+import numpy
+
+# a compact set of non-negative integer ids, like hash_ids, backed by a sorted unique numpy int64 array
+# a python set of a million ints is ~60MB and does set ops one item at a time. this is ~8MB and does them vectorised
+# it speaks the normal set api, so it can go anywhere a set of hash_ids was going
+# iterating gives you python ints, not numpy ints, since sqlite will not bind numpy ints
+
+# we never edit an array in place--ops always make a new one--so two sets may safely share the same array
+
+INTEGER_DTYPE = numpy.int64
+
+def _EmptyArray() -> numpy.ndarray:
+    
+    return numpy.empty( 0, dtype = INTEGER_DTYPE )
+    
+
+def _GetSortedUniqueArray( integers ) -> numpy.ndarray:
+    
+    if integers is None:
+        
+        return _EmptyArray()
+        
+    
+    if isinstance( integers, SortedIntegerSet ):
+        
+        return integers.GetArray()
+        
+    
+    if isinstance( integers, numpy.ndarray ):
+        
+        return numpy.unique( integers.astype( INTEGER_DTYPE, copy = False ) )
+        
+    
+    if isinstance( integers, ( set, frozenset ) ):
+        
+        # already unique, so we only have to sort
+        
+        array = numpy.fromiter( integers, dtype = INTEGER_DTYPE, count = len( integers ) )
+        
+        array.sort()
+        
+        return array
+        
+    
+    if isinstance( integers, ( list, tuple ) ):
+        
+        if len( integers ) == 0:
+            
+            return _EmptyArray()
+            
+        
+        return numpy.unique( numpy.array( integers, dtype = INTEGER_DTYPE ) )
+        
+    
+    # generators, db cursors, dict keys, whatever
+    
+    return numpy.unique( numpy.fromiter( integers, dtype = INTEGER_DTYPE ) )
+    
+
+def _GetIntersectionMaskAndPositions( haystack: numpy.ndarray, needles: numpy.ndarray ):
+    
+    # both sorted unique. O( len( needles ) * log( len( haystack ) ) )
+    
+    positions = numpy.searchsorted( haystack, needles )
+    
+    if len( haystack ) == 0:
+        
+        return ( numpy.zeros( len( needles ), dtype = bool ), positions )
+        
+    
+    clipped_positions = numpy.minimum( positions, len( haystack ) - 1 )
+    
+    mask = haystack[ clipped_positions ] == needles
+    
+    return ( mask, positions )
+    
+
+def GetSortedIntersection( a: numpy.ndarray, b: numpy.ndarray ) -> numpy.ndarray:
+    
+    if len( a ) > len( b ):
+        
+        ( a, b ) = ( b, a )
+        
+    
+    # probe the big one with the small one
+    
+    ( mask, positions ) = _GetIntersectionMaskAndPositions( b, a )
+    
+    return a[ mask ]
+    
+
+def GetSortedDifference( a: numpy.ndarray, b: numpy.ndarray ) -> numpy.ndarray:
+    
+    if len( a ) == 0 or len( b ) == 0:
+        
+        return a
+        
+    
+    if len( b ) < len( a ):
+        
+        # find the few things to remove and cut them out
+        
+        ( mask, positions ) = _GetIntersectionMaskAndPositions( a, b )
+        
+        if not mask.any():
+            
+            return a
+            
+        
+        return numpy.delete( a, positions[ mask ] )
+        
+    else:
+        
+        ( mask, positions ) = _GetIntersectionMaskAndPositions( b, a )
+        
+        return a[ ~mask ]
+        
+    
+
+def GetSortedUnion( a: numpy.ndarray, b: numpy.ndarray ) -> numpy.ndarray:
+    
+    if len( a ) < len( b ):
+        
+        ( a, b ) = ( b, a )
+        
+    
+    if len( b ) == 0:
+        
+        return a
+        
+    
+    # slot the new stuff from the small one into the big one
+    
+    new_items = GetSortedDifference( b, a )
+    
+    if len( new_items ) == 0:
+        
+        return a
+        
+    
+    return numpy.insert( a, numpy.searchsorted( a, new_items ), new_items )
+    
+
+class SortedIntegerSet( collections.abc.MutableSet ):
+    
+    def __init__( self, integers: typing.Optional[ typing.Iterable[ int ] ] = None ):
+        
+        self._array = _GetSortedUniqueArray( integers )
+        
+    
+    def __and__( self, other ):
+        
+        if not isinstance( other, collections.abc.Iterable ):
+            
+            return NotImplemented
+            
+        
+        return self.intersection( other )
+        
+    
+    __rand__ = __and__
+    
+    def __contains__( self, item ):
+        
+        if len( self._array ) == 0 or not isinstance( item, ( int, numpy.integer ) ):
+            
+            return False
+            
+        
+        position = numpy.searchsorted( self._array, item )
+        
+        return position < len( self._array ) and self._array[ position ] == item
+        
+    
+    def __eq__( self, other ):
+        
+        if isinstance( other, SortedIntegerSet ):
+            
+            return numpy.array_equal( self._array, other.GetArray() )
+            
+        
+        return collections.abc.MutableSet.__eq__( self, other )
+        
+    
+    def __getitem__( self, index ):
+        
+        # so we can be chunked like a list
+        
+        if isinstance( index, slice ):
+            
+            return self._array[ index ].tolist()
+            
+        
+        return int( self._array[ index ] )
+        
+    
+    def __iter__( self ):
+        
+        return iter( self._array.tolist() )
+        
+    
+    def __len__( self ):
+        
+        return len( self._array )
+        
+    
+    def __or__( self, other ):
+        
+        if not isinstance( other, collections.abc.Iterable ):
+            
+            return NotImplemented
+            
+        
+        return self.union( other )
+        
+    
+    __ror__ = __or__
+    
+    def __repr__( self ):
+        
+        return 'SortedIntegerSet: {} items'.format( len( self._array ) )
+        
+    
+    def __sub__( self, other ):
+        
+        if not isinstance( other, collections.abc.Iterable ):
+            
+            return NotImplemented
+            
+        
+        return self.difference( other )
+        
+    
+    def __rsub__( self, other ):
+        
+        if not isinstance( other, collections.abc.Iterable ):
+            
+            return NotImplemented
+            
+        
+        return SortedIntegerSet( other ).difference( self )
+        
+    
+    def add( self, item: int ):
+        
+        self._array = GetSortedUnion( self._array, numpy.array( [ item ], dtype = INTEGER_DTYPE ) )
+        
+    
+    def clear( self ):
+        
+        self._array = _EmptyArray()
+        
+    
+    def copy( self ) -> 'SortedIntegerSet':
+        
+        return SortedIntegerSet( self )
+        
+    
+    def difference( self, *others ) -> 'SortedIntegerSet':
+        
+        result = self.copy()
+        
+        result.difference_update( *others )
+        
+        return result
+        
+    
+    def difference_update( self, *others ):
+        
+        for other in others:
+            
+            self._array = GetSortedDifference( self._array, _GetSortedUniqueArray( other ) )
+            
+        
+    
+    def discard( self, item: int ):
+        
+        self._array = GetSortedDifference( self._array, numpy.array( [ item ], dtype = INTEGER_DTYPE ) )
+        
+    
+    def GetArray( self ) -> numpy.ndarray:
+        
+        return self._array
+        
+    
+    def intersection( self, *others ) -> 'SortedIntegerSet':
+        
+        result = self.copy()
+        
+        result.intersection_update( *others )
+        
+        return result
+        
+    
+    def intersection_update( self, *others ):
+        
+        for other in others:
+            
+            self._array = GetSortedIntersection( self._array, _GetSortedUniqueArray( other ) )
+            
+        
+    
+    def isdisjoint( self, other ) -> bool:
+        
+        return len( GetSortedIntersection( self._array, _GetSortedUniqueArray( other ) ) ) == 0
+        
+    
+    def issubset( self, other ) -> bool:
+        
+        return len( GetSortedDifference( self._array, _GetSortedUniqueArray( other ) ) ) == 0
+        
+    
+    def issuperset( self, other ) -> bool:
+        
+        return len( GetSortedDifference( _GetSortedUniqueArray( other ), self._array ) ) == 0
+        
+    
+    def remove( self, item: int ):
+        
+        if item not in self:
+            
+            raise KeyError( item )
+            
+        
+        self.discard( item )
+        
+    
+    def ToList( self ) -> typing.List[ int ]:
+        
+        return self._array.tolist()
+        
+    
+    def union( self, *others ) -> 'SortedIntegerSet':
+        
+        result = self.copy()
+        
+        result.update( *others )
+        
+        return result
+        
+    
+    def update( self, *others ):
+        
+        for other in others:
+            
+            self._array = GetSortedUnion( self._array, _GetSortedUniqueArray( other ) )
+            
+        
+    
+    @staticmethod
+    def STATICCreateFromSortedArray( array: numpy.ndarray ) -> "SortedIntegerSet":
+        
+        # skips the sort, so only for arrays you know are already sorted and unique, like a masked slice of another set's array
+        
+        sorted_integer_set = SortedIntegerSet()
+        
+        sorted_integer_set._array = array.astype( INTEGER_DTYPE, copy = False )
+        
+        return sorted_integer_set
+        
+    
@@ -2978,6 +2978,49 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( boned_stats, dict( expected_data ) )
         
+        #
+        
+        status = {
+            'num_siblings_to_sync' : 5,
+            'num_parents_to_sync' : 12,
+            'num_actual_rows' : 100,
+            'num_ideal_rows' : 117,
+            'waiting_on_tag_repos' : []
+        }
+        
+        HG.test_controller.SetRead( 'tag_display_maintenance_statuses', { service_key : status for service_key in HG.test_controller.services_manager.GetServiceKeys( HC.REAL_TAG_SERVICES ) } )
+        
+        path = '/manage_database/get_tag_display_sync_status'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        tag_display_sync_status = d[ 'tag_display_sync_status' ]
+        
+        self.assertIn( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY.hex(), tag_display_sync_status )
+        
+        for service_status in tag_display_sync_status.values():
+            
+            for ( key, value ) in status.items():
+                
+                self.assertEqual( service_status[ key ], value )
+                
+            
+            self.assertEqual( service_status[ 'going_faster' ], False )
+            self.assertEqual( service_status[ 'eta' ], None )
+            
+        
+        self.assertIn( 'services', d )
+        
     
     def _test_manage_duplicates( self, connection, set_up_permissions ):
         
@@ -1,4 +1,6 @@
+import collections
 import os
+import sqlite3
 import time
 import unittest
 
@@ -7,23 +9,32 @@ from hydrus.core import HydrusData
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusImageHandling
 from hydrus.core import HydrusSerialisable
+from hydrus.core import HydrusTags
 from hydrus.core import HydrusTime
 from hydrus.core.networking import HydrusNetwork
 
 from hydrus.client import ClientConstants as CC
+from hydrus.client import ClientController
 from hydrus.client import ClientDefaults
 from hydrus.client import ClientImageHandling
 from hydrus.client import ClientLocation
 from hydrus.client import ClientServices
 from hydrus.client.db import ClientDB
+from hydrus.client.db import ClientDBFilesMetadataBasic
+from hydrus.client.db import ClientDBFilesSearch
+from hydrus.client.db import ClientDBFilesSearchCache
+from hydrus.client.db import ClientDBTagSearchCache
 from hydrus.client.exporting import ClientExportingFiles
 from hydrus.client.gui.pages import ClientGUIManagementController
 from hydrus.client.gui.pages import ClientGUISession
 from hydrus.client.importing import ClientImportLocal
 from hydrus.client.importing import ClientImportFiles
 from hydrus.client.importing.options import FileImportOptions
+from hydrus.client.media import ClientMedia
 from hydrus.client.metadata import ClientTags
+from hydrus.client.metadata import ClientTagsHandling
 from hydrus.client.search import ClientSearch
+from hydrus.client.search import ClientSearchAutocomplete
 
 from hydrus.test import TestController
 
@@ -229,22 +240,643 @@ class TestClientDB( unittest.TestCase ):
         
         self.assertEqual( set( result ), preds )
         
+        #
+        
+        # infix searches should give the same results with and without the optional trigram index
+        
+        search_texts_to_expected_tags = {
+            '*ars*' : { 'series:cars' },
+            '*ord' : { 'maker:ford' },
+            '*a*' : { 'car', 'series:cars' },
+            '*xyz*' : set()
+        }
+        
+        def do_infix_searches():
+            
+            for ( search_text, expected_tags ) in search_texts_to_expected_tags.items():
+                
+                result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = search_text )
+                
+                self.assertEqual( { p.GetValue() for p in result }, expected_tags )
+                
+            
+        
+        do_infix_searches()
+        
+        self._write( 'regenerate_tag_cache_trigram_index' )
+        
+        do_infix_searches()
+        
+        # new tags go into the index
+        
+        service_keys_to_content_updates = { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'scarf', ( hash, ) ) ) ] }
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        search_texts_to_expected_tags[ '*ars*' ] = { 'series:cars' }
+        search_texts_to_expected_tags[ '*car*' ] = { 'car', 'series:cars', 'scarf' }
+        search_texts_to_expected_tags[ '*a*' ] = { 'car', 'series:cars', 'scarf' }
+        
+        do_infix_searches()
+        
+        # and deleted ones come out
+        
+        service_keys_to_content_updates = { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( 'scarf', ( hash, ) ) ) ] }
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        search_texts_to_expected_tags[ '*car*' ] = { 'car', 'series:cars' }
+        search_texts_to_expected_tags[ '*a*' ] = { 'car', 'series:cars' }
+        
+        do_infix_searches()
+        
+        # a regen of the main cache keeps the index
+        
+        self._write( 'regenerate_tag_cache' )
+        
+        do_infix_searches()
+        
+        self._write( 'delete_tag_cache_trigram_index' )
+        
+        do_infix_searches()
+        
+    
+    def test_autocomplete_cache( self ):
+        
+        TestClientDB._clear_db()
+        
+        location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.COMBINED_FILE_SERVICE_KEY )
+        tag_context = ClientSearch.TagContext( service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        file_search_context = ClientSearch.FileSearchContext( location_context = location_context, tag_context = tag_context )
+        
+        autocomplete_predicates_cache = self._db._autocomplete_predicates_cache
+        
+        hash_1 = HydrusData.GenerateKey()
+        hash_2 = HydrusData.GenerateKey()
+        
+        def add_mappings( tag, hashes ):
+            
+            content_update = HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( tag, hashes ) )
+            
+            self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update ] } )
+            
+        
+        def get_tags_to_counts( search_text ):
+            
+            result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = search_text )
+            
+            return { predicate.GetValue() : predicate.GetCount().GetMinCount() for predicate in result }
+            
+        
+        add_mappings( 'character:samus aran', ( hash_1, ) )
+        add_mappings( 'series:metroid', ( hash_1, ) )
+        
+        self.assertEqual( get_tags_to_counts( 'character:*' ), { 'character:samus aran' : 1 } )
+        
+        ( num_entries, total_weight, num_hits, num_misses ) = autocomplete_predicates_cache.GetStats()
+        
+        self.assertEqual( get_tags_to_counts( 'character:*' ), { 'character:samus aran' : 1 } )
+        
+        self.assertEqual( autocomplete_predicates_cache.GetStats()[2], num_hits + 1 )
+        
+        # what we get out is a copy, so merging and editing it does not poison the cache
+        
+        result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = 'character:*' )
+        
+        result[0].GetCount().AddCounts( ClientSearch.PredicateCount.STATICCreateCurrentCount( 5 ) )
+        
+        self.assertEqual( get_tags_to_counts( 'character:*' ), { 'character:samus aran' : 1 } )
+        
+        # a count change to a tag we looked at
+        
+        add_mappings( 'character:samus aran', ( hash_2, ) )
+        
+        self.assertEqual( get_tags_to_counts( 'character:*' ), { 'character:samus aran' : 2 } )
+        
+        # a count change to a tag we did not look at leaves us alone
+        
+        self.assertEqual( get_tags_to_counts( 'series:*' ), { 'series:metroid' : 1 } )
+        
+        ( num_entries, total_weight, num_hits, num_misses ) = autocomplete_predicates_cache.GetStats()
+        
+        add_mappings( 'series:metroid', ( hash_2, ) )
+        
+        self.assertEqual( get_tags_to_counts( 'character:*' ), { 'character:samus aran' : 2 } )
+        
+        self.assertEqual( autocomplete_predicates_cache.GetStats()[2], num_hits + 1 )
+        
+        self.assertEqual( get_tags_to_counts( 'series:*' ), { 'series:metroid' : 2 } )
+        
+        # a brand new tag that matches
+        
+        add_mappings( 'character:ridley', ( hash_2, ) )
+        
+        self.assertEqual( get_tags_to_counts( 'character:*' ), { 'character:samus aran' : 2, 'character:ridley' : 1 } )
+        
+        # and removal
+        
+        content_update = HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( 'character:ridley', ( hash_2, ) ) )
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update ] } )
+        
+        self.assertEqual( get_tags_to_counts( 'character:*' ), { 'character:samus aran' : 2 } )
+        
+        # siblings are applied to what we cached
+        
+        result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_ACTUAL, file_search_context, search_text = 'series:*' )
+        
+        self.assertEqual( { predicate.GetValue() for predicate in result }, { 'series:metroid' } )
+        
+        content_update = HydrusData.ContentUpdate( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD, ( 'series:metroid', 'series:metroid (series)' ) )
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ content_update ] } )
+        
+        self._write( 'sync_tag_display_maintenance', CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, 30 )
+        
+        result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_ACTUAL, file_search_context, search_text = 'series:*' )
+        
+        self.assertEqual( { predicate.GetValue() for predicate in result }, { 'series:metroid (series)' } )
+        
+        # the startup warm-up fills the entries a new search page's dropdown asks for
+        
+        tag_service_key = HG.test_controller.new_options.GetKey( 'default_tag_service_search_page' )
+        
+        original_tag_autocomplete_options = HG.test_controller.tag_display_manager.GetTagAutocompleteOptions( tag_service_key )
+        
+        tag_autocomplete_options = ClientTagsHandling.TagAutocompleteOptions( tag_service_key )
+        
+        tag_autocomplete_options.SetTuple(
+            tag_autocomplete_options.GetWriteAutocompleteTagDomain(),
+            tag_autocomplete_options.OverridesWriteAutocompleteLocationContext(),
+            tag_autocomplete_options.GetWriteAutocompleteLocationContext(),
+            False,
+            True,
+            True,
+            False
+        )
+        
+        HG.test_controller.tag_display_manager.SetTagAutocompleteOptions( tag_autocomplete_options )
+        
+        try:
+            
+            ( num_entries, total_weight, num_hits, num_misses ) = autocomplete_predicates_cache.GetStats()
+            
+            ClientController.Controller.WarmAutocompleteCache( HG.test_controller )
+            
+            self.assertGreater( autocomplete_predicates_cache.GetStats()[3], num_misses )
+            
+            dropdown_file_search_context = ClientSearch.FileSearchContext( location_context = HG.test_controller.new_options.GetDefaultLocalLocationContext(), tag_context = ClientSearch.TagContext( service_key = tag_service_key ) )
+            
+            parsed_autocomplete_text = ClientSearchAutocomplete.ParsedAutocompleteText( 'character:', tag_autocomplete_options, True )
+            
+            ( num_entries, total_weight, num_hits, num_misses ) = autocomplete_predicates_cache.GetStats()
+            
+            # same calls as ReadFetch
+            
+            self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_ACTUAL, dropdown_file_search_context, search_text = parsed_autocomplete_text.GetSearchText( False ), exact_match = True, inclusive = parsed_autocomplete_text.inclusive )
+            self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_ACTUAL, dropdown_file_search_context, search_text = parsed_autocomplete_text.GetSearchText( True ), inclusive = parsed_autocomplete_text.inclusive, search_namespaces_into_full_tags = tag_autocomplete_options.SearchNamespacesIntoFullTags(), limit = ClientSearchAutocomplete.AUTOCOMPLETE_RESULTS_FETCH_LIMIT )
+            
+            self.assertEqual( autocomplete_predicates_cache.GetStats()[2:], ( num_hits + 2, num_misses ) )
+            
+        finally:
+            
+            HG.test_controller.tag_display_manager.SetTagAutocompleteOptions( original_tag_autocomplete_options )
+            
+        
+        # bounded
+        
+        autocomplete_predicates_cache = ClientDBTagSearchCache.AutocompletePredicatesCache( max_weight = 10 )
+        
+        predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, 'tag {}'.format( i ) ) for i in range( 3 ) ]
+        
+        for i in range( 5 ):
+            
+            autocomplete_predicates_cache.SetPredicates( i, predicates, ( 1, ), ( 1, 2, 3 ) )
+            
+        
+        ( num_entries, total_weight, num_hits, num_misses ) = autocomplete_predicates_cache.GetStats()
+        
+        self.assertEqual( num_entries, 1 )
+        self.assertLessEqual( total_weight, 10 )
+        
+        self.assertIsNone( autocomplete_predicates_cache.GetPredicates( 0 ) )
+        self.assertIsNotNone( autocomplete_predicates_cache.GetPredicates( 4 ) )
+        
+        autocomplete_predicates_cache.Clear( 1 )
+        
+        self.assertIsNone( autocomplete_predicates_cache.GetPredicates( 4 ) )
+        
+    
+    def test_autocomplete_top_k( self ):
+        
+        TestClientDB._clear_db()
+        
+        services = list( self._read( 'services' ) )
+        
+        other_service_key = HydrusData.GenerateKey()
+        
+        services.append( ClientServices.GenerateService( other_service_key, HC.LOCAL_TAG, 'other service' ) )
+        
+        self._write( 'update_services', services )
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        hashes = []
+        
+        for filename in ( 'muh_png.png', 'muh_jpg.jpg', 'muh_gif.gif', 'muh_apng.png' ):
+            
+            path = os.path.join( HC.STATIC_DIR, 'testing', filename )
+            
+            file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+            
+            file_import_job.GeneratePreImportHashAndStatus()
+            
+            file_import_job.GenerateInfo()
+            
+            self._write( 'import_file', file_import_job )
+            
+            hashes.append( file_import_job.GetHash() )
+            
+        
+        remote_hashes = [ HydrusData.GenerateKey() for i in range( 30 ) ]
+        
+        # 'topk:tag n' has n remote files in my tags, and a scatter of local files across both services
+        
+        my_content_updates = []
+        other_content_updates = []
+        
+        for i in range( 30 ):
+            
+            tag = 'topk:tag {}'.format( i )
+            
+            my_content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( tag, remote_hashes[ : i ] ) ) )
+            my_content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( tag, hashes[ : i % 4 ] ) ) )
+            other_content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( tag, hashes[ : ( i * 7 ) % 5 ] ) ) )
+            
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : my_content_updates, other_service_key : other_content_updates } )
+        
+        def do_test( file_search_context, limit, zero_count_ok = False ):
+            
+            full_result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = 'topk:*', zero_count_ok = zero_count_ok )
+            top_k_result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = 'topk:*', zero_count_ok = zero_count_ok, limit = limit )
+            
+            full_result = ClientSearch.SortPredicates( full_result )
+            top_k_result = ClientSearch.SortPredicates( top_k_result )
+            
+            self.assertEqual( len( top_k_result ), min( limit, len( full_result ) ) )
+            
+            # ties at the cutoff can go either way, so we test the counts
+            
+            self.assertEqual( [ p.GetCount().GetMinCount() for p in top_k_result ], [ p.GetCount().GetMinCount() for p in full_result[ : limit ] ] )
+            
+            full_values_to_counts = { p.GetValue() : p.GetCount().GetMinCount() for p in full_result }
+            
+            for p in top_k_result:
+                
+                self.assertEqual( p.GetCount().GetMinCount(), full_values_to_counts[ p.GetValue() ] )
+                
+            
+        
+        # one leaf
+        
+        location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.COMBINED_FILE_SERVICE_KEY )
+        tag_context = ClientSearch.TagContext( service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        file_search_context = ClientSearch.FileSearchContext( location_context = location_context, tag_context = tag_context )
+        
+        do_test( file_search_context, 5 )
+        do_test( file_search_context, 1 )
+        do_test( file_search_context, 100 )
+        
+        # several leaves, merged
+        
+        location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.COMBINED_LOCAL_MEDIA_SERVICE_KEY )
+        tag_context = ClientSearch.TagContext( service_key = CC.COMBINED_TAG_SERVICE_KEY )
+        
+        file_search_context = ClientSearch.FileSearchContext( location_context = location_context, tag_context = tag_context )
+        
+        for limit in ( 1, 3, 7, 100 ):
+            
+            do_test( file_search_context, limit )
+            do_test( file_search_context, limit, zero_count_ok = True )
+            
+        
+        # pending only
+        
+        tag_context = ClientSearch.TagContext( service_key = CC.COMBINED_TAG_SERVICE_KEY, include_current_tags = False )
+        
+        file_search_context = ClientSearch.FileSearchContext( location_context = location_context, tag_context = tag_context )
+        
+        self.assertEqual( self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = 'topk:*', limit = 5 ), [] )
+        
     
     def test_export_folders( self ):
         
-        tag_context = ClientSearch.TagContext( service_key = HydrusData.GenerateKey() )
+        tag_context = ClientSearch.TagContext( service_key = HydrusData.GenerateKey() )
+        
+        location_context = ClientLocation.LocationContext.STATICCreateSimple( HydrusData.GenerateKey() )
+        
+        file_search_context = ClientSearch.FileSearchContext( location_context = location_context, tag_context = tag_context, predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, 'test' ) ] )
+        
+        export_folder = ClientExportingFiles.ExportFolder( 'test path', export_type = HC.EXPORT_FOLDER_TYPE_REGULAR, delete_from_client_after_export = False, file_search_context = file_search_context, period = 3600, phrase = '{hash}' )
+        
+        self._write( 'serialisable', export_folder )
+        
+        [ result ] = self._read( 'serialisable_named', HydrusSerialisable.SERIALISABLE_TYPE_EXPORT_FOLDER )
+        
+        self.assertEqual( result.GetName(), export_folder.GetName() )
+        
+    
+    def test_file_search_plan( self ):
+        
+        TestClientDB._clear_db()
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        hashes = []
+        
+        for filename in ( 'muh_png.png', 'muh_jpg.jpg', 'muh_gif.gif', 'muh_apng.png' ):
+            
+            path = os.path.join( HC.STATIC_DIR, 'testing', filename )
+            
+            file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+            
+            file_import_job.GeneratePreImportHashAndStatus()
+            
+            file_import_job.GenerateInfo()
+            
+            self._write( 'import_file', file_import_job )
+            
+            hashes.append( file_import_job.GetHash() )
+            
+        
+        # two in the inbox, the rare tag on one of them, the common tag on everything
+        
+        content_updates = []
+        
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'plan:common', hashes ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'plan:rare', hashes[ : 1 ] ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'plan:unused', [ HydrusData.GenerateKey() ] ) ) )
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : content_updates, CC.COMBINED_LOCAL_FILE_SERVICE_KEY : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ARCHIVE, hashes[ 2 : ] ) ] } )
+        
+        location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.LOCAL_FILE_SERVICE_KEY )
+        tag_context = ClientSearch.TagContext( service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        inbox_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_INBOX )
+        age_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_AGE, ( '<', 'delta', ( 1, 1, 1, 1, ) ) )
+        size_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_SIZE, ( '>', 0, HydrusData.ConvertUnitToInt( 'B' ) ) )
+        
+        def tag_pred( tag, inclusive = True ):
+            
+            return ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, tag, inclusive )
+            
+        
+        def get_plan_and_results( predicates ):
+            
+            file_search_context = ClientSearch.FileSearchContext( location_context = location_context, tag_context = tag_context, predicates = predicates )
+            
+            search_plan = self._read( 'file_search_plan', file_search_context )
+            
+            hash_ids = self._read( 'file_query_ids', file_search_context )
+            
+            return ( [ description for ( step_type, step_data, estimate, description ) in search_plan ], set( self._read( 'hash_ids_to_hashes', hash_ids = hash_ids ).values() ) )
+            
+        
+        # the rare tag goes first, then the inbox, then the common tag, whatever order they came in
+        
+        ( plan, results ) = get_plan_and_results( [ tag_pred( 'plan:common' ), inbox_pred, tag_pred( 'plan:rare' ) ] )
+        
+        self.assertEqual( plan, [ 'plan:rare', 'system:inbox', 'plan:common' ] )
+        self.assertEqual( results, set( hashes[ : 1 ] ) )
+        
+        ( plan, results ) = get_plan_and_results( [ tag_pred( 'plan:common' ), tag_pred( 'plan:rare' ), size_pred ] )
+        
+        self.assertEqual( plan, [ 'plan:rare', 'plan:common' ] )
+        self.assertEqual( results, set( hashes[ : 1 ] ) )
+        
+        ( plan, results ) = get_plan_and_results( [ tag_pred( 'plan:common' ), inbox_pred ] )
+        
+        self.assertEqual( plan, [ 'system:inbox', 'plan:common' ] )
+        self.assertEqual( results, set( hashes[ : 2 ] ) )
+        
+        ( plan, results ) = get_plan_and_results( [ tag_pred( 'plan:common' ), age_pred, inbox_pred, tag_pred( 'plan:rare', inclusive = False ) ] )
+        
+        self.assertEqual( plan[0], 'system time predicates' )
+        self.assertEqual( results, set( hashes[ 1 : 2 ] ) )
+        
+        # a tag with no files in the domain is planned first and ends the search early
+        
+        ( plan, results ) = get_plan_and_results( [ tag_pred( 'plan:common' ), inbox_pred, tag_pred( 'plan:unused' ) ] )
+        
+        self.assertEqual( plan[0], 'plan:unused' )
+        self.assertEqual( results, set() )
+        
+        ( plan, results ) = get_plan_and_results( [ tag_pred( 'plan:common' ), tag_pred( 'plan:does not exist' ) ] )
+        
+        self.assertEqual( plan[0], 'plan:does not exist' )
+        self.assertEqual( results, set() )
+        
+        # similar to walks the vptree first, unless something else gives it a small candidate set to scan
+        
+        similar_to_png_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_SIMILAR_TO_FILES, ( ( hashes[0], ), 0 ) )
+        similar_to_jpg_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_SIMILAR_TO_FILES, ( ( hashes[1], ), 8 ) )
+        
+        ( plan, results ) = get_plan_and_results( [ similar_to_png_pred ] )
+        
+        self.assertEqual( plan, [ 'system:similar to' ] )
+        self.assertEqual( results, set( hashes[ : 1 ] ) )
+        
+        ( plan, results ) = get_plan_and_results( [ tag_pred( 'plan:common' ), tag_pred( 'plan:rare' ), similar_to_png_pred ] )
+        
+        self.assertEqual( plan, [ 'plan:rare', 'system:similar to (candidate scan)', 'plan:common' ] )
+        self.assertEqual( results, set( hashes[ : 1 ] ) )
+        
+        ( plan, results ) = get_plan_and_results( [ tag_pred( 'plan:common' ), similar_to_jpg_pred ] )
+        
+        self.assertEqual( plan, [ 'plan:common', 'system:similar to (candidate scan)' ] )
+        self.assertEqual( results, set( hashes[ 1 : 2 ] ) )
+        
+        ( plan, results ) = get_plan_and_results( [ tag_pred( 'plan:rare' ), similar_to_jpg_pred ] )
+        
+        self.assertEqual( results, set() )
+        
+        # and the candidate scan agrees with the vptree
+        
+        path = os.path.join( HC.STATIC_DIR, 'testing', 'muh_jpg.jpg' )
+        
+        perceptual_hashes = tuple( ClientImageHandling.GenerateShapePerceptualHashes( path, HC.IMAGE_JPEG ) )
+        
+        for max_hamming in ( 0, 4, 8, 64 ):
+            
+            similar_to_data_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_SIMILAR_TO_DATA, ( (), perceptual_hashes, max_hamming ) )
+            
+            ( plan, global_results ) = get_plan_and_results( [ similar_to_data_pred ] )
+            
+            self.assertEqual( plan, [ 'system:similar to' ] )
+            
+            ( plan, scan_results ) = get_plan_and_results( [ tag_pred( 'plan:common' ), similar_to_data_pred ] )
+            
+            self.assertEqual( plan, [ 'plan:common', 'system:similar to (candidate scan)' ] )
+            self.assertEqual( scan_results, global_results )
+            self.assertIn( hashes[1], scan_results )
+            
+        
+        # a zero duplicate count does no location work in the plan, so it must not stop the location filter later
+        
+        self._write( 'content_updates', { CC.LOCAL_FILE_SERVICE_KEY : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, hashes[ 3 : ] ) ] } )
+        
+        no_dupes_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_FILE_RELATIONSHIPS_COUNT, ( '=', 0, HC.DUPLICATE_POTENTIAL ) )
+        
+        ( plan, results ) = get_plan_and_results( [ no_dupes_pred ] )
+        
+        self.assertEqual( plan, [ 'system duplicate count predicates' ] )
+        self.assertEqual( results, set( hashes[ : 3 ] ) )
+        
+        # system:hash fills the domain without looking at locations, so only the location filter can drop the trashed file
+        
+        hash_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_HASH, ( tuple( hashes ), 'sha256' ) )
+        
+        ( plan, results ) = get_plan_and_results( [ no_dupes_pred, hash_pred ] )
+        
+        self.assertEqual( results, set( hashes[ : 3 ] ) )
+        
+    
+    def test_file_search_results_cache( self ):
+        
+        TestClientDB._clear_db()
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        hashes = []
+        
+        for filename in ( 'muh_png.png', 'muh_jpg.jpg', 'muh_gif.gif' ):
+            
+            path = os.path.join( HC.STATIC_DIR, 'testing', filename )
+            
+            file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+            
+            file_import_job.GeneratePreImportHashAndStatus()
+            
+            file_import_job.GenerateInfo()
+            
+            self._write( 'import_file', file_import_job )
+            
+            hashes.append( file_import_job.GetHash() )
+            
+        
+        content_updates = [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'cache:a', hashes[ : 2 ] ) ) ]
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : content_updates } )
+        
+        file_search_results_cache = self._db._file_search_results_cache
+        
+        location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.LOCAL_FILE_SERVICE_KEY )
+        tag_context = ClientSearch.TagContext( service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        tag_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, 'cache:a' )
+        inbox_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_INBOX )
+        age_pred = ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_AGE, ( '<', 'delta', ( 1, 1, 1, 1, ) ) )
+        
+        def get_results( predicates ):
+            
+            file_search_context = ClientSearch.FileSearchContext( location_context = location_context, tag_context = tag_context, predicates = predicates )
+            
+            hash_ids = self._read( 'file_query_ids', file_search_context )
+            
+            return set( self._read( 'hash_ids_to_hashes', hash_ids = hash_ids ).values() )
+            
+        
+        def get_num_hits():
+            
+            ( num_entries, total_weight, num_hits, num_misses ) = file_search_results_cache.GetStats()
+            
+            return num_hits
+            
+        
+        # a repeat search is a hit
+        
+        self.assertEqual( get_results( [ tag_pred ] ), set( hashes[ : 2 ] ) )
+        
+        num_hits = get_num_hits()
+        
+        self.assertEqual( get_results( [ tag_pred ] ), set( hashes[ : 2 ] ) )
+        
+        self.assertEqual( get_num_hits(), num_hits + 1 )
+        
+        # an unrelated tag leaves it alone
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'cache:b', hashes ) ) ] } )
+        
+        num_hits = get_num_hits()
+        
+        self.assertEqual( get_results( [ tag_pred ] ), set( hashes[ : 2 ] ) )
+        
+        self.assertEqual( get_num_hits(), num_hits + 1 )
+        
+        # but the searched tag does not
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'cache:a', hashes[ 2 : ] ) ) ] } )
+        
+        num_hits = get_num_hits()
+        
+        self.assertEqual( get_results( [ tag_pred ] ), set( hashes ) )
+        
+        self.assertEqual( get_num_hits(), num_hits )
+        
+        # inbox
+        
+        self.assertEqual( get_results( [ tag_pred, inbox_pred ] ), set( hashes ) )
+        
+        self._write( 'content_updates', { CC.COMBINED_LOCAL_FILE_SERVICE_KEY : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ARCHIVE, hashes[ : 1 ] ) ] } )
+        
+        self.assertEqual( get_results( [ tag_pred, inbox_pred ] ), set( hashes[ 1 : ] ) )
+        
+        # files leaving the domain
+        
+        self._write( 'content_updates', { CC.LOCAL_FILE_SERVICE_KEY : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, hashes[ 2 : ], reason = 'test delete' ) ] } )
+        
+        self.assertEqual( get_results( [ tag_pred ] ), set( hashes[ : 2 ] ) )
+        self.assertEqual( get_results( [ tag_pred, inbox_pred ] ), set( hashes[ 1 : 2 ] ) )
+        
+        # anything time-sensitive is never cached
+        
+        num_hits = get_num_hits()
+        
+        get_results( [ tag_pred, age_pred ] )
+        get_results( [ tag_pred, age_pred ] )
+        
+        self.assertEqual( get_num_hits(), num_hits )
         
-        location_context = ClientLocation.LocationContext.STATICCreateSimple( HydrusData.GenerateKey() )
+        # eviction is by weight, oldest first
         
-        file_search_context = ClientSearch.FileSearchContext( location_context = location_context, tag_context = tag_context, predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_TAG, 'test' ) ] )
+        file_search_results_cache = ClientDBFilesSearchCache.FileSearchResultsCache( max_weight = 20000 )
         
-        export_folder = ClientExportingFiles.ExportFolder( 'test path', export_type = HC.EXPORT_FOLDER_TYPE_REGULAR, delete_from_client_after_export = False, file_search_context = file_search_context, period = 3600, phrase = '{hash}' )
+        for i in range( 5 ):
+            
+            file_search_results_cache.SetHashIds( str( i ), range( 500 ), ( 1, ), { 2 : ( 3, ) }, () )
+            
         
-        self._write( 'serialisable', export_folder )
+        ( num_entries, total_weight, num_hits, num_misses ) = file_search_results_cache.GetStats()
         
-        [ result ] = self._read( 'serialisable_named', HydrusSerialisable.SERIALISABLE_TYPE_EXPORT_FOLDER )
+        self.assertLessEqual( total_weight, 20000 )
+        self.assertLess( num_entries, 5 )
         
-        self.assertEqual( result.GetName(), export_folder.GetName() )
+        self.assertIsNone( file_search_results_cache.GetHashIds( '0' ) )
+        self.assertEqual( file_search_results_cache.GetHashIds( '4' ), set( range( 500 ) ) )
+        
+        file_search_results_cache.NotifyTagIdsChanged( 2, ( 4, ) )
+        
+        self.assertIsNotNone( file_search_results_cache.GetHashIds( '4' ) )
+        
+        file_search_results_cache.NotifyFilesChanged( 1 )
+        
+        self.assertIsNone( file_search_results_cache.GetHashIds( '4' ) )
         
     
     def test_file_query_ids( self ):
@@ -985,6 +1617,91 @@ class TestClientDB( unittest.TestCase ):
         self._db._weakref_media_result_cache.DropMediaResult( hash_id, hash )
         
     
+    def test_files_info_columnar_cache( self ):
+        
+        # hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words
+        rows = [
+            ( 1, 5270, HC.IMAGE_PNG, 200, 200, None, None, False, None ),
+            ( 2, 100000, HC.IMAGE_JPEG, 1920, 1080, None, None, False, None ),
+            ( 3, 2000000, HC.VIDEO_MP4, 1280, 720, 10000, 300, True, None ),
+            ( 4, 3000000, HC.VIDEO_WEBM, 640, 480, 0, 0, False, None ),
+            ( 5, 4000, HC.APPLICATION_PDF, None, None, None, None, False, 500 ),
+            ( 6, 500, HC.IMAGE_GIF, 100, 0, 1000, 24, False, 0 ),
+            ( 7, None, None, None, None, None, None, None, None )
+        ]
+        
+        db = sqlite3.connect( ':memory:' )
+        
+        db.execute( 'CREATE TABLE files_info ( hash_id INTEGER PRIMARY KEY, size INTEGER, mime INTEGER, width INTEGER, height INTEGER, duration INTEGER, num_frames INTEGER, has_audio INTEGER_BOOLEAN, num_words INTEGER );' )
+        
+        db.executemany( 'INSERT INTO files_info ( hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words ) VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ? );', rows )
+        
+        files_info_columnar_cache = ClientDBFilesMetadataBasic.FilesInfoColumnarCache( rows )
+        
+        tests = []
+        
+        for operator in ( '<', '=', CC.UNICODE_NOT_EQUAL_TO, '>' ):
+            
+            tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_SIZE, ( operator, 5270, HydrusData.ConvertUnitToInt( 'B' ) ) ) )
+            tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_WIDTH, ( operator, 1280 ) ) )
+            tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_HEIGHT, ( operator, 0 ) ) )
+            tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_NUM_PIXELS, ( operator, 1, 1000000 ) ) )
+            tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_FRAMERATE, ( operator, 30 ) ) )
+            
+            for value in ( 0, 300 ):
+                
+                tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_DURATION, ( operator, value ) ) )
+                tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_NUM_FRAMES, ( operator, value ) ) )
+                tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_NUM_WORDS, ( operator, value ) ) )
+                
+            
+        
+        for operator in ( 'wider than', '=', CC.UNICODE_NOT_EQUAL_TO, CC.UNICODE_ALMOST_EQUAL_TO, 'taller than' ):
+            
+            tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_RATIO, ( operator, 16, 9 ) ) )
+            
+        
+        tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_MIME, HC.IMAGES ) )
+        tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_MIME, ( HC.VIDEO_WEBM, ) ) )
+        tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_HAS_AUDIO, True ) )
+        tests.append( ( ClientSearch.PREDICATE_TYPE_SYSTEM_HAS_AUDIO, False ) )
+        
+        for ( predicate_type, value ) in tests:
+            
+            system_predicates = ClientSearch.FileSystemPredicates( [ ClientSearch.Predicate( predicate_type, value ) ] )
+            
+            files_info_predicates = ClientDBFilesSearch.GetFilesInfoPredicates( system_predicates )
+            
+            self.assertGreater( len( files_info_predicates ), 0, ( predicate_type, value ) )
+            
+            expected_hash_ids = { hash_id for ( hash_id, ) in db.execute( 'SELECT hash_id FROM files_info WHERE {};'.format( ' AND '.join( files_info_predicates ) ) ) }
+            
+            simple_preds = system_predicates.GetSimpleInfo()
+            
+            self.assertEqual( set( files_info_columnar_cache.FilterHashIds( simple_preds ) ), expected_hash_ids, ( predicate_type, value ) )
+            
+            # and with candidate sets, big and small, and with a file we have no row for
+            
+            for candidate_hash_ids in ( { 1, 3, 5, 99 }, { 5 }, { 99 } ):
+                
+                self.assertEqual( set( files_info_columnar_cache.FilterHashIds( simple_preds, hash_ids = candidate_hash_ids ) ), expected_hash_ids.intersection( candidate_hash_ids ), ( predicate_type, value ) )
+                
+            
+        
+        # keeping in sync with AddFilesInfo
+        
+        simple_preds = ClientSearch.FileSystemPredicates( [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_WIDTH, ( '>', 1000 ) ) ] ).GetSimpleInfo()
+        
+        files_info_columnar_cache.AddRows( [ ( 1, 5270, HC.IMAGE_PNG, 2000, 2000, None, None, False, None ), ( 8, 5270, HC.IMAGE_PNG, 3000, 2000, None, None, False, None ) ], False )
+        
+        self.assertEqual( set( files_info_columnar_cache.FilterHashIds( simple_preds ) ), { 2, 3, 8 } )
+        
+        files_info_columnar_cache.AddRows( [ ( 1, 5270, HC.IMAGE_PNG, 2000, 2000, None, None, False, None ), ( 3, 2000000, HC.VIDEO_MP4, 640, 360, 10000, 300, True, None ) ], True )
+        
+        self.assertEqual( set( files_info_columnar_cache.FilterHashIds( simple_preds ) ), { 1, 2, 8 } )
+        self.assertEqual( set( files_info_columnar_cache.FilterHashIds( simple_preds, hash_ids = { 1, 3 } ) ), { 1 } )
+        
+    
     def test_filter_existing_tags( self ):
         
         TestClientDB._clear_db()
@@ -1512,6 +2229,56 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( written_hash, hash )
         
     
+    def test_media_collect_groups( self ):
+        
+        TestClientDB._clear_db()
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        hash = file_import_job.GetHash()
+        
+        content_updates = []
+        
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'car', ( hash, ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'series:cars', ( hash, ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'maker:ford', ( hash, ) ) ) )
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : content_updates } )
+        
+        hash_id = self._read( 'hash_ids_to_hashes', hashes = ( hash, ) ).popitem()[0]
+        
+        result = self._read( 'media_collect_groups', ( hash_id, ), ( 'series', ), CC.COMBINED_TAG_SERVICE_KEY )
+        
+        self.assertEqual( result, { frozenset( { 'series:cars' } ) : [ hash_id ] } )
+        
+        result = self._read( 'media_collect_groups', ( hash_id, ), ( 'series', 'maker' ), CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        self.assertEqual( result, { frozenset( { 'series:cars', 'maker:ford' } ) : [ hash_id ] } )
+        
+        # no match, and a namespace the db has never seen
+        
+        result = self._read( 'media_collect_groups', ( hash_id, ), ( 'creator', 'not_a_namespace' ), CC.COMBINED_TAG_SERVICE_KEY )
+        
+        self.assertEqual( result, { frozenset() : [ hash_id ] } )
+        
+        # agrees with the media collect
+        
+        ( media_result, ) = self._read( 'media_results_from_ids', ( hash_id, ) )
+        
+        self.assertEqual( media_result.GetTagsManager().GetNamespaceSlice( CC.COMBINED_TAG_SERVICE_KEY, ( 'series', 'maker' ), ClientTags.TAG_DISPLAY_ACTUAL ), frozenset( { 'series:cars', 'maker:ford' } ) )
+        
+    
     def test_media_results( self ):
         
         TestClientDB._clear_db()
@@ -1578,6 +2345,197 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( mr_num_words, None )
         
     
+    def test_media_results_lazy_tags( self ):
+        
+        TestClientDB._clear_db()
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        hash = file_import_job.GetHash()
+        
+        content_updates = []
+        
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'car', ( hash, ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'series:cars', ( hash, ) ) ) )
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : content_updates } )
+        
+        content_updates = []
+        
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( 'series:cars', ( hash, ) ) ) )
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : content_updates } )
+        
+        hash_id = self._read( 'hash_ids_to_hashes', hashes = ( hash, ) ).popitem()[0]
+        
+        # the weakref media result cache has let go of anything from the import by now
+        
+        ( media_result, ) = self._read( 'media_results_from_ids', ( hash_id, ), lazy_tags = True )
+        
+        tags_manager = media_result.GetTagsManager()
+        
+        self.assertFalse( tags_manager.IsFullyLoaded() )
+        
+        # display stuff is all there without a fetch
+        
+        self.assertEqual( tags_manager.GetCurrent( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_ACTUAL ), { 'car' } )
+        self.assertEqual( tags_manager.GetCurrentAndPending( CC.COMBINED_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_SINGLE_MEDIA ), { 'car' } )
+        self.assertEqual( tags_manager.GetDeleted( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_ACTUAL ), { 'series:cars' } )
+        
+        self.assertFalse( tags_manager.IsFullyLoaded() )
+        
+        # storage asks for the full thing
+        
+        self.assertEqual( tags_manager.GetCurrent( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_STORAGE ), { 'car' } )
+        
+        self.assertTrue( tags_manager.IsFullyLoaded() )
+        
+        self.assertEqual( tags_manager.GetDeleted( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_STORAGE ), { 'series:cars' } )
+        self.assertEqual( tags_manager.GetCurrent( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_ACTUAL ), { 'car' } )
+        
+        # a petition needs the storage current tags, which a lazy manager does not have. it must not fetch them there and then, since the db applies content updates to its cached media results on its own thread
+        
+        del media_result
+        del tags_manager
+        
+        services = list( self._read( 'services' ) )
+        
+        # the media result only takes updates for services the services manager knows about
+        tag_repo_service_key = HG.test_controller.example_tag_repo_service_key
+        
+        services.append( ClientServices.GenerateService( tag_repo_service_key, HC.TAG_REPOSITORY, 'example tag repo' ) )
+        
+        self._write( 'update_services', services )
+        
+        self._write( 'content_updates', { tag_repo_service_key : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'car', ( hash, ) ) ) ] } )
+        
+        ( media_result, ) = self._read( 'media_results_from_ids', ( hash_id, ), lazy_tags = True )
+        
+        tags_manager = media_result.GetTagsManager()
+        
+        self.assertFalse( tags_manager.IsFullyLoaded() )
+        
+        self._write( 'content_updates', { tag_repo_service_key : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_PETITION, ( 'car', ( hash, ) ), reason = 'yo' ) ] } )
+        
+        # the db is still free
+        
+        self.assertEqual( self._read( 'nums_pending' )[ tag_repo_service_key ][ HC.SERVICE_INFO_NUM_PETITIONED_MAPPINGS ], 1 )
+        
+        self.assertFalse( tags_manager.IsFullyLoaded() )
+        
+        self.assertEqual( tags_manager.GetPetitioned( tag_repo_service_key, ClientTags.TAG_DISPLAY_STORAGE ), { 'car' } )
+        
+        self.assertTrue( tags_manager.IsFullyLoaded() )
+        
+        # and if the full tags were read before the petition went in, the held petition is applied on top
+        
+        del media_result
+        del tags_manager
+        
+        self._write( 'content_updates', { tag_repo_service_key : [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_RESCIND_PETITION, ( 'car', ( hash, ) ) ) ] } )
+        
+        ( media_result, ) = self._read( 'media_results_from_ids', ( hash_id, ), lazy_tags = True )
+        
+        tags_manager = media_result.GetTagsManager()
+        
+        ( full_tags_manager, ) = self._read( 'force_refresh_tags_managers', ( hash_id, ) ).values()
+        
+        self.assertEqual( full_tags_manager.GetPetitioned( tag_repo_service_key, ClientTags.TAG_DISPLAY_STORAGE ), set() )
+        
+        tags_manager.ProcessContentUpdate( tag_repo_service_key, HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_PETITION, ( 'car', ( hash, ) ), reason = 'yo' ) )
+        
+        self.assertFalse( tags_manager.IsFullyLoaded() )
+        
+        tags_manager.SetFullTags( full_tags_manager )
+        
+        self.assertEqual( tags_manager.GetPetitioned( tag_repo_service_key, ClientTags.TAG_DISPLAY_STORAGE ), { 'car' } )
+        
+    
+    def test_media_tag_counts( self ):
+        
+        TestClientDB._clear_db()
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        hash = file_import_job.GetHash()
+        
+        content_updates = []
+        
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'car', ( hash, ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'series:cars', ( hash, ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'series:trucks', ( hash, ) ) ) )
+        
+        self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : content_updates } )
+        
+        hash_id = self._read( 'hash_ids_to_hashes', hashes = ( hash, ) ).popitem()[0]
+        
+        ( media_result, ) = self._read( 'media_results_from_ids', ( hash_id, ) )
+        
+        # agrees with the media count for every display type
+        
+        for tag_service_key in ( CC.COMBINED_TAG_SERVICE_KEY, CC.DEFAULT_LOCAL_TAG_SERVICE_KEY ):
+            
+            for tag_display_type in ( ClientTags.TAG_DISPLAY_STORAGE, ClientTags.TAG_DISPLAY_ACTUAL, ClientTags.TAG_DISPLAY_SELECTION_LIST ):
+                
+                result = self._read( 'media_tag_counts', ( hash_id, ), tag_service_key, tag_display_type )
+                
+                self.assertEqual( result, ClientMedia.GetMediaResultsTagCount( ( media_result, ), tag_service_key, tag_display_type ) )
+                
+            
+        
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = self._read( 'media_tag_counts', ( hash_id, ), CC.COMBINED_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_ACTUAL )
+        
+        self.assertEqual( current_tags_to_count, collections.Counter( { 'car' : 1, 'series:cars' : 1, 'series:trucks' : 1 } ) )
+        self.assertEqual( len( deleted_tags_to_count ), 0 )
+        
+        # top n per namespace
+        
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = self._read( 'media_tag_counts', ( hash_id, ), CC.COMBINED_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_ACTUAL, max_tags_per_namespace = 1 )
+        
+        self.assertEqual( current_tags_to_count, collections.Counter( { 'car' : 1, 'series:cars' : 1 } ) )
+        
+        # a selection list filter
+        
+        tag_filter = HydrusTags.TagFilter()
+        
+        tag_filter.SetRule( 'series:', HC.FILTER_BLACKLIST )
+        
+        HG.test_controller.tag_display_manager.SetTagFilter( ClientTags.TAG_DISPLAY_SELECTION_LIST, CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, tag_filter )
+        
+        try:
+            
+            ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = self._read( 'media_tag_counts', ( hash_id, ), CC.COMBINED_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_SELECTION_LIST )
+            
+            self.assertEqual( current_tags_to_count, collections.Counter( { 'car' : 1 } ) )
+            
+        finally:
+            
+            HG.test_controller.tag_display_manager.SetTagFilter( ClientTags.TAG_DISPLAY_SELECTION_LIST, CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, HydrusTags.TagFilter() )
+            
+        
+    
     def test_nums_pending( self ):
         
         TestClientDB._clear_db()
@@ -1884,6 +2842,82 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( result, [ pixiv_id, password ] )
         
     
+    def test_pre_import_statuses( self ):
+        
+        TestClientDB._clear_db()
+        
+        hash = b'\xadm5\x99\xa6\xc4\x89\xa5u\xeb\x19\xc0&\xfa\xce\x97\xa9\xcdey\xe7G(\xb0\xce\x94\xa6\x01\xd22\xf3\xc3'
+        
+        md5 = bytes.fromhex( 'fdadb2cae78f2dfeb629449cd005f2a2' )
+        
+        unknown_hash = os.urandom( 32 )
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        url = 'https://example.com/post/123'
+        unknown_url = 'https://example.com/post/456'
+        
+        service_keys_to_content_updates = { CC.COMBINED_LOCAL_FILE_SERVICE_KEY : ( HydrusData.ContentUpdate( HC.CONTENT_TYPE_URLS, HC.CONTENT_UPDATE_ADD, ( ( url, ), ( hash, ) ) ), ) }
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        #
+        
+        hash_types_and_hashes = [ ( 'sha256', hash ), ( 'md5', md5 ), ( 'sha256', unknown_hash ), ( 'md5', os.urandom( 16 ) ) ]
+        urls = [ url, unknown_url ]
+        
+        ( hash_types_and_hashes_to_statuses, urls_to_statuses ) = self._read( 'pre_import_statuses', hash_types_and_hashes, urls )
+        
+        self.assertEqual( set( hash_types_and_hashes_to_statuses.keys() ), set( hash_types_and_hashes ) )
+        self.assertEqual( set( urls_to_statuses.keys() ), set( urls ) )
+        
+        for ( hash_type, h ) in hash_types_and_hashes:
+            
+            batch_status = hash_types_and_hashes_to_statuses[ ( hash_type, h ) ]
+            single_status = self._read( 'hash_status', hash_type, h, prefix = '{} hash recognised'.format( hash_type ) )
+            
+            self.assertEqual( ( batch_status.status, batch_status.hash, batch_status.mime, batch_status.note ), ( single_status.status, single_status.hash, single_status.mime, single_status.note ) )
+            
+        
+        self.assertEqual( hash_types_and_hashes_to_statuses[ ( 'md5', md5 ) ].status, CC.STATUS_SUCCESSFUL_BUT_REDUNDANT )
+        self.assertEqual( hash_types_and_hashes_to_statuses[ ( 'sha256', unknown_hash ) ].hash, None )
+        
+        for u in urls:
+            
+            batch_statuses = urls_to_statuses[ u ]
+            single_statuses = self._read( 'url_statuses', u )
+            
+            self.assertEqual( [ ( s.status, s.hash, s.mime, s.note ) for s in batch_statuses ], [ ( s.status, s.hash, s.mime, s.note ) for s in single_statuses ] )
+            
+        
+        self.assertEqual( [ s.hash for s in urls_to_statuses[ url ] ], [ hash ] )
+        self.assertEqual( urls_to_statuses[ unknown_url ], [] )
+        
+        #
+        
+        content_update = HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, ( hash, ), reason = 'test delete' )
+        
+        self._write( 'content_updates', { CC.LOCAL_FILE_SERVICE_KEY : ( content_update, ) } )
+        
+        ( hash_types_and_hashes_to_statuses, urls_to_statuses ) = self._read( 'pre_import_statuses', hash_types_and_hashes, urls )
+        
+        self.assertEqual( hash_types_and_hashes_to_statuses[ ( 'sha256', hash ) ].status, CC.STATUS_DELETED )
+        self.assertEqual( [ s.status for s in urls_to_statuses[ url ] ], [ CC.STATUS_DELETED ] )
+        
+        TestClientDB._clear_db()
+        
+    
     def test_services( self ):
         
         TestClientDB._clear_db()
@@ -1543,6 +1543,71 @@ class TestClientDBTags( unittest.TestCase ):
         self._test_ac( 'lara*', self._public_service_key, CC.COMBINED_FILE_SERVICE_KEY, { lara_tag : ClientSearch.PredicateCount.STATICCreateStaticCount( 0, 1 ) }, { lara_tag : ClientSearch.PredicateCount.STATICCreateStaticCount( 0, 1 ) } )
         
     
+    def test_display_chain_regen_matches_full_regen( self ):
+        
+        self._clear_db()
+        
+        r = random.Random( 532 )
+        
+        tags = [ 'chain tag {}'.format( i ) for i in range( 24 ) ]
+        
+        def get_display_state():
+            
+            tags_to_ideals = self._read( 'tag_siblings_all_ideals', self._my_service_key )
+            
+            tags_to_lookups = self._read( 'tag_siblings_and_parents_lookup', tags )
+            
+            return ( tags_to_ideals, { tag : tags_to_lookups[ tag ][ self._my_service_key ] for tag in tags } )
+            
+        
+        def get_status():
+            
+            status = self._read( 'tag_display_maintenance_status', self._my_service_key )
+            
+            return ( status[ 'num_siblings_to_sync' ], status[ 'num_parents_to_sync' ], status[ 'num_actual_rows' ], status[ 'num_ideal_rows' ] )
+            
+        
+        for i in range( 16 ):
+            
+            # add and remove a few pairs, like a manual edit or a repository update would
+            
+            content_updates = []
+            
+            for ( content_type, read_action ) in ( ( HC.CONTENT_TYPE_TAG_SIBLINGS, 'tag_siblings' ), ( HC.CONTENT_TYPE_TAG_PARENTS, 'tag_parents' ) ):
+                
+                current_pairs = sorted( self._read( read_action, self._my_service_key )[ HC.CONTENT_STATUS_CURRENT ] )
+                
+                for pair in r.sample( current_pairs, min( len( current_pairs ), r.randint( 0, 2 ) ) ):
+                    
+                    content_updates.append( HydrusData.ContentUpdate( content_type, HC.CONTENT_UPDATE_DELETE, pair ) )
+                    
+                
+                for j in range( r.randint( 1, 4 ) ):
+                    
+                    content_updates.append( HydrusData.ContentUpdate( content_type, HC.CONTENT_UPDATE_ADD, tuple( r.sample( tags, 2 ) ) ) )
+                    
+                
+            
+            self._write( 'content_updates', { self._my_service_key : content_updates } )
+            
+            self._sync_display()
+            
+            chain_regen_display_state = get_display_state()
+            chain_regen_status = get_status()
+            
+            self.assertEqual( chain_regen_status[ : 2 ], ( 0, 0 ) )
+            
+            # now throw it all away and do it from scratch
+            
+            self._write( 'regenerate_tag_siblings_and_parents_cache' )
+            
+            self._sync_display()
+            
+            self.assertEqual( get_display_state(), chain_regen_display_state )
+            self.assertEqual( get_status(), chain_regen_status )
+            
+        
+    
     def test_parents_pairs_lookup( self ):
         
         self._clear_db()
@@ -15,6 +15,7 @@ from hydrus.core import HydrusTime
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientLocation
 from hydrus.client.importing import ClientImportFileSeeds
+from hydrus.client.importing import ClientImportFiles
 from hydrus.client.importing.options import ClientImportOptions
 from hydrus.client.importing.options import FileImportOptions
 from hydrus.client.importing.options import NoteImportOptions
@@ -205,6 +206,81 @@ class TestCheckerOptions( unittest.TestCase ):
             
         
     
+class TestFileSeedPreImportStatusPredictions( unittest.TestCase ):
+    
+    def test_shared_hash( self ):
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        
+        file_import_options.SetIsDefault( False )
+        
+        def make_file_seed( url, md5 ):
+            
+            file_seed = ClientImportFileSeeds.FileSeed( ClientImportFileSeeds.FILE_SEED_TYPE_URL, url )
+            
+            file_seed.AddParseResults( [ ( ( 'md5 hash', HC.CONTENT_TYPE_HASH, ( 'md5', 'hex' ) ), md5.hex() ) ], file_import_options )
+            
+            return file_seed
+            
+        
+        shared_md5 = os.urandom( 16 )
+        other_md5 = os.urandom( 16 )
+        
+        # the same file posted twice in a thread, and something else
+        
+        file_seed_1 = make_file_seed( 'https://example.com/post/1', shared_md5 )
+        file_seed_2 = make_file_seed( 'https://example.com/post/2', shared_md5 )
+        file_seed_3 = make_file_seed( 'https://example.com/post/3', other_md5 )
+        
+        file_seed_cache = ClientImportFileSeeds.FileSeedCache()
+        
+        file_seed_cache.AddFileSeeds( ( file_seed_1, file_seed_2, file_seed_3 ) )
+        
+        unknown_hash_statuses = collections.defaultdict( ClientImportFiles.FileImportStatus.STATICGetUnknownStatus )
+        unknown_url_statuses = collections.defaultdict( list )
+        
+        HG.test_controller.SetRead( 'pre_import_statuses', ( unknown_hash_statuses, unknown_url_statuses ) )
+        
+        file_seed_cache.PredictPreImportStatuses( file_seed_1 )
+        
+        for file_seed in ( file_seed_1, file_seed_2, file_seed_3 ):
+            
+            self.assertTrue( file_seed.HasPreImportStatusPredictions() )
+            
+        
+        HG.test_controller.ClearReads( 'hash_status' )
+        
+        ( match_found, matches_are_dispositive, file_import_status ) = file_seed_2.GetPreImportStatusPredictionHash( file_import_options )
+        
+        self.assertFalse( match_found )
+        self.assertEqual( HG.test_controller.GetRead( 'hash_status' ), [] )
+        
+        # the first seed imports the file, so the second's prediction is now stale
+        
+        sha256 = HydrusData.GenerateKey()
+        
+        file_seed_1.SetHash( sha256 )
+        file_seed_1.SetStatus( CC.STATUS_SUCCESSFUL_AND_NEW )
+        
+        file_seed_cache.NotifyFileSeedsUpdated( ( file_seed_1, ) )
+        
+        HG.test_controller.SetRead( 'hash_status', ClientImportFiles.FileImportStatus( CC.STATUS_SUCCESSFUL_BUT_REDUNDANT, sha256, note = 'md5 hash recognised' ) )
+        
+        ( match_found, matches_are_dispositive, file_import_status ) = file_seed_2.GetPreImportStatusPredictionHash( file_import_options )
+        
+        self.assertTrue( match_found )
+        self.assertEqual( file_import_status.status, CC.STATUS_SUCCESSFUL_BUT_REDUNDANT )
+        self.assertEqual( file_import_status.hash, sha256 )
+        self.assertEqual( len( HG.test_controller.GetRead( 'hash_status' ) ), 1 )
+        
+        # an unrelated seed still uses its prediction
+        
+        ( match_found, matches_are_dispositive, file_import_status ) = file_seed_3.GetPreImportStatusPredictionHash( file_import_options )
+        
+        self.assertFalse( match_found )
+        self.assertEqual( HG.test_controller.GetRead( 'hash_status' ), [] )
+        
+    
 class TestFileImportOptions( unittest.TestCase ):
     
     def test_file_import_options( self ):
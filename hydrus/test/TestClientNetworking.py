@@ -1,3 +1,5 @@
+import http.server
+import threading
 import time
 import unittest
 
@@ -8,6 +10,7 @@ from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusTemp
 from hydrus.core import HydrusTime
 from hydrus.core.networking import HydrusNetworking
 
@@ -18,6 +21,7 @@ from hydrus.client.networking import ClientNetworking
 from hydrus.client.networking import ClientNetworkingBandwidth
 from hydrus.client.networking import ClientNetworkingContexts
 from hydrus.client.networking import ClientNetworkingDomain
+from hydrus.client.networking import ClientNetworkingFunctions
 from hydrus.client.networking import ClientNetworkingJobs
 from hydrus.client.networking import ClientNetworkingLogin
 from hydrus.client.networking import ClientNetworkingSessions
@@ -59,6 +63,11 @@ def catch_wew_ok( url, request ):
     
     return GOOD_RESPONSE
     
+@urlmatch( netloc = 'wew.lad' )
+def catch_wew_too_busy( url, request ):
+    
+    return { 'status_code' : 429, 'reason' : 'Too Many Requests', 'content' : BAD_RESPONSE }
+    
 @urlmatch( netloc = MOCK_HYDRUS_ADDRESS )
 def catch_hydrus_error( url, request ):
     
@@ -453,8 +462,165 @@ class TestNetworkingDomain( unittest.TestCase ):
         self.assertEqual( url_class.Matches( single_value_missing_url ), False )
         
     
+    def test_url_class_matcher( self ):
+        
+        from hydrus.client import ClientDefaults
+        
+        url_classes = ClientDefaults.GetDefaultURLClasses()
+        
+        domain_manager = ClientNetworkingDomain.NetworkDomainManager()
+        
+        domain_manager.SetURLClasses( url_classes )
+        
+        def get_url_class_the_slow_way( url ):
+            
+            domain = ClientNetworkingFunctions.ConvertURLIntoSecondLevelDomain( url )
+            
+            candidates = [ url_class for url_class in url_classes if ClientNetworkingFunctions.ConvertDomainIntoSecondLevelDomain( url_class.GetDomain() ) == domain ]
+            
+            ClientNetworkingURLClass.SortURLClassesListDescendingComplexity( candidates )
+            
+            for url_class in candidates:
+                
+                if url_class.Matches( url ):
+                    
+                    return url_class
+                    
+                
+            
+            return None
+            
+        
+        urls = []
+        
+        for url_class in url_classes:
+            
+            example_url = url_class.GetExampleURL()
+            
+            p = ClientNetworkingFunctions.ParseURL( example_url )
+            
+            urls.append( example_url )
+            urls.append( url_class.Normalise( example_url ) )
+            urls.append( example_url + '/extra' )
+            urls.append( example_url.rsplit( '/', 1 )[0] )
+            urls.append( example_url.split( '?', 1 )[0] )
+            urls.append( example_url + ( '&' if '?' in example_url else '?' ) + 'junk=1' )
+            urls.append( example_url.replace( '://', '://www.', 1 ) )
+            urls.append( example_url.replace( '1', 'a' ) )
+            urls.append( '{}://{}/'.format( p.scheme, p.netloc ) )
+            
+        
+        for url in urls:
+            
+            self.assertIs( domain_manager.GetURLClass( url ), get_url_class_the_slow_way( url ), url )
+            
+            # and again from the cache
+            
+            self.assertIs( domain_manager.GetURLClass( url ), get_url_class_the_slow_way( url ), url )
+            
+        
+        example_url = url_classes[0].GetExampleURL()
+        
+        self.assertIsNotNone( domain_manager.GetURLClass( example_url ) )
+        
+        normalised_url = domain_manager.NormaliseURL( example_url )
+        
+        self.assertEqual( domain_manager.NormaliseURL( example_url ), normalised_url )
+        
+        # changing the url classes resets the caches
+        
+        domain_manager.SetURLClasses( [] )
+        
+        self.assertIsNone( domain_manager.GetURLClass( example_url ) )
+        
+    
 class TestNetworkingEngine( unittest.TestCase ):
     
+    def test_engine_async_runner( self ):
+        
+        mock_controller = TestController.MockController()
+        bandwidth_manager = ClientNetworkingBandwidth.NetworkBandwidthManager()
+        session_manager = ClientNetworkingSessions.NetworkSessionManager()
+        domain_manager = ClientNetworkingDomain.NetworkDomainManager()
+        login_manager = ClientNetworkingLogin.NetworkLoginManager()
+        
+        mock_controller.new_options.SetBoolean( 'network_jobs_use_async_runner', True )
+        mock_controller.new_options.SetInteger( 'max_network_jobs', 50 )
+        mock_controller.new_options.SetInteger( 'max_network_jobs_per_domain', 50 )
+        
+        engine = ClientNetworking.NetworkEngine( mock_controller, bandwidth_manager, session_manager, domain_manager, login_manager )
+        
+        mock_controller.CallToThread( engine.MainLoop )
+        
+        with HTTMock( catch_all ):
+            
+            with HTTMock( catch_wew_ok ):
+                
+                jobs = [ ClientNetworkingJobs.NetworkJob( 'GET', MOCK_URL ) for i in range( 100 ) ]
+                
+                for job in jobs:
+                    
+                    engine.AddJob( job )
+                    
+                
+                for job in jobs:
+                    
+                    job.WaitUntilDone()
+                    
+                
+                self.assertTrue( all( job.IsDone() and not job.HasError() for job in jobs ) )
+                self.assertTrue( all( job.GetContentBytes() == GOOD_RESPONSE for job in jobs ) )
+                tracker = bandwidth_manager.GetTracker( ClientNetworkingContexts.NetworkContext( CC.NETWORK_CONTEXT_DOMAIN, MOCK_DOMAIN ) )
+                
+                self.assertEqual( tracker.GetUsage( HC.BANDWIDTH_TYPE_DATA, None ), 100 * len( GOOD_RESPONSE ) )
+                
+            
+            with HTTMock( catch_wew_error ):
+                
+                job = ClientNetworkingJobs.NetworkJob( 'GET', MOCK_URL )
+                
+                engine.AddJob( job )
+                
+                with self.assertRaises( HydrusExceptions.ServerException ):
+                    
+                    job.WaitUntilDone()
+                    
+                
+                self.assertTrue( job.HasError() )
+                self.assertEqual( job.GetContentBytes(), BAD_RESPONSE )
+                self.assertEqual( type( job.GetErrorException() ), HydrusExceptions.ServerException )
+                
+            
+            # a job waiting on a retry timer is just a timer on the loop, and still cancels promptly
+            
+            with HTTMock( catch_wew_too_busy ):
+                
+                job = ClientNetworkingJobs.NetworkJob( 'GET', MOCK_URL )
+                
+                engine.AddJob( job )
+                
+                time.sleep( 0.5 )
+                
+                self.assertFalse( job.IsDone() )
+                self.assertIn( 'retrying in', job.GetStatus()[0] )
+                
+                job.Cancel()
+                
+                time.sleep( 1.5 )
+                
+                self.assertTrue( job.IsDone() )
+                self.assertTrue( job.IsCancelled() )
+                
+            
+        
+        engine.Shutdown()
+        
+        time.sleep( 0.5 )
+        
+        self.assertTrue( engine.IsShutdown() )
+        self.assertFalse( engine._async_runner.IsRunning() )
+        
+    
     def test_engine_shutdown_app( self ):
         
         mock_controller = TestController.MockController()
@@ -534,15 +700,12 @@ class TestNetworkingEngine( unittest.TestCase ):
                 self.assertTrue( job.IsDone() )
                 self.assertFalse( job.HasError() )
                 
-                engine._new_work_to_do.set()
+                # the job tells the engine it is done, so no nudge needed
                 
                 time.sleep( 0.25 )
                 
-                self.assertEqual( len( engine._jobs_awaiting_validity ), 0 )
-                self.assertEqual( len( engine._jobs_awaiting_bandwidth ), 0 )
-                self.assertEqual( len( engine._jobs_awaiting_login ), 0 )
-                self.assertEqual( len( engine._jobs_awaiting_slot ), 0 )
-                self.assertEqual( len( engine._jobs_running ), 0 )
+                self.assertEqual( engine.GetJobsSnapshot(), [] )
+                self.assertFalse( engine.IsBusy() )
                 
             
         
@@ -550,6 +713,86 @@ class TestNetworkingEngine( unittest.TestCase ):
         
         engine.Shutdown()
         
+    def test_engine_many_jobs( self ):
+        
+        mock_controller = TestController.MockController()
+        bandwidth_manager = ClientNetworkingBandwidth.NetworkBandwidthManager()
+        session_manager = ClientNetworkingSessions.NetworkSessionManager()
+        domain_manager = ClientNetworkingDomain.NetworkDomainManager()
+        login_manager = ClientNetworkingLogin.NetworkLoginManager()
+        
+        engine = ClientNetworking.NetworkEngine( mock_controller, bandwidth_manager, session_manager, domain_manager, login_manager )
+        
+        mock_controller.CallToThread( engine.MainLoop )
+        
+        with HTTMock( catch_all ):
+            
+            with HTTMock( catch_wew_ok ):
+                
+                jobs = [ ClientNetworkingJobs.NetworkJob( 'GET', MOCK_URL ) for i in range( 100 ) ]
+                
+                for job in jobs:
+                    
+                    engine.AddJob( job )
+                    
+                
+                # one domain, so these go a few at a time, each finished job waking the engine for the next
+                
+                for job in jobs:
+                    
+                    job.WaitUntilDone()
+                    
+                
+                self.assertTrue( all( job.IsDone() and not job.HasError() for job in jobs ) )
+                
+                time.sleep( 0.25 )
+                
+                self.assertEqual( engine.GetJobsSnapshot(), [] )
+                
+            
+        
+        engine.Shutdown()
+        
+    
+    def test_engine_wakes_sleeping_job( self ):
+        
+        mock_controller = TestController.MockController()
+        bandwidth_manager = ClientNetworkingBandwidth.NetworkBandwidthManager()
+        session_manager = ClientNetworkingSessions.NetworkSessionManager()
+        domain_manager = ClientNetworkingDomain.NetworkDomainManager()
+        login_manager = ClientNetworkingLogin.NetworkLoginManager()
+        
+        engine = ClientNetworking.NetworkEngine( mock_controller, bandwidth_manager, session_manager, domain_manager, login_manager )
+        
+        mock_controller.CallToThread( engine.MainLoop )
+        
+        engine.PausePlayNewJobs()
+        
+        job = ClientNetworkingJobs.NetworkJob( 'GET', MOCK_URL )
+        
+        engine.AddJob( job )
+        
+        time.sleep( 0.25 )
+        
+        self.assertTrue( job.IsAsleep() )
+        self.assertEqual( engine.GetJobsSnapshot(), [ ( ClientNetworking.JOB_STATUS_AWAITING_BANDWIDTH, job ) ] )
+        
+        # it is asleep for a couple of seconds, but cancelling tells the engine to drop it now
+        
+        job.Cancel()
+        
+        # and it is out of the snapshot straight away, whether or not the engine has got to it yet
+        
+        self.assertEqual( engine.GetJobsSnapshot(), [] )
+        
+        time.sleep( 0.25 )
+        
+        self.assertEqual( engine.GetJobsSnapshot(), [] )
+        
+        engine.PausePlayNewJobs()
+        
+        engine.Shutdown()
+        
     
 class TestNetworkingJob( unittest.TestCase ):
     
@@ -767,6 +1010,159 @@ class TestNetworkingJob( unittest.TestCase ):
         pass
         
     
+    def test_segmented_download( self ):
+        
+        # 4MB, so big enough for four 1MB segments
+        data = LONG_GOOD_RESPONSE * 16
+        
+        ranges_requested = []
+        server_mode = [ 'ok' ]
+        
+        class RecordingFileImportOptions( object ):
+            
+            def __init__( self ):
+                
+                self.checks = []
+                
+            
+            def CheckNetworkDownload( self, possible_mime, num_bytes, is_complete_file_size ):
+                
+                self.checks.append( ( num_bytes, is_complete_file_size ) )
+                
+            
+        
+        class Handler( http.server.BaseHTTPRequestHandler ):
+            
+            protocol_version = 'HTTP/1.1'
+            
+            def do_GET( self ):
+                
+                range_header = self.headers.get( 'Range' )
+                
+                ranges_requested.append( range_header )
+                
+                if range_header is None or server_mode[0] == 'no_ranges':
+                    
+                    self.send_response( 200 )
+                    self.send_header( 'Content-Length', str( len( data ) ) )
+                    self.end_headers()
+                    self.wfile.write( data )
+                    
+                    return
+                    
+                
+                ( start_text, end_text ) = range_header[6:].split( '-' )
+                
+                byte_start = int( start_text )
+                byte_end = len( data ) - 1 if end_text == '' else int( end_text )
+                
+                content_range_start = byte_start
+                
+                if server_mode[0] == 'bad_content_range' and byte_start > 0:
+                    
+                    content_range_start = byte_start + 1
+                    
+                
+                body = data[ byte_start : byte_end + 1 ]
+                
+                self.send_response( 206 )
+                self.send_header( 'Content-Range', 'bytes {}-{}/{}'.format( content_range_start, byte_end, len( data ) ) )
+                self.send_header( 'Content-Length', str( len( body ) ) )
+                self.end_headers()
+                self.wfile.write( body )
+                
+            
+            def log_message( self, *args ):
+                
+                pass
+                
+            
+        
+        server = http.server.ThreadingHTTPServer( ( '127.0.0.1', 0 ), Handler )
+        server.daemon_threads = True
+        
+        port = server.server_address[1]
+        
+        threading.Thread( target = server.serve_forever, daemon = True ).start()
+        
+        new_options = HG.client_controller.new_options
+        
+        original_num_segments = new_options.GetInteger( 'segmented_download_num_segments' )
+        original_min_size = new_options.GetInteger( 'segmented_download_min_size' )
+        
+        try:
+            
+            new_options.SetInteger( 'segmented_download_num_segments', 4 )
+            new_options.SetInteger( 'segmented_download_min_size', 1048576 )
+            
+            for mode in ( 'ok', 'bad_content_range', 'no_ranges' ):
+                
+                server_mode[0] = mode
+                ranges_requested.clear()
+                
+                ( os_file_handle, temp_path ) = HydrusTemp.GetTempPath()
+                
+                try:
+                    
+                    job = ClientNetworkingJobs.NetworkJob( 'GET', 'http://127.0.0.1:{}/file'.format( port ), temp_path = temp_path )
+                    
+                    job.engine = self._GetJob().engine
+                    
+                    file_import_options = RecordingFileImportOptions()
+                    
+                    job.SetFileImportOptions( file_import_options )
+                    
+                    job.Start()
+                    
+                    self.assertFalse( job.HasError() )
+                    
+                    with open( temp_path, 'rb' ) as f:
+                        
+                        self.assertEqual( f.read(), data )
+                        
+                    
+                    tracker = job.engine.bandwidth_manager.GetTracker( ClientNetworkingContexts.GLOBAL_NETWORK_CONTEXT )
+                    
+                    if mode == 'ok':
+                        
+                        self.assertEqual( sorted( ranges_requested ), [ 'bytes=0-', 'bytes=0-1048575', 'bytes=1048576-2097151', 'bytes=2097152-3145727', 'bytes=3145728-4194303' ] )
+                        
+                        self.assertEqual( tracker.GetUsage( HC.BANDWIDTH_TYPE_DATA, None ), len( data ) )
+                        
+                        # once on the first response's headers, and once more on what the parts actually added up to
+                        
+                        self.assertEqual( file_import_options.checks, [ ( len( data ), True ), ( len( data ), True ) ] )
+                        
+                    elif mode == 'bad_content_range':
+                        
+                        # the broken parts are thrown away and we get it again in one go
+                        
+                        self.assertEqual( ranges_requested[-1], 'bytes=0-' )
+                        
+                        self.assertGreaterEqual( tracker.GetUsage( HC.BANDWIDTH_TYPE_DATA, None ), len( data ) )
+                        
+                    else:
+                        
+                        self.assertEqual( ranges_requested, [ 'bytes=0-' ] )
+                        
+                        self.assertEqual( tracker.GetUsage( HC.BANDWIDTH_TYPE_DATA, None ), len( data ) )
+                        
+                    
+                finally:
+                    
+                    HydrusTemp.CleanUpTempPath( os_file_handle, temp_path )
+                    
+                
+            
+        finally:
+            
+            new_options.SetInteger( 'segmented_download_num_segments', original_num_segments )
+            new_options.SetInteger( 'segmented_download_min_size', original_min_size )
+            
+            server.shutdown()
+            
+        
+    
 class TestNetworkingJobHydrus( unittest.TestCase ):
     
     def _GetJob( self, for_login = False ):
@@ -922,3 +1318,112 @@ class TestNetworkingJobHydrus( unittest.TestCase ):
         pass
         
     
+class TestNetworkingSessions( unittest.TestCase ):
+    
+    def test_connection_pool_settings( self ):
+        
+        new_options = HG.client_controller.new_options
+        
+        original_domains_to_connection_pool_settings = new_options.GetDomainsToConnectionPoolSettings()
+        
+        try:
+            
+            new_options.SetDomainsToConnectionPoolSettings( { MOCK_DOMAIN : ( 32, 2 ) } )
+            
+            session_manager = ClientNetworkingSessions.NetworkSessionManager()
+            
+            session = session_manager.GetSessionForDomain( MOCK_SUBDOMAIN )
+            
+            adapter = session.get_adapter( MOCK_SUBURL )
+            
+            self.assertIsInstance( adapter, ClientNetworkingSessions.ConnectionCountingHTTPAdapter )
+            self.assertEqual( adapter.GetConnectionPoolSettings(), ( new_options.GetInteger( 'connection_pool_num_hosts' ), 32, 2 ) )
+            self.assertEqual( adapter.max_retries.total, 2 )
+            
+            session = session_manager.GetSessionForDomain( 'other.com' )
+            
+            adapter = session.get_adapter( 'https://other.com/' )
+            
+            self.assertEqual( adapter.GetConnectionPoolSettings(), ( new_options.GetInteger( 'connection_pool_num_hosts' ), new_options.GetInteger( 'connection_pool_size_per_host' ), new_options.GetInteger( 'connection_max_retries' ) ) )
+            
+            # changing the options remounts on next fetch
+            
+            new_options.SetDomainsToConnectionPoolSettings( {} )
+            
+            session_manager.ReinitialiseConnectionPoolSettings()
+            
+            session = session_manager.GetSessionForDomain( MOCK_SUBDOMAIN )
+            
+            self.assertEqual( session.get_adapter( MOCK_SUBURL ).GetConnectionPoolSettings()[1], new_options.GetInteger( 'connection_pool_size_per_host' ) )
+            
+        finally:
+            
+            new_options.SetDomainsToConnectionPoolSettings( original_domains_to_connection_pool_settings )
+            
+        
+    
+    def test_connection_reuse( self ):
+        
+        class Handler( http.server.BaseHTTPRequestHandler ):
+            
+            protocol_version = 'HTTP/1.1'
+            
+            def do_GET( self ):
+                
+                self.send_response( 200 )
+                self.send_header( 'Content-Length', str( len( GOOD_RESPONSE ) ) )
+                self.end_headers()
+                self.wfile.write( GOOD_RESPONSE )
+                
+            
+            def log_message( self, *args ):
+                
+                pass
+                
+            
+        
+        server = http.server.ThreadingHTTPServer( ( '127.0.0.1', 0 ), Handler )
+        server.daemon_threads = True
+        
+        port = server.server_address[1]
+        
+        threading.Thread( target = server.serve_forever, daemon = True ).start()
+        
+        try:
+            
+            mock_controller = TestController.MockController()
+            bandwidth_manager = ClientNetworkingBandwidth.NetworkBandwidthManager()
+            session_manager = ClientNetworkingSessions.NetworkSessionManager()
+            domain_manager = ClientNetworkingDomain.NetworkDomainManager()
+            login_manager = ClientNetworkingLogin.NetworkLoginManager()
+            
+            engine = ClientNetworking.NetworkEngine( mock_controller, bandwidth_manager, session_manager, domain_manager, login_manager )
+            
+            mock_controller.CallToThread( engine.MainLoop )
+            
+            # one at a time, so every job after the first should get the kept-alive connection
+            
+            for i in range( 5 ):
+                
+                job = ClientNetworkingJobs.NetworkJob( 'GET', 'http://127.0.0.1:{}/file/{}'.format( port, i ) )
+                
+                engine.AddJob( job )
+                
+                job.WaitUntilDone()
+                
+                self.assertFalse( job.HasError() )
+                self.assertEqual( job.GetContentBytes(), GOOD_RESPONSE )
+                
+            
+            engine.Shutdown()
+            
+            network_context = ClientNetworkingContexts.NetworkContext( CC.NETWORK_CONTEXT_DOMAIN, '127.0.0.1:{}'.format( port ) )
+            
+            self.assertEqual( session_manager.GetConnectionCounts( network_context ), ( 1, 4 ) )
+            
+        finally:
+            
+            server.shutdown()
+            
+        
+    
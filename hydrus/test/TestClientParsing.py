@@ -5,7 +5,9 @@ import unittest
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusGlobals as HG
 
+from hydrus.client import ClientCaches
 from hydrus.client import ClientParsing
 from hydrus.client import ClientStrings
 
@@ -109,6 +111,290 @@ class TestContentParser( unittest.TestCase ):
         
     
 
+class TestParseFormulaHTML( unittest.TestCase ):
+    
+    def test_lxml_matches_bs4( self ):
+        
+        html = '''<!DOCTYPE html>
+<html><head><title>test page</title></head>
+<body>
+<div id="content" class="main  wide">
+<ul class="tag-list">
+<li class="tag-type-artist"><a class="search-tag" href="/tags?name=artist_a">artist a</a> <span class="count">12</span></li>
+<li class="tag-type-general"><a class="search-tag" href="/tags?name=blue_sky">blue sky</a> <span class="count">4000</span></li>
+<li class="tag-type-general"><a class="search-tag" href="/tags?name=cloud">cloud</a> <span class="count">300</span></li>
+<li class="tag-type-general extra"><a class="search-tag other" href="/tags?name=sun&amp;x=1">sun</a></li>
+<li class="tag-type-character"><a class="search-tag" rel="nofollow  external" href="/tags?name=someone">someone</a></li>
+</ul>
+<p>first line<br>second line<!-- a comment --> and <b>bold</b> text</p>
+<table><tbody><tr><td headers="h1 h2">cell</td><td class="">empty class</td></tr></tbody></table>
+<img src="https://example.com/image.jpg" title="" alt="an image">
+</div>
+</body>
+</html>'''
+        
+        def rule( **kwargs ):
+            
+            return ClientParsing.ParseRuleHTML( **kwargs )
+            
+        
+        D = ClientParsing.HTML_RULE_TYPE_DESCENDING
+        A = ClientParsing.HTML_RULE_TYPE_ASCENDING
+        N = ClientParsing.HTML_RULE_TYPE_NEXT_SIBLINGS
+        P = ClientParsing.HTML_RULE_TYPE_PREV_SIBLINGS
+        
+        tag_rule_chains = [
+            [ rule( rule_type = D, tag_name = 'a' ) ],
+            [ rule( rule_type = D, tag_name = 'li', tag_attributes = { 'class' : 'tag-type-general' } ), rule( rule_type = D, tag_name = 'a' ) ],
+            [ rule( rule_type = D, tag_name = 'li', tag_attributes = { 'class' : 'tag-type-general extra' } ) ],
+            [ rule( rule_type = D, tag_name = 'li', tag_attributes = { 'class' : 'extra tag-type-general' } ) ],
+            [ rule( rule_type = D, tag_name = 'div', tag_attributes = { 'class' : 'main wide' } ) ],
+            [ rule( rule_type = D, tag_name = 'div', tag_attributes = { 'class' : 'main  wide' } ) ],
+            [ rule( rule_type = D, tag_name = None, tag_attributes = { 'class' : 'search-tag' } ) ],
+            [ rule( rule_type = D, tag_name = 'td', tag_attributes = { 'class' : '' } ) ],
+            [ rule( rule_type = D, tag_name = 'img', tag_attributes = { 'title' : '' } ) ],
+            [ rule( rule_type = D, tag_name = 'td', tag_attributes = { 'headers' : 'h2' } ) ],
+            [ rule( rule_type = D, tag_name = 'a', tag_attributes = { 'rel' : 'external' } ) ],
+            [ rule( rule_type = D, tag_name = 'a', tag_attributes = { 'href' : '/tags?name=cloud' } ) ],
+            [ rule( rule_type = D, tag_name = 'li', tag_index = 1 ), rule( rule_type = D, tag_name = 'a' ) ],
+            [ rule( rule_type = D, tag_name = 'li', tag_index = -1 ) ],
+            [ rule( rule_type = D, tag_name = 'li', tag_index = 20 ) ],
+            [ rule( rule_type = D, tag_name = 'li', tag_index = 2 ), rule( rule_type = N, tag_name = 'li' ) ],
+            [ rule( rule_type = D, tag_name = 'li', tag_index = 2 ), rule( rule_type = P, tag_name = 'li', tag_index = 0 ) ],
+            [ rule( rule_type = D, tag_name = 'li', tag_index = 3 ), rule( rule_type = P, tag_name = None ) ],
+            [ rule( rule_type = D, tag_name = 'span' ), rule( rule_type = A, tag_name = 'ul', tag_depth = 1 ) ],
+            [ rule( rule_type = D, tag_name = 'span', tag_index = 0 ), rule( rule_type = A, tag_name = None, tag_depth = 2 ) ],
+            [ rule( rule_type = D, tag_name = 'span', tag_index = 0 ), rule( rule_type = A, tag_name = None, tag_depth = 20 ) ],
+            [ rule( rule_type = D, tag_name = 'a', should_test_tag_string = True, tag_string_string_match = ClientStrings.StringMatch( match_type = ClientStrings.STRING_MATCH_REGEX, match_value = '^s' ) ) ],
+            [ rule( rule_type = D, tag_name = 'p' ) ],
+            [ rule( rule_type = D, tag_name = 'title' ) ],
+            [ rule( rule_type = D, tag_name = 'html' ) ],
+            [ rule( rule_type = D, tag_name = 'nonexistent' ) ]
+        ]
+        
+        contents = [
+            ( ClientParsing.HTML_CONTENT_ATTRIBUTE, 'href' ),
+            ( ClientParsing.HTML_CONTENT_ATTRIBUTE, 'class' ),
+            ( ClientParsing.HTML_CONTENT_ATTRIBUTE, 'rel' ),
+            ( ClientParsing.HTML_CONTENT_ATTRIBUTE, 'title' ),
+            ( ClientParsing.HTML_CONTENT_STRING, '' ),
+            ( ClientParsing.HTML_CONTENT_HTML, '' )
+        ]
+        
+        new_options = HG.client_controller.new_options
+        
+        try:
+            
+            for tag_rules in tag_rule_chains:
+                
+                for ( content_to_fetch, attribute_to_fetch ) in contents:
+                    
+                    formula = ClientParsing.ParseFormulaHTML( tag_rules = tag_rules, content_to_fetch = content_to_fetch, attribute_to_fetch = attribute_to_fetch )
+                    
+                    new_options.SetBoolean( 'parse_html_with_lxml', False )
+                    
+                    bs4_result = formula.Parse( {}, html, False )
+                    
+                    new_options.SetBoolean( 'parse_html_with_lxml', True )
+                    
+                    lxml_result = formula.Parse( {}, html, False )
+                    
+                    self.assertEqual( lxml_result, bs4_result, formula.ToPrettyMultilineString() )
+                    
+                
+            
+            # a couple of spot checks that we are testing something
+            
+            formula = ClientParsing.ParseFormulaHTML( tag_rules = tag_rule_chains[1], content_to_fetch = ClientParsing.HTML_CONTENT_ATTRIBUTE, attribute_to_fetch = 'href' )
+            
+            self.assertEqual( formula.Parse( {}, html, False ), [ '/tags?name=blue_sky', '/tags?name=cloud', '/tags?name=sun&x=1' ] )
+            
+            formula = ClientParsing.ParseFormulaHTML( tag_rules = tag_rule_chains[22], content_to_fetch = ClientParsing.HTML_CONTENT_STRING )
+            
+            self.assertEqual( formula.Parse( {}, html, False ), [ 'first line' + os.linesep + 'second line a comment  and bold text' ] )
+            
+            # lxml won't do an empty document, so that goes to bs4
+            
+            self.assertEqual( formula.Parse( {}, '', False ), [] )
+            
+        finally:
+            
+            new_options.SetBoolean( 'parse_html_with_lxml', False )
+            
+        
+    
+
+class TestParseFormulaJSON( unittest.TestCase ):
+    
+    def test_streaming_matches_in_memory( self ):
+        
+        json_text = '''{
+    "posts" : [
+        { "id" : 123, "file_url" : "https://example.com/a.jpg", "tags" : { "general" : [ "blue sky", "cloud" ], "artist" : [ "artist a" ] }, "score" : 1.5e2, "parent" : null },
+        { "id" : 124, "file_url" : "https://example.com/b\\u00e9.png", "tags" : { "general" : [], "artist" : [ "artist b", "artist c" ] }, "score" : -3, "parent" : 123, "id" : 125 },
+        {"id":126,"file_url":"https://example.com/c.gif","tags":{},"score":true,"parent":{"id":1}},
+        "not a post",
+        [ 1, 2, [ 3 ] ]
+    ],
+    "next" : "https://example.com/page/2",
+    "counts" : { "b" : 2, "a" : 1, "10" : 10, "9" : 9 },
+    "empty" : {}
+}'''
+        
+        def key( k ):
+            
+            return ( ClientParsing.JSON_PARSE_RULE_TYPE_DICT_KEY, ClientStrings.StringMatch( match_type = ClientStrings.STRING_MATCH_FIXED, match_value = k, example_string = k ) )
+            
+        
+        all_items = ( ClientParsing.JSON_PARSE_RULE_TYPE_ALL_ITEMS, None )
+        
+        def index( i ):
+            
+            return ( ClientParsing.JSON_PARSE_RULE_TYPE_INDEXED_ITEM, i )
+            
+        
+        parse_rule_chains = [
+            [ key( 'posts' ), all_items, key( 'file_url' ) ],
+            [ key( 'posts' ), all_items, key( 'id' ) ],
+            [ key( 'posts' ), all_items, key( 'tags' ), all_items, all_items ],
+            [ key( 'posts' ), all_items, key( 'tags' ), key( 'artist' ), index( 0 ) ],
+            [ key( 'posts' ), all_items, key( 'tags' ), index( 0 ) ],
+            [ key( 'posts' ), all_items, all_items ],
+            [ key( 'posts' ), index( 1 ) ],
+            [ key( 'posts' ), index( -1 ), index( -1 ) ],
+            [ key( 'posts' ), index( 20 ) ],
+            [ key( 'posts' ), all_items, index( 2 ) ],
+            [ key( 'posts' ), all_items, key( 'parent' ) ],
+            [ key( 'posts' ), all_items, key( 'score' ) ],
+            [ key( 'next' ) ],
+            [ key( 'next' ), all_items ],
+            [ key( 'counts' ), all_items ],
+            [ key( 'counts' ), index( 0 ) ],
+            [ key( 'empty' ), all_items ],
+            [ ( ClientParsing.JSON_PARSE_RULE_TYPE_DICT_KEY, ClientStrings.StringMatch( match_type = ClientStrings.STRING_MATCH_REGEX, match_value = '^(next|counts)$' ) ) ],
+            [ all_items ],
+            [ index( 1 ) ],
+            [ key( 'nonexistent' ) ],
+            []
+        ]
+        
+        contents = [ ClientParsing.JSON_CONTENT_STRING, ClientParsing.JSON_CONTENT_JSON, ClientParsing.JSON_CONTENT_DICT_KEYS ]
+        
+        original_min_size = ClientParsing.JSON_STREAMING_MIN_SIZE
+        
+        try:
+            
+            for parse_rules in parse_rule_chains:
+                
+                for content_to_fetch in contents:
+                    
+                    formula = ClientParsing.ParseFormulaJSON( parse_rules = parse_rules, content_to_fetch = content_to_fetch )
+                    
+                    ClientParsing.JSON_STREAMING_MIN_SIZE = original_min_size
+                    
+                    in_memory_result = formula.Parse( {}, json_text, False )
+                    
+                    ClientParsing.JSON_STREAMING_MIN_SIZE = 0
+                    
+                    # a fresh cache, or we'd just share the object the in-memory parse loaded
+                    HG.test_controller.parsing_cache = ClientCaches.ParsingCache()
+                    
+                    streaming_result = formula.Parse( {}, json_text, False )
+                    
+                    self.assertEqual( streaming_result, in_memory_result, formula.ToPrettyMultilineString() )
+                    
+                
+            
+            # and all the rules at once in one pass
+            
+            j = ClientCaches.ParsingCache().GetJSON( json_text )
+            
+            self.assertEqual( ClientParsing.GetJSONRootsStreaming( json_text, parse_rule_chains ), [ list( ClientParsing.GetJSONRoots( j, parse_rules ) ) for parse_rules in parse_rule_chains ] )
+            
+            # a couple of spot checks that we are testing something
+            
+            formula = ClientParsing.ParseFormulaJSON( parse_rules = parse_rule_chains[1], content_to_fetch = ClientParsing.JSON_CONTENT_STRING )
+            
+            self.assertEqual( formula.Parse( {}, json_text, False ), [ '123', '125', '126' ] )
+            
+            formula = ClientParsing.ParseFormulaJSON( parse_rules = parse_rule_chains[14], content_to_fetch = ClientParsing.JSON_CONTENT_STRING )
+            
+            self.assertEqual( formula.Parse( {}, json_text, False ), [ '10', '9', '1', '2' ] )
+            
+            formula = ClientParsing.ParseFormulaJSON( parse_rules = parse_rule_chains[0], content_to_fetch = ClientParsing.JSON_CONTENT_STRING )
+            
+            for bad_json_text in ( '', '{ "posts" : [ }', '{ "posts" : [] } []', '<html></html>' ):
+                
+                with self.assertRaises( HydrusExceptions.ParseException ):
+                    
+                    formula.Parse( {}, bad_json_text, False )
+                    
+                
+            
+            # a page parser streams the text once for all its formulae, and none of them load the whole thing
+            
+            content_parsers = [ ClientParsing.ContentParser( name = str( i ), content_type = HC.CONTENT_TYPE_MAPPINGS, formula = ClientParsing.ParseFormulaJSON( parse_rules = parse_rules, content_to_fetch = ClientParsing.JSON_CONTENT_STRING ), additional_info = '' ) for ( i, parse_rules ) in enumerate( parse_rule_chains[:4] ) ]
+            
+            page_parser = ClientParsing.PageParser( 'test', content_parsers = content_parsers )
+            
+            ClientParsing.JSON_STREAMING_MIN_SIZE = original_min_size
+            
+            HG.test_controller.parsing_cache = ClientCaches.ParsingCache()
+            
+            in_memory_results = page_parser.Parse( {}, json_text )
+            
+            ClientParsing.JSON_STREAMING_MIN_SIZE = 0
+            
+            parsing_cache = ClientCaches.ParsingCache()
+            
+            HG.test_controller.parsing_cache = parsing_cache
+            
+            original_get_json_roots_streaming = ClientParsing.GetJSONRootsStreaming
+            
+            streaming_calls = []
+            
+            def get_json_roots_streaming( *args ):
+                
+                streaming_calls.append( args )
+                
+                return original_get_json_roots_streaming( *args )
+                
+            
+            def get_json( *args ):
+                
+                raise Exception( 'Loaded the whole json!' )
+                
+            
+            parsing_cache.GetJSON = get_json
+            
+            ClientParsing.GetJSONRootsStreaming = get_json_roots_streaming
+            
+            try:
+                
+                streaming_results = page_parser.Parse( {}, json_text )
+                
+            finally:
+                
+                ClientParsing.GetJSONRootsStreaming = original_get_json_roots_streaming
+                
+            
+            self.assertEqual( streaming_results, in_memory_results )
+            self.assertEqual( len( streaming_calls ), 1 )
+            
+            for content_parser in content_parsers:
+                
+                self.assertIsNotNone( parsing_cache.GetStreamedJSONRoots( json_text, content_parser.GetFormula() ) )
+                
+            
+        finally:
+            
+            ClientParsing.JSON_STREAMING_MIN_SIZE = original_min_size
+            
+            HG.test_controller.parsing_cache = ClientCaches.ParsingCache()
+            
+        
+    
+
 class TestStringConverter( unittest.TestCase ):
     
     def test_basics( self ):
@@ -305,6 +305,7 @@ class Controller( object ):
         self.CallToThreadLongRunning( self.network_engine.MainLoop )
         
         self.tag_display_manager = ClientTagsHandling.TagDisplayManager()
+        self.tag_display_maintenance_manager = ClientTagsHandling.TagDisplayMaintenanceManager( self )
         
         self._managers[ 'undo' ] = ClientManagers.UndoManager( self )
         
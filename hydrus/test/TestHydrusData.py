@@ -1,8 +1,10 @@
+import random
 import unittest
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusIntegerSets
 from hydrus.core import HydrusTime
 
 from hydrus.client import ClientConstants as CC
@@ -26,3 +28,72 @@ class TestHydrusData( unittest.TestCase ):
         self.assertEqual( HydrusData.ConvertIntToPrettyOrdinalString( 1011 ), '1,011th' )
         
     
+    def test_sorted_integer_set( self ):
+        
+        for ( size_a, size_b ) in [ ( 0, 0 ), ( 0, 50 ), ( 1, 1 ), ( 10, 2000 ), ( 2000, 10 ), ( 1500, 1500 ) ]:
+            
+            a = set( random.sample( range( 5000 ), size_a ) )
+            b = set( random.sample( range( 5000 ), size_b ) )
+            
+            sa = HydrusIntegerSets.SortedIntegerSet( a )
+            
+            self.assertEqual( len( sa ), len( a ) )
+            self.assertEqual( list( sa ), sorted( a ) )
+            self.assertTrue( all( isinstance( i, int ) and not isinstance( i, bool ) for i in sa ) )
+            
+            self.assertEqual( set( sa.intersection( b ) ), a.intersection( b ) )
+            self.assertEqual( set( sa.difference( b ) ), a.difference( b ) )
+            self.assertEqual( set( sa.union( b ) ), a.union( b ) )
+            self.assertEqual( set( sa & list( b ) ), a & b )
+            self.assertEqual( set( b & sa ), a & b )
+            self.assertEqual( set( sa - b ), a - b )
+            self.assertEqual( set( sa | b ), a | b )
+            self.assertEqual( sa.isdisjoint( b ), a.isdisjoint( b ) )
+            self.assertEqual( sa.issubset( b ), a.issubset( b ) )
+            
+            self.assertEqual( sa, HydrusIntegerSets.SortedIntegerSet( list( a ) + list( a ) ) )
+            self.assertTrue( sa == a )
+            
+            for i in random.sample( range( 5000 ), 50 ):
+                
+                self.assertEqual( i in sa, i in a )
+                
+            
+            # the update ops work in place but must not touch any copy sharing the array
+            
+            sa_copy = sa.copy()
+            
+            sa.intersection_update( b )
+            
+            self.assertEqual( set( sa ), a & b )
+            self.assertEqual( set( sa_copy ), a )
+            
+            sa.update( ( i for i in b ) )
+            
+            self.assertEqual( set( sa ), b )
+            
+            sa.difference_update( a )
+            
+            self.assertEqual( set( sa ), b - a )
+            self.assertEqual( set( sa_copy ), a )
+            
+        
+        s = HydrusIntegerSets.SortedIntegerSet( [ 5, 3, 3, 1 ] )
+        
+        self.assertEqual( s[:2], [ 1, 3 ] )
+        self.assertEqual( s[ -1 ], 5 )
+        
+        s.add( 4 )
+        s.discard( 3 )
+        s.discard( 100 )
+        
+        self.assertEqual( list( s ), [ 1, 4, 5 ] )
+        self.assertNotIn( 'a', s )
+        self.assertNotIn( None, s )
+        
+        with self.assertRaises( KeyError ):
+            
+            s.remove( 3 )
+            
+        
+    
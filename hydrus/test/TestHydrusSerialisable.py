@@ -11,7 +11,11 @@ from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientData
 from hydrus.client import ClientDefaults
 from hydrus.client import ClientDuplicates
+from hydrus.client import ClientLocation
 from hydrus.client.gui import ClientGUIShortcuts
+from hydrus.client.gui.pages import ClientGUIManagementController
+from hydrus.client.gui.pages import ClientGUISession
+from hydrus.client.importing import ClientImportFileSeeds
 from hydrus.client.importing import ClientImportSubscriptions
 from hydrus.client.importing import ClientImportSubscriptionQuery
 from hydrus.client.importing.options import ClientImportOptions
@@ -446,6 +450,116 @@ class TestSerialisables( unittest.TestCase ):
         assertSCUEqual( result, scu )
         
     
+    def test_SERIALISABLE_TYPE_FILE_SEED_CACHE( self ):
+        
+        def test( obj, dupe_obj ):
+            
+            self.assertEqual( len( obj ), len( dupe_obj ) )
+            
+            for ( file_seed, dupe_file_seed ) in zip( obj.GetFileSeeds(), dupe_obj.GetFileSeeds() ):
+                
+                self.assertEqual( file_seed.GetSerialisableTuple(), dupe_file_seed.GetSerialisableTuple() )
+                
+            
+            self.assertEqual( obj.GetStatus().GetStatusesToCounts(), dupe_obj.GetStatus().GetStatusesToCounts() )
+            self.assertEqual( obj.GetStatus().GetLatestAddedTime(), dupe_obj.GetStatus().GetLatestAddedTime() )
+            
+        
+        file_seed_cache = ClientImportFileSeeds.FileSeedCache()
+        
+        file_seeds = [ ClientImportFileSeeds.FileSeed( ClientImportFileSeeds.FILE_SEED_TYPE_URL, 'https://example.com/file/{}.jpg'.format( i ) ) for i in range( 20 ) ]
+        
+        for ( i, file_seed ) in enumerate( file_seeds ):
+            
+            file_seed.created = 1000 + i
+            
+        
+        file_seed_cache.AddFileSeeds( file_seeds )
+        
+        for file_seed in file_seeds[:10]:
+            
+            file_seed.SetStatus( CC.STATUS_SUCCESSFUL_AND_NEW, note = 'done' )
+            
+        
+        file_seed_cache.NotifyFileSeedsUpdated( file_seeds[:10] )
+        
+        self.assertEqual( file_seed_cache.GetStatus().GetStatusesToCounts(), { CC.STATUS_SUCCESSFUL_AND_NEW : 10, CC.STATUS_UNKNOWN : 10 } )
+        self.assertEqual( file_seed_cache.GetStatus().GetLatestAddedTime(), 1019 )
+        self.assertEqual( file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN ), file_seeds[10] )
+        
+        self._dump_and_load_and_test( file_seed_cache, test )
+        
+        # an update to a finished file seed gets through to the next save
+        
+        file_seeds[3].SetStatus( CC.STATUS_ERROR, note = 'it broke' )
+        
+        file_seed_cache.NotifyFileSeedsUpdated( ( file_seeds[3], ) )
+        
+        self._dump_and_load_and_test( file_seed_cache, test )
+        
+        dupe_file_seed_cache = file_seed_cache.Duplicate()
+        
+        self.assertEqual( dupe_file_seed_cache.GetFileSeeds()[3].status, CC.STATUS_ERROR )
+        self.assertEqual( dupe_file_seed_cache.GetFileSeeds()[3].note, 'it broke' )
+        
+        # and so do changes that don't touch the status or modified time
+        
+        file_seeds[4].SetReferralURL( 'https://example.com/gallery' )
+        file_seeds[5].SetHash( bytes( range( 32 ) ) )
+        
+        self._dump_and_load_and_test( file_seed_cache, test )
+        
+        # dupes find the original
+        
+        self.assertTrue( file_seed_cache.HasFileSeed( ClientImportFileSeeds.FileSeed( ClientImportFileSeeds.FILE_SEED_TYPE_URL, 'https://example.com/file/5.jpg' ) ) )
+        self.assertFalse( file_seed_cache.HasFileSeed( ClientImportFileSeeds.FileSeed( ClientImportFileSeeds.FILE_SEED_TYPE_URL, 'https://example.com/file/50.jpg' ) ) )
+        
+        self.assertEqual( file_seed_cache.AddFileSeeds( ( ClientImportFileSeeds.FileSeed( ClientImportFileSeeds.FILE_SEED_TYPE_URL, 'https://example.com/file/3.jpg' ), ), dupe_try_again = True ), 1 )
+        
+        self.assertEqual( file_seeds[3].status, CC.STATUS_UNKNOWN )
+        self.assertEqual( file_seed_cache.GetStatus().GetStatusesToCounts(), { CC.STATUS_SUCCESSFUL_AND_NEW : 9, CC.STATUS_UNKNOWN : 11 } )
+        self.assertEqual( file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN ), file_seeds[3] )
+        
+        file_seed_cache.RemoveFileSeeds( file_seeds[15:] )
+        
+        self.assertEqual( file_seed_cache.GetStatus().GetLatestAddedTime(), 1014 )
+        
+        self._dump_and_load_and_test( file_seed_cache, test )
+        
+    
+    def test_SERIALISABLE_TYPE_GUI_SESSION_PAGE_DATA( self ):
+        
+        def test( obj, dupe_obj ):
+            
+            self.assertEqual( obj.GetHashes(), dupe_obj.GetHashes() )
+            self.assertEqual( obj.GetManagementController().GetPageName(), dupe_obj.GetManagementController().GetPageName() )
+            
+        
+        location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.LOCAL_FILE_SERVICE_KEY )
+        
+        fsc = ClientSearch.FileSearchContext( location_context = location_context, predicates = [] )
+        
+        management_controller = ClientGUIManagementController.CreateManagementControllerQuery( 'search', fsc, False )
+        
+        hashes = [ HydrusData.GenerateKey() for i in range( 200 ) ]
+        
+        page_data = ClientGUISession.GUISessionPageData( management_controller, hashes )
+        
+        self._dump_and_load_and_test( page_data, test )
+        
+        self._dump_and_load_and_test( ClientGUISession.GUISessionPageData( management_controller, [] ), test )
+        
+        # old sessions stored a list of hex
+        
+        old_serialisable_tuple = ( HydrusSerialisable.SERIALISABLE_TYPE_GUI_SESSION_PAGE_DATA, 1, ( management_controller.GetSerialisableTuple(), [ hash.hex() for hash in hashes ] ) )
+        
+        old_page_data = HydrusSerialisable.CreateFromSerialisableTuple( old_serialisable_tuple )
+        
+        self.assertEqual( old_page_data.GetHashes(), hashes )
+        
+        self._dump_and_load_and_test( old_page_data, test )
+        
+    
     def test_SERIALISABLE_TYPE_SHORTCUT( self ):
         
         def test( obj, dupe_obj ):